@@ -4,85 +4,79 @@ Invokes AWS Bedrock Claude Opus 4.5 to generate SOAP notes from medical transcri
 """
 
 import json
-import boto3
 import logging
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import os
 
+from medzen_runtime.clients import LazyClient
+from medzen_runtime.config import get_config, get_prompt
+from medzen_runtime.json_extract import extract_json
+from medzen_runtime.prompt_cache import (
+    CACHE_MIN_TOKENS,
+    cache_eligible,
+    cached_prefix_tokens,
+    cached_system,
+    prompt_version,
+    strip_cache_control,
+    usage_tokens,
+)
+from medzen_runtime.soap_sections import (
+    REPAIR_SYSTEM_PROMPT,
+    SYSTEM_PROMPT,
+    SYSTEM_PROMPT_NAME,
+    build_section_repair_prompt,
+    build_transcript_digest,
+    estimate_tokens,
+    merge_sections,
+)
+from medzen_runtime.soap_schema import validate_soap_note
+from medzen_runtime.supabase import SupabaseClient
+from medzen_runtime.tracing import span
+
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize clients
-import requests
-bedrock_client = boto3.client('bedrock-runtime', region_name='us-east-1')
-sqs_client = boto3.client('sqs', region_name='us-east-1')
+# Initialize clients (built on first use)
+bedrock_client = LazyClient('bedrock-runtime', 'us-east-1')
+sqs_client = LazyClient('sqs', 'us-east-1')
 
 # Constants
-MODEL_ID_PRIMARY = 'us.anthropic.claude-opus-4-5-20251101-v1:0'
-MODEL_ID_FALLBACK = 'us.anthropic.claude-3-5-sonnet-20241022-v2:0'
-SQS_QUEUE_URL = os.environ.get('SOAP_RETRY_QUEUE_URL', 'https://sqs.us-east-1.amazonaws.com/558069890522/medzen-soap-retry-queue')
+# Model IDs, the retry queue URL and repair thresholds come from medzen_runtime.config
 SUPABASE_URL = os.environ.get('SUPABASE_URL', 'https://noaeltglphdlkbflipit.supabase.co')
 SUPABASE_SERVICE_KEY = os.environ.get('SUPABASE_SERVICE_KEY', '')
-ENABLE_FALLBACK = os.environ.get('ENABLE_FALLBACK_MODEL', 'true').lower() == 'true'
-SYSTEM_PROMPT = """You are a clinical documentation assistant generating SOAP notes from medical call transcripts.
-
-CRITICAL INSTRUCTIONS:
-1. Return ONLY a single valid JSON object - No markdown, no text before/after, no explanations
-2. Never hallucinate - Use "unknown" for any information not explicitly stated or reasonably inferred
-3. Telemedicine-aware - Acknowledge missing vitals and physical exams; do not pretend they exist
-4. Safety first - Always include red flags and return precautions relevant to the chief complaint
-5. Honest assessment - Mark uncertainties in source.data_quality.uncertainties
-6. Doctor-friendly - Generate a note that's easy for the provider to review and edit
-
-The JSON must follow the exact schema provided. Key rules:
-- chief_complaint: 1-2 sentences, primary reason for visit
-- subjective.hpi: Chronological narrative with symptom details (onset, duration, severity, context)
-- subjective.ros: Systematically document positives, negatives, and unknowns for each body system
-- objective.vitals: Set "measured": false if vitals NOT taken; do NOT hallucinate vital signs
-- objective.physical_exam_limited: For telemedicine, set "performed": false and use telemedicine_observations
-- assessment.problem_list: Include differential diagnoses with likelihood estimates
-- plan: Document exact medications, doses, frequencies from conversation; include rationale
-- safety.requires_clinician_review: Always true if any gaps or uncertainties
-- doctor_editing: Include specific clarifications provider should ask about
-
-For telemedicine visits:
-- Do NOT add vitals that weren't measured
-- Do NOT describe physical exam findings that weren't observed
-- Use "unknown" liberally for missing information
-- Add limitations to safety.limitations and doctor_editing.sections_needing_attention
-
-If language of transcript is French:
-- Output all free-text fields in FRENCH
-- Keep medication names and medical terminology as stated
-- Set "language": "fr" in output
-
-JSON Schema Summary (you MUST follow this exactly):
-{
-  "schema_version": "1.0.0",
-  "generated_at": "ISO8601 timestamp",
-  "language": "en or fr",
-  "encounter": { encounter_type, appointment_id, session_id, start_time, end_time, timezone, location },
-  "participants": { provider, patient },
-  "source": { transcript, data_quality },
-  "chief_complaint": "string",
-  "subjective": { hpi, ros, pmh, psh, medications, allergies, social_history, family_history },
-  "objective": { vitals, telemedicine_observations, physical_exam_limited, diagnostics_reviewed },
-  "assessment": { problem_list, clinical_impression_summary },
-  "plan": { treatments, orders, follow_up, patient_education, work_school_notes },
-  "coding_billing": { suggested_cpt, mdm_level_suggestion, rationale },
-  "safety": { medication_safety_notes, limitations, requires_clinician_review },
-  "doctor_editing": { draft_quality, recommended_clarifications, sections_needing_attention }
-}"""
+
+
+# Version hash of the prompt text last returned; identical text on every call keeps the Bedrock prompt cache warm
+_system_prompt: Dict[str, str] = {}
 
 
 def load_system_prompt() -> str:
     """
     Load the comprehensive system prompt.
-    Can be overridden to load from S3 for easier updates without redeploying Lambda.
+
+    Served from the per-container artifact cache (S3 prompts/soap-generation-system-prompt.md,
+    refreshed by ETag or pinned via config prompt_versions), falling back to the bundled SYSTEM_PROMPT.
     """
-    return SYSTEM_PROMPT
+    text = get_prompt(SYSTEM_PROMPT_NAME, SYSTEM_PROMPT)
+    if _system_prompt.get('text') is not text:
+        _system_prompt['text'] = text
+        _system_prompt['version'] = prompt_version(text)
+        logger.info(f"Using system prompt {_system_prompt['version']} ({len(text)} characters)")
+        tokens = cached_prefix_tokens({'system': cached_system(text)})
+        if tokens < CACHE_MIN_TOKENS:
+            logger.warning(
+                f"System prompt is ~{tokens} tokens, below the {CACHE_MIN_TOKENS}-token prompt cache minimum: "
+                f"prompt caching is off for this prompt"
+            )
+    return text
+
+
+def add_token_counts(total: Dict[str, Any], extra: Dict[str, Any]) -> None:
+    """Add the token counts of another Bedrock call to a bedrock_tokens dict in place."""
+    for key in ('input', 'output', 'cache_read', 'cache_write'):
+        total[key] = total.get(key, 0) + extra.get(key, 0)
 
 
 def queue_for_retry(event: Dict[str, Any], reason: str = "Bedrock throttling") -> bool:
@@ -98,7 +92,7 @@ def queue_for_retry(event: Dict[str, Any], reason: str = "Bedrock throttling") -
     """
     try:
         sqs_client.send_message(
-            QueueUrl=SQS_QUEUE_URL,
+            QueueUrl=get_config('soap_retry_queue_url'),
             MessageBody=json.dumps({
                 'event': event,
                 'reason': reason,
@@ -113,53 +107,177 @@ def queue_for_retry(event: Dict[str, Any], reason: str = "Bedrock throttling") -
         return False
 
 
-def log_token_usage(session_id: str, appointment_id: str, input_tokens: int, output_tokens: int, model: str):
+def log_token_usage(
+    session_id: str,
+    appointment_id: str,
+    input_tokens: int,
+    output_tokens: int,
+    model: str,
+    cache_read_tokens: int = 0,
+    cache_write_tokens: int = 0,
+    system_prompt_version: Optional[str] = None
+):
     """
     Log token usage to Supabase for monitoring.
 
     Args:
         session_id: Session identifier
         appointment_id: Appointment identifier
-        input_tokens: Number of input tokens used
+        input_tokens: Number of uncached input tokens used
         output_tokens: Number of output tokens used
         model: Model used for generation
+        cache_read_tokens: Input tokens served from the prompt cache
+        cache_write_tokens: Input tokens written to the prompt cache
+        system_prompt_version: Hash of the system prompt revision
     """
     if not SUPABASE_SERVICE_KEY:
         logger.warning("SUPABASE_SERVICE_KEY not configured, skipping token logging")
         return
 
     try:
-        headers = {
-            'Authorization': f'Bearer {SUPABASE_SERVICE_KEY}',
-            'Content-Type': 'application/json',
-            'Prefer': 'return=minimal'
-        }
-
         data = {
             'session_id': session_id,
             'appointment_id': appointment_id,
             'timestamp': datetime.utcnow().isoformat() + 'Z',
             'input_tokens': input_tokens,
             'output_tokens': output_tokens,
+            'cache_read_input_tokens': cache_read_tokens,
+            'cache_creation_input_tokens': cache_write_tokens,
+            'prompt_version': system_prompt_version,
             'model': model
         }
 
-        response = requests.post(
-            f'{SUPABASE_URL}/rest/v1/bedrock_token_usage',
-            json=data,
-            headers=headers,
-            timeout=10
+        SupabaseClient(SUPABASE_URL, SUPABASE_SERVICE_KEY).insert('bedrock_token_usage', data)
+        logger.info(
+            f"Logged {input_tokens + output_tokens} tokens for session {session_id} "
+            f"(cache read {cache_read_tokens}, cache write {cache_write_tokens})"
         )
 
-        if response.status_code in [200, 201]:
-            logger.info(f"Logged {input_tokens + output_tokens} tokens for session {session_id}")
-        else:
-            logger.warning(f"Failed to log tokens to Supabase: {response.status_code} - {response.text[:200]}")
-
     except Exception as e:
         logger.warning(f"Failed to log token usage: {str(e)}")
 
 
+def build_metadata_context(metadata: Optional[Dict[str, Any]]) -> str:
+    """
+    Format encounter metadata as prompt context lines.
+
+    Args:
+        metadata: Optional metadata (appointment_id, session_id, provider_name, patient_name, etc.)
+
+    Returns:
+        Newline-separated "Label: value" lines for the fields that are set
+    """
+    if not metadata:
+        return ""
+
+    labels = [
+        ('appointment_id', 'Appointment ID'),
+        ('session_id', 'Session ID'),
+        ('provider_name', 'Provider'),
+        ('provider_specialty', 'Provider Specialty'),
+        ('patient_name', 'Patient'),
+        ('call_start_time', 'Call Start Time'),
+        ('call_end_time', 'Call End Time'),
+        ('language', 'Transcript Language'),
+    ]
+
+    metadata_context = ""
+    for key, label in labels:
+        if metadata.get(key):
+            metadata_context += f"{label}: {metadata[key]}\n"
+    return metadata_context
+
+
+def invoke_model(request_body: Dict[str, Any], use_fallback: bool = False) -> Dict[str, Any]:
+    """
+    Call Bedrock with the primary model, retrying once with the fallback model if throttled.
+
+    Args:
+        request_body: Anthropic Messages API request body
+        use_fallback: Use fallback model instead of primary
+
+    Returns:
+        Dict with statusCode 200, response_body and model_name, or a retryable 429 error
+    """
+    # Select model based on fallback flag
+    config = get_config()
+    model_id = config['model_id_fallback'] if use_fallback else config['model_id_primary']
+    model_name = config['model_name_fallback'] if use_fallback else config['model_name_primary']
+
+    logger.info(f"Invoking Bedrock {model_name}")
+
+    # The fallback model does not support prompt caching checkpoints
+    body = strip_cache_control(request_body) if use_fallback else request_body
+
+    try:
+        with span('bedrock', 'invoke_model', model=model_id) as call:
+            response = bedrock_client.invoke_model(
+                modelId=model_id,
+                contentType='application/json',
+                accept='application/json',
+                body=json.dumps(body)
+            )
+            response_body = json.loads(response['body'].read().decode('utf-8'))
+            usage = usage_tokens(response_body)
+            call.metric('InputTokens', usage['input'])
+            call.metric('OutputTokens', usage['output'])
+            call.metric('CacheReadTokens', usage['cache_read'])
+            call.metric('CacheEligible', int(cache_eligible(body)))
+    except bedrock_client.exceptions.ThrottlingException as e:
+        logger.warning(f"Bedrock throttling error: {str(e)}")
+        if not use_fallback and config['enable_fallback_model']:
+            logger.info(f"Attempting to retry with fallback model ({config['model_name_fallback']})")
+            return invoke_model(request_body, use_fallback=True)
+        else:
+            logger.error("Throttled and no fallback available or fallback also failed")
+            return {
+                'statusCode': 429,
+                'error': 'BedrockThrottled',
+                'message': 'Bedrock is currently throttled. Request has been queued for retry.',
+                'retryable': True
+            }
+    except Exception as e:
+        if 'Too many tokens per day' in str(e) or 'ThrottlingException' in str(e):
+            logger.warning(f"Token limit exceeded: {str(e)}")
+            if not use_fallback and config['enable_fallback_model']:
+                logger.info(f"Attempting to retry with fallback model ({config['model_name_fallback']})")
+                return invoke_model(request_body, use_fallback=True)
+            else:
+                return {
+                    'statusCode': 429,
+                    'error': 'TokenLimitExceeded',
+                    'message': 'Daily token limit exceeded. Request has been queued for retry.',
+                    'retryable': True
+                }
+        raise
+
+    return {
+        'statusCode': 200,
+        'response_body': response_body,
+        'model_name': model_name
+    }
+
+
+def parse_model_json(response_text: str, operation: str) -> Dict[str, Any]:
+    """
+    Extract the JSON object from model output inside a 'json' tracing span.
+
+    Args:
+        response_text: Raw model text
+        operation: Span operation name, e.g. 'parse_soap_note'
+
+    Returns:
+        extract_json result
+    """
+    with span('json', operation) as parse:
+        extraction = extract_json(response_text, expect='object')
+        parse.metric('Repairs', len(extraction['repairs']))
+        parse.metric('Chars', len(response_text))
+        if extraction['error'] or not extraction['complete']:
+            parse.fail(extraction['error'] or 'truncated output')
+    return extraction
+
+
 def invoke_bedrock(transcript: str, metadata: Optional[Dict[str, Any]] = None, use_fallback: bool = False) -> Dict[str, Any]:
     """
     Invoke AWS Bedrock to generate SOAP note from transcript.
@@ -176,24 +294,7 @@ def invoke_bedrock(transcript: str, metadata: Optional[Dict[str, Any]] = None, u
 
     try:
         # Prepare metadata context
-        metadata_context = ""
-        if metadata:
-            if metadata.get('appointment_id'):
-                metadata_context += f"Appointment ID: {metadata['appointment_id']}\n"
-            if metadata.get('session_id'):
-                metadata_context += f"Session ID: {metadata['session_id']}\n"
-            if metadata.get('provider_name'):
-                metadata_context += f"Provider: {metadata['provider_name']}\n"
-            if metadata.get('provider_specialty'):
-                metadata_context += f"Provider Specialty: {metadata['provider_specialty']}\n"
-            if metadata.get('patient_name'):
-                metadata_context += f"Patient: {metadata['patient_name']}\n"
-            if metadata.get('call_start_time'):
-                metadata_context += f"Call Start Time: {metadata['call_start_time']}\n"
-            if metadata.get('call_end_time'):
-                metadata_context += f"Call End Time: {metadata['call_end_time']}\n"
-            if metadata.get('language'):
-                metadata_context += f"Transcript Language: {metadata['language']}\n"
+        metadata_context = build_metadata_context(metadata)
 
         # Prepare user message
         user_message = f"""Please generate a SOAP note from the following medical transcript.
@@ -205,15 +306,12 @@ def invoke_bedrock(transcript: str, metadata: Optional[Dict[str, Any]] = None, u
 
 Generate the SOAP note as a single, complete JSON object following the exact schema. Return ONLY the JSON object, no other text."""
 
-        # Select model based on fallback flag
-        model_id = MODEL_ID_FALLBACK if use_fallback else MODEL_ID_PRIMARY
-        model_name = "Claude 3.5 Sonnet (Fallback)" if use_fallback else "Claude Opus 4.5 (Primary)"
-
-        # Prepare Bedrock request
+        # Prepare Bedrock request; the static system prompt is a cached prefix and the
+        # per-encounter metadata and transcript stay in the uncached user message
         request_body = {
             "anthropic_version": "bedrock-2023-06-01",
             "max_tokens": 4096,
-            "system": load_system_prompt(),
+            "system": cached_system(load_system_prompt()),
             "messages": [
                 {
                     "role": "user",
@@ -222,47 +320,15 @@ Generate the SOAP note as a single, complete JSON object following the exact sch
             ]
         }
 
-        logger.info(f"Invoking Bedrock {model_name} for SOAP generation")
         logger.info(f"Transcript length: {len(transcript)} characters")
 
         # Call Bedrock
-        try:
-            response = bedrock_client.invoke_model(
-                modelId=model_id,
-                contentType='application/json',
-                accept='application/json',
-                body=json.dumps(request_body)
-            )
-        except bedrock_client.exceptions.ThrottlingException as e:
-            logger.warning(f"Bedrock throttling error: {str(e)}")
-            if not use_fallback and ENABLE_FALLBACK:
-                logger.info("Attempting to retry with fallback model (Claude 3.5 Sonnet)")
-                return invoke_bedrock(transcript, metadata, use_fallback=True)
-            else:
-                logger.error("Throttled and no fallback available or fallback also failed")
-                return {
-                    'statusCode': 429,
-                    'error': 'BedrockThrottled',
-                    'message': 'Bedrock is currently throttled. Request has been queued for retry.',
-                    'retryable': True
-                }
-        except Exception as e:
-            if 'Too many tokens per day' in str(e) or 'ThrottlingException' in str(e):
-                logger.warning(f"Token limit exceeded: {str(e)}")
-                if not use_fallback and ENABLE_FALLBACK:
-                    logger.info("Attempting to retry with fallback model (Claude 3.5 Sonnet)")
-                    return invoke_bedrock(transcript, metadata, use_fallback=True)
-                else:
-                    return {
-                        'statusCode': 429,
-                        'error': 'TokenLimitExceeded',
-                        'message': 'Daily token limit exceeded. Request has been queued for retry.',
-                        'retryable': True
-                    }
-            raise
-
-        # Parse response
-        response_body = json.loads(response['body'].read().decode('utf-8'))
+        invocation = invoke_model(request_body, use_fallback)
+        if invocation['statusCode'] != 200:
+            return invocation
+
+        response_body = invocation['response_body']
+        model_name = invocation['model_name']
 
         # Extract content
         if 'content' not in response_body or len(response_body['content']) == 0:
@@ -278,65 +344,183 @@ Generate the SOAP note as a single, complete JSON object following the exact sch
 
         logger.info(f"Bedrock response received: {len(response_text)} characters")
 
-        # Parse JSON from response
-        try:
-            # Try to extract JSON from response (handle potential markdown code blocks)
-            json_str = response_text
+        usage = usage_tokens(response_body)
+        input_tokens = usage['input']
+        output_tokens = usage['output']
+        bedrock_tokens = dict(usage, model=model_name, prompt_version=_system_prompt.get('version'))
 
-            # If response is wrapped in markdown code blocks, extract
-            if '```json' in json_str:
-                json_str = json_str.split('```json')[1].split('```')[0].strip()
-            elif '```' in json_str:
-                json_str = json_str.split('```')[1].split('```')[0].strip()
+        if usage['cache_read'] or usage['cache_write']:
+            logger.info(f"Prompt cache: {usage['cache_read']} tokens read, {usage['cache_write']} tokens written")
 
-            soap_note = json.loads(json_str)
+        # Parse JSON from response (code fences, trailing commas, smart quotes and truncation are repaired)
+        extraction = parse_model_json(response_text, 'parse_soap_note')
+        soap_note = extraction['data']
 
-            # Validate schema version
-            if 'schema_version' not in soap_note:
-                logger.warning("SOAP note missing schema_version, adding default")
-                soap_note['schema_version'] = '1.0.0'
+        if extraction['repairs']:
+            logger.info(f"Repaired Bedrock JSON output: {', '.join(extraction['repairs'])}")
 
-            # Ensure generated_at timestamp
-            if 'generated_at' not in soap_note:
-                soap_note['generated_at'] = datetime.utcnow().isoformat() + 'Z'
+        if not isinstance(soap_note, dict) or not extraction['complete']:
+            logger.error(f"Failed to parse Bedrock response as JSON: {extraction['error'] or 'truncated output'}")
+            logger.error(f"Response text: {response_text[:500]}")
+            result = {
+                'statusCode': 500,
+                'error': 'InvalidJsonResponse',
+                'message': f"Bedrock returned invalid JSON: {extraction['error'] or 'truncated output'}",
+                'raw_response': response_text[:1000],  # First 1000 chars for debugging
+                'bedrock_tokens': bedrock_tokens
+            }
+            if isinstance(soap_note, dict):
+                # Complete top-level sections salvaged from truncated output
+                result['partial_soap_note'] = soap_note
+                result['truncated_sections'] = extraction['truncated_sections']
+                logger.warning(f"Salvaged {len(extraction['sections'])} complete sections from truncated response")
+            return result
 
-            logger.info("SOAP note generated successfully")
+        logger.info("SOAP note generated successfully")
 
-            # Log token usage
-            input_tokens = response_body.get('usage', {}).get('input_tokens', 0)
-            output_tokens = response_body.get('usage', {}).get('output_tokens', 0)
+        # Log token usage
+        if metadata:
+            log_token_usage(
+                metadata.get('session_id', 'unknown'),
+                metadata.get('appointment_id', 'unknown'),
+                input_tokens,
+                output_tokens,
+                model_name,
+                cache_read_tokens=usage['cache_read'],
+                cache_write_tokens=usage['cache_write'],
+                system_prompt_version=bedrock_tokens['prompt_version']
+            )
 
-            if metadata:
-                log_token_usage(
-                    metadata.get('session_id', 'unknown'),
-                    metadata.get('appointment_id', 'unknown'),
-                    input_tokens,
-                    output_tokens,
-                    model_name
-                )
+        return {
+            'statusCode': 200,
+            'soap_note': soap_note,
+            'bedrock_tokens': bedrock_tokens
+        }
 
-            return {
-                'statusCode': 200,
-                'soap_note': soap_note,
-                'bedrock_tokens': {
-                    'input': input_tokens,
-                    'output': output_tokens,
-                    'model': model_name
+    except Exception as e:
+        logger.error(f"Error invoking Bedrock: {str(e)}", exc_info=True)
+        return {
+            'statusCode': 500,
+            'error': 'BedrockInvocationError',
+            'message': str(e)
+        }
+
+
+def repair_soap_sections(
+    transcript: str,
+    soap_note: Optional[Dict[str, Any]],
+    sections: List[str],
+    metadata: Optional[Dict[str, Any]] = None,
+    full_input_tokens: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Regenerate only the given sections of a partial SOAP note and merge them in.
+
+    The request carries a compact system prompt, a transcript digest and the sections
+    that already exist, so it costs a fraction of a full regeneration.
+
+    Args:
+        transcript: Medical conversation transcript
+        soap_note: Partial SOAP note (complete sections are kept as-is)
+        sections: Top-level sections to regenerate
+        metadata: Optional metadata (appointment_id, session_id, provider_name, patient_name, etc.)
+        full_input_tokens: Input tokens of the failed full generation, if known
+
+    Returns:
+        Dict with merged SOAP note and repair report, or error
+    """
+    soap_note = dict(soap_note or {})
+
+    try:
+        metadata_context = build_metadata_context(metadata)
+        user_message = build_section_repair_prompt(
+            sections,
+            soap_note,
+            build_transcript_digest(transcript),
+            metadata_context
+        )
+
+        request_body = {
+            "anthropic_version": "bedrock-2023-06-01",
+            "max_tokens": 4096,
+            "system": REPAIR_SYSTEM_PROMPT,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": user_message
                 }
-            }
+            ]
+        }
 
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse Bedrock response as JSON: {str(e)}")
-            logger.error(f"Response text: {response_text[:500]}")
+        logger.info(f"Repairing SOAP sections: {', '.join(sections)}")
+
+        invocation = invoke_model(request_body)
+        if invocation['statusCode'] != 200:
+            return invocation
+
+        response_body = invocation['response_body']
+        model_name = invocation['model_name']
+        response_text = (response_body.get('content') or [{}])[0].get('text', '')
+
+        extraction = parse_model_json(response_text, 'parse_repaired_sections')
+        repaired = extraction['data'] if isinstance(extraction['data'], dict) else {}
+        merge_sections(soap_note, repaired, sections)
+
+        validation = validate_soap_note(soap_note)
+        soap_note = validation['note']
+        still_missing = [s for s in validation['invalid_sections'] if s in sections]
+
+        usage = usage_tokens(response_body)
+        input_tokens = usage['input']
+        output_tokens = usage['output']
+
+        if full_input_tokens is None:
+            full_input_tokens = estimate_tokens(load_system_prompt(), metadata_context, transcript)
+
+        repair_report = {
+            'sections': sections,
+            'unrepaired_sections': still_missing,
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'full_regeneration_input_tokens': full_input_tokens,
+            'input_tokens_saved': max(full_input_tokens - input_tokens, 0),
+            'model': model_name
+        }
+
+        logger.info(
+            f"Section repair used {input_tokens} input tokens "
+            f"(saved ~{repair_report['input_tokens_saved']} vs full regeneration), "
+            f"unrepaired: {still_missing or 'none'}"
+        )
+
+        if metadata:
+            log_token_usage(
+                metadata.get('session_id', 'unknown'),
+                metadata.get('appointment_id', 'unknown'),
+                input_tokens,
+                output_tokens,
+                f"{model_name} - Section Repair"
+            )
+
+        if still_missing:
             return {
                 'statusCode': 500,
-                'error': 'InvalidJsonResponse',
-                'message': f'Bedrock returned invalid JSON: {str(e)}',
-                'raw_response': response_text[:1000]  # First 1000 chars for debugging
+                'error': 'SectionRepairFailed',
+                'message': f"Could not regenerate sections: {', '.join(still_missing)}",
+                'partial_soap_note': soap_note,
+                'repair': repair_report
             }
 
+        return {
+            'statusCode': 200,
+            'soap_note': soap_note,
+            'validation': summarize_validation(validation),
+            'bedrock_tokens': dict(usage, model=model_name),
+            'repair': repair_report
+        }
+
     except Exception as e:
-        logger.error(f"Error invoking Bedrock: {str(e)}", exc_info=True)
+        logger.error(f"Error repairing SOAP sections: {str(e)}", exc_info=True)
         return {
             'statusCode': 500,
             'error': 'BedrockInvocationError',
@@ -344,6 +528,108 @@ Generate the SOAP note as a single, complete JSON object following the exact sch
         }
 
 
+def summarize_validation(validation: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact validation report for the Lambda response and logs."""
+    return {
+        'violations': validation['violations'][:20],
+        'violation_count': len(validation['violations']),
+        'defaulted': len(validation['defaulted']),
+        'coerced': len(validation['coerced'])
+    }
+
+
+def repair_incomplete_note(
+    result: Dict[str, Any],
+    transcript: str,
+    metadata: Dict[str, Any],
+    allow_regeneration: bool = True
+) -> Dict[str, Any]:
+    """
+    Validate a generation result and regenerate whatever the validator rejects.
+
+    The compiled SOAP schema fills defaults and coerces types in place. Top-level
+    sections it reports as invalid are regenerated on their own; if more than
+    max_repair_sections (config) are invalid (or nothing could be salvaged) the whole note
+    is regenerated once instead.
+
+    Args:
+        result: Result of invoke_bedrock
+        transcript: Medical conversation transcript
+        metadata: Metadata passed to invoke_bedrock
+        allow_regeneration: Whether a full regeneration may still be attempted
+
+    Returns:
+        Validated or repaired result, or the original result if the repair fails
+    """
+    if result['statusCode'] == 200:
+        partial_note = result['soap_note']
+    elif result.get('error') == 'InvalidJsonResponse':
+        partial_note = result.get('partial_soap_note') or {}
+    else:
+        return result
+
+    validation = validate_soap_note(partial_note)
+    partial_note = validation['note']
+    sections = validation['invalid_sections']
+
+    if validation['violations']:
+        logger.warning(
+            f"SOAP schema violations ({len(validation['violations'])}): "
+            f"{', '.join(v['path'] for v in validation['violations'][:10])}"
+        )
+
+    if not sections:
+        # Truncation after the last section still leaves a complete note
+        return {
+            'statusCode': 200,
+            'soap_note': partial_note,
+            'bedrock_tokens': result.get('bedrock_tokens', {}),
+            'validation': summarize_validation(validation)
+        }
+
+    if len(sections) > get_config('max_repair_sections') and allow_regeneration:
+        logger.warning(f"{len(sections)} SOAP sections invalid, regenerating the full note")
+        regenerated = invoke_bedrock(transcript, metadata)
+        regenerated = repair_incomplete_note(regenerated, transcript, metadata, allow_regeneration=False)
+        if regenerated['statusCode'] != 200 and result['statusCode'] == 200:
+            return result
+        if regenerated['statusCode'] == 200 and result.get('bedrock_tokens'):
+            add_token_counts(regenerated['bedrock_tokens'], result['bedrock_tokens'])
+        return regenerated
+
+    if not result.get('partial_soap_note') and result['statusCode'] != 200:
+        return result
+
+    # Full prompt size of the original call, including the cached prefix
+    original_tokens = result.get('bedrock_tokens')
+    full_input_tokens = None
+    if original_tokens:
+        full_input_tokens = sum(original_tokens.get(k, 0) for k in ('input', 'cache_read', 'cache_write'))
+
+    logger.warning(f"SOAP note incomplete, regenerating sections: {', '.join(sections)}")
+    repaired = repair_soap_sections(
+        transcript,
+        partial_note,
+        sections,
+        metadata,
+        full_input_tokens=full_input_tokens
+    )
+
+    if repaired['statusCode'] != 200 and result['statusCode'] == 200:
+        # Keep the usable note rather than failing on a best-effort repair
+        logger.warning(f"Section repair failed, keeping generated note: {repaired.get('message')}")
+        result['validation'] = summarize_validation(validation)
+        return result
+
+    if repaired['statusCode'] == 200 and result.get('bedrock_tokens'):
+        # Report the cost of the original call plus the repair
+        add_token_counts(repaired['bedrock_tokens'], result['bedrock_tokens'])
+    elif repaired['statusCode'] == 429:
+        repaired['partial_soap_note'] = partial_note
+
+    return repaired
+
+
 def lambda_handler(event, context):
     """
     AWS Lambda handler for SOAP generation.
@@ -359,7 +645,9 @@ def lambda_handler(event, context):
         "patientName": "string (optional)",
         "callStartTime": "ISO8601 (optional)",
         "callEndTime": "ISO8601 (optional)",
-        "transcriptLanguage": "en|fr (optional, default: en)"
+        "transcriptLanguage": "en|fr (optional, default: en)",
+        "soapNote": { ... } (optional, partial note - only its missing sections are regenerated),
+        "repairSections": ["plan", ...] (optional, sections of soapNote to regenerate)
     }
 
     Returns:
@@ -368,7 +656,9 @@ def lambda_handler(event, context):
         "soapNote": { ... },
         "sessionId": "string",
         "appointmentId": "string",
-        "bedrockTokens": { ... }
+        "bedrockTokens": { ... },
+        "repair": { ... } (present when sections were regenerated),
+        "validation": { ... } (schema violations, defaulted and coerced field counts)
     }
     """
 
@@ -416,8 +706,23 @@ def lambda_handler(event, context):
             'language': event.get('transcriptLanguage', 'en')
         }
 
-        # Generate SOAP note via Bedrock
-        result = invoke_bedrock(transcript, metadata)
+        existing_note = event.get('soapNote')
+        if existing_note:
+            # Repair mode: regenerate only the missing or invalid sections of an existing note
+            validation = validate_soap_note(existing_note)
+            sections = event.get('repairSections') or validation['invalid_sections']
+            if sections:
+                result = repair_soap_sections(transcript, validation['note'], sections, metadata)
+            else:
+                result = {
+                    'statusCode': 200,
+                    'soap_note': validation['note'],
+                    'validation': summarize_validation(validation)
+                }
+        else:
+            # Generate SOAP note via Bedrock
+            result = invoke_bedrock(transcript, metadata)
+            result = repair_incomplete_note(result, transcript, metadata)
 
         # Prepare response
         response = {
@@ -426,21 +731,31 @@ def lambda_handler(event, context):
             'appointmentId': appointment_id
         }
 
+        if 'repair' in result:
+            response['repair'] = result['repair']
+        if 'validation' in result:
+            response['validation'] = result['validation']
+
         if result['statusCode'] == 200:
             response['soapNote'] = result['soap_note']
             response['bedrockTokens'] = result.get('bedrock_tokens', {})
             logger.info(f"SOAP note generated successfully for session {session_id}")
         elif result.get('statusCode') == 429 and result.get('retryable'):
-            # Queue for retry if throttled
+            # Queue for retry if throttled; a partial note is retried in repair mode
             response['error'] = result.get('error', 'Unknown error')
             response['message'] = result.get('message', 'Generation throttled')
-            response['queued'] = queue_for_retry(event, result.get('message'))
+            retry_event = dict(event)
+            if result.get('partial_soap_note'):
+                retry_event['soapNote'] = result['partial_soap_note']
+            response['queued'] = queue_for_retry(retry_event, result.get('message'))
             logger.warning(f"SOAP generation throttled for session {session_id}, queued for retry")
         else:
             response['error'] = result.get('error', 'Unknown error')
             response['message'] = result.get('message', 'Generation failed')
             if 'raw_response' in result:
                 response['debugInfo'] = result['raw_response']
+            if 'partial_soap_note' in result:
+                response['partialSoapNote'] = result['partial_soap_note']
             logger.error(f"SOAP generation failed for session {session_id}: {result.get('message')}")
 
         return response
@@ -4,27 +4,28 @@ Monitors daily token usage and sends alerts when approaching limits
 """
 
 import json
-import boto3
-import requests
 import logging
 import os
 from datetime import datetime, timedelta
 
+from medzen_runtime.clients import LazyClient
+from medzen_runtime.config import get_config
+from medzen_runtime.supabase import SupabaseClient, SupabaseError
+from medzen_runtime.tracing import span
+
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize clients
-cloudwatch = boto3.client('cloudwatch', region_name='us-east-1')
-sns = boto3.client('sns', region_name='us-east-1')
+# Initialize clients (built on first use)
+cloudwatch = LazyClient('cloudwatch', 'us-east-1')
+sns = LazyClient('sns', 'us-east-1')
 
 # Constants
 SUPABASE_URL = os.environ.get('SUPABASE_URL', 'https://noaeltglphdlkbflipit.supabase.co')
 SUPABASE_SERVICE_KEY = os.environ.get('SUPABASE_SERVICE_KEY', '')
-SNS_TOPIC_ARN = 'arn:aws:sns:us-east-1:558069890522:medzen-token-alerts'
-DAILY_TOKEN_LIMIT = 10000000  # 10M tokens/day (adjust based on AWS limit increase)
-WARNING_THRESHOLD = 0.80  # Alert at 80% of limit
-CRITICAL_THRESHOLD = 0.95  # Critical at 95% of limit
+# Alert topic, daily_token_limit and warning/critical thresholds (fractions of the limit)
+# come from medzen_runtime.config
 
 
 def get_daily_token_usage(date: str) -> dict:
@@ -38,30 +39,20 @@ def get_daily_token_usage(date: str) -> dict:
         Dict with token usage stats
     """
     try:
-        headers = {
-            'Authorization': f'Bearer {SUPABASE_SERVICE_KEY}',
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        }
+        supabase = SupabaseClient(SUPABASE_URL, SUPABASE_SERVICE_KEY)
 
         # Query the daily summary view filtered by date
         # Format: /rest/v1/bedrock_daily_token_summary?usage_date=eq.2024-01-13
-        response = requests.get(
-            f'{SUPABASE_URL}/rest/v1/bedrock_daily_token_summary?usage_date=eq.{date}',
-            headers=headers,
-            timeout=10
-        )
-
-        if response.status_code != 200:
-            logger.error(f"Supabase query failed: {response.status_code} - {response.text}")
+        try:
+            data = supabase.select('bedrock_daily_token_summary', {'usage_date': date})
+        except SupabaseError as e:
+            logger.error(f"Supabase query failed: {e.status} - {e.body}")
             return {
                 'date': date,
                 'total_tokens': 0,
-                'error': f'Supabase returned {response.status_code}'
+                'error': f'Supabase returned {e.status}'
             }
 
-        data = response.json()
-
         if not data:
             # No data for this date yet
             return {
@@ -78,23 +69,23 @@ def get_daily_token_usage(date: str) -> dict:
         row = data[0]
 
         # Query individual records to get model breakdown
-        model_data = requests.get(
-            f'{SUPABASE_URL}/rest/v1/bedrock_model_performance?usage_date=eq.{date}',
-            headers=headers,
-            timeout=10
-        )
-
         model_breakdown = {}
-        if model_data.status_code == 200:
-            for model_row in model_data.json():
-                model = model_row.get('model', 'unknown')
-                model_breakdown[model] = {
-                    'input': model_row.get('total_input_tokens', 0),
-                    'output': model_row.get('total_output_tokens', 0),
-                    'count': model_row.get('sessions_count', 0)
-                }
+        try:
+            model_rows = supabase.select('bedrock_model_performance', {'usage_date': date})
+        except SupabaseError as e:
+            logger.warning(f"Model breakdown query failed: {e.status}")
+            model_rows = []
+
+        for model_row in model_rows:
+            model = model_row.get('model', 'unknown')
+            model_breakdown[model] = {
+                'input': model_row.get('total_input_tokens', 0),
+                'output': model_row.get('total_output_tokens', 0),
+                'count': model_row.get('sessions_count', 0)
+            }
 
         total_tokens = row.get('total_tokens', 0) or 0
+        daily_limit = get_config('daily_token_limit')
 
         return {
             'date': date,
@@ -103,7 +94,7 @@ def get_daily_token_usage(date: str) -> dict:
             'output_tokens': row.get('total_output_tokens', 0) or 0,
             'total_sessions': row.get('total_sessions', 0) or 0,
             'model_breakdown': model_breakdown,
-            'usage_percentage': (total_tokens / DAILY_TOKEN_LIMIT) * 100 if DAILY_TOKEN_LIMIT > 0 else 0
+            'usage_percentage': (total_tokens / daily_limit) * 100 if daily_limit > 0 else 0
         }
 
     except Exception as e:
@@ -160,6 +151,7 @@ def send_alert(usage: dict, severity: str):
         severity: 'warning' or 'critical'
     """
     try:
+        daily_limit = get_config('daily_token_limit')
         subject = f"[{severity.upper()}] Bedrock Token Usage Alert - {usage['date']}"
 
         # Build message body
@@ -176,9 +168,9 @@ Current Usage:
 - Sessions Processed: {usage['total_sessions']}
 
 Limit Status:
-- Daily Limit: {DAILY_TOKEN_LIMIT:,}
+- Daily Limit: {daily_limit:,}
 - Usage: {usage['usage_percentage']:.1f}%
-- Remaining: {DAILY_TOKEN_LIMIT - usage['total_tokens']:,}
+- Remaining: {daily_limit - usage['total_tokens']:,}
 
 Model Breakdown:
 """
@@ -209,11 +201,12 @@ Action Items:
 5. Monitor SQS queue depth for backlog status
 """
 
-        sns.publish(
-            TopicArn=SNS_TOPIC_ARN,
-            Subject=subject,
-            Message=message_body
-        )
+        with span('notification', 'sns_publish', severity=severity):
+            sns.publish(
+                TopicArn=get_config('token_alerts_topic_arn'),
+                Subject=subject,
+                Message=message_body
+            )
         logger.info(f"Published {severity} alert to SNS")
 
     except Exception as e:
@@ -244,10 +237,11 @@ def lambda_handler(event, context):
     # Publish metrics
     publish_metrics(usage)
 
-    # Check thresholds and send alerts
+    # Check thresholds (fractions of the daily limit) and send alerts
+    config = get_config()
     usage_pct = usage['usage_percentage']
 
-    if usage_pct >= CRITICAL_THRESHOLD:
+    if usage_pct >= config['critical_threshold'] * 100:
         logger.critical(f"CRITICAL: Token usage at {usage_pct:.1f}%")
         send_alert(usage, 'critical')
         return {
@@ -255,7 +249,7 @@ def lambda_handler(event, context):
             'alert': 'critical',
             'usage': usage
         }
-    elif usage_pct >= WARNING_THRESHOLD:
+    elif usage_pct >= config['warning_threshold'] * 100:
         logger.warning(f"WARNING: Token usage at {usage_pct:.1f}%")
         send_alert(usage, 'warning')
         return {
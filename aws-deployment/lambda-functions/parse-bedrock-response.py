@@ -3,11 +3,13 @@ MedZen Lambda: Parse Bedrock Response
 Parses Claude 3 Opus response from Bedrock into structured SOAP JSON
 """
 
-import json
-import re
 import uuid
 from datetime import datetime
 
+from medzen_runtime.json_extract import extract_json
+from medzen_runtime.soap_schema import validate_step_functions_soap
+from medzen_runtime.tracing import span
+
 def lambda_handler(event, context):
     """
     Parses Bedrock response into structured SOAP note
@@ -38,7 +40,10 @@ def lambda_handler(event, context):
             "plan": {...}
         },
         "rawResponse": {...},
-        "generatedAt": "2026-01-15T..."
+        "generatedAt": "2026-01-15T...",
+        "processingStatus": "completed|partial",
+        "truncatedSections": [...],
+        "missingSections": [...]
     }
     """
 
@@ -67,18 +72,33 @@ def lambda_handler(event, context):
         print(f"[Parse] Extracted response text: {len(response_text)} characters")
 
         # Try to extract JSON from response
-        # Claude might wrap it in markdown code blocks
-        soap_json = extract_json_from_response(response_text)
-
-        if not soap_json:
+        # Claude might wrap it in markdown code blocks or stop mid-object
+        with span('json', 'parse_soap_note') as parse:
+            extraction = extract_json(response_text, expect='object')
+            parse.metric('Repairs', len(extraction['repairs']))
+            parse.metric('Chars', len(response_text))
+            if extraction['error'] or not extraction['complete']:
+                parse.fail(extraction['error'] or 'truncated output')
+        soap_json = extraction['data']
+
+        if not isinstance(soap_json, dict) or not soap_json:
             raise ValueError("Could not extract valid JSON from Bedrock response")
 
-        # Validate required SOAP sections
-        required_sections = ['chief_complaint', 'subjective', 'objective', 'assessment', 'plan']
-        for section in required_sections:
-            if section not in soap_json:
-                print(f"[Parse] Warning: Missing section '{section}', adding empty placeholder")
-                soap_json[section] = {}
+        if extraction['repairs']:
+            print(f"[Parse] Repaired response JSON: {', '.join(extraction['repairs'])}")
+        if extraction['truncated_sections']:
+            print(f"[Parse] Warning: Dropped truncated section(s): {', '.join(extraction['truncated_sections'])}")
+
+        # Validate required SOAP sections against the compiled schema
+        # Missing or invalid ones get an empty placeholder and are reported so the workflow
+        # can regenerate just those sections (generate-soap-from-transcript repair mode)
+        validation = validate_step_functions_soap(soap_json)
+        soap_json = validation['note']
+        missing_sections = validation['invalid_sections']
+        for violation in validation['violations']:
+            print(f"[Parse] Warning: {violation['path']}: {violation['message']}")
+        if missing_sections:
+            print(f"[Parse] Warning: Missing section(s) {', '.join(missing_sections)}, added empty placeholders")
 
         # Generate SOAP note ID
         soap_note_id = str(uuid.uuid4())
@@ -98,7 +118,7 @@ def lambda_handler(event, context):
             'medicalCodes': soap_json.get('medical_codes', {}),
             'rawResponse': soap_json,
             'generatedAt': generated_at,
-            'processingStatus': 'completed',
+            'processingStatus': 'completed' if extraction['complete'] else 'partial',
         }
 
         print(f"[Parse] SOAP parsing complete, ID: {soap_note_id}")
@@ -111,6 +131,9 @@ def lambda_handler(event, context):
             'medicalCodes': parsed_soap['medicalCodes'],
             'rawResponse': parsed_soap['rawResponse'],
             'generatedAt': generated_at,
+            'processingStatus': parsed_soap['processingStatus'],
+            'truncatedSections': extraction['truncated_sections'],
+            'missingSections': missing_sections,
         }
 
     except Exception as e:
@@ -121,63 +144,3 @@ def lambda_handler(event, context):
             'message': str(e)
         }
 
-
-def extract_json_from_response(response_text):
-    """
-    Extract and parse JSON from Claude's response
-    Handles markdown code blocks and raw JSON
-    """
-
-    # Try to find JSON in markdown code blocks first
-    json_match = re.search(r'```(?:json)?\s*\n?(.*?)\n?```', response_text, re.DOTALL)
-
-    if json_match:
-        json_str = json_match.group(1).strip()
-    else:
-        # Try to find raw JSON object
-        # Look for opening brace
-        brace_index = response_text.find('{')
-        if brace_index != -1:
-            json_str = response_text[brace_index:]
-        else:
-            return None
-
-    try:
-        # Try to parse as JSON
-        soap_data = json.loads(json_str)
-        return soap_data
-    except json.JSONDecodeError as e:
-        print(f"[Parse] JSON decode error: {str(e)}")
-
-        # Try to fix common issues
-        # Remove trailing commas
-        json_str = re.sub(r',(\s*[}\]])', r'\1', json_str)
-
-        try:
-            soap_data = json.loads(json_str)
-            return soap_data
-        except json.JSONDecodeError:
-            return None
-
-
-def validate_soap_structure(soap_json):
-    """
-    Validates that SOAP JSON has expected structure
-    """
-
-    expected_sections = {
-        'chief_complaint': str,
-        'subjective': dict,
-        'objective': dict,
-        'assessment': dict,
-        'plan': dict,
-    }
-
-    for section, expected_type in expected_sections.items():
-        if section not in soap_json:
-            return False
-
-        if not isinstance(soap_json[section], expected_type):
-            return False
-
-    return True
@@ -4,23 +4,24 @@ Processes queued SOAP generation requests from SQS with exponential backoff
 """
 
 import json
-import boto3
 import logging
 from datetime import datetime
 import time
 
+from medzen_runtime.clients import LazyClient
+from medzen_runtime.config import get_config
+from medzen_runtime.tracing import span
+
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize clients
-lambda_client = boto3.client('lambda', region_name='us-east-1')
-sqs_client = boto3.client('sqs', region_name='us-east-1')
+# Initialize clients (built on first use)
+lambda_client = LazyClient('lambda', 'us-east-1')
+sqs_client = LazyClient('sqs', 'us-east-1')
 
-# Constants
-SOAP_GENERATION_FUNCTION = 'medzen-generate-soap-from-transcript'
-SQS_QUEUE_URL = 'https://sqs.us-east-1.amazonaws.com/558069890522/medzen-soap-retry-queue'
-MAX_RETRY_ATTEMPTS = 5
+# Constants (soap_generation_function, soap_retry_queue_url and max_retry_attempts)
+# come from medzen_runtime.config
 
 
 def process_queue_message(message_body: dict) -> bool:
@@ -41,7 +42,7 @@ def process_queue_message(message_body: dict) -> bool:
         logger.info(f"Processing queued request: session={event.get('sessionId')}, retry={retry_count}")
 
         # Check if max retries exceeded
-        if retry_count >= MAX_RETRY_ATTEMPTS:
+        if retry_count >= get_config('max_retry_attempts'):
             logger.error(f"Max retries exceeded for session {event.get('sessionId')} after {queued_at}")
             return True  # Remove from queue - hard failure
 
@@ -50,11 +51,13 @@ def process_queue_message(message_body: dict) -> bool:
         event['original_queue_time'] = queued_at
 
         # Invoke the main SOAP generation Lambda
-        response = lambda_client.invoke(
-            FunctionName=SOAP_GENERATION_FUNCTION,
-            InvocationType='RequestResponse',
-            Payload=json.dumps(event)
-        )
+        with span('lambda', 'invoke', target=get_config('soap_generation_function')) as call:
+            response = lambda_client.invoke(
+                FunctionName=get_config('soap_generation_function'),
+                InvocationType='RequestResponse',
+                Payload=json.dumps(event)
+            )
+            call.metric('RetryCount', retry_count)
 
         # Check response
         status_code = response.get('StatusCode')
@@ -119,7 +122,7 @@ def lambda_handler(event, context):
             if process_queue_message(message_body):
                 # Delete from queue on success
                 sqs_client.delete_message(
-                    QueueUrl=SQS_QUEUE_URL,
+                    QueueUrl=get_config('soap_retry_queue_url'),
                     ReceiptHandle=receipt_handle
                 )
                 successful += 1
@@ -5,10 +5,17 @@ Sends real-time notification to provider when SOAP note is generated and ready f
 
 import json
 import os
-import requests
 from datetime import datetime
 
+from medzen_runtime.events import NotificationEvent, parse_event
+from medzen_runtime.handler import lambda_entry
+from medzen_runtime.supabase import SupabaseError, get_supabase, http_json
+from medzen_runtime.tracing import span
 
+FCM_SEND_URL = 'https://fcm.googleapis.com/fcm/send'
+
+
+@lambda_entry('NotificationFailed')
 def lambda_handler(event, context):
     """
     Sends notification to provider when SOAP note is generated
@@ -29,126 +36,84 @@ def lambda_handler(event, context):
     }
     """
 
-    try:
-        notification_type = event.get('type')
-        provider_id = event.get('providerId')
-        soap_note_id = event.get('soapNoteId')
-        session_id = event.get('sessionId')
+    params = parse_event(event, NotificationEvent)
+    notification_type = params['type']
+    provider_id = params['providerId']
+    soap_note_id = params['soapNoteId']
+    session_id = params['sessionId']
 
-        if not all([notification_type, provider_id, soap_note_id, session_id]):
-            raise ValueError("type, providerId, soapNoteId, and sessionId are required")
+    supabase = get_supabase()
+    print(f"[Notification] Sending {notification_type} notification for SOAP {soap_note_id} to provider {provider_id}...")
 
-        # Supabase configuration
-        supabase_url = os.environ['SUPABASE_URL']
-        supabase_key = os.environ['SUPABASE_SERVICE_KEY']
-
-        headers = {
-            'apikey': supabase_key,
-            'Authorization': f'Bearer {supabase_key}',
-            'Content-Type': 'application/json'
+    # Fetch provider details to get FCM token
+    provider = supabase.select_one('users', {'id': provider_id}, 'id,fcm_token,display_name')
+    if not provider:
+        print(f"[Notification] Warning: Provider {provider_id} not found")
+        return {
+            'statusCode': 200,
+            'message': f'Provider {provider_id} not found, skipping notification'
         }
 
-        print(f"[Notification] Sending {notification_type} notification for SOAP {soap_note_id} to provider {provider_id}...")
-
-        # Fetch provider details to get FCM token
-        provider_query = f"{supabase_url}/rest/v1/users?id=eq.{provider_id}&select=id,fcm_token,display_name"
-        provider_response = requests.get(provider_query, headers=headers, timeout=10)
-        provider_response.raise_for_status()
-
-        provider_data = provider_response.json()
-        if not provider_data or len(provider_data) == 0:
-            print(f"[Notification] Warning: Provider {provider_id} not found")
-            return {
-                'statusCode': 200,
-                'message': f'Provider {provider_id} not found, skipping notification'
-            }
-
-        provider = provider_data[0]
-        fcm_token = provider.get('fcm_token')
-        provider_name = provider.get('display_name', 'Provider')
-
-        # Fetch SOAP note details for notification content
-        soap_query = f"{supabase_url}/rest/v1/soap_notes?id=eq.{soap_note_id}&select=id,appointment_id,chief_complaint"
-        soap_response = requests.get(soap_query, headers=headers, timeout=10)
-        soap_response.raise_for_status()
-
-        soap_data = soap_response.json()
-        if not soap_data or len(soap_data) == 0:
-            raise ValueError(f"SOAP note {soap_note_id} not found")
-
-        soap_note = soap_data[0]
-        chief_complaint = soap_note.get('chief_complaint', 'Clinical Note')
-        appointment_id = soap_note.get('appointment_id')
-
-        # Prepare notification content based on type
-        notification_content = build_notification_content(
-            notification_type,
-            soap_note_id,
-            appointment_id,
-            chief_complaint
-        )
-
-        # Store notification record in database
-        notification_record = {
-            'provider_id': provider_id,
-            'soap_note_id': soap_note_id,
-            'session_id': session_id,
-            'notification_type': notification_type,
-            'title': notification_content['title'],
-            'body': notification_content['body'],
-            'data': json.dumps(notification_content.get('data', {})),
-            'status': 'sent',
-            'created_at': datetime.utcnow().isoformat() + 'Z',
-        }
+    fcm_token = provider.get('fcm_token')
+    provider_name = provider.get('display_name', 'Provider')
+
+    # Fetch SOAP note details for notification content
+    soap_note = supabase.select_one('soap_notes', {'id': soap_note_id}, 'id,appointment_id,chief_complaint')
+    if not soap_note:
+        raise ValueError(f"SOAP note {soap_note_id} not found")
+
+    chief_complaint = soap_note.get('chief_complaint', 'Clinical Note')
+    appointment_id = soap_note.get('appointment_id')
+
+    # Prepare notification content based on type
+    notification_content = build_notification_content(
+        notification_type,
+        soap_note_id,
+        appointment_id,
+        chief_complaint
+    )
+
+    # Store notification record in database
+    notification_record = {
+        'provider_id': provider_id,
+        'soap_note_id': soap_note_id,
+        'session_id': session_id,
+        'notification_type': notification_type,
+        'title': notification_content['title'],
+        'body': notification_content['body'],
+        'data': json.dumps(notification_content.get('data', {})),
+        'status': 'sent',
+        'created_at': datetime.utcnow().isoformat() + 'Z',
+    }
 
-        notification_url = f"{supabase_url}/rest/v1/call_notifications"
-        notification_response = requests.post(
-            notification_url,
-            headers=headers,
-            json=notification_record,
-            timeout=10
+    notification_id = None
+    try:
+        stored_notification = supabase.insert('call_notifications', notification_record, returning=True)
+        if isinstance(stored_notification, list) and len(stored_notification) > 0:
+            notification_id = stored_notification[0].get('id')
+    except SupabaseError as e:
+        # Don't fail if notification record storage fails
+        print(f"[Notification] Warning: Failed to store notification record: {e.body}")
+
+    # Send FCM push notification if FCM token exists
+    if fcm_token:
+        send_fcm_notification(
+            fcm_token,
+            notification_content['title'],
+            notification_content['body'],
+            notification_content.get('data', {})
         )
+        print(f"[Notification] Sent FCM push notification to provider {provider_id}")
+    else:
+        print(f"[Notification] Warning: No FCM token for provider {provider_id}, skipping push notification")
 
-        if notification_response.status_code not in [200, 201]:
-            print(f"[Notification] Warning: Failed to store notification record: {notification_response.text}")
-            # Don't fail if notification record storage fails
-
-        notification_id = None
-        try:
-            stored_notification = notification_response.json()
-            if isinstance(stored_notification, list) and len(stored_notification) > 0:
-                notification_id = stored_notification[0].get('id')
-        except Exception as e:
-            print(f"[Notification] Warning: Could not extract notification ID: {str(e)}")
-
-        # Send FCM push notification if FCM token exists
-        if fcm_token:
-            send_fcm_notification(
-                fcm_token,
-                notification_content['title'],
-                notification_content['body'],
-                notification_content.get('data', {})
-            )
-            print(f"[Notification] Sent FCM push notification to provider {provider_id}")
-        else:
-            print(f"[Notification] Warning: No FCM token for provider {provider_id}, skipping push notification")
-
-        print(f"[Notification] Successfully sent {notification_type} notification")
-
-        return {
-            'statusCode': 200,
-            'notificationId': notification_id,
-            'message': 'Notification sent successfully'
-        }
-
-    except Exception as e:
-        print(f"Error sending notification: {str(e)}")
-        return {
-            'statusCode': 500,
-            'error': 'NotificationFailed',
-            'message': str(e)
-        }
+    print(f"[Notification] Successfully sent {notification_type} notification")
 
+    return {
+        'statusCode': 200,
+        'notificationId': notification_id,
+        'message': 'Notification sent successfully'
+    }
 
 def build_notification_content(notification_type, soap_note_id, appointment_id, chief_complaint):
     """
@@ -211,8 +176,7 @@ def send_fcm_notification(fcm_token, title, body, data):
             return
 
         headers = {
-            'Authorization': f'key={fcm_server_key}',
-            'Content-Type': 'application/json'
+            'Authorization': f'key={fcm_server_key}'
         }
 
         payload = {
@@ -251,17 +215,16 @@ def send_fcm_notification(fcm_token, title, body, data):
             }
         }
 
-        response = requests.post(
-            'https://fcm.googleapis.com/fcm/send',
-            headers=headers,
-            json=payload,
-            timeout=10
-        )
+        with span('notification', 'fcm_send', type=data.get('type')) as send:
+            status, text = http_json('POST', FCM_SEND_URL, payload, headers)
+            send.set('HttpStatus', status)
+            if status != 200:
+                send.fail(f"HTTP {status}")
 
-        if response.status_code == 200:
+        if status == 200:
             print(f"[Notification] FCM notification sent successfully")
         else:
-            print(f"[Notification] FCM error: {response.status_code} - {response.text}")
+            print(f"[Notification] FCM error: {status} - {text}")
 
     except Exception as e:
         print(f"[Notification] Warning: Failed to send FCM notification: {str(e)}")
@@ -0,0 +1,6 @@
+"""
+MedZen Lambda Runtime
+Shared helpers packaged as a Lambda layer for the SOAP workflow and transcription Lambdas
+"""
+
+__version__ = '1.0.0'
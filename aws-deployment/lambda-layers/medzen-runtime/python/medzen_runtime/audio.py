@@ -0,0 +1,304 @@
+"""
+MedZen Runtime: Audio Preprocessing
+Extracts mono 16 kHz speech audio from a recording and trims silence before transcription, using ffmpeg
+
+Two ffmpeg passes. The first decodes only the audio track (no video), downmixes it to mono
+16 kHz WAV in /tmp and runs silencedetect. plan_cuts() turns the detected silences into the
+ranges worth transcribing: leading and trailing silence go, pauses longer than MIN_PAUSE_SECONDS
+shrink to PAD_SECONDS on each side. The second pass keeps those ranges and encodes FLAC
+(lossless, preferred by Transcribe) or Opus in Ogg (small enough for Whisper's 25 MB limit).
+
+Trimming shifts timestamps, so the kept ranges are saved as a timeline next to the derivative;
+original_time() maps a time in the trimmed audio back to the recording.
+
+ffmpeg comes from a Lambda layer (/opt/bin/ffmpeg) or PATH. Preprocessing is opt-in
+(MEDZEN_AUDIO_PREPROCESS=true); when it is off, ffmpeg is missing or it fails, callers get
+None and transcribe the original recording.
+"""
+
+import bisect
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import wave
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+from medzen_runtime.clients import get_client
+from medzen_runtime.tracing import span
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get('MEDZEN_AUDIO_PREPROCESS', 'false').lower() == 'true'
+FFMPEG_PATH = os.environ.get('MEDZEN_FFMPEG_PATH', '/opt/bin/ffmpeg')
+SAMPLE_RATE = 16000
+SILENCE_DB = float(os.environ.get('MEDZEN_AUDIO_SILENCE_DB', '-45'))
+# silencedetect reports silences at least this long; shorter gaps are speech rhythm
+DETECT_SECONDS = 0.5
+MIN_PAUSE_SECONDS = float(os.environ.get('MEDZEN_AUDIO_MIN_PAUSE_SECONDS', '2.0'))
+PAD_SECONDS = float(os.environ.get('MEDZEN_AUDIO_PAD_SECONDS', '0.3'))
+# Opus bitrate for Ogg output: about 11 MB per hour, under Whisper's upload limit
+OPUS_BITRATE = os.environ.get('MEDZEN_AUDIO_OPUS_BITRATE', '24k')
+FFMPEG_TIMEOUT_SECONDS = 600
+
+ENCODERS = {
+    'flac': ['-c:a', 'flac', '-compression_level', '5'],
+    'ogg': ['-c:a', 'libopus', '-b:a', OPUS_BITRATE, '-application', 'voip'],
+}
+
+SILENCE_START = re.compile(r'silence_start:\s*(-?[\d.]+)')
+SILENCE_END = re.compile(r'silence_end:\s*(-?[\d.]+)')
+
+
+def ffmpeg_binary() -> Optional[str]:
+    """Path of the ffmpeg executable, or None if it is not installed."""
+    if os.path.isfile(FFMPEG_PATH) and os.access(FFMPEG_PATH, os.X_OK):
+        return FFMPEG_PATH
+    return shutil.which('ffmpeg')
+
+
+def parse_silences(stderr: str, duration: float) -> List[Tuple[float, float]]:
+    """
+    Collect (start, end) silences from ffmpeg silencedetect output.
+
+    Args:
+        stderr: ffmpeg log containing silence_start / silence_end lines
+        duration: Audio duration; closes a silence still open at the end of the file
+
+    Returns:
+        Silences in time order
+    """
+    silences = []
+    start = None
+    for line in stderr.splitlines():
+        match = SILENCE_START.search(line)
+        if match:
+            start = max(0.0, float(match.group(1)))
+            continue
+        match = SILENCE_END.search(line)
+        if match and start is not None:
+            silences.append((start, min(float(match.group(1)), duration)))
+            start = None
+    if start is not None and start < duration:
+        silences.append((start, duration))
+    return silences
+
+
+def plan_cuts(
+    silences: Sequence[Tuple[float, float]],
+    duration: float,
+    min_pause: float = MIN_PAUSE_SECONDS,
+    pad: float = PAD_SECONDS,
+) -> List[Tuple[float, float]]:
+    """
+    Ranges of the recording to keep.
+
+    Args:
+        silences: (start, end) silences in time order
+        duration: Recording duration in seconds
+        min_pause: Internal pauses shorter than this are kept whole
+        pad: Silence kept next to speech at every cut
+
+    Returns:
+        Non-overlapping (start, end) ranges in time order; [(0, duration)] if nothing is cut
+    """
+    edge = 0.05
+    removed = []
+    for start, end in silences:
+        if start <= edge:
+            cut = (0.0, end - pad)
+        elif end >= duration - edge:
+            cut = (start + pad, duration)
+        elif end - start >= min_pause:
+            cut = (start + pad, end - pad)
+        else:
+            continue
+        if cut[1] - cut[0] > 0.1:
+            removed.append(cut)
+
+    kept = []
+    position = 0.0
+    for start, end in removed:
+        if start > position:
+            kept.append((round(position, 3), round(start, 3)))
+        position = max(position, end)
+    if position < duration:
+        kept.append((round(position, 3), round(duration, 3)))
+    return kept
+
+
+def original_time(t: float, kept: Sequence[Sequence[float]]) -> float:
+    """
+    Map a time in the trimmed audio back to the original recording.
+
+    Args:
+        t: Seconds from the start of the trimmed audio
+        kept: Kept ranges from plan_cuts() (or the saved timeline)
+
+    Returns:
+        Seconds from the start of the original recording
+    """
+    if not kept:
+        return t
+    offsets = []
+    total = 0.0
+    for start, end in kept:
+        offsets.append(total)
+        total += end - start
+    index = max(0, bisect.bisect_right(offsets, t) - 1)
+    start, end = kept[index]
+    return round(min(start + (t - offsets[index]), end), 3)
+
+
+def remap_segments(segments: List[Dict[str, Any]], kept: Sequence[Sequence[float]]) -> List[Dict[str, Any]]:
+    """Rewrite segment start/end (or start_time/end_time) from trimmed to original time, in place."""
+    for segment in segments:
+        for field in ('start', 'end', 'start_time', 'end_time'):
+            if segment.get(field) is not None:
+                segment[field] = original_time(float(segment[field]), kept)
+    return segments
+
+
+def _aselect(kept: Sequence[Tuple[float, float]]) -> str:
+    ranges = '+'.join(f"between(t,{start:.3f},{end:.3f})" for start, end in kept)
+    return f"aselect='{ranges}',asetpts=N/SR/TB"
+
+
+def _run(ffmpeg: str, arguments: List[str]) -> str:
+    command = [ffmpeg, '-hide_banner', '-nostdin', '-y'] + arguments
+    completed = subprocess.run(command, capture_output=True, text=True, timeout=FFMPEG_TIMEOUT_SECONDS)
+    if completed.returncode != 0:
+        raise RuntimeError(f"ffmpeg exited {completed.returncode}: {completed.stderr[-500:]}")
+    return completed.stderr
+
+
+def preprocess_file(source: str, output_path: str, audio_format: str = 'flac') -> Dict[str, Any]:
+    """
+    Extract, downmix and trim one recording.
+
+    Args:
+        source: Input path or URL (e.g. a presigned S3 URL; ffmpeg streams it)
+        output_path: Where to write the derivative
+        audio_format: 'flac' or 'ogg' (Opus)
+
+    Returns:
+        Dict with original_seconds, seconds, seconds_saved and kept ranges
+    """
+    ffmpeg = ffmpeg_binary()
+    if not ffmpeg:
+        raise FileNotFoundError('ffmpeg not found')
+
+    with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp:
+        wav_path = tmp.name
+    try:
+        detect = f"silencedetect=noise={SILENCE_DB}dB:d={DETECT_SECONDS}"
+        stderr = _run(ffmpeg, ['-i', source, '-vn', '-ac', '1', '-ar', str(SAMPLE_RATE), '-af', detect,
+                               '-c:a', 'pcm_s16le', wav_path])
+        with wave.open(wav_path, 'rb') as audio:
+            duration = audio.getnframes() / float(audio.getframerate())
+
+        kept = plan_cuts(parse_silences(stderr, duration), duration)
+        seconds = sum(end - start for start, end in kept)
+        trim = [] if seconds >= duration - 0.01 else ['-af', _aselect(kept)]
+        _run(ffmpeg, ['-i', wav_path] + trim + ENCODERS[audio_format] + [output_path])
+    finally:
+        if os.path.exists(wav_path):
+            os.remove(wav_path)
+
+    return {
+        'original_seconds': round(duration, 3),
+        'seconds': round(seconds, 3),
+        'seconds_saved': round(duration - seconds, 3),
+        'kept': [list(kept_range) for kept_range in kept],
+    }
+
+
+def preprocess_recording(
+    s3_uri: str,
+    output_bucket: str,
+    output_prefix: str,
+    audio_format: str = 'flac',
+) -> Optional[Dict[str, Any]]:
+    """
+    Write a trimmed mono 16 kHz derivative of an S3 recording, plus its timeline.
+
+    Args:
+        s3_uri: Original recording
+        output_bucket: Bucket for the derivative
+        output_prefix: Key prefix, e.g. 'preprocessed/<appointment_id>/<job suffix>'
+        audio_format: 'flac' or 'ogg' (Opus)
+
+    Returns:
+        Dict with s3_uri, media_format, timeline_uri, original_seconds, seconds, seconds_saved,
+        bytes_in and bytes_out; None if preprocessing is off, ffmpeg is missing or it failed
+    """
+    if not ENABLED:
+        return None
+    if not ffmpeg_binary():
+        logger.warning("Audio preprocessing enabled but ffmpeg not found; using the original recording")
+        return None
+
+    parsed = urlparse(s3_uri)
+    bucket, key = parsed.netloc, parsed.path.lstrip('/')
+    prefix = output_prefix.rstrip('/')
+    output_key = f"{prefix}/audio.{audio_format}"
+    s3 = get_client('s3')
+
+    with tempfile.NamedTemporaryFile(suffix=f".{audio_format}", delete=False) as tmp:
+        output_path = tmp.name
+    try:
+        with span('ffmpeg', 'preprocess', format=audio_format) as call:
+            bytes_in = s3.head_object(Bucket=bucket, Key=key)['ContentLength']
+            source = s3.generate_presigned_url('get_object', Params={'Bucket': bucket, 'Key': key}, ExpiresIn=3600)
+            stats = preprocess_file(source, output_path, audio_format)
+            bytes_out = os.path.getsize(output_path)
+            call.metric('SecondsSaved', stats['seconds_saved'], 'Seconds')
+            call.metric('OriginalSeconds', stats['original_seconds'], 'Seconds')
+            call.metric('BytesIn', bytes_in, 'Bytes')
+            call.metric('BytesOut', bytes_out, 'Bytes')
+
+        with span('s3', 'upload_file') as upload:
+            s3.upload_file(output_path, output_bucket, output_key)
+            upload.metric('Bytes', bytes_out, 'Bytes')
+        timeline_key = f"{prefix}/timeline.json"
+        with span('s3', 'put_object'):
+            s3.put_object(
+                Bucket=output_bucket,
+                Key=timeline_key,
+                Body=json.dumps({'source': s3_uri, **stats}),
+                ContentType='application/json'
+            )
+    except Exception as e:
+        logger.error(f"Audio preprocessing failed for {s3_uri}, using the original recording: {e}")
+        return None
+    finally:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+    return {
+        's3_uri': f"s3://{output_bucket}/{output_key}",
+        'media_format': audio_format,
+        'timeline_uri': f"s3://{output_bucket}/{timeline_key}",
+        'original_seconds': stats['original_seconds'],
+        'seconds': stats['seconds'],
+        'seconds_saved': stats['seconds_saved'],
+        'bytes_in': bytes_in,
+        'bytes_out': bytes_out,
+        'kept': stats['kept'],
+    }
+
+
+def load_timeline(bucket: str, key: str) -> Optional[List[List[float]]]:
+    """Kept ranges saved by preprocess_recording(), or None if the recording was not trimmed."""
+    try:
+        with span('s3', 'get_object'):
+            body = get_client('s3').get_object(Bucket=bucket, Key=key)['Body'].read()
+    except Exception as e:
+        if getattr(e, 'response', {}).get('Error', {}).get('Code') not in ('NoSuchKey', '404'):
+            logger.error(f"Failed to load audio timeline s3://{bucket}/{key}: {e}")
+        return None
+    return json.loads(body).get('kept')
@@ -0,0 +1,87 @@
+"""
+MedZen Runtime: Lazy AWS Clients
+Builds each boto3 client on first use and shares it across the handlers in a container
+
+Creating a client loads its service model and resolves credentials, and importing boto3
+itself takes a noticeable share of a Python Lambda cold start. Handlers that never touch a
+service (e.g. the callback path of the transcription router never starts a job) skip that
+cost entirely.
+"""
+
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+_clients: Dict[Tuple, Any] = {}
+_lock = threading.Lock()
+_session = None
+
+
+def _client_key(service: str, region_name: Optional[str], options: Dict[str, Any]) -> Tuple:
+    return (service, region_name) + tuple(sorted(options.items()))
+
+
+def get_client(service: str, region_name: Optional[str] = None, **options: Any) -> Any:
+    """
+    Return the shared boto3 client for a service, creating it on first use.
+
+    Args:
+        service: boto3 service name, e.g. 's3', 'bedrock-runtime'
+        region_name: Region, or None for the Lambda's default region
+        options: Extra boto3 client arguments (e.g. endpoint_url); part of the cache key
+
+    Returns:
+        boto3 client (or the stand-in registered with register_client)
+    """
+    key = _client_key(service, region_name, options)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _boto3_session().client(service, region_name=region_name, **options)
+            _clients[key] = client
+    return client
+
+
+def _boto3_session():
+    global _session
+    if _session is None:
+        import boto3  # Deferred: only paid by handlers that actually call AWS
+        _session = boto3.session.Session()
+    return _session
+
+
+def register_client(service: str, client: Any, region_name: Optional[str] = None, **options: Any) -> None:
+    """Install a client (e.g. a local stand-in for benchmarks) under the key get_client would use."""
+    with _lock:
+        _clients[_client_key(service, region_name, options)] = client
+
+
+def reset_clients() -> None:
+    """Drop all cached clients; the next get_client call builds fresh ones."""
+    with _lock:
+        _clients.clear()
+
+
+class LazyClient:
+    """
+    Module-level handle for a client that is built on first attribute access.
+
+    Lets Lambdas keep `bedrock_client = LazyClient('bedrock-runtime', 'us-east-1')` at
+    module scope and call `bedrock_client.invoke_model(...)` unchanged.
+    """
+
+    __slots__ = ('_service', '_region_name', '_options')
+
+    def __init__(self, service: str, region_name: Optional[str] = None, **options: Any):
+        self._service = service
+        self._region_name = region_name
+        self._options = options
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_client(self._service, self._region_name, **self._options), name)
+
+    def __repr__(self) -> str:
+        return f"LazyClient({self._service!r}, {self._region_name!r})"
@@ -0,0 +1,211 @@
+"""
+MedZen Runtime: Config & Prompt Loader
+Loads versioned config and prompt artifacts from S3 once per container, with ETag-conditional refresh
+
+Artifacts are cached in module state, so they survive across warm invocations. Between
+refreshes a lookup never touches S3. After MEDZEN_CONFIG_REFRESH_SECONDS the next lookup
+sends a conditional GET (If-None-Match); an unchanged object costs one 304 response.
+Prompts pinned to an S3 VersionId in the config are immutable and are never re-fetched once
+loaded. Without a bucket, or when S3 is unreachable, the bundled defaults below are used; a
+bundled fallback is retried after the refresh interval like any other entry, pinned or not.
+
+S3 layout (bucket MEDZEN_CONFIG_BUCKET):
+    config/medzen-runtime.json       overrides for DEFAULT_CONFIG
+    prompts/<name>                   prompt text, e.g. prompts/soap-generation-system-prompt.md
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Optional
+
+from medzen_runtime.clients import get_client
+
+logger = logging.getLogger(__name__)
+
+CONFIG_BUCKET = os.environ.get('MEDZEN_CONFIG_BUCKET', '')
+CONFIG_KEY = os.environ.get('MEDZEN_CONFIG_KEY', 'config/medzen-runtime.json')
+PROMPT_PREFIX = os.environ.get('MEDZEN_PROMPT_PREFIX', 'prompts/')
+REFRESH_SECONDS = float(os.environ.get('MEDZEN_CONFIG_REFRESH_SECONDS', '300'))
+# Region of the config bucket; unset uses the Lambda's own region
+CONFIG_BUCKET_REGION = os.environ.get('MEDZEN_CONFIG_BUCKET_REGION') or None
+# Optional endpoint for a local S3 stand-in (MinIO, LocalStack)
+S3_ENDPOINT_URL = os.environ.get('MEDZEN_S3_ENDPOINT_URL') or None
+
+
+def _env(name: str, default: Any, cast: Callable[[str], Any] = str) -> Any:
+    value = os.environ.get(name)
+    if value is None or value == '':
+        return default
+    if cast is bool:
+        return value.lower() == 'true'
+    return cast(value)
+
+
+# Bundled defaults; existing environment variables still override them at deploy time
+DEFAULT_CONFIG: Dict[str, Any] = {
+    # generate-soap-from-transcript
+    'model_id_primary': _env('MODEL_ID_PRIMARY', 'us.anthropic.claude-opus-4-5-20251101-v1:0'),
+    'model_name_primary': 'Claude Opus 4.5 (Primary)',
+    'model_id_fallback': _env('MODEL_ID_FALLBACK', 'us.anthropic.claude-3-5-sonnet-20241022-v2:0'),
+    'model_name_fallback': 'Claude 3.5 Sonnet (Fallback)',
+    'enable_fallback_model': _env('ENABLE_FALLBACK_MODEL', True, bool),
+    'max_repair_sections': _env('MAX_REPAIR_SECTIONS', 6, int),
+    'soap_retry_queue_url': _env(
+        'SOAP_RETRY_QUEUE_URL',
+        'https://sqs.us-east-1.amazonaws.com/558069890522/medzen-soap-retry-queue'
+    ),
+    # soap_draft (streaming server): facts updates on the cheaper model, then save through the SOAP save Lambda
+    'soap_draft_model_id': _env('SOAP_DRAFT_MODEL_ID', 'us.anthropic.claude-3-5-sonnet-20241022-v2:0'),
+    'soap_draft_min_words': _env('SOAP_DRAFT_MIN_WORDS', 80, int),
+    'soap_draft_interval_seconds': _env('SOAP_DRAFT_INTERVAL_SECONDS', 45.0, float),
+    'soap_draft_note_interval_seconds': _env('SOAP_DRAFT_NOTE_INTERVAL_SECONDS', 180.0, float),
+    'soap_save_function': _env('SOAP_SAVE_FUNCTION', 'medzen-save-soap-to-supabase'),
+    # process-soap-queue
+    'soap_generation_function': _env('SOAP_GENERATION_FUNCTION', 'medzen-generate-soap-from-transcript'),
+    'max_retry_attempts': _env('MAX_RETRY_ATTEMPTS', 5, int),
+    # monitor-bedrock-usage
+    'token_alerts_topic_arn': _env('TOKEN_ALERTS_TOPIC_ARN', 'arn:aws:sns:us-east-1:558069890522:medzen-token-alerts'),
+    'daily_token_limit': _env('DAILY_TOKEN_LIMIT', 10000000, int),
+    'warning_threshold': _env('WARNING_THRESHOLD', 0.80, float),
+    'critical_threshold': _env('CRITICAL_THRESHOLD', 0.95, float),
+    # S3 object versions pinned per prompt name, e.g. {"soap-generation-system-prompt.md": "3HL4kqtJ..."}
+    'prompt_versions': {},
+}
+
+# key -> {value, etag, version_id, checked_at, source}
+_artifacts: Dict[str, Dict[str, Any]] = {}
+
+
+def _s3():
+    if S3_ENDPOINT_URL:
+        return get_client('s3', CONFIG_BUCKET_REGION, endpoint_url=S3_ENDPOINT_URL)
+    return get_client('s3', CONFIG_BUCKET_REGION)
+
+
+def reset_artifacts() -> None:
+    """Drop all cached artifacts; the next lookup behaves like a cold start."""
+    _artifacts.clear()
+
+
+def _error_code(error: Exception) -> str:
+    """S3 error code of a botocore ClientError (checked by shape to avoid importing botocore)."""
+    response = getattr(error, 'response', None) or {}
+    code = str(response.get('Error', {}).get('Code', ''))
+    if response.get('ResponseMetadata', {}).get('HTTPStatusCode') == 304:
+        return '304'
+    return code
+
+
+def _load_artifact(
+    key: str,
+    default: Any,
+    parse: Callable[[str], Any],
+    version_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Return the cached artifact entry for an S3 key, fetching or refreshing it when due.
+
+    Args:
+        key: S3 object key in CONFIG_BUCKET
+        default: Bundled value used when the object is unavailable
+        parse: Converts the object body text to the cached value
+        version_id: Fetch this immutable S3 object version instead of the latest
+
+    Returns:
+        Entry dict with value, etag, version_id, checked_at and source
+    """
+    cache_key = f"{key}@{version_id}" if version_id else key
+    entry = _artifacts.get(cache_key)
+    now = time.monotonic()
+
+    pinned = version_id and entry and entry['source'] != 'bundled'
+    if entry and (pinned or now - entry['checked_at'] < REFRESH_SECONDS):
+        return entry
+
+    if not CONFIG_BUCKET:
+        entry = {'value': default, 'etag': None, 'version_id': None, 'checked_at': now, 'source': 'bundled'}
+        _artifacts[cache_key] = entry
+        return entry
+
+    params = {'Bucket': CONFIG_BUCKET, 'Key': key}
+    if version_id:
+        params['VersionId'] = version_id
+    elif entry and entry['etag']:
+        params['IfNoneMatch'] = entry['etag']
+
+    try:
+        response = _s3().get_object(**params)
+        value = parse(response['Body'].read().decode('utf-8'))
+        entry = {
+            'value': value,
+            'etag': response.get('ETag'),
+            'version_id': response.get('VersionId'),
+            'checked_at': now,
+            'source': f"s3://{CONFIG_BUCKET}/{key}"
+        }
+        logger.info(f"Loaded {entry['source']} (version {entry['version_id'] or 'unversioned'}, etag {entry['etag']})")
+    except Exception as e:
+        code = _error_code(e)
+        if entry and code in ('304', 'NotModified'):
+            entry['checked_at'] = now
+            return entry
+        if code not in ('NoSuchKey', '404'):
+            logger.warning(f"Failed to load s3://{CONFIG_BUCKET}/{key}: {str(e)}")
+        entry = _fallback_entry(entry, default, now)
+
+    _artifacts[cache_key] = entry
+    return entry
+
+
+def _fallback_entry(entry: Optional[Dict[str, Any]], default: Any, now: float) -> Dict[str, Any]:
+    """Keep the last good value (or the bundled default) and wait a full interval before retrying."""
+    if entry:
+        entry['checked_at'] = now
+        return entry
+    return {'value': default, 'etag': None, 'version_id': None, 'checked_at': now, 'source': 'bundled'}
+
+
+def _parse_config(text: str) -> Dict[str, Any]:
+    overrides = json.loads(text)
+    if not isinstance(overrides, dict):
+        raise ValueError('config artifact must be a JSON object')
+    return dict(DEFAULT_CONFIG, **overrides)
+
+
+def get_config(name: Optional[str] = None) -> Any:
+    """
+    Current runtime config (bundled defaults overlaid with the S3 config object).
+
+    Args:
+        name: Single key to return; None returns the whole config dict
+
+    Returns:
+        Config value or dict
+    """
+    config = _load_artifact(CONFIG_KEY, DEFAULT_CONFIG, _parse_config)['value']
+    return config if name is None else config.get(name, DEFAULT_CONFIG.get(name))
+
+
+def get_prompt(name: str, default: str) -> str:
+    """
+    Prompt text from S3 (PROMPT_PREFIX + name), honouring a version pinned in the config.
+
+    Args:
+        name: Prompt file name, e.g. 'soap-generation-system-prompt.md'
+        default: Bundled prompt used when S3 is not configured or unavailable
+
+    Returns:
+        Prompt text
+    """
+    version_id = (get_config('prompt_versions') or {}).get(name)
+    return _load_artifact(PROMPT_PREFIX + name, default, str, version_id)['value']
+
+
+def artifact_status() -> Dict[str, Dict[str, Any]]:
+    """Source, version and ETag of each cached artifact, for logging and diagnostics."""
+    return {
+        key: {k: entry[k] for k in ('source', 'version_id', 'etag')}
+        for key, entry in _artifacts.items()
+    }
@@ -0,0 +1,104 @@
+"""
+MedZen Runtime: Workflow Event Models
+Typed input events for the SOAP workflow Lambdas, as passed by the Step Functions state machine
+
+The models are TypedDicts, so events stay plain dicts end to end; parse_event only checks
+the required keys and fills documented defaults.
+"""
+
+from typing import Any, Dict, Optional, Required, Type, TypedDict, TypeVar
+
+E = TypeVar('E')
+
+
+class SessionEvent(TypedDict, total=False):
+    """validate-session-supabase"""
+    sessionId: Required[str]
+
+
+class FetchTranscriptEvent(TypedDict, total=False):
+    """fetch-transcript"""
+    sessionId: Required[str]
+    transcriptId: Optional[str]
+
+
+class EnrichMetadataEvent(TypedDict, total=False):
+    """enrich-metadata"""
+    appointmentId: Required[str]
+    sessionId: Required[str]
+    transcript: Dict[str, Any]
+
+
+class SessionStatusEvent(TypedDict, total=False):
+    """update-session-status-supabase"""
+    sessionId: Required[str]
+    status: str
+    soapGenerated: bool
+
+
+class SaveSoapEvent(TypedDict, total=False):
+    """save-soap-to-supabase"""
+    sessionId: Required[str]
+    appointmentId: Required[str]
+    soapData: Dict[str, Any]
+    bedrockTokens: Dict[str, Any]
+    aiModel: str
+
+
+class SoapSyncEvent(TypedDict, total=False):
+    """update-supabase-soap"""
+    soapNoteId: Required[str]
+    sessionId: Required[str]
+    appointmentId: Required[str]
+    soapData: Dict[str, Any]
+    aiRawJson: Dict[str, Any]
+    medicalCodes: Dict[str, Any]
+
+
+class NotificationEvent(TypedDict, total=False):
+    """send-notification"""
+    type: Required[str]
+    providerId: Required[str]
+    soapNoteId: Required[str]
+    sessionId: Required[str]
+
+
+DEFAULTS: Dict[type, Dict[str, Any]] = {
+    EnrichMetadataEvent: {'transcript': {}},
+    SessionStatusEvent: {'status': 'soap_generated', 'soapGenerated': True},
+    SaveSoapEvent: {'soapData': {}, 'bedrockTokens': {}, 'aiModel': 'claude-opus-4-5-20251101-v1:0'},
+    SoapSyncEvent: {'soapData': {}, 'aiRawJson': {}, 'medicalCodes': {}},
+}
+
+
+def _join(names: list) -> str:
+    if len(names) == 1:
+        return names[0]
+    if len(names) == 2:
+        return f"{names[0]} and {names[1]}"
+    return ', '.join(names[:-1]) + f", and {names[-1]}"
+
+
+def parse_event(event: Optional[Dict[str, Any]], model: Type[E]) -> E:
+    """
+    Check a workflow event against its model and apply the model's defaults.
+
+    Args:
+        event: Raw Lambda event
+        model: One of the event TypedDicts above
+
+    Returns:
+        New dict with defaults filled in for absent keys
+
+    Raises:
+        ValueError: "<keys> is/are required" when a required key is missing or empty
+    """
+    event = event or {}
+    # Keep declaration order so messages read like the documented input
+    missing = [key for key in model.__annotations__ if key in model.__required_keys__ and not event.get(key)]
+    if missing:
+        raise ValueError(f"{_join(missing)} {'is' if len(missing) == 1 else 'are'} required")
+
+    parsed = dict(DEFAULTS.get(model, {}))
+    parsed.update({key: value for key, value in event.items() if value is not None or key not in parsed})
+    return parsed  # type: ignore[return-value]
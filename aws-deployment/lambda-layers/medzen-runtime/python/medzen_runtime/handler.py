@@ -0,0 +1,59 @@
+"""
+MedZen Runtime: Handler Envelope
+Common error envelope and invocation metrics for the SOAP workflow Lambdas
+
+Step Functions branches on the statusCode / error fields, so every Lambda returns failures
+in the same shape:
+
+    {"statusCode": 400 | 500, "error": "<ErrorCode>", "message": "<details>"}
+"""
+
+import functools
+from typing import Any, Callable, Dict, Optional
+
+from medzen_runtime.tracing import span, take_cold_start
+
+
+def error_response(status_code: int, error: str, message: str, **extra: Any) -> Dict[str, Any]:
+    """Failure envelope returned to Step Functions."""
+    return {'statusCode': status_code, 'error': error, 'message': message, **extra}
+
+
+def lambda_entry(failure_error: str, invalid_error: Optional[str] = None) -> Callable:
+    """
+    Wrap a Lambda handler with the common error envelope and an 'invocation' span.
+
+    The span carries a ColdStart dimension; 500 responses count as errors.
+
+    Args:
+        failure_error: Error code for unexpected failures (HTTP 500)
+        invalid_error: Error code for ValueError (HTTP 400); None reports ValueError as a failure
+
+    Returns:
+        Decorator for `lambda_handler(event, context)`
+    """
+    def decorator(handler: Callable[[Dict[str, Any], Any], Dict[str, Any]]) -> Callable:
+        @functools.wraps(handler)
+        def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+            with span('lambda', 'invocation', cold_start=take_cold_start()) as invocation:
+                try:
+                    result = handler(event, context)
+                except ValueError as e:
+                    if invalid_error is None:
+                        print(f"Error: {str(e)}")
+                        result = error_response(500, failure_error, str(e))
+                    else:
+                        print(f"Validation error: {str(e)}")
+                        result = error_response(400, invalid_error, str(e))
+                except Exception as e:
+                    print(f"Error: {str(e)}")
+                    result = error_response(500, failure_error, str(e))
+
+                status_code = result.get('statusCode') if isinstance(result, dict) else None
+                invocation.set('StatusCode', status_code)
+                invocation.set('RequestId', getattr(context, 'aws_request_id', None))
+                if status_code == 500:
+                    invocation.fail(result.get('error'))
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,200 @@
+"""
+MedZen Runtime: Idempotency Registry
+DynamoDB conditional-write registry so a repeated request returns the first request's job instead of starting another
+
+claim() is a single conditional UpdateItem. The first caller for a key owns it (IN_PROGRESS,
+with a lease); every concurrent or later caller gets the existing record back and starts
+nothing. The owner records the outcome with complete() or fail(). A key can be claimed again
+once its job FAILED, its lease ran out (the owner died mid-request) or its TTL passed.
+
+    owned, record = claim(idempotency_key(appointment_id, s3_uri, etag, language))
+    if not owned:
+        return record['result']          # None while the first request is still running
+
+Table (MEDZEN_IDEMPOTENCY_TABLE): partition key idempotency_key (S), TTL attribute expires_at.
+Without a table configured, or while DynamoDB is unreachable, every claim is owned: requests
+are never blocked by the registry, they just lose de-duplication.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from medzen_runtime.clients import get_client
+from medzen_runtime.tracing import span
+
+logger = logging.getLogger(__name__)
+
+TABLE_NAME = os.environ.get('MEDZEN_IDEMPOTENCY_TABLE', '')
+# An owner that has not completed within the lease is presumed dead (Lambda max timeout)
+LEASE_SECONDS = int(os.environ.get('MEDZEN_IDEMPOTENCY_LEASE_SECONDS', '900'))
+TTL_SECONDS = int(os.environ.get('MEDZEN_IDEMPOTENCY_TTL_SECONDS', str(7 * 24 * 3600)))
+
+IN_PROGRESS = 'IN_PROGRESS'
+COMPLETED = 'COMPLETED'
+FAILED = 'FAILED'
+
+# Pointer items map a job name back to its key, so a job-completion callback can mark it FAILED
+JOB_POINTER_PREFIX = 'job#'
+
+
+def idempotency_key(*parts: Any) -> str:
+    """Stable hex key for the request identity, e.g. (appointment_id, s3_uri, etag, language)."""
+    return hashlib.sha256('\x1f'.join('' if part is None else str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def job_suffix(key: str, attempt: int) -> str:
+    """8-hex job name suffix derived from the key, so duplicate starts collide on the job name too."""
+    return hashlib.sha256(f"{key}:{attempt}".encode('utf-8')).hexdigest()[:8]
+
+
+def _decode(item: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if not item:
+        return {}
+    record = {name: value.get('S', value.get('N')) for name, value in item.items()}
+    for name in ('attempt', 'lease_until', 'expires_at'):
+        if record.get(name) is not None:
+            record[name] = int(record[name])
+    if record.get('result'):
+        record['result'] = json.loads(record['result'])
+    return record
+
+
+def claim(key: str, now: Optional[float] = None) -> Tuple[bool, Dict[str, Any]]:
+    """
+    Claim a key for this request.
+
+    Args:
+        key: idempotency_key() of the request
+        now: Current epoch seconds (for tests and benches)
+
+    Returns:
+        (True, record) if this caller owns the key and should do the work, with record['attempt']
+        counting earlier owners; (False, record) for a duplicate, with the existing status and
+        result (result is None while the owner is still running)
+    """
+    if not TABLE_NAME:
+        return True, {'idempotency_key': key, 'status': IN_PROGRESS, 'attempt': 0}
+
+    now = int(now if now is not None else time.time())
+    with span('dynamodb', 'claim') as call:
+        try:
+            response = get_client('dynamodb').update_item(
+                TableName=TABLE_NAME,
+                Key={'idempotency_key': {'S': key}},
+                UpdateExpression=(
+                    'SET #status = :in_progress, lease_until = :lease, expires_at = :ttl, '
+                    'attempt = if_not_exists(attempt, :first) + :one REMOVE #result, job_name, failure_reason'
+                ),
+                ConditionExpression=(
+                    'attribute_not_exists(idempotency_key) OR #status = :failed OR expires_at < :now '
+                    'OR (#status = :in_progress AND lease_until < :now)'
+                ),
+                ExpressionAttributeNames={'#status': 'status', '#result': 'result'},
+                ExpressionAttributeValues={
+                    ':in_progress': {'S': IN_PROGRESS},
+                    ':failed': {'S': FAILED},
+                    ':now': {'N': str(now)},
+                    ':lease': {'N': str(now + LEASE_SECONDS)},
+                    ':ttl': {'N': str(now + TTL_SECONDS)},
+                    ':first': {'N': '-1'},
+                    ':one': {'N': '1'},
+                },
+                ReturnValues='ALL_NEW',
+                ReturnValuesOnConditionCheckFailure='ALL_OLD',
+            )
+        except Exception as e:
+            error = getattr(e, 'response', {}).get('Error', {})
+            if error.get('Code') != 'ConditionalCheckFailedException':
+                logger.error(f"Idempotency claim failed, proceeding without de-duplication: {e}")
+                call.fail(type(e).__name__)
+                return True, {'idempotency_key': key, 'status': IN_PROGRESS, 'attempt': 0}
+            record = _decode(e.response.get('Item'))
+            call.metric('DuplicatesAvoided', 1)
+            call.dimension('status', record.get('status'))
+            return False, record
+
+        call.metric('DuplicatesAvoided', 0)
+        return True, _decode(response.get('Attributes'))
+
+
+def complete(key: str, result: Dict[str, Any], job_name: Optional[str] = None) -> None:
+    """
+    Record the owner's result; later duplicates receive it instead of starting a job.
+
+    Args:
+        key: Claimed key
+        result: JSON-serializable result returned to duplicates
+        job_name: Job started for the key (written as a pointer for fail_job)
+    """
+    if not TABLE_NAME:
+        return
+
+    client = get_client('dynamodb')
+    expires_at = {'N': str(int(time.time()) + TTL_SECONDS)}
+    try:
+        with span('dynamodb', 'complete'):
+            client.update_item(
+                TableName=TABLE_NAME,
+                Key={'idempotency_key': {'S': key}},
+                UpdateExpression='SET #status = :completed, #result = :result, job_name = :job, expires_at = :ttl',
+                ExpressionAttributeNames={'#status': 'status', '#result': 'result'},
+                ExpressionAttributeValues={
+                    ':completed': {'S': COMPLETED},
+                    ':result': {'S': json.dumps(result, ensure_ascii=False, default=str)},
+                    ':job': {'S': job_name or ''},
+                    ':ttl': expires_at,
+                },
+            )
+            if job_name:
+                client.put_item(
+                    TableName=TABLE_NAME,
+                    Item={
+                        'idempotency_key': {'S': JOB_POINTER_PREFIX + job_name},
+                        'target': {'S': key},
+                        'expires_at': expires_at,
+                    },
+                )
+    except Exception as e:
+        # The job is running; duplicates see IN_PROGRESS until the lease runs out
+        logger.error(f"Failed to record idempotency result: {e}")
+
+
+def fail(key: str, reason: str) -> None:
+    """Mark a key FAILED so the next request for it may claim it and retry."""
+    if not TABLE_NAME:
+        return
+
+    try:
+        with span('dynamodb', 'fail'):
+            get_client('dynamodb').update_item(
+                TableName=TABLE_NAME,
+                Key={'idempotency_key': {'S': key}},
+                UpdateExpression='SET #status = :failed, failure_reason = :reason',
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues={':failed': {'S': FAILED}, ':reason': {'S': reason[:1000]}},
+            )
+    except Exception as e:
+        # The key is released anyway once its lease runs out
+        logger.error(f"Failed to release idempotency key: {e}")
+
+
+def fail_job(job_name: str, reason: str) -> None:
+    """Mark the key that started job_name FAILED (used by job-completion callbacks)."""
+    if not TABLE_NAME:
+        return
+
+    try:
+        with span('dynamodb', 'get_item'):
+            item = get_client('dynamodb').get_item(
+                TableName=TABLE_NAME,
+                Key={'idempotency_key': {'S': JOB_POINTER_PREFIX + job_name}},
+            ).get('Item')
+    except Exception as e:
+        logger.error(f"Failed to look up idempotency key for job {job_name}: {e}")
+        return
+    if item:
+        fail(item['target']['S'], reason)
@@ -0,0 +1,256 @@
+"""
+MedZen Runtime: LLM JSON Extraction
+Extracts the JSON object or array embedded in model output, repairing common defects in a single pass
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Characters the repair scanner has to look at; everything in between is skipped in bulk
+_TOKEN_RE = re.compile(r'[{}\[\]",:\\“”]')
+_FENCE_RE = re.compile(r'```[A-Za-z]*')
+
+SMART_QUOTES = ('“', '”')
+CLOSERS = {'{': '}', '[': ']'}
+
+# strict=False accepts raw newlines/tabs inside strings, which models emit regularly
+_decoder = json.JSONDecoder(strict=False)
+
+
+def extract_json(text: str, expect: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Extract the first JSON value from model output.
+
+    The fast path decodes directly from the first opening bracket (after a markdown
+    fence if present) and ignores any trailing prose. If that fails, a single
+    brace-matching scan repairs trailing commas, smart-quote delimiters, mismatched
+    closers and missing closing brackets. A bracketed span that is not JSON (prose
+    like "{see below}") is skipped and the next value is tried. For truncated output
+    only the top-level members that were fully emitted are kept; the member cut off
+    mid-value is reported in truncated_sections so it can be regenerated on its own.
+    A final scalar member is kept, and still reported if it is a number that may
+    have lost digits.
+
+    Args:
+        text: Raw model output (may include prose or markdown code fences)
+        expect: 'object' or 'array' to restrict the kind of value, None for either
+
+    Returns:
+        Dict with data (parsed value or None), complete, repairs, sections,
+        truncated_sections and error
+    """
+    if not text:
+        return _result(error='Empty response text')
+
+    start = _find_start(text, expect)
+    if start < 0:
+        return _result(error='No JSON value found in response text')
+
+    first_failure = None
+    while start >= 0:
+        try:
+            data, _ = _decoder.raw_decode(text, start)
+            return _result(data=data, complete=True)
+        except ValueError:
+            pass
+
+        result, end = _scan(text, start)
+        if result['data'] is not None or end < 0:
+            return result
+        # A closed span that is not JSON: look for the next value after it
+        first_failure = first_failure or result
+        start = _find_opener(text, end, expect)
+
+    return first_failure
+
+
+def _find_opener(text: str, offset: int, expect: Optional[str]) -> int:
+    """Position of the first opening bracket at or after offset, -1 if none."""
+    openers = {'object': '{', 'array': '['}.get(expect, '{[')
+    positions = [p for p in (text.find(o, offset) for o in openers) if p >= 0]
+    return min(positions) if positions else -1
+
+
+def _find_start(text: str, expect: Optional[str]) -> int:
+    """Locate the opening bracket of the JSON value, preferring the inside of a code fence."""
+    search_from = 0
+    fence = _FENCE_RE.search(text)
+    if fence:
+        search_from = fence.end()
+
+    for offset in (search_from, 0):
+        position = _find_opener(text, offset, expect)
+        if position >= 0:
+            return position
+    return -1
+
+
+def _scan(text: str, start: int) -> Tuple[Dict[str, Any], int]:
+    """
+    Single-pass repair scan starting at the opening bracket at text[start].
+
+    Returns:
+        (result, end): end is the position after the matching closer, -1 if the value is truncated
+    """
+    stack: List[str] = []
+    edits: Dict[int, str] = {}
+    repairs: List[str] = []
+
+    in_string = False
+    smart_string = False
+    string_start = -1
+    escaped_at = -1
+    pending_comma = -1
+
+    # Top-level bookkeeping used to salvage complete members from truncated output
+    expect_key = False
+    current_key: Optional[str] = None
+    value_start = -1
+    commit_pos = start + 1
+    end = -1
+
+    def commit(pos: int) -> None:
+        nonlocal commit_pos, current_key, value_start
+        commit_pos = pos
+        current_key = None
+        value_start = -1
+
+    for match in _TOKEN_RE.finditer(text, start):
+        pos = match.start()
+        ch = match.group()
+
+        if in_string:
+            if pos == escaped_at:
+                continue
+            if ch == '\\':
+                escaped_at = pos + 1
+                continue
+            if ch == '"' or (smart_string and ch in SMART_QUOTES):
+                in_string = False
+                if ch != '"':
+                    edits[pos] = '"'
+                if len(stack) == 1:
+                    if expect_key:
+                        current_key = text[string_start + 1:pos]
+                        expect_key = False
+                    else:
+                        commit(pos + 1)
+            continue
+
+        if ch == '"' or ch in SMART_QUOTES:
+            if ch != '"':
+                edits[pos] = '"'
+                _note(repairs, 'smart_quotes')
+            in_string = True
+            smart_string = ch != '"'
+            string_start = pos
+            pending_comma = -1
+
+        elif ch == '{' or ch == '[':
+            stack.append(ch)
+            pending_comma = -1
+            if len(stack) == 1:
+                expect_key = ch == '{'
+
+        elif ch == '}' or ch == ']':
+            if pending_comma >= 0 and not text[pending_comma + 1:pos].strip():
+                edits[pending_comma] = ''
+                _note(repairs, 'trailing_commas')
+            pending_comma = -1
+
+            expected = CLOSERS[stack.pop()]
+            if ch != expected:
+                edits[pos] = expected
+                _note(repairs, 'mismatched_brackets')
+
+            if not stack:
+                end = pos + 1
+                commit(end)
+                break
+            if len(stack) == 1:
+                commit(pos + 1)
+
+        elif ch == ',':
+            pending_comma = pos
+            if len(stack) == 1:
+                # Commits scalar members (numbers, booleans) that have no closing token
+                commit(pos)
+                expect_key = stack[0] == '{'
+
+        elif ch == ':':
+            if len(stack) == 1:
+                expect_key = False
+                value_start = pos + 1
+
+    truncated_sections: List[str] = []
+    if end >= 0:
+        candidate = _apply_edits(text, start, end, edits)
+    else:
+        _note(repairs, 'truncated')
+        if current_key is not None and value_start >= 0 and not in_string and len(stack) == 1:
+            # A complete final scalar has no comma after it to commit it; a number running
+            # to the very end may still have lost digits, so it is kept but reported
+            value = text[value_start:].rstrip()
+            key = current_key
+            try:
+                _decoder.decode(value)
+                commit(value_start + len(value))
+                if value[-1].isdigit() and text.endswith(value):
+                    truncated_sections.append(key)
+            except ValueError:
+                pass
+        if current_key is not None:
+            truncated_sections.append(current_key)
+        candidate = _apply_edits(text, start, commit_pos, edits) + CLOSERS[text[start]]
+
+    try:
+        data = _decoder.decode(candidate)
+    except ValueError as e:
+        return _result(repairs=repairs, truncated_sections=truncated_sections, error=str(e)), end
+
+    return _result(
+        data=data,
+        complete=end >= 0,
+        repairs=repairs,
+        truncated_sections=truncated_sections
+    ), end
+
+
+def _apply_edits(text: str, start: int, end: int, edits: Dict[int, str]) -> str:
+    """Return text[start:end] with single-character edits applied."""
+    if not edits:
+        return text[start:end]
+
+    parts = []
+    cursor = start
+    for pos in sorted(edits):
+        if pos >= end:
+            break
+        parts.append(text[cursor:pos])
+        parts.append(edits[pos])
+        cursor = pos + 1
+    parts.append(text[cursor:end])
+    return ''.join(parts)
+
+
+def _note(repairs: List[str], repair: str) -> None:
+    if repair not in repairs:
+        repairs.append(repair)
+
+
+def _result(
+    data: Any = None,
+    complete: bool = False,
+    repairs: Optional[List[str]] = None,
+    truncated_sections: Optional[List[str]] = None,
+    error: Optional[str] = None
+) -> Dict[str, Any]:
+    return {
+        'data': data,
+        'complete': complete,
+        'repairs': repairs or [],
+        'sections': list(data.keys()) if isinstance(data, dict) else [],
+        'truncated_sections': truncated_sections or [],
+        'error': error
+    }
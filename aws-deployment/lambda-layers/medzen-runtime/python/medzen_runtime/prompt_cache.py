@@ -0,0 +1,88 @@
+"""
+MedZen Runtime: Bedrock Prompt Caching
+Builds Anthropic Messages request parts with a cached static prefix and reads cache token usage
+"""
+
+import hashlib
+from typing import Any, Dict, List
+
+# Bedrock only creates a cache entry once the prefix reaches the model's minimum
+# (1024 tokens for Opus/Sonnet); shorter prefixes are sent uncached without error
+CACHE_CONTROL = {'type': 'ephemeral'}
+CACHE_MIN_TOKENS = 1024
+CHARS_PER_TOKEN = 4
+
+
+def prompt_version(text: str) -> str:
+    """Short content hash identifying a prompt revision in logs and usage records."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:12]
+
+
+def cached_system(*static_texts: str) -> List[Dict[str, Any]]:
+    """
+    Build a system block list whose static prefix is marked for prompt caching.
+
+    Args:
+        static_texts: Instruction and schema text identical across requests
+
+    Returns:
+        System content blocks with a cache checkpoint after the last one
+    """
+    blocks = [{'type': 'text', 'text': text} for text in static_texts if text]
+    if blocks:
+        blocks[-1]['cache_control'] = dict(CACHE_CONTROL)
+    return blocks
+
+
+def cached_prefix_tokens(request_body: Dict[str, Any]) -> int:
+    """
+    Estimated size of a request's cached prefix: system, then message blocks, up to the last checkpoint.
+
+    Returns 0 when the request has no checkpoint.
+    """
+    blocks = []
+    system = request_body.get('system')
+    if isinstance(system, list):
+        blocks += system
+    for message in request_body.get('messages', []):
+        if isinstance(message.get('content'), list):
+            blocks += message['content']
+    marked = [i for i, block in enumerate(blocks) if 'cache_control' in block]
+    if not marked:
+        return 0
+    chars = sum(len(block.get('text', '')) for block in blocks[:marked[-1] + 1])
+    return chars // CHARS_PER_TOKEN
+
+
+def cache_eligible(request_body: Dict[str, Any]) -> bool:
+    """Whether the cached prefix is long enough for Bedrock to cache it (the bundled prompts are not)."""
+    return cached_prefix_tokens(request_body) >= CACHE_MIN_TOKENS
+
+
+def strip_cache_control(request_body: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a request body without cache checkpoints, for models that do not support caching."""
+    def strip(content):
+        if not isinstance(content, list):
+            return content
+        return [{k: v for k, v in block.items() if k != 'cache_control'} for block in content]
+
+    body = dict(request_body)
+    if 'system' in body:
+        body['system'] = strip(body['system'])
+    body['messages'] = [dict(m, content=strip(m.get('content'))) for m in body.get('messages', [])]
+    return body
+
+
+def usage_tokens(response_body: Dict[str, Any]) -> Dict[str, int]:
+    """
+    Token usage of a Bedrock Anthropic response, including prompt cache reads and writes.
+
+    input_tokens excludes cached tokens, so input + cache_read + cache_write is the full prompt size.
+    """
+    usage = response_body.get('usage') or {}
+    return {
+        'input': usage.get('input_tokens', 0),
+        'output': usage.get('output_tokens', 0),
+        'cache_read': usage.get('cache_read_input_tokens', 0) or 0,
+        'cache_write': usage.get('cache_creation_input_tokens', 0) or 0,
+    }
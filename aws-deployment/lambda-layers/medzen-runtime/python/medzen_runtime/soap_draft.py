@@ -0,0 +1,423 @@
+"""
+MedZen Runtime: Incremental SOAP Drafting
+Keeps running clinical facts, a rolling summary and a draft SOAP note while a call is transcribed
+
+Final transcript segments are added as they arrive. Every few dozen words (or
+soap_draft_interval_seconds of call time) update() sends only the new lines, the current facts
+and the summary to the draft model and folds the returned delta in: facts added or retracted
+per category, the chief complaint and a rewritten summary. Each changed category marks the SOAP
+sections it feeds as dirty. refresh_note() regenerates the dirty sections of the draft note
+during the call, off the critical path.
+
+At hang-up finalize() folds in the last lines and regenerates only the sections still dirty
+(the whole note from the facts if there is no draft yet or too much changed). The prompt
+carries the facts and summary instead of the transcript, so the call that gates the note is
+small on both input and output.
+
+    drafter = SoapDrafter(metadata)
+    drafter.add(segment)              # each final segment, in call order
+    drafter.step()                    # whenever convenient; no-op unless an update is due
+    result = drafter.finalize()       # {'statusCode': 200, 'soap_note': ..., 'bedrock_tokens': ...}
+
+Methods are thread-safe: add() may run on the event loop while step() runs in an executor.
+"""
+
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+from medzen_runtime.clients import get_client
+from medzen_runtime.config import get_config, get_prompt
+from medzen_runtime.json_extract import extract_json
+from medzen_runtime.prompt_cache import cache_eligible, cached_system, strip_cache_control, usage_tokens
+from medzen_runtime.soap_schema import validate_soap_note
+from medzen_runtime.soap_sections import (
+    REPAIR_SYSTEM_PROMPT,
+    SOAP_SECTIONS,
+    SYSTEM_PROMPT,
+    SYSTEM_PROMPT_NAME,
+    build_section_repair_prompt,
+    merge_sections,
+)
+from medzen_runtime.tracing import span
+
+logger = logging.getLogger(__name__)
+
+BEDROCK_REGION = 'us-east-1'
+
+# Fact categories and the SOAP sections each one feeds
+FACT_SECTIONS = {
+    'chief_complaint': ('chief_complaint', 'subjective'),
+    'symptoms': ('subjective', 'assessment'),
+    'history': ('subjective',),
+    'medications': ('subjective', 'safety'),
+    'allergies': ('subjective', 'safety'),
+    'observations': ('objective',),
+    'impressions': ('assessment', 'coding_billing'),
+    'plan': ('plan', 'coding_billing'),
+    'red_flags': ('safety', 'plan'),
+    'open_questions': ('doctor_editing',),
+}
+LIST_CATEGORIES = [category for category in FACT_SECTIONS if category != 'chief_complaint']
+# Sections that depend only on metadata, or on the whole note, are filled in with every full note
+NOTE_SECTIONS = list(SOAP_SECTIONS)
+
+DRAFT_SYSTEM_PROMPT = f"""You maintain the running clinical facts of a live medical call for a SOAP note drafted while the call is in progress.
+
+You receive the current facts, a rolling summary and the newest transcript lines. Return ONLY a JSON object:
+{{
+  "add": {{"<category>": ["short fact", ...]}},
+  "remove": {{"<category>": ["existing fact, copied exactly, that the new lines contradict"]}},
+  "chief_complaint": "updated chief complaint, or null if unchanged",
+  "summary": "the rolling summary rewritten to include the new lines, at most 120 words"
+}}
+Categories: {', '.join(LIST_CATEGORIES)}.
+Only include facts stated in the new lines. Keep facts short (one finding, dose or instruction each), in the language of the transcript.
+Never hallucinate; omit categories with nothing new."""
+
+METADATA_LABELS = [
+    ('appointment_id', 'Appointment ID'),
+    ('session_id', 'Session ID'),
+    ('provider_name', 'Provider'),
+    ('provider_specialty', 'Provider Specialty'),
+    ('patient_name', 'Patient'),
+    ('call_start_time', 'Call Start Time'),
+    ('call_end_time', 'Call End Time'),
+    ('language', 'Transcript Language'),
+]
+
+
+def _error_code(error: Exception) -> str:
+    return getattr(error, 'response', {}).get('Error', {}).get('Code', '')
+
+
+def invoke(request_body: Dict[str, Any], model_ids: List[str], operation: str) -> Dict[str, Any]:
+    """
+    Call Bedrock, moving to the next model on throttling or unavailability.
+
+    Args:
+        request_body: Anthropic Messages API request body
+        model_ids: Models to try in order; cache checkpoints are kept only for the first
+        operation: Purpose dimension of the span, e.g. 'soap_draft_update'
+
+    Returns:
+        Dict with text, usage (usage_tokens) and model_id
+    """
+    model_ids = list(dict.fromkeys(model_ids))
+    for attempt, model_id in enumerate(model_ids):
+        body = request_body if attempt == 0 else strip_cache_control(request_body)
+        try:
+            with span('bedrock', 'invoke_model', model=model_id, purpose=operation) as call:
+                response = get_client('bedrock-runtime', BEDROCK_REGION).invoke_model(
+                    modelId=model_id,
+                    contentType='application/json',
+                    accept='application/json',
+                    body=json.dumps(body)
+                )
+                response_body = json.loads(response['body'].read().decode('utf-8'))
+                usage = usage_tokens(response_body)
+                call.metric('InputTokens', usage['input'])
+                call.metric('OutputTokens', usage['output'])
+                call.metric('CacheReadTokens', usage['cache_read'])
+                call.metric('CacheEligible', int(cache_eligible(body)))
+        except Exception as e:
+            if _error_code(e) in ('ThrottlingException', 'ServiceUnavailableException') and attempt + 1 < len(model_ids):
+                logger.warning(f"{operation}: {model_id} unavailable ({_error_code(e)}), trying {model_ids[attempt + 1]}")
+                continue
+            raise
+        text = ''.join(block.get('text', '') for block in response_body.get('content', []))
+        return {'text': text, 'usage': usage, 'model_id': model_id}
+    raise ValueError('No model to invoke')
+
+
+class SoapDrafter:
+    """Running clinical facts, summary and draft note for one call."""
+
+    def __init__(self, metadata: Optional[Dict[str, Any]] = None):
+        self.metadata = dict(metadata or {})
+        self.facts: Dict[str, Any] = {'chief_complaint': None, **{category: [] for category in LIST_CATEGORIES}}
+        self.summary = ''
+        self.note: Optional[Dict[str, Any]] = None
+        self.dirty: Set[str] = set()
+        self.pending: List[Dict[str, Any]] = []
+        self.call_time = 0.0
+        self.updated_at = 0.0
+        self.noted_at = 0.0
+        self.tokens = {'live': {}, 'finalize': {}}
+        self.calls = {'update': 0, 'note': 0, 'sections': 0, 'failed': 0}
+        self.model_id: Optional[str] = None
+        self._lock = threading.Lock()
+        self._busy = threading.Lock()
+
+    # Segments in
+
+    def add(self, segment: Dict[str, Any]) -> None:
+        """Queue a final transcript segment (speaker, start_time, end_time, text)."""
+        if not (segment.get('text') or '').strip():
+            return
+        with self._lock:
+            self.pending.append(segment)
+            self.call_time = max(self.call_time, float(segment.get('end_time') or 0))
+
+    def _pending_words(self) -> int:
+        return sum(len(segment['text'].split()) for segment in self.pending)
+
+    def update_due(self) -> bool:
+        """True once enough new words, or enough call time, have accumulated since the last update."""
+        config = get_config()
+        with self._lock:
+            if not self.pending:
+                return False
+            return (self._pending_words() >= config['soap_draft_min_words']
+                    or self.call_time - self.updated_at >= config['soap_draft_interval_seconds'])
+
+    def note_due(self) -> bool:
+        """True when facts changed since the last draft note and either there is none yet or the refresh interval passed."""
+        with self._lock:
+            if not self.dirty:
+                return False
+            return self.note is None or self.call_time - self.noted_at >= get_config('soap_draft_note_interval_seconds')
+
+    # Bedrock calls
+
+    def _count_tokens(self, phase: str, usage: Dict[str, int]) -> None:
+        totals = self.tokens[phase]
+        for key, value in usage.items():
+            totals[key] = totals.get(key, 0) + value
+
+    def _metadata_context(self) -> str:
+        return ''.join(f"{label}: {self.metadata[key]}\n" for key, label in METADATA_LABELS if self.metadata.get(key))
+
+    def facts_digest(self, tail: Optional[List[Dict[str, Any]]] = None) -> str:
+        """Facts and summary as prompt text, optionally followed by transcript lines not yet folded in."""
+        lines = [f"Rolling summary: {self.summary or 'none yet'}"]
+        lines.append(f"Chief complaint: {self.facts['chief_complaint'] or 'unknown'}")
+        for category in LIST_CATEGORIES:
+            if self.facts[category]:
+                lines.append(f"{category.replace('_', ' ').capitalize()}:")
+                lines.extend(f"- {fact}" for fact in self.facts[category])
+        if tail:
+            lines.append('Latest transcript lines:')
+            lines.extend(_transcript_line(segment) for segment in tail)
+        return '\n'.join(lines)
+
+    def update(self, phase: str = 'live') -> bool:
+        """
+        Fold the pending lines into the facts with one small model call.
+
+        Returns:
+            True if the facts were updated; on failure the lines stay pending for the next update
+        """
+        with self._lock:
+            lines, self.pending = self.pending, []
+            call_time = self.call_time
+            facts = json.dumps(self.facts, ensure_ascii=False, separators=(',', ':'))
+            summary = self.summary
+        if not lines:
+            return False
+
+        user_message = f"""CLINICAL FACTS UPDATE
+{self._metadata_context()}
+Current facts:
+{facts}
+
+Rolling summary:
+{summary or 'none yet'}
+
+---NEW TRANSCRIPT LINES START---
+{chr(10).join(_transcript_line(segment) for segment in lines)}
+---NEW TRANSCRIPT LINES END---
+
+Return ONLY the JSON delta object."""
+        request_body = {
+            'anthropic_version': 'bedrock-2023-06-01',
+            'max_tokens': 1024,
+            'system': cached_system(DRAFT_SYSTEM_PROMPT),
+            'messages': [{'role': 'user', 'content': user_message}],
+        }
+        config = get_config()
+        try:
+            response = invoke(request_body, [config['soap_draft_model_id'], config['model_id_fallback']], 'soap_draft_update')
+            delta = extract_json(response['text'], expect='object')['data']
+            if not isinstance(delta, dict):
+                raise ValueError('draft update is not a JSON object')
+        except Exception as e:
+            logger.error(f"SOAP draft update failed, keeping {len(lines)} lines for the next one: {e}")
+            with self._lock:
+                self.pending[:0] = lines
+                self.calls['failed'] += 1
+            return False
+
+        with self._lock:
+            self._apply(delta)
+            self.updated_at = call_time
+            self.calls['update'] += 1
+            self._count_tokens(phase, response['usage'])
+        return True
+
+    def _apply(self, delta: Dict[str, Any]) -> None:
+        changed = set()
+        for category, facts in (delta.get('remove') or {}).items():
+            if category in LIST_CATEGORIES and isinstance(facts, list):
+                drop = {str(fact).strip().lower() for fact in facts}
+                kept = [fact for fact in self.facts[category] if fact.lower() not in drop]
+                if len(kept) != len(self.facts[category]):
+                    self.facts[category] = kept
+                    changed.add(category)
+        for category, facts in (delta.get('add') or {}).items():
+            if category in LIST_CATEGORIES and isinstance(facts, list):
+                known = {fact.lower() for fact in self.facts[category]}
+                for fact in facts:
+                    fact = str(fact).strip()
+                    if fact and fact.lower() not in known:
+                        self.facts[category].append(fact)
+                        known.add(fact.lower())
+                        changed.add(category)
+        complaint = delta.get('chief_complaint')
+        if isinstance(complaint, str) and complaint.strip() and complaint.strip() != self.facts['chief_complaint']:
+            self.facts['chief_complaint'] = complaint.strip()
+            changed.add('chief_complaint')
+        if isinstance(delta.get('summary'), str) and delta['summary'].strip():
+            self.summary = delta['summary'].strip()
+        for category in changed:
+            self.dirty.update(FACT_SECTIONS[category])
+
+    def _generate_note(self, phase: str, tail: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Regenerate the dirty sections of the draft note, or the whole note from the facts."""
+        with self._lock:
+            sections = [section for section in NOTE_SECTIONS if section in self.dirty]
+            digest = self.facts_digest(tail)
+            note = self.note
+        config = get_config()
+        full = note is None or len(sections) > config['max_repair_sections']
+
+        if full:
+            system = get_prompt(SYSTEM_PROMPT_NAME, SYSTEM_PROMPT)
+            user_message = f"""Please generate a SOAP note from the following clinical facts, gathered from a medical call as it happened.
+
+{self._metadata_context()}
+---CLINICAL FACTS START---
+{digest}
+---CLINICAL FACTS END---
+
+Generate the SOAP note as a single, complete JSON object following the exact schema. Return ONLY the JSON object, no other text."""
+            max_tokens = 4096
+        else:
+            system = REPAIR_SYSTEM_PROMPT
+            user_message = build_section_repair_prompt(sections, note, digest, self._metadata_context())
+            max_tokens = min(4096, 800 * len(sections))
+
+        request_body = {
+            'anthropic_version': 'bedrock-2023-06-01',
+            'max_tokens': max_tokens,
+            'system': cached_system(system),
+            'messages': [{'role': 'user', 'content': user_message}],
+        }
+        models = [config['model_id_primary']] + ([config['model_id_fallback']] if config['enable_fallback_model'] else [])
+        response = invoke(request_body, models, 'soap_draft_note' if full else 'soap_draft_sections')
+        extraction = extract_json(response['text'], expect='object')
+        generated = extraction['data']
+        if not isinstance(generated, dict):
+            raise ValueError(f"draft note is not a JSON object: {extraction['error']}")
+
+        with self._lock:
+            if full:
+                self.note = generated
+                self.dirty.clear()
+                self.calls['note'] += 1
+            else:
+                for section in merge_sections(self.note, generated, sections):
+                    self.dirty.discard(section)
+                self.calls['sections'] += 1
+            self.noted_at = self.call_time
+            self.model_id = response['model_id']
+            self._count_tokens(phase, response['usage'])
+
+    def refresh_note(self) -> bool:
+        """Bring the draft note up to date with the facts; False if the call failed."""
+        try:
+            self._generate_note('live')
+        except Exception as e:
+            logger.error(f"SOAP draft note refresh failed: {e}")
+            with self._lock:
+                self.calls['failed'] += 1
+            return False
+        return True
+
+    def step(self) -> None:
+        """Run whatever is due: a facts update, then a draft note refresh. Skips if another step is running."""
+        if not self._busy.acquire(blocking=False):
+            return
+        try:
+            if self.update_due():
+                self.update()
+            if self.note_due():
+                self.refresh_note()
+        finally:
+            self._busy.release()
+
+    # Hang-up
+
+    def finalize(self) -> Dict[str, Any]:
+        """
+        Produce the final note: fold in the last lines, then regenerate only what they changed.
+
+        Returns:
+            Dict with statusCode, soap_note, validation, bedrock_tokens (live and finalize usage)
+            and sections_regenerated; statusCode 500 with error and message if the note call failed
+        """
+        with self._busy:
+            with self._lock:
+                tail = list(self.pending)
+            if tail and not self.update(phase='finalize'):
+                # Facts could not absorb the tail: show it to the note call verbatim
+                with self._lock:
+                    self.dirty.update(section for sections in FACT_SECTIONS.values() for section in sections)
+            else:
+                tail = None
+
+            with self._lock:
+                regenerated = [section for section in NOTE_SECTIONS if section in self.dirty]
+                full = self.note is None or len(regenerated) > get_config('max_repair_sections')
+            try:
+                if self.note is None or self.dirty:
+                    self._generate_note('finalize', tail)
+            except Exception as e:
+                logger.error(f"SOAP draft finalize failed: {e}")
+                return {'statusCode': 500, 'error': 'DraftFinalizeFailed', 'message': str(e),
+                        'bedrock_tokens': self.tokens}
+
+            validation = validate_soap_note(json.loads(json.dumps(self.note)))
+            return {
+                'statusCode': 200,
+                'soap_note': validation['note'],
+                'validation': {
+                    'violation_count': len(validation['violations']),
+                    'invalid_sections': validation['invalid_sections'],
+                    'defaulted': len(validation['defaulted']),
+                    'coerced': len(validation['coerced']),
+                },
+                'bedrock_tokens': self.tokens,
+                'model_id': self.model_id,
+                'sections_regenerated': NOTE_SECTIONS if full else regenerated,
+                'calls': dict(self.calls),
+            }
+
+    def export(self) -> Dict[str, Any]:
+        """JSON-serializable drafting state (facts, summary, draft note, dirty sections)."""
+        with self._lock:
+            return {
+                'facts': self.facts,
+                'summary': self.summary,
+                'note': self.note,
+                'dirty_sections': sorted(self.dirty),
+                'pending_segments': len(self.pending),
+                'call_time': self.call_time,
+                'calls': dict(self.calls),
+                'bedrock_tokens': self.tokens,
+            }
+
+
+def _transcript_line(segment: Dict[str, Any]) -> str:
+    return f"[{float(segment.get('start_time') or 0):.1f}] {segment.get('speaker', 'Unknown')}: {segment['text'].strip()}"
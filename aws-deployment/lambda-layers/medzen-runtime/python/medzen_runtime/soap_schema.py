@@ -0,0 +1,555 @@
+"""
+MedZen Runtime: SOAP Schema Validator
+Compiles the SOAP note schema into nested validator closures once at import time.
+
+Validation fills defaults for missing fields, coerces near-miss types (e.g. "38.5" -> 38.5,
+"true" -> True, "Low" -> "low") and reports every violation with its dotted path. Top-level
+sections that are missing or unusable are listed in invalid_sections, which drives section
+repair and full regeneration in generate-soap-from-transcript.
+"""
+
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from medzen_runtime.soap_sections import SOAP_SECTIONS
+
+_MISSING = object()
+_NULL_STRINGS = {'', 'null', 'none', 'unknown', 'n/a', 'na'}
+_TRUE_STRINGS = {'true', 'yes', 'y', '1'}
+_FALSE_STRINGS = {'false', 'no', 'n', '0'}
+
+Checker = Callable[[Any, str, '_Report'], Any]
+
+
+# Schema spec constructors -------------------------------------------------
+
+def STR(default: Any = 'unknown', nullable: bool = False) -> Tuple:
+    return ('str', default, nullable)
+
+
+def NUM(default: Optional[float] = None, lo: Optional[float] = None, hi: Optional[float] = None) -> Tuple:
+    return ('num', default, lo, hi)
+
+
+def BOOL(default: bool = False) -> Tuple:
+    return ('bool', default)
+
+
+def ENUM(*choices: str, default: str = 'unknown') -> Tuple:
+    return ('enum', frozenset(choices), default)
+
+
+def LIST(item: Any) -> Tuple:
+    return ('list', item)
+
+
+def ANY_OBJECT() -> Tuple:
+    return ('any_object',)
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat() + 'Z'
+
+
+_ROS = {'positives': LIST(STR()), 'negatives': LIST(STR()), 'unknown': LIST(STR())}
+_CONFIDENCE = ENUM('high', 'medium', 'low', 'unknown')
+
+# Mirrors the JSON schema in aws-deployment/prompts/soap-generation-system-prompt.md
+SOAP_SCHEMA = {
+    'schema_version': STR(default='1.0.0'),
+    'generated_at': STR(default=_now),
+    'language': STR(default='en'),
+    'encounter': {
+        'encounter_type': STR(default='telemedicine_video'),
+        'appointment_id': STR(),
+        'session_id': STR(),
+        'start_time': STR(),
+        'end_time': STR(),
+        'timezone': STR(),
+        'location': {
+            'patient_location_text': STR(),
+            'provider_location_text': STR(),
+        },
+    },
+    'participants': {
+        'provider': {
+            'id': STR(),
+            'name': STR(),
+            'role': STR(),
+            'specialty': STR(),
+            'facility': STR(),
+        },
+        'patient': {
+            'id': STR(),
+            'name': STR(),
+            'age_years': NUM(lo=0, hi=130),
+            'sex_at_birth': ENUM('unknown', 'male', 'female', 'other'),
+            'gender_identity': ENUM('unknown', 'male', 'female', 'non-binary', 'other'),
+            'pregnancy_status': ENUM('unknown', 'not_pregnant', 'pregnant', 'postpartum'),
+        },
+    },
+    'source': {
+        'transcript': {
+            'type': STR(),
+            'confidence_overall': NUM(default=0, lo=0, hi=1),
+            'language_code': STR(),
+            'speaker_labels_used': BOOL(),
+            'notes': STR(default=''),
+        },
+        'data_quality': {
+            'missing_audio_segments': BOOL(),
+            'inaudible_sections': LIST(STR()),
+            'uncertainties': LIST(STR()),
+        },
+    },
+    'chief_complaint': STR(),
+    'subjective': {
+        'hpi': {
+            'narrative': STR(),
+            'symptom_onset': STR(),
+            'duration': STR(),
+            'location': STR(),
+            'quality': STR(),
+            'severity_scale_0_10': NUM(lo=0, hi=10),
+            'timing': STR(),
+            'context': STR(),
+            'modifying_factors': {
+                'aggravating': LIST(STR()),
+                'relieving': LIST(STR()),
+            },
+            'associated_symptoms': LIST(STR()),
+            'pertinent_negatives': LIST(STR()),
+        },
+        'ros': {system: _ROS for system in (
+            'constitutional', 'cardiovascular', 'respiratory', 'gastrointestinal', 'genitourinary',
+            'musculoskeletal', 'skin', 'neurologic', 'psychiatric', 'endocrine', 'hematologic',
+            'allergic_immunologic',
+        )},
+        'pmh': {
+            'conditions': LIST({
+                'name': STR(),
+                'status': ENUM('active', 'resolved', 'unknown'),
+                'notes': STR(default=''),
+            }),
+        },
+        'psh': {
+            'surgeries': LIST({
+                'procedure': STR(),
+                'approx_year': STR(),
+                'notes': STR(default=''),
+            }),
+        },
+        'medications': LIST({
+            'name': STR(),
+            'dose': STR(),
+            'route': STR(),
+            'frequency': STR(),
+            'adherence': STR(),
+            'indication': STR(),
+        }),
+        'allergies': LIST({
+            'substance': STR(),
+            'reaction': STR(),
+            'severity': ENUM('mild', 'moderate', 'severe', 'unknown'),
+            'type': ENUM('medication', 'food', 'environmental', 'other', 'unknown'),
+        }),
+        'social_history': {
+            'tobacco': STR(),
+            'alcohol': STR(),
+            'substance_use': STR(),
+            'occupation': STR(),
+            'living_situation': STR(),
+        },
+        'family_history': {
+            'relevant_conditions': LIST(STR()),
+        },
+    },
+    'objective': {
+        'vitals': {
+            'measured': BOOL(),
+            'bp_mmHg': STR(default=None, nullable=True),
+            'hr_bpm': NUM(lo=0, hi=300),
+            'rr_bpm': NUM(lo=0, hi=100),
+            'temp_c': NUM(lo=25, hi=45),
+            'spo2_percent': NUM(lo=0, hi=100),
+            'weight_kg': NUM(lo=0, hi=500),
+            'height_cm': NUM(lo=0, hi=280),
+            'bmi': NUM(lo=0, hi=150),
+            'source': STR(),
+        },
+        'telemedicine_observations': {
+            'general_appearance': STR(),
+            'respiratory_effort': STR(),
+            'speech': STR(),
+            'mental_status': STR(),
+            'skin_visible': STR(),
+            'other': LIST(STR()),
+        },
+        'physical_exam_limited': {
+            'performed': BOOL(),
+            'summary': STR(),
+            'systems': {system: STR() for system in (
+                'general', 'heent', 'cardiovascular', 'respiratory', 'abdomen', 'msk', 'neuro', 'skin', 'psych',
+            )},
+        },
+        'diagnostics_reviewed': LIST(STR()),
+    },
+    'assessment': {
+        'problem_list': LIST({
+            'problem': STR(),
+            'status': ENUM('new', 'active', 'resolved', 'unknown'),
+            'supporting_evidence': LIST({
+                'type': ENUM('subjective', 'objective', 'imaging', 'lab', default='subjective'),
+                'detail': STR(),
+            }),
+            'differential_diagnoses': LIST({
+                'diagnosis': STR(),
+                'likelihood': ENUM('high', 'medium', 'low', default='low'),
+                'rationale': STR(),
+            }),
+            'icd10_suggestions': LIST({
+                'code': STR(default='optional'),
+                'label': STR(),
+                'confidence': _CONFIDENCE,
+            }),
+            'red_flags': LIST({
+                'flag': STR(),
+                'present': BOOL(),
+                'action': STR(),
+            }),
+        }),
+        'clinical_impression_summary': STR(),
+    },
+    'plan': {
+        'treatments': LIST({
+            'category': ENUM('non_pharm', 'medication', 'procedure', 'lifestyle', default='non_pharm'),
+            'name': STR(),
+            'details': {
+                'dose': STR(),
+                'route': STR(),
+                'frequency': STR(),
+                'duration': STR(),
+                'instructions': STR(),
+            },
+            'rationale': STR(),
+        }),
+        'orders': LIST({
+            'type': ENUM('lab', 'imaging', 'referral', 'procedure', 'other', default='other'),
+            'name': STR(),
+            'priority': ENUM('routine', 'urgent', 'stat', default='routine'),
+            'reason': STR(),
+        }),
+        'follow_up': {
+            'timeframe': STR(),
+            'with_whom': STR(default='provider'),
+            'return_precautions': LIST(STR()),
+        },
+        'patient_education': LIST({
+            'topic': STR(),
+            'instructions': STR(),
+        }),
+        'work_school_notes': {
+            'needed': BOOL(),
+            'restrictions': STR(),
+        },
+    },
+    'coding_billing': {
+        'suggested_cpt': LIST({
+            'code': STR(default='optional'),
+            'confidence': _CONFIDENCE,
+            'notes': STR(default=''),
+        }),
+        'mdm_level_suggestion': ENUM('straightforward', 'low', 'moderate', 'high', 'unknown'),
+        'rationale': STR(),
+    },
+    'safety': {
+        'medication_safety_notes': LIST(STR()),
+        'limitations': LIST(STR()),
+        'requires_clinician_review': BOOL(default=True),
+    },
+    'doctor_editing': {
+        'draft_quality': ENUM('high', 'medium', 'low', default='low'),
+        'recommended_clarifications': LIST(STR()),
+        'sections_needing_attention': LIST(STR()),
+    },
+}
+
+# Five-section layout produced by the Step Functions prompt in enrich-metadata.py
+STEP_FUNCTIONS_SOAP_SCHEMA = {
+    'chief_complaint': STR(default=''),
+    'subjective': ANY_OBJECT(),
+    'objective': ANY_OBJECT(),
+    'assessment': ANY_OBJECT(),
+    'plan': ANY_OBJECT(),
+}
+
+
+# Compiler -----------------------------------------------------------------
+
+class SchemaViolation(Exception):
+    """Raised internally to stop at the first violation in fail-fast mode."""
+
+
+class _Report:
+    __slots__ = ('violations', 'defaulted', 'coerced', 'invalid_sections', 'fail_fast', 'quiet')
+
+    def __init__(self, fail_fast: bool = False, quiet: bool = False):
+        self.violations: List[Dict[str, str]] = []
+        self.defaulted: List[str] = []
+        self.coerced: List[str] = []
+        self.invalid_sections: List[str] = []
+        self.fail_fast = fail_fast
+        self.quiet = quiet
+
+    def violation(self, path: str, message: str) -> None:
+        if self.quiet:
+            return
+        self.violations.append({'path': path, 'message': message})
+        if '.' not in path and '[' not in path:
+            self.invalid_sections.append(path)
+        if self.fail_fast:
+            raise SchemaViolation(path)
+
+    def default(self, path: str) -> None:
+        if self.quiet:
+            return
+        self.defaulted.append(path)
+        if '.' not in path and '[' not in path:
+            self.invalid_sections.append(path)
+            if self.fail_fast:
+                raise SchemaViolation(path)
+
+    def coerce(self, path: str) -> None:
+        if not self.quiet:
+            self.coerced.append(path)
+
+
+_QUIET = _Report(quiet=True)
+
+
+def _default_value(default: Any) -> Any:
+    return default() if callable(default) else default
+
+
+def _type_name(value: Any) -> str:
+    return 'null' if value is None else type(value).__name__
+
+
+def compile_schema(spec: Any) -> Checker:
+    """
+    Compile a schema spec into a checker closure.
+
+    Each node is compiled exactly once; validation then runs only the specialised
+    closures, without inspecting the spec again.
+    """
+    if isinstance(spec, dict):
+        return _compile_object(spec)
+
+    kind = spec[0]
+    if kind == 'str':
+        return _compile_str(spec[1], spec[2])
+    if kind == 'num':
+        return _compile_num(spec[1], spec[2], spec[3])
+    if kind == 'bool':
+        return _compile_bool(spec[1])
+    if kind == 'enum':
+        return _compile_enum(spec[1], spec[2])
+    if kind == 'list':
+        return _compile_list(compile_schema(spec[1]))
+    if kind == 'any_object':
+        return _compile_any_object()
+    raise ValueError(f"Unknown schema node: {spec!r}")
+
+
+def _compile_object(spec: Dict[str, Any]) -> Checker:
+    fields = tuple((key, compile_schema(sub)) for key, sub in spec.items())
+
+    def check_object(value, path, report):
+        if value is _MISSING or value is None or (value == {} and path):
+            # An empty nested object carries no content; treat it like a missing one
+            report.default(path)
+            value = {}
+            report = _QUIET
+        elif not isinstance(value, dict):
+            report.violation(path, f"expected object, got {_type_name(value)}")
+            value = {}
+            report = _QUIET
+
+        prefix = f"{path}." if path else ''
+        for key, check in fields:
+            value[key] = check(value.get(key, _MISSING), prefix + key, report)
+        return value
+
+    return check_object
+
+
+def _compile_any_object() -> Checker:
+    def check_any_object(value, path, report):
+        if value is _MISSING or value is None or value == {}:
+            report.default(path)
+            return {}
+        if not isinstance(value, dict):
+            report.violation(path, f"expected object, got {_type_name(value)}")
+            return {}
+        return value
+
+    return check_any_object
+
+
+def _compile_list(check_item: Checker) -> Checker:
+    def check_list(value, path, report):
+        if value is _MISSING or value is None:
+            report.default(path)
+            return []
+        if not isinstance(value, list):
+            if isinstance(value, (str, dict)):
+                report.coerce(path)
+                value = [value]
+            else:
+                report.violation(path, f"expected array, got {_type_name(value)}")
+                return []
+        for i, item in enumerate(value):
+            value[i] = check_item(item, f"{path}[{i}]", report)
+        return value
+
+    return check_list
+
+
+def _compile_str(default: Any, nullable: bool) -> Checker:
+    def check_str(value, path, report):
+        if isinstance(value, str):
+            return value
+        if value is _MISSING:
+            report.default(path)
+            return _default_value(default)
+        if value is None:
+            if nullable:
+                return None
+            report.coerce(path)
+            return _default_value(default)
+        if isinstance(value, (int, float)):
+            report.coerce(path)
+            return str(value).lower() if isinstance(value, bool) else str(value)
+        report.violation(path, f"expected string, got {_type_name(value)}")
+        return _default_value(default)
+
+    return check_str
+
+
+def _compile_num(default: Optional[float], lo: Optional[float], hi: Optional[float]) -> Checker:
+    def check_num(value, path, report):
+        if value is _MISSING:
+            report.default(path)
+            return default
+        if value is None:
+            return None
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            if not isinstance(value, str):
+                report.violation(path, f"expected number or null, got {_type_name(value)}")
+                return default
+            text = value.strip().rstrip('%').strip()
+            if text.lower() in _NULL_STRINGS:
+                report.coerce(path)
+                return None
+            try:
+                value = float(text)
+            except ValueError:
+                report.violation(path, f"expected number or null, got {value!r}")
+                return default
+            if value.is_integer():
+                value = int(value)
+            report.coerce(path)
+        if (lo is not None and value < lo) or (hi is not None and value > hi):
+            report.violation(path, f"value {value} outside range [{lo}, {hi}]")
+            return default
+        return value
+
+    return check_num
+
+
+def _compile_bool(default: bool) -> Checker:
+    def check_bool(value, path, report):
+        if value is True or value is False:
+            return value
+        if value is _MISSING or value is None:
+            report.default(path)
+            return default
+        if isinstance(value, str):
+            text = value.strip().lower()
+            if text in _TRUE_STRINGS:
+                report.coerce(path)
+                return True
+            if text in _FALSE_STRINGS:
+                report.coerce(path)
+                return False
+        elif isinstance(value, (int, float)) and value in (0, 1):
+            report.coerce(path)
+            return bool(value)
+        report.violation(path, f"expected boolean, got {value!r}")
+        return default
+
+    return check_bool
+
+
+def _compile_enum(choices: frozenset, default: str) -> Checker:
+    def check_enum(value, path, report):
+        if value is _MISSING or value is None:
+            report.default(path)
+            return default
+        if isinstance(value, str):
+            if value in choices:
+                return value
+            normalized = value.strip().lower().replace(' ', '_')
+            if normalized in choices:
+                report.coerce(path)
+                return normalized
+        report.violation(path, f"expected one of {sorted(choices)}, got {value!r}")
+        return default
+
+    return check_enum
+
+
+def build_validator(spec: Dict[str, Any], sections: Optional[List[str]] = None) -> Callable[..., Dict[str, Any]]:
+    """
+    Compile a top-level schema into a validate(note, fail_fast=False) function.
+
+    Args:
+        spec: Object schema spec
+        sections: Top-level keys reported in invalid_sections (default: all keys of spec)
+
+    Returns:
+        Function returning a dict with valid, note, violations, defaulted, coerced and invalid_sections
+    """
+    check = compile_schema(spec)
+    reportable = frozenset(sections or spec.keys())
+
+    def validate(note: Any, fail_fast: bool = False) -> Dict[str, Any]:
+        """
+        Validate a note in place, filling defaults and coercing types.
+
+        With fail_fast=True validation stops at the first violation; the note may
+        then be only partially normalized.
+        """
+        report = _Report(fail_fast=fail_fast)
+        if not isinstance(note, dict):
+            note = {}
+        try:
+            note = check(note, '', report)
+        except SchemaViolation:
+            pass
+
+        return {
+            'valid': not report.violations and not report.invalid_sections,
+            'note': note,
+            'violations': report.violations,
+            'defaulted': report.defaulted,
+            'coerced': report.coerced,
+            'invalid_sections': [s for s in dict.fromkeys(report.invalid_sections) if s in reportable],
+        }
+
+    return validate
+
+
+# Compiled once per container (cold start)
+validate_soap_note = build_validator(SOAP_SCHEMA, sections=list(SOAP_SECTIONS))
+validate_step_functions_soap = build_validator(STEP_FUNCTIONS_SOAP_SCHEMA)
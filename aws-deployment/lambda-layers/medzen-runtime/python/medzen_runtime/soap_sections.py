@@ -0,0 +1,431 @@
+"""
+MedZen Runtime: SOAP Section Repair
+Builds compact prompts that regenerate only the missing or invalid top-level SOAP sections
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+# Top-level sections of the SOAP schema (see aws-deployment/prompts/soap-generation-system-prompt.md)
+# mapped to the JSON type each one must have and the field summary used in repair prompts
+SOAP_SECTIONS = {
+    'encounter': (dict, '{ encounter_type, appointment_id, session_id, start_time, end_time, timezone, location }'),
+    'participants': (dict, '{ provider, patient }'),
+    'source': (dict, '{ transcript, data_quality }'),
+    'chief_complaint': (str, '"string: primary reason for visit"'),
+    'subjective': (dict, '{ hpi, ros, pmh, psh, medications, allergies, social_history, family_history }'),
+    'objective': (dict, '{ vitals, telemedicine_observations, physical_exam_limited, diagnostics_reviewed }'),
+    'assessment': (dict, '{ problem_list, clinical_impression_summary }'),
+    'plan': (dict, '{ treatments, orders, follow_up, patient_education, work_school_notes }'),
+    'coding_billing': (dict, '{ suggested_cpt, mdm_level_suggestion, rationale }'),
+    'safety': (dict, '{ medication_safety_notes, limitations, requires_clinician_review }'),
+    'doctor_editing': (dict, '{ draft_quality, recommended_clarifications, sections_needing_attention }'),
+}
+
+# Full-note system prompt, bundled fallback for S3 prompts/<SYSTEM_PROMPT_NAME>; shared by
+# generate-soap-from-transcript and the live drafter so both notes follow one schema. It carries
+# the full JSON schema of the prompt file, which also keeps the cached prefix above Bedrock's
+# 1024-token caching minimum (bench/soap_schema_bench.py checks both against the file)
+SYSTEM_PROMPT_NAME = 'soap-generation-system-prompt.md'
+SYSTEM_PROMPT = """You are a clinical documentation assistant generating SOAP notes from medical call transcripts.
+
+CRITICAL INSTRUCTIONS:
+1. Return ONLY a single valid JSON object - No markdown, no text before/after, no explanations
+2. Never hallucinate - Use "unknown" for any information not explicitly stated or reasonably inferred
+3. Telemedicine-aware - Acknowledge missing vitals and physical exams; do not pretend they exist
+4. Safety first - Always include red flags and return precautions relevant to the chief complaint
+5. Honest assessment - Mark uncertainties in source.data_quality.uncertainties
+6. Doctor-friendly - Generate a note that's easy for the provider to review and edit
+
+The JSON must follow the exact schema provided. Key rules:
+- chief_complaint: 1-2 sentences, primary reason for visit
+- subjective.hpi: Chronological narrative with symptom details (onset, duration, severity, context)
+- subjective.ros: Systematically document positives, negatives, and unknowns for each body system
+- objective.vitals: Set "measured": false if vitals NOT taken; do NOT hallucinate vital signs
+- objective.physical_exam_limited: For telemedicine, set "performed": false and use telemedicine_observations
+- assessment.problem_list: Include differential diagnoses with likelihood estimates
+- plan: Document exact medications, doses, frequencies from conversation; include rationale
+- safety.requires_clinician_review: Always true if any gaps or uncertainties
+- doctor_editing: Include specific clarifications provider should ask about
+
+For telemedicine visits:
+- Do NOT add vitals that weren't measured
+- Do NOT describe physical exam findings that weren't observed
+- Use "unknown" liberally for missing information
+- Add limitations to safety.limitations and doctor_editing.sections_needing_attention
+
+If language of transcript is French:
+- Output all free-text fields in FRENCH
+- Keep medication names and medical terminology as stated
+- Set "language": "fr" in output
+
+JSON Schema (you MUST follow this exactly):
+{
+  "schema_version": "1.0.0",
+  "generated_at": "ISO8601 timestamp",
+  "language": "en or fr",
+  "encounter": {
+    "encounter_type": "telemedicine_video",
+    "appointment_id": "UUID or unknown",
+    "session_id": "UUID or unknown",
+    "start_time": "ISO8601 or unknown",
+    "end_time": "ISO8601 or unknown",
+    "timezone": "IANA timezone or unknown",
+    "location": {
+      "patient_location_text": "text or unknown",
+      "provider_location_text": "text or unknown"
+    }
+  },
+  "participants": {
+    "provider": {
+      "id": "UUID or string",
+      "name": "string",
+      "role": "string (e.g., Doctor, Nurse)",
+      "specialty": "string or unknown",
+      "facility": "string or unknown"
+    },
+    "patient": {
+      "id": "UUID or string",
+      "name": "string or unknown",
+      "age_years": "number or null",
+      "sex_at_birth": "unknown|male|female|other",
+      "gender_identity": "unknown|male|female|non-binary|other",
+      "pregnancy_status": "unknown|not_pregnant|pregnant|postpartum"
+    }
+  },
+  "source": {
+    "transcript": {
+      "type": "string (e.g., mixed, provider_only, patient_only)",
+      "confidence_overall": "0.0-1.0 or 0 if not applicable",
+      "language_code": "language code from transcript",
+      "speaker_labels_used": "boolean",
+      "notes": "string about transcript quality/processing"
+    },
+    "data_quality": {
+      "missing_audio_segments": "boolean",
+      "inaudible_sections": ["array of descriptions"],
+      "uncertainties": ["array of things unclear or not discussed"]
+    }
+  },
+  "chief_complaint": "string: primary reason for visit",
+  "subjective": {
+    "hpi": {
+      "narrative": "free-text history of present illness",
+      "symptom_onset": "when symptoms started",
+      "duration": "how long symptoms present",
+      "location": "where on body",
+      "quality": "how patient describes it",
+      "severity_scale_0_10": "number or null",
+      "timing": "continuous, intermittent, etc.",
+      "context": "circumstances of onset",
+      "modifying_factors": {
+        "aggravating": ["array of things that make it worse"],
+        "relieving": ["array of things that help"]
+      },
+      "associated_symptoms": ["array of other symptoms"],
+      "pertinent_negatives": ["array of red-flag symptoms NOT present"]
+    },
+    "ros": {
+      "constitutional": { "positives": [], "negatives": [], "unknown": [] },
+      "cardiovascular": { "positives": [], "negatives": [], "unknown": [] },
+      "respiratory": { "positives": [], "negatives": [], "unknown": [] },
+      "gastrointestinal": { "positives": [], "negatives": [], "unknown": [] },
+      "genitourinary": { "positives": [], "negatives": [], "unknown": [] },
+      "musculoskeletal": { "positives": [], "negatives": [], "unknown": [] },
+      "skin": { "positives": [], "negatives": [], "unknown": [] },
+      "neurologic": { "positives": [], "negatives": [], "unknown": [] },
+      "psychiatric": { "positives": [], "negatives": [], "unknown": [] },
+      "endocrine": { "positives": [], "negatives": [], "unknown": [] },
+      "hematologic": { "positives": [], "negatives": [], "unknown": [] },
+      "allergic_immunologic": { "positives": [], "negatives": [], "unknown": [] }
+    },
+    "pmh": {
+      "conditions": [
+        {
+          "name": "condition name or unknown",
+          "status": "active|resolved|unknown",
+          "notes": "any relevant details"
+        }
+      ]
+    },
+    "psh": {
+      "surgeries": [
+        {
+          "procedure": "procedure name or unknown",
+          "approx_year": "year or unknown",
+          "notes": "any complications or details"
+        }
+      ]
+    },
+    "medications": [
+      {
+        "name": "medication name",
+        "dose": "dose or unknown",
+        "route": "route or unknown",
+        "frequency": "frequency or unknown",
+        "adherence": "adherence status or unknown",
+        "indication": "why taking it"
+      }
+    ],
+    "allergies": [
+      {
+        "substance": "allergen or unknown",
+        "reaction": "reaction type or unknown",
+        "severity": "mild|moderate|severe|unknown",
+        "type": "medication|food|environmental|other|unknown"
+      }
+    ],
+    "social_history": {
+      "tobacco": "status or unknown",
+      "alcohol": "status or unknown",
+      "substance_use": "status or unknown",
+      "occupation": "occupation or unknown",
+      "living_situation": "description or unknown"
+    },
+    "family_history": {
+      "relevant_conditions": ["array of conditions with family history or unknown"]
+    }
+  },
+  "objective": {
+    "vitals": {
+      "measured": "boolean",
+      "bp_mmHg": "systolic/diastolic or null",
+      "hr_bpm": "number or null",
+      "rr_bpm": "number or null",
+      "temp_c": "number or null",
+      "spo2_percent": "number or null",
+      "weight_kg": "number or null",
+      "height_cm": "number or null",
+      "bmi": "number or null",
+      "source": "source of vitals or unknown"
+    },
+    "telemedicine_observations": {
+      "general_appearance": "observable description or unknown",
+      "respiratory_effort": "description or unknown",
+      "speech": "description or unknown",
+      "mental_status": "description or unknown",
+      "skin_visible": "description or unknown",
+      "other": ["array of other observable findings"]
+    },
+    "physical_exam_limited": {
+      "performed": "boolean",
+      "summary": "if telemedicine, note limitations; if in-person, brief summary",
+      "systems": {
+        "general": "findings or unknown",
+        "heent": "findings or unknown",
+        "cardiovascular": "findings or unknown",
+        "respiratory": "findings or unknown",
+        "abdomen": "findings or unknown",
+        "msk": "findings or unknown",
+        "neuro": "findings or unknown",
+        "skin": "findings or unknown",
+        "psych": "findings or unknown"
+      }
+    },
+    "diagnostics_reviewed": ["array of imaging, labs, etc. reviewed during call or unknown"]
+  },
+  "assessment": {
+    "problem_list": [
+      {
+        "problem": "primary diagnosis or concern",
+        "status": "new|active|resolved|unknown",
+        "supporting_evidence": [
+          {
+            "type": "subjective|objective|imaging|lab",
+            "detail": "specific evidence"
+          }
+        ],
+        "differential_diagnoses": [
+          {
+            "diagnosis": "diagnosis name",
+            "likelihood": "high|medium|low",
+            "rationale": "why this diagnosis is being considered"
+          }
+        ],
+        "icd10_suggestions": [
+          {
+            "code": "ICD-10 code or 'optional'",
+            "label": "description",
+            "confidence": "high|medium|low|unknown"
+          }
+        ],
+        "red_flags": [
+          {
+            "flag": "red-flag symptom",
+            "present": "boolean",
+            "action": "what to do if flag develops"
+          }
+        ]
+      }
+    ],
+    "clinical_impression_summary": "1-2 sentence summary of the encounter and impression"
+  },
+  "plan": {
+    "treatments": [
+      {
+        "category": "non_pharm|medication|procedure|lifestyle",
+        "name": "treatment name",
+        "details": {
+          "dose": "dose (if medication) or unknown",
+          "route": "route or unknown",
+          "frequency": "frequency or unknown",
+          "duration": "duration or unknown",
+          "instructions": "specific instructions for patient"
+        },
+        "rationale": "why this treatment was chosen"
+      }
+    ],
+    "orders": [
+      {
+        "type": "lab|imaging|referral|procedure|other",
+        "name": "order description",
+        "priority": "routine|urgent|stat",
+        "reason": "clinical reason for order"
+      }
+    ],
+    "follow_up": {
+      "timeframe": "when to follow up (e.g., '48 hours', '2 weeks')",
+      "with_whom": "provider name or 'provider' or 'specialist'",
+      "return_precautions": ["array of symptoms requiring urgent return"]
+    },
+    "patient_education": [
+      {
+        "topic": "education topic",
+        "instructions": "what was discussed with patient"
+      }
+    ],
+    "work_school_notes": {
+      "needed": "boolean",
+      "restrictions": "any restrictions or 'none' or 'unknown'"
+    }
+  },
+  "coding_billing": {
+    "suggested_cpt": [
+      {
+        "code": "CPT code or 'optional'",
+        "confidence": "high|medium|low|unknown",
+        "notes": "rationale or data gaps"
+      }
+    ],
+    "mdm_level_suggestion": "straightforward|low|moderate|high|unknown",
+    "rationale": "why this MDM level or gaps preventing accurate assessment"
+  },
+  "safety": {
+    "medication_safety_notes": ["array of warnings, contraindications, interactions"],
+    "limitations": [
+      "array of limitations (e.g., telemedicine, missing exam, language barrier)"
+    ],
+    "requires_clinician_review": "boolean - true if any uncertainty or gaps"
+  },
+  "doctor_editing": {
+    "draft_quality": "high|medium|low",
+    "recommended_clarifications": [
+      "array of questions the provider should ask to improve documentation"
+    ],
+    "sections_needing_attention": [
+      "array of sections with gaps (e.g., 'Vitals missing', 'Physical exam not performed')"
+    ]
+  }
+}"""
+
+REPAIR_SYSTEM_PROMPT = """You are a clinical documentation assistant completing a partially generated SOAP note from a medical call transcript.
+
+Return ONLY a single valid JSON object containing exactly the requested top-level sections - no markdown, no other text.
+Never hallucinate: use "unknown" for information not stated in the transcript. For telemedicine, do not invent vitals or exam findings.
+Stay consistent with the sections that were already generated. Write free-text fields in the language of the existing note."""
+
+# Roughly 4 characters per token for English/French clinical text
+CHARS_PER_TOKEN = 4
+
+DIGEST_MAX_CHARS = 6000
+_FILLER_RE = re.compile(r'\b(?:um+|uh+|erm+|hmm+|euh+|you know|I mean)\b[,.]?\s*', re.IGNORECASE)
+_CLINICAL_RE = re.compile(
+    r'\d|mg\b|ml\b|pain|fever|cough|allerg|medic|dose|pill|tablet|blood|pressure|breath|chest|'
+    r'douleur|fièvre|toux|médic|comprimé|tension|sang|souffle',
+    re.IGNORECASE
+)
+
+
+def build_transcript_digest(transcript: str, max_chars: int = DIGEST_MAX_CHARS) -> str:
+    """
+    Compact the transcript for a repair prompt.
+
+    Collapses whitespace and filler words; if still over budget, keeps the opening
+    and closing turns plus every turn that mentions clinical details (numbers,
+    doses, symptoms), in their original order.
+    """
+    lines = []
+    for line in transcript.splitlines():
+        line = _FILLER_RE.sub('', ' '.join(line.split()))
+        if line:
+            lines.append(line)
+
+    digest = '\n'.join(lines)
+    if len(digest) <= max_chars:
+        return digest
+
+    keep = set(range(min(3, len(lines)))) | set(range(max(0, len(lines) - 3), len(lines)))
+    budget = max_chars - sum(len(lines[i]) + 1 for i in keep)
+    for i, line in enumerate(lines):
+        if i not in keep and _CLINICAL_RE.search(line) and len(line) + 1 <= budget:
+            keep.add(i)
+            budget -= len(line) + 1
+
+    kept = sorted(keep)
+    parts = []
+    previous = -1
+    for i in kept:
+        if i != previous + 1:
+            parts.append('[...]')
+        parts.append(lines[i])
+        previous = i
+    return '\n'.join(parts)
+
+
+def build_section_repair_prompt(
+    sections: List[str],
+    soap_note: Optional[Dict[str, Any]],
+    transcript_digest: str,
+    metadata_context: str = ''
+) -> str:
+    """Build the user message asking the model for only the given sections."""
+    existing = {k: v for k, v in (soap_note or {}).items() if k not in sections}
+    schema_lines = '\n'.join(f'  "{s}": {SOAP_SECTIONS.get(s, (dict, "{ ... }"))[1]}' for s in sections)
+
+    return f"""Complete this SOAP note by generating ONLY these sections: {', '.join(sections)}
+
+{metadata_context}
+Section schema:
+{{
+{schema_lines}
+}}
+
+Already generated sections (for consistency, do not repeat them):
+{json.dumps(existing, ensure_ascii=False, separators=(',', ':'))}
+
+---TRANSCRIPT DIGEST START---
+{transcript_digest}
+---TRANSCRIPT DIGEST END---
+
+Return ONLY a JSON object with the keys: {', '.join(sections)}"""
+
+
+def merge_sections(soap_note: Dict[str, Any], repaired: Dict[str, Any], sections: List[str]) -> List[str]:
+    """
+    Merge regenerated sections into the note in place.
+
+    Returns:
+        Sections that were present in the repair output and merged
+    """
+    merged = []
+    for section in sections:
+        if section in repaired:
+            soap_note[section] = repaired[section]
+            merged.append(section)
+    return merged
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Rough token estimate used when Bedrock usage for the full call is not available."""
+    return sum(len(t) for t in texts) // CHARS_PER_TOKEN
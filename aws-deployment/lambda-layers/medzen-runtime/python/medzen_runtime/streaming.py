@@ -0,0 +1,301 @@
+"""
+MedZen Runtime: Streaming Transcription
+Live transcription sessions: PCM frames in, partial and final speaker segments out as the call goes
+
+A StreamingSession pulls 16 kHz mono s16le PCM frames from an async iterator (the WebSocket
+relay), sends them to a streaming transport and turns each result into the segment shape
+callback_handler produces for batch jobs:
+
+    {'speaker': 'spk_0', 'start_time': 12.3, 'end_time': 15.1, 'text': 'Any chest pain?'}
+
+Partial results are reported as they arrive and replaced by later partials with the same
+result id; final results are kept. When the audio ends (hang-up), the final segments are
+written to the transcript segment store, so the session row can be completed and SOAP
+generation started as soon as the stream drains instead of after a batch job.
+
+The AWS transport uses the amazon-transcribe SDK (event stream over HTTP/2 on awscrt). It is
+imported on first use so the layer does not require it; anything with the same async
+transcribe(frames, language_code, sample_rate) generator can stand in, e.g. for replay.
+"""
+
+import asyncio
+import inspect
+import logging
+import os
+import time
+import uuid
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from medzen_runtime.tracing import span
+from medzen_runtime.transcript_store import write_transcript
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+# Transcribe streaming accepts 50-200 ms of audio per event
+FRAME_MS = int(os.environ.get('MEDZEN_STREAMING_FRAME_MS', '100'))
+REGION = os.environ.get('MEDZEN_STREAMING_REGION', os.environ.get('AWS_REGION', 'eu-central-1'))
+
+# Streaming has no Whisper fallback: other languages go through the batch router
+STREAMING_LANGUAGES = {
+    'en': 'en-US',
+    'en-us': 'en-US',
+    'en-gb': 'en-GB',
+    'en-au': 'en-AU',
+    'fr': 'fr-FR',
+    'fr-fr': 'fr-FR',
+    'fr-ca': 'fr-CA',
+}
+
+
+def streaming_language(code: Optional[str]) -> Optional[str]:
+    """Transcribe streaming language code for a request language, or None if streaming cannot serve it."""
+    return STREAMING_LANGUAGES.get((code or '').strip().lower().replace('_', '-'))
+
+
+def frame_bytes(frame_ms: int = FRAME_MS, sample_rate: int = SAMPLE_RATE) -> int:
+    """Bytes of s16le mono PCM in one frame."""
+    return sample_rate * SAMPLE_WIDTH * frame_ms // 1000
+
+
+def result_segments(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Split one streaming result into speaker segments.
+
+    Args:
+        result: Result in the streaming API's JSON shape (ResultId, StartTime, EndTime,
+            IsPartial, Alternatives[0].Items with Content, Type, Speaker, StartTime, EndTime)
+
+    Returns:
+        Segments with speaker, start_time, end_time and text, one per speaker turn
+    """
+    alternatives = result.get('Alternatives') or []
+    if not alternatives:
+        return []
+    items = alternatives[0].get('Items') or []
+    if not items:
+        text = (alternatives[0].get('Transcript') or '').strip()
+        if not text:
+            return []
+        return [{
+            'speaker': 'Unknown',
+            'start_time': round(float(result.get('StartTime', 0)), 3),
+            'end_time': round(float(result.get('EndTime', 0)), 3),
+            'text': text,
+        }]
+
+    segments: List[Dict[str, Any]] = []
+    current: Optional[Dict[str, Any]] = None
+    for item in items:
+        content = item.get('Content', '')
+        if item.get('Type') == 'punctuation':
+            if current:
+                current['text'] += content
+            continue
+        speaker = f"spk_{item['Speaker']}" if item.get('Speaker') not in (None, '') else None
+        if current is None or (speaker and speaker != current['speaker'] and current['speaker'] != 'Unknown'):
+            current = {
+                'speaker': speaker or 'Unknown',
+                'start_time': round(float(item.get('StartTime', result.get('StartTime', 0))), 3),
+                'end_time': 0.0,
+                'text': content,
+            }
+            segments.append(current)
+        else:
+            if current['speaker'] == 'Unknown' and speaker:
+                current['speaker'] = speaker
+            current['text'] += ' ' + content
+        current['end_time'] = round(float(item.get('EndTime', result.get('EndTime', 0))), 3)
+    return segments
+
+
+class TranscriptAssembler:
+    """Keeps final segments in order and the latest partial per result id."""
+
+    def __init__(self):
+        self.final: List[Dict[str, Any]] = []
+        self.partials: Dict[str, List[Dict[str, Any]]] = {}
+
+    def add(self, result: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Fold one result in.
+
+        Returns:
+            The result's segments (empty if it carried no words)
+        """
+        segments = result_segments(result)
+        result_id = result.get('ResultId', '')
+        if result.get('IsPartial'):
+            self.partials[result_id] = segments
+        else:
+            self.partials.pop(result_id, None)
+            self.final.extend(segments)
+        return segments
+
+    def text(self) -> str:
+        return ' '.join(seg['text'] for seg in self.final if seg['text'])
+
+
+class TranscribeStreamingTransport:
+    """Amazon Transcribe streaming through the amazon-transcribe SDK (HTTP/2 event stream)."""
+
+    def __init__(self, region: str = REGION, show_speaker_label: bool = True):
+        self.region = region
+        self.show_speaker_label = show_speaker_label
+
+    async def transcribe(
+        self,
+        frames: AsyncIterator[bytes],
+        language_code: str,
+        sample_rate: int = SAMPLE_RATE,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Send frames as audio events and yield results in the streaming API's JSON shape."""
+        from amazon_transcribe.client import TranscribeStreamingClient
+        from amazon_transcribe.model import TranscriptEvent
+
+        client = TranscribeStreamingClient(region=self.region)
+        stream = await client.start_stream_transcription(
+            language_code=language_code,
+            media_sample_rate_hz=sample_rate,
+            media_encoding='pcm',
+            show_speaker_label=self.show_speaker_label,
+        )
+
+        async def send() -> None:
+            try:
+                async for frame in frames:
+                    await stream.input_stream.send_audio_event(audio_chunk=frame)
+            finally:
+                await stream.input_stream.end_stream()
+
+        sender = asyncio.ensure_future(send())
+        try:
+            async for event in stream.output_stream:
+                if isinstance(event, TranscriptEvent):
+                    for result in event.transcript.results:
+                        yield _result_dict(result)
+            await sender
+        finally:
+            sender.cancel()
+
+
+def _result_dict(result: Any) -> Dict[str, Any]:
+    """SDK Result object -> streaming API JSON shape."""
+    return {
+        'ResultId': result.result_id,
+        'StartTime': result.start_time,
+        'EndTime': result.end_time,
+        'IsPartial': result.is_partial,
+        'Alternatives': [{
+            'Transcript': alternative.transcript,
+            'Items': [{
+                'Content': item.content,
+                'Type': item.item_type,
+                'Speaker': item.speaker,
+                'StartTime': item.start_time,
+                'EndTime': item.end_time,
+            } for item in alternative.items or []],
+        } for alternative in result.alternatives or []],
+    }
+
+
+SegmentCallback = Callable[[Dict[str, Any], bool], Any]
+
+
+class StreamingSession:
+    """
+    One live call: stream audio, report segments, store the transcript at hang-up.
+
+        session = StreamingSession(appointment_id, 'en-US', TranscribeStreamingTransport(),
+                                   on_segment=relay.send_segment)
+        summary = await session.run(frames)
+
+    The transcript is stored under transcriptions/<appointment_id>/streaming/<stream_id>.
+    """
+
+    def __init__(
+        self,
+        appointment_id: str,
+        language_code: str,
+        transport: Any,
+        output_bucket: Optional[str] = None,
+        on_segment: Optional[SegmentCallback] = None,
+        sample_rate: int = SAMPLE_RATE,
+        stream_id: Optional[str] = None,
+    ):
+        self.appointment_id = appointment_id
+        # Each stream stores under its own prefix, so a reconnect or a second session never
+        # overwrites segments an earlier row still points to
+        self.stream_id = stream_id or uuid.uuid4().hex
+        self.language_code = language_code
+        self.transport = transport
+        self.output_bucket = output_bucket or os.environ.get('OUTPUT_BUCKET', 'medzen-transcriptions')
+        self.on_segment = on_segment
+        self.sample_rate = sample_rate
+        self.assembler = TranscriptAssembler()
+        self.audio_bytes = 0
+        self.partials_sent = 0
+        self.hung_up_at: Optional[float] = None
+
+    async def _count(self, frames: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        async for frame in frames:
+            self.audio_bytes += len(frame)
+            yield frame
+        self.hung_up_at = time.perf_counter()
+
+    async def _emit(self, segment: Dict[str, Any], final: bool) -> None:
+        if self.on_segment is None:
+            return
+        try:
+            outcome = self.on_segment(segment, final)
+            if inspect.isawaitable(outcome):
+                await outcome
+        except Exception as e:
+            # A relay that went away must not lose the transcript
+            logger.error(f"Segment callback failed for {self.appointment_id}: {e}")
+
+    @property
+    def audio_seconds(self) -> float:
+        return self.audio_bytes / float(self.sample_rate * SAMPLE_WIDTH)
+
+    async def run(self, frames: AsyncIterator[bytes]) -> Dict[str, Any]:
+        """
+        Stream frames until they end, then store the final segments.
+
+        Args:
+            frames: Async iterator of s16le mono PCM frames at sample_rate
+
+        Returns:
+            Dict with segments, text, transcript_store (summary of the stored manifest, None if
+            nothing was said), audio_seconds, partials and drain_seconds / store_seconds after hang-up
+        """
+        with span('transcribe', 'stream', language=self.language_code) as call:
+            async for result in self.transport.transcribe(self._count(frames), self.language_code, self.sample_rate):
+                final = not result.get('IsPartial')
+                for segment in self.assembler.add(result):
+                    if not final:
+                        self.partials_sent += 1
+                    await self._emit(segment, final)
+            call.metric('AudioSeconds', round(self.audio_seconds, 3), 'Seconds')
+            call.metric('Partials', self.partials_sent)
+            call.metric('Segments', len(self.assembler.final))
+
+        drained_at = time.perf_counter()
+        store = None
+        if self.assembler.final:
+            prefix = f"transcriptions/{self.appointment_id}/streaming/{self.stream_id}"
+            store = await asyncio.get_running_loop().run_in_executor(
+                None, write_transcript, self.output_bucket, prefix, self.assembler.final, self.audio_seconds
+            )
+        hung_up_at = self.hung_up_at or drained_at
+
+        return {
+            'segments': self.assembler.final,
+            'text': self.assembler.text(),
+            'transcript_store': store,
+            'audio_seconds': round(self.audio_seconds, 3),
+            'partials': self.partials_sent,
+            'drain_seconds': round(drained_at - hung_up_at, 3),
+            'store_seconds': round(time.perf_counter() - hung_up_at, 3),
+        }
@@ -0,0 +1,148 @@
+"""
+MedZen Runtime: Supabase REST Client
+Pooled PostgREST client shared by the SOAP workflow Lambdas
+
+Built on urllib3, which the Lambda Python runtime already ships as a botocore dependency,
+so functions no longer package `requests`. urllib3 is imported when the first request is
+sent, and the connection pool lives at module scope, keeping TLS connections to Supabase
+open across warm invocations.
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple, Union
+from urllib.parse import quote
+
+from medzen_runtime.tracing import span
+
+DEFAULT_TIMEOUT = 10.0
+
+_pool: Any = None
+_client: Optional['SupabaseClient'] = None
+
+
+class SupabaseError(Exception):
+    """Non-2xx response from the Supabase REST API."""
+
+    def __init__(self, status: int, body: str, method: str, table: str):
+        super().__init__(f"Supabase {method} {table} failed ({status}): {body[:500]}")
+        self.status = status
+        self.body = body
+
+
+def _connection_pool() -> Any:
+    global _pool
+    if _pool is None:
+        import urllib3  # Deferred: handlers that skip Supabase never pay the import
+        _pool = urllib3.PoolManager(
+            num_pools=4,
+            maxsize=4,
+            retries=urllib3.Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2)
+        )
+    return _pool
+
+
+def _filters(eq: Optional[Dict[str, Any]], query: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """PostgREST query parameters from equality matches plus raw operators (e.g. {'order': 'created_at.desc'})."""
+    params = {key: f"eq.{value}" for key, value in (eq or {}).items()}
+    params.update({key: str(value) for key, value in (query or {}).items() if value is not None})
+    return params
+
+
+class SupabaseClient:
+    """Thin PostgREST client: select / insert / update with service-role auth."""
+
+    def __init__(self, url: Optional[str] = None, key: Optional[str] = None, timeout: float = DEFAULT_TIMEOUT):
+        self.url = (url or os.environ['SUPABASE_URL']).rstrip('/')
+        key = key or os.environ['SUPABASE_SERVICE_KEY']
+        self.timeout = timeout
+        self.headers = {
+            'apikey': key,
+            'Authorization': f'Bearer {key}',
+            'Content-Type': 'application/json',
+            'Accept': 'application/json'
+        }
+
+    def request(
+        self,
+        method: str,
+        table: str,
+        params: Optional[Dict[str, str]] = None,
+        body: Any = None,
+        prefer: Optional[str] = None
+    ) -> Any:
+        """
+        Send one REST request and return the decoded JSON body (None when empty).
+
+        Raises:
+            SupabaseError: On any non-2xx status
+        """
+        url = f"{self.url}/rest/v1/{table}"
+        if params:
+            url += '?' + '&'.join(f"{quote(k, safe='')}={quote(v, safe='.,()*:')}" for k, v in params.items())
+
+        headers = dict(self.headers, Prefer=prefer) if prefer else self.headers
+        payload = json.dumps(body, default=str).encode('utf-8') if body is not None else None
+
+        with span('supabase', method, table=table) as call:
+            response = _connection_pool().request(
+                method, url, body=payload, headers=headers, timeout=self.timeout
+            )
+            call.set('HttpStatus', response.status)
+            text = response.data.decode('utf-8') if response.data else ''
+            if not 200 <= response.status < 300:
+                raise SupabaseError(response.status, text, method, table)
+            return json.loads(text) if text else None
+
+    def select(
+        self,
+        table: str,
+        eq: Optional[Dict[str, Any]] = None,
+        columns: str = '*',
+        order: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Rows matching all equality filters."""
+        return self.request('GET', table, _filters(eq, {'select': columns, 'order': order, 'limit': limit})) or []
+
+    def select_one(self, table: str, eq: Dict[str, Any], columns: str = '*', order: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """First matching row, or None."""
+        rows = self.select(table, eq, columns, order=order, limit=1)
+        return rows[0] if rows else None
+
+    def insert(self, table: str, record: Union[Dict[str, Any], List[Dict[str, Any]]], returning: bool = False) -> Any:
+        """Insert one record or a batch; returns the stored rows when returning=True."""
+        prefer = 'return=representation' if returning else 'return=minimal'
+        return self.request('POST', table, body=record, prefer=prefer)
+
+    def update(self, table: str, eq: Dict[str, Any], values: Dict[str, Any], returning: bool = False) -> Any:
+        """Patch all rows matching the equality filters."""
+        prefer = 'return=representation' if returning else 'return=minimal'
+        return self.request('PATCH', table, _filters(eq, None), body=values, prefer=prefer)
+
+
+def http_json(
+    method: str,
+    url: str,
+    payload: Any = None,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: float = DEFAULT_TIMEOUT
+) -> Tuple[int, str]:
+    """
+    JSON request to a non-Supabase endpoint (e.g. FCM) over the shared connection pool.
+
+    Returns:
+        (status, response text); the caller decides which statuses are errors
+    """
+    body = json.dumps(payload, default=str).encode('utf-8') if payload is not None else None
+    headers = dict({'Content-Type': 'application/json'}, **(headers or {}))
+    response = _connection_pool().request(method, url, body=body, headers=headers, timeout=timeout)
+    return response.status, response.data.decode('utf-8', errors='replace')
+
+
+def get_supabase() -> SupabaseClient:
+    """Shared client for the container, created on first use from SUPABASE_URL / SUPABASE_SERVICE_KEY."""
+    global _client
+    if _client is None:
+        _client = SupabaseClient()
+    return _client
@@ -0,0 +1,133 @@
+"""
+MedZen Runtime: Tracing Spans
+Context-manager spans that emit CloudWatch Embedded Metric Format (EMF) lines
+
+Each span prints one JSON line to stdout. In Lambda, CloudWatch turns it into a Latency
+metric (and an Errors count) under MEDZEN_METRICS_NAMESPACE, so p50/p95/p99 dashboards
+need no extra agent or API call. Offline the same line is just printed.
+
+    with span('bedrock', 'invoke_model', model=model_id) as s:
+        response = bedrock_client.invoke_model(...)
+        s.metric('InputTokens', usage['input'])
+
+Dimensions are published twice: per service/operation, and per service/operation with the
+span's own dimensions (model, language, table, ...), so both roll-ups are queryable.
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+NAMESPACE = os.environ.get('MEDZEN_METRICS_NAMESPACE', 'MedZen')
+METRICS_ENABLED = os.environ.get('MEDZEN_METRICS_ENABLED', 'true').lower() != 'false'
+FUNCTION_NAME = os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'local')
+
+# EMF limits per metric directive
+MAX_DIMENSIONS = 30
+MAX_METRICS = 100
+
+# Set once per container: the first invocation is the cold start
+_cold_start = True
+
+
+def _dimension_name(name: str) -> str:
+    """'model' -> 'Model', 'cold_start' -> 'ColdStart'"""
+    return ''.join(part[:1].upper() + part[1:] for part in name.split('_'))
+
+
+class Span:
+    """Timing scope for one operation; collects dimensions, extra metrics and properties."""
+
+    __slots__ = ('service', 'operation', 'dimensions', 'metrics', 'properties', 'error')
+
+    def __init__(self, service: str, operation: str, dimensions: Dict[str, Any]):
+        self.service = service
+        self.operation = operation
+        self.dimensions = {
+            _dimension_name(name): str(value) for name, value in dimensions.items() if value is not None
+        }
+        self.metrics: Dict[str, tuple] = {}
+        self.properties: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+
+    def dimension(self, name: str, value: Any) -> None:
+        """Add a dimension known only inside the span (e.g. the model a fallback switched to)."""
+        if value is not None:
+            self.dimensions[_dimension_name(name)] = str(value)
+
+    def metric(self, name: str, value: float, unit: str = 'Count') -> None:
+        """Record an extra metric (e.g. tokens, bytes) on the span's dimensions."""
+        self.metrics[name] = (value, unit)
+
+    def set(self, name: str, value: Any) -> None:
+        """Attach a searchable log property that is not a metric dimension (e.g. a job name)."""
+        self.properties[name] = value
+
+    def fail(self, reason: str) -> None:
+        """Count the span as an error without raising (e.g. a non-2xx response that is tolerated)."""
+        self.error = reason
+
+
+def emf_record(span: Span, duration_ms: float, timestamp_ms: Optional[int] = None) -> Dict[str, Any]:
+    """Build the EMF document for a finished span."""
+    base = ['Service', 'Operation']
+    extra = [name for name in span.dimensions if name not in base][:MAX_DIMENSIONS - len(base)]
+    dimension_sets = [base, base + extra] if extra else [base]
+
+    metrics = {'Latency': (round(duration_ms, 3), 'Milliseconds'), 'Errors': (1 if span.error else 0, 'Count')}
+    metrics.update(list(span.metrics.items())[:MAX_METRICS - len(metrics)])
+
+    record: Dict[str, Any] = {
+        '_aws': {
+            'Timestamp': timestamp_ms if timestamp_ms is not None else int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': NAMESPACE,
+                'Dimensions': dimension_sets,
+                'Metrics': [{'Name': name, 'Unit': unit} for name, (_, unit) in metrics.items()]
+            }]
+        },
+        'Service': span.service,
+        'Operation': span.operation,
+        'FunctionName': FUNCTION_NAME,
+    }
+    record.update(span.properties)
+    record.update({name: span.dimensions[name] for name in extra})
+    record.update({name: value for name, (value, _) in metrics.items()})
+    if span.error:
+        record['Error'] = span.error
+    return record
+
+
+@contextmanager
+def span(service: str, operation: str, **dimensions: Any) -> Iterator[Span]:
+    """
+    Time a block and emit it as an EMF line; exceptions are counted as errors and re-raised.
+
+    Args:
+        service: Downstream system, e.g. 'supabase', 'bedrock', 's3', 'transcribe', 'json'
+        operation: Call within the service, e.g. 'invoke_model', 'GET'
+        dimensions: Low-cardinality dimensions such as model, language or table (None is skipped)
+
+    Yields:
+        Span for adding metrics, properties or a tolerated failure
+    """
+    current = Span(service, operation, dimensions)
+    started = time.perf_counter()
+    try:
+        yield current
+    except Exception as e:
+        current.error = current.error or type(e).__name__
+        raise
+    finally:
+        if METRICS_ENABLED:
+            duration_ms = (time.perf_counter() - started) * 1000
+            print(json.dumps(emf_record(current, duration_ms), default=str))
+
+
+def take_cold_start() -> bool:
+    """True exactly once per container (the first invocation)."""
+    global _cold_start
+    cold, _cold_start = _cold_start, False
+    return cold
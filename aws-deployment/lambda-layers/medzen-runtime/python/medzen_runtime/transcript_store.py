@@ -0,0 +1,241 @@
+"""
+MedZen Runtime: Transcript Segment Store
+Persists transcript segments to S3 as gzip NDJSON chunks with a manifest, read back by time range or speaker
+
+A transcript is split into fixed time windows (CHUNK_SECONDS). Each window is one object
+holding one compact JSON segment per line, gzip-compressed. A small manifest lists the
+chunks with their time bounds, speakers and sizes. The session row keeps the manifest URI
+and summary() instead of the segments, so reading a session no longer drags them along.
+
+S3 layout (under the prefix passed to write_transcript):
+    manifest.json                   chunk index, duration, speakers
+    segments-0000.ndjson.gz         segments starting in [0, CHUNK_SECONDS)
+    segments-0001.ndjson.gz         segments starting in [CHUNK_SECONDS, 2 * CHUNK_SECONDS)
+
+read_segments() consults the manifest and fetches only the chunks that overlap the requested
+window (and contain a requested speaker), in parallel, and decompresses each as a stream.
+"""
+
+import gzip
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+from urllib.parse import urlparse
+
+from medzen_runtime.clients import get_client
+from medzen_runtime.tracing import span
+
+CHUNK_SECONDS = float(os.environ.get('MEDZEN_TRANSCRIPT_CHUNK_SECONDS', '300'))
+MANIFEST_VERSION = 1
+SEGMENT_FORMAT = 'ndjson+gzip'
+# Concurrent chunk PUTs/GETs per write or read (a 1h call at 300s windows is 12 chunks)
+FETCH_WORKERS = int(os.environ.get('MEDZEN_TRANSCRIPT_FETCH_WORKERS', '8'))
+
+# Per-segment fields kept besides timing, text and speaker (Whisper token ids are dropped)
+SCORE_FIELDS = ('avg_logprob', 'no_speech_prob', 'compression_ratio', 'confidence')
+
+
+def compact_segment(segment: Dict[str, Any], index: int) -> Dict[str, Any]:
+    """
+    Normalize a Whisper or Transcribe segment to the stored shape.
+
+    Args:
+        segment: Whisper segment (start/end/text/tokens...) or speaker segment (start_time/end_time/speaker)
+        index: Position of the segment in the transcript
+
+    Returns:
+        Dict with i, start, end, text and, when present, speaker and score fields
+    """
+    start = segment.get('start', segment.get('start_time', 0))
+    end = segment.get('end', segment.get('end_time', start))
+    compact = {
+        'i': index,
+        'start': round(float(start or 0), 3),
+        'end': round(float(end or 0), 3),
+        'text': (segment.get('text') or '').strip(),
+    }
+    if segment.get('speaker'):
+        compact['speaker'] = segment['speaker']
+    for field in SCORE_FIELDS:
+        if segment.get(field) is not None:
+            compact[field] = segment[field]
+    return compact
+
+
+def _split_uri(uri: str) -> tuple:
+    parsed = urlparse(uri)
+    return parsed.netloc, parsed.path.lstrip('/')
+
+
+def _put(bucket: str, key: str, body: bytes, content_type: str, encoding: Optional[str] = None) -> None:
+    extra = {'ContentEncoding': encoding} if encoding else {}
+    with span('s3', 'put_object') as upload:
+        get_client('s3').put_object(Bucket=bucket, Key=key, Body=body, ContentType=content_type, **extra)
+        upload.metric('Bytes', len(body), 'Bytes')
+
+
+def _encode_chunk(segments: List[Dict[str, Any]]) -> bytes:
+    raw = ''.join(json.dumps(seg, ensure_ascii=False, separators=(',', ':')) + '\n' for seg in segments)
+    # mtime=0 keeps the bytes identical for identical input
+    return gzip.compress(raw.encode('utf-8'), compresslevel=6, mtime=0)
+
+
+def write_transcript(
+    bucket: str,
+    prefix: str,
+    segments: Iterable[Dict[str, Any]],
+    duration: Optional[float] = None,
+    chunk_seconds: float = CHUNK_SECONDS,
+) -> Dict[str, Any]:
+    """
+    Write segments as time-window chunks plus a manifest.
+
+    Args:
+        bucket: Output bucket
+        prefix: Key prefix for this transcript, e.g. 'transcriptions/<appointment_id>/whisper'
+        segments: Whisper or Transcribe segments, in time order
+        duration: Audio duration in seconds (defaults to the last segment end)
+        chunk_seconds: Width of each chunk's time window
+
+    Returns:
+        summary() of the written manifest, including manifest_uri
+    """
+    prefix = prefix.rstrip('/')
+    compacted = [compact_segment(seg, i) for i, seg in enumerate(segments)]
+
+    windows: Dict[int, List[Dict[str, Any]]] = {}
+    for seg in compacted:
+        windows.setdefault(int(seg['start'] // chunk_seconds), []).append(seg)
+
+    chunks = []
+    bodies = {}
+    for n, window in enumerate(sorted(windows)):
+        chunk_segments = windows[window]
+        key = f"{prefix}/segments-{n:04d}.ndjson.gz"
+        bodies[key] = _encode_chunk(chunk_segments)
+        chunks.append({
+            'key': key,
+            'start': chunk_segments[0]['start'],
+            'end': max(seg['end'] for seg in chunk_segments),
+            'segments': len(chunk_segments),
+            'speakers': sorted({seg['speaker'] for seg in chunk_segments if 'speaker' in seg}),
+            'bytes': len(bodies[key]),
+        })
+
+    if bodies:
+        with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(bodies))) as pool:
+            list(pool.map(lambda key: _put(bucket, key, bodies[key], 'application/x-ndjson', 'gzip'), bodies))
+    stored_bytes = sum(len(body) for body in bodies.values())
+
+    last_end = max((seg['end'] for seg in compacted), default=0)
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'format': SEGMENT_FORMAT,
+        'bucket': bucket,
+        'duration': round(float(duration), 3) if duration else last_end,
+        'segment_count': len(compacted),
+        'speakers': sorted({speaker for chunk in chunks for speaker in chunk['speakers']}),
+        'chunk_seconds': chunk_seconds,
+        'stored_bytes': stored_bytes,
+        'chunks': chunks,
+    }
+    manifest_key = f"{prefix}/manifest.json"
+    _put(bucket, manifest_key, json.dumps(manifest, ensure_ascii=False).encode('utf-8'), 'application/json')
+    manifest['manifest_uri'] = f"s3://{bucket}/{manifest_key}"
+    return summary(manifest)
+
+
+def summary(manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact manifest summary for the session row (no chunk list, no segment text)."""
+    return {
+        'manifest_uri': manifest.get('manifest_uri'),
+        'format': manifest.get('format'),
+        'duration': manifest.get('duration'),
+        'segment_count': manifest.get('segment_count'),
+        'speakers': manifest.get('speakers', []),
+        'chunks': len(manifest.get('chunks', [])),
+        'stored_bytes': manifest.get('stored_bytes'),
+    }
+
+
+def load_manifest(uri: str) -> Dict[str, Any]:
+    """
+    Fetch a transcript manifest.
+
+    Args:
+        uri: s3:// URI of manifest.json (as stored in transcript_manifest_uri)
+
+    Returns:
+        Manifest dict with manifest_uri set
+    """
+    bucket, key = _split_uri(uri)
+    with span('s3', 'get_object') as download:
+        body = get_client('s3').get_object(Bucket=bucket, Key=key)['Body'].read()
+        download.metric('Bytes', len(body), 'Bytes')
+    manifest = json.loads(body)
+    manifest['manifest_uri'] = uri
+    return manifest
+
+
+def _wanted(chunk: Dict[str, Any], start: Optional[float], end: Optional[float], speakers: Optional[set]) -> bool:
+    if start is not None and chunk['end'] < start:
+        return False
+    if end is not None and chunk['start'] > end:
+        return False
+    if speakers is not None and chunk['speakers'] and not speakers.intersection(chunk['speakers']):
+        return False
+    return True
+
+
+def read_segments(
+    source: Union[str, Dict[str, Any]],
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    speakers: Optional[Iterable[str]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield stored segments overlapping [start, end], optionally limited to some speakers.
+
+    Args:
+        source: Manifest URI or an already loaded manifest
+        start: Window start in seconds (None = from the beginning)
+        end: Window end in seconds (None = to the end)
+        speakers: Speaker labels to keep, e.g. {'spk_0'} (None = all)
+
+    Yields:
+        Segments in time order, as written by compact_segment()
+    """
+    manifest = load_manifest(source) if isinstance(source, str) else source
+    speaker_set = set(speakers) if speakers is not None else None
+    bucket = manifest['bucket']
+
+    keys = [chunk['key'] for chunk in manifest['chunks'] if _wanted(chunk, start, end, speaker_set)]
+    if not keys:
+        return
+
+    def fetch(key: str) -> bytes:
+        with span('s3', 'get_object') as download:
+            body = get_client('s3').get_object(Bucket=bucket, Key=key)['Body'].read()
+            download.metric('Bytes', len(body), 'Bytes')
+        return body
+
+    with ThreadPoolExecutor(max_workers=max(1, min(FETCH_WORKERS, len(keys)))) as pool:
+        # map() yields bodies in chunk order while later chunks are still downloading
+        for body in pool.map(fetch, keys):
+            with gzip.GzipFile(fileobj=io.BytesIO(body)) as lines:
+                for line in lines:
+                    seg = json.loads(line)
+                    if start is not None and seg['end'] < start:
+                        continue
+                    if end is not None and seg['start'] > end:
+                        break
+                    if speaker_set is not None and seg.get('speaker') not in speaker_set:
+                        continue
+                    yield seg
+
+
+def read_text(source: Union[str, Dict[str, Any]], **window: Any) -> str:
+    """Join the text of read_segments(source, **window) into one string."""
+    return ' '.join(seg['text'] for seg in read_segments(source, **window) if seg['text'])
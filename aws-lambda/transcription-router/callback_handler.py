@@ -10,27 +10,32 @@ Version: 1.0.0
 
 import json
 import os
-import boto3
 import logging
-import requests
 from datetime import datetime
 from typing import Dict, Any, Optional
 
+from medzen_runtime.audio import load_timeline, remap_segments
+from medzen_runtime.clients import LazyClient
+from medzen_runtime.idempotency import fail_job
+from medzen_runtime.json_extract import extract_json
+from medzen_runtime.supabase import SupabaseClient, SupabaseError, http_json
+from medzen_runtime.tracing import span
+from medzen_runtime.transcript_store import write_transcript
+
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize AWS clients
-s3_client = boto3.client('s3')
-transcribe_client = boto3.client('transcribe')
-transcribe_medical_client = boto3.client('transcribe')
-comprehend_medical = boto3.client('comprehendmedical')
-bedrock_runtime = boto3.client('bedrock-runtime', region_name=os.environ.get('AWS_REGION', 'eu-central-1'))
+# Initialize AWS clients (built on first use, shared with index)
+s3_client = LazyClient('s3')
+transcribe_client = LazyClient('transcribe')
+bedrock_runtime = LazyClient('bedrock-runtime', os.environ.get('AWS_REGION', 'eu-central-1'))
 
 # Environment variables
 SUPABASE_URL = os.environ.get('SUPABASE_URL')
 SUPABASE_SERVICE_KEY = os.environ.get('SUPABASE_SERVICE_KEY')
 OUTPUT_BUCKET = os.environ.get('OUTPUT_BUCKET', 'medzen-transcriptions')
+ENTITY_MODEL_ID = 'anthropic.claude-3-5-sonnet-20241022-v2:0'
 
 
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
@@ -88,7 +93,7 @@ def process_medical_transcription(job_name: str) -> None:
     logger.info(f"Processing medical transcription job: {job_name}")
 
     # Get job details
-    response = transcribe_medical_client.get_medical_transcription_job(
+    response = transcribe_client.get_medical_transcription_job(
         MedicalTranscriptionJobName=job_name
     )
 
@@ -108,8 +113,8 @@ def process_medical_transcription(job_name: str) -> None:
     transcripts = results.get('transcripts', [])
     full_text = ' '.join([t.get('transcript', '') for t in transcripts])
 
-    # Get speaker-labeled segments
-    segments = extract_speaker_segments(results)
+    # Get speaker-labeled segments (in recording time if the audio was trimmed)
+    segments = to_recording_time(extract_speaker_segments(results), job)
 
     # Medical entities are already extracted by AWS Transcribe Medical
     entities = results.get('entities', [])
@@ -155,8 +160,8 @@ def process_standard_transcription(job_name: str) -> None:
     transcripts = results.get('transcripts', [])
     full_text = ' '.join([t.get('transcript', '') for t in transcripts])
 
-    # Get speaker-labeled segments
-    segments = extract_speaker_segments(results)
+    # Get speaker-labeled segments (in recording time if the audio was trimmed)
+    segments = to_recording_time(extract_speaker_segments(results), job)
 
     # For non-English (French), extract entities using Bedrock
     entities = extract_entities_with_bedrock(full_text, language_code)
@@ -193,12 +198,18 @@ def download_transcript(uri: str) -> Optional[Dict]:
             bucket = parsed.netloc
             key = parsed.path.lstrip('/')
 
-            response = s3_client.get_object(Bucket=bucket, Key=key)
-            return json.loads(response['Body'].read())
+            with span('s3', 'get_object') as download:
+                body = s3_client.get_object(Bucket=bucket, Key=key)['Body'].read()
+                download.metric('Bytes', len(body), 'Bytes')
+            return json.loads(body)
 
         elif uri.startswith('https://'):
-            response = requests.get(uri)
-            return response.json()
+            with span('s3', 'get_presigned') as download:
+                status, text = http_json('GET', uri, timeout=30)
+                download.metric('Bytes', len(text.encode('utf-8')), 'Bytes')
+                if status != 200:
+                    download.fail(f"HTTP {status}")
+            return json.loads(text)
 
     except Exception as e:
         logger.error(f"Failed to download transcript: {e}")
@@ -234,6 +245,19 @@ def extract_speaker_segments(results: Dict) -> list:
     return segments
 
 
+def to_recording_time(segments: list, job: Dict[str, Any]) -> list:
+    """Map segment times back to the original recording when the router transcribed trimmed audio."""
+    # Only preprocessed jobs have a timeline, written next to the derivative they transcribed:
+    # s3://{OUTPUT_BUCKET}/preprocessed/{appointment_id}/{suffix}/audio.<format>
+    media_uri = job.get('Media', {}).get('MediaFileUri', '')
+    bucket_prefix = f"s3://{OUTPUT_BUCKET}/"
+    if not media_uri.startswith(bucket_prefix + 'preprocessed/'):
+        return segments
+    media_key = media_uri[len(bucket_prefix):]
+    timeline = load_timeline(OUTPUT_BUCKET, f"{media_key.rpartition('/')[0]}/timeline.json")
+    return remap_segments(segments, timeline) if timeline else segments
+
+
 def format_medical_entities(entities: list) -> list:
     """Format AWS Transcribe Medical entities for storage."""
     formatted = []
@@ -294,30 +318,42 @@ Return a JSON array with this format for each entity found:
 Only return valid JSON, no other text."""
 
     try:
-        response = bedrock_runtime.invoke_model(
-            modelId='anthropic.claude-3-5-sonnet-20241022-v2:0',
-            body=json.dumps({
-                'anthropic_version': 'bedrock-2023-05-31',
-                'max_tokens': 4096,
-                'messages': [
-                    {
-                        'role': 'user',
-                        'content': prompt
-                    }
-                ]
-            })
-        )
+        with span('bedrock', 'invoke_model', model=ENTITY_MODEL_ID, language=language_code) as call:
+            response = bedrock_runtime.invoke_model(
+                modelId=ENTITY_MODEL_ID,
+                body=json.dumps({
+                    'anthropic_version': 'bedrock-2023-05-31',
+                    'max_tokens': 4096,
+                    'messages': [
+                        {
+                            'role': 'user',
+                            'content': prompt
+                        }
+                    ]
+                })
+            )
+            response_body = json.loads(response['body'].read())
+            usage = response_body.get('usage', {})
+            call.metric('InputTokens', usage.get('input_tokens', 0))
+            call.metric('OutputTokens', usage.get('output_tokens', 0))
 
-        response_body = json.loads(response['body'].read())
         content = response_body.get('content', [{}])[0].get('text', '[]')
 
-        # Parse JSON response
-        entities = json.loads(content)
+        # Parse JSON response (keeps the complete entities if the array was cut off)
+        with span('json', 'parse_entities', language=language_code) as parse:
+            extraction = extract_json(content, expect='array')
+            parse.metric('Repairs', len(extraction['repairs']))
+            if extraction['error']:
+                parse.fail(extraction['error'])
+        if extraction['error']:
+            logger.error(f"Failed to parse entity extraction response: {extraction['error']}")
+            return []
+        if extraction['repairs']:
+            logger.warning(f"Repaired entity extraction response: {', '.join(extraction['repairs'])}")
+
+        entities = extraction['data']
         return entities if isinstance(entities, list) else []
 
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse entity extraction response: {e}")
-        return []
     except Exception as e:
         logger.error(f"Entity extraction error: {e}")
         return []
@@ -334,7 +370,7 @@ def handle_failed_job(job_name: str, is_medical: bool) -> None:
     try:
         # Get failure reason
         if is_medical:
-            response = transcribe_medical_client.get_medical_transcription_job(
+            response = transcribe_client.get_medical_transcription_job(
                 MedicalTranscriptionJobName=job_name
             )
             failure_reason = response['MedicalTranscriptionJob'].get('FailureReason', 'Unknown')
@@ -344,6 +380,9 @@ def handle_failed_job(job_name: str, is_medical: bool) -> None:
             )
             failure_reason = response['TranscriptionJob'].get('FailureReason', 'Unknown')
 
+        # Let the next request for this recording start a new job
+        fail_job(job_name, failure_reason)
+
         # Update Supabase with failure status
         update_transcription_status(
             appointment_id=appointment_id,
@@ -370,11 +409,15 @@ def store_completed_transcription(
         return
 
     try:
+        # Speaker segments go to S3 as compressed chunks; the row keeps the manifest summary
+        store = write_transcript(OUTPUT_BUCKET, f"transcriptions/{appointment_id}/{job_name}", segments)
+
         data = {
             'transcription_status': 'COMPLETED',
             'transcription_completed_at': datetime.utcnow().isoformat(),
             'raw_transcript': transcript_text,
-            'transcript_segments': json.dumps(segments, ensure_ascii=False),
+            'transcript_manifest_uri': store['manifest_uri'],
+            'transcript_summary': store,
             'medical_entities': json.dumps(entities, ensure_ascii=False),
             'transcription_language': language,
             'transcription_service': service,
@@ -382,21 +425,13 @@ def store_completed_transcription(
         }
 
         # Find session by job name pattern (appointment_id is in the job name)
-        response = requests.patch(
-            f"{SUPABASE_URL}/rest/v1/video_call_sessions?transcription_job_name=eq.{job_name}",
-            headers={
-                'apikey': SUPABASE_SERVICE_KEY,
-                'Authorization': f'Bearer {SUPABASE_SERVICE_KEY}',
-                'Content-Type': 'application/json',
-                'Prefer': 'return=minimal'
-            },
-            json=data
+        SupabaseClient(SUPABASE_URL, SUPABASE_SERVICE_KEY).update(
+            'video_call_sessions', {'transcription_job_name': job_name}, data
         )
+        logger.info(f"Transcription stored for job {job_name}")
 
-        if response.status_code not in [200, 201, 204]:
-            logger.error(f"Supabase update failed: {response.status_code} - {response.text}")
-        else:
-            logger.info(f"Transcription stored for job {job_name}")
+    except SupabaseError as e:
+        logger.error(f"Supabase update failed: {e.status} - {e.body}")
 
     except Exception as e:
         logger.error(f"Failed to store transcription: {e}")
@@ -420,15 +455,8 @@ def update_transcription_status(
         if error_message:
             data['transcription_error'] = error_message
 
-        requests.patch(
-            f"{SUPABASE_URL}/rest/v1/video_call_sessions?appointment_id=eq.{appointment_id}",
-            headers={
-                'apikey': SUPABASE_SERVICE_KEY,
-                'Authorization': f'Bearer {SUPABASE_SERVICE_KEY}',
-                'Content-Type': 'application/json',
-                'Prefer': 'return=minimal'
-            },
-            json=data
+        SupabaseClient(SUPABASE_URL, SUPABASE_SERVICE_KEY).update(
+            'video_call_sessions', {'appointment_id': appointment_id}, data
         )
 
     except Exception as e:
@@ -12,28 +12,35 @@ Version: 1.0.0
 
 import json
 import os
-import boto3
 import logging
 import uuid
 from datetime import datetime
 from typing import Dict, Any, Optional, Tuple
 from urllib.parse import urlparse
 
+from medzen_runtime.audio import original_time, preprocess_recording, remap_segments
+from medzen_runtime.clients import LazyClient
+from medzen_runtime.idempotency import claim, complete, fail, idempotency_key, job_suffix
+from medzen_runtime.json_extract import extract_json
+from medzen_runtime.supabase import SupabaseClient, SupabaseError
+from medzen_runtime.tracing import span
+from medzen_runtime.transcript_store import write_transcript
+
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize AWS clients
-s3_client = boto3.client('s3')
-transcribe_client = boto3.client('transcribe')
-transcribe_medical_client = boto3.client('transcribe')
-bedrock_runtime = boto3.client('bedrock-runtime', region_name=os.environ.get('AWS_REGION', 'eu-central-1'))
+# Initialize AWS clients (built on first use, shared with callback_handler)
+s3_client = LazyClient('s3')
+transcribe_client = LazyClient('transcribe')
+bedrock_runtime = LazyClient('bedrock-runtime', os.environ.get('AWS_REGION', 'eu-central-1'))
 
 # Environment variables
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 OUTPUT_BUCKET = os.environ.get('OUTPUT_BUCKET', 'medzen-transcriptions')
 SUPABASE_URL = os.environ.get('SUPABASE_URL')
 SUPABASE_SERVICE_KEY = os.environ.get('SUPABASE_SERVICE_KEY')
+ENTITY_MODEL_ID = 'anthropic.claude-3-5-sonnet-20241022-v2:0'
 
 # Language configurations
 AWS_TRANSCRIBE_MEDICAL_LANGUAGES = {
@@ -136,43 +143,83 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         # Normalize language code
         language_code = normalize_language_code(language_code)
 
-        # Route to appropriate transcription service
-        if language_code in AWS_TRANSCRIBE_MEDICAL_LANGUAGES:
-            result = transcribe_with_aws_medical(
-                s3_uri=s3_uri,
-                language_code=AWS_TRANSCRIBE_MEDICAL_LANGUAGES[language_code],
-                appointment_id=appointment_id,
-                medical_specialty=medical_specialty
-            )
-            service_used = 'aws_transcribe_medical'
-
-        elif language_code in AWS_TRANSCRIBE_STANDARD_LANGUAGES:
-            result = transcribe_with_aws_standard(
-                s3_uri=s3_uri,
-                language_code=AWS_TRANSCRIBE_STANDARD_LANGUAGES[language_code],
-                appointment_id=appointment_id
-            )
-            # Extract entities using Bedrock for non-English
-            result = add_entity_extraction_bedrock(result, language_code)
-            service_used = 'aws_transcribe_standard'
-
-        elif language_code in WHISPER_LANGUAGES or is_fulfulde_variant(language_code):
-            result = transcribe_with_whisper(
-                s3_uri=s3_uri,
-                language_code=language_code,
-                appointment_id=appointment_id
-            )
-            service_used = 'openai_whisper'
-
-        else:
-            # Default to Whisper for unknown languages (best multilingual support)
-            logger.warning(f"Unknown language code: {language_code}, defaulting to Whisper")
-            result = transcribe_with_whisper(
-                s3_uri=s3_uri,
-                language_code=language_code,
-                appointment_id=appointment_id
+        # One job per (appointment, recording version, language): client retries and double
+        # taps get the first request's job back instead of starting another billed job
+        request_key = idempotency_key(appointment_id, s3_uri, get_object_etag(s3_uri), language_code)
+        owned, claimed = claim(request_key)
+        if not owned:
+            logger.info(f"Duplicate transcription request for appointment {appointment_id} ({claimed.get('status')})")
+            return duplicate_response(claimed, language_code, appointment_id)
+        suffix = job_suffix(request_key, claimed['attempt'])
+
+        try:
+            # Optional: transcribe a trimmed mono 16 kHz derivative instead of the raw recording
+            prepared = preprocess_recording(
+                s3_uri,
+                OUTPUT_BUCKET,
+                f"preprocessed/{appointment_id}/{suffix}",
+                audio_format='ogg' if uses_whisper(language_code) else 'flac'
             )
-            service_used = 'openai_whisper'
+            media_uri = prepared['s3_uri'] if prepared else s3_uri
+
+            # Route to appropriate transcription service
+            if language_code in AWS_TRANSCRIBE_MEDICAL_LANGUAGES:
+                result = transcribe_with_aws_medical(
+                    s3_uri=media_uri,
+                    language_code=AWS_TRANSCRIBE_MEDICAL_LANGUAGES[language_code],
+                    appointment_id=appointment_id,
+                    medical_specialty=medical_specialty,
+                    job_suffix=suffix
+                )
+                service_used = 'aws_transcribe_medical'
+
+            elif language_code in AWS_TRANSCRIBE_STANDARD_LANGUAGES:
+                result = transcribe_with_aws_standard(
+                    s3_uri=media_uri,
+                    language_code=AWS_TRANSCRIBE_STANDARD_LANGUAGES[language_code],
+                    appointment_id=appointment_id,
+                    job_suffix=suffix
+                )
+                # Extract entities using Bedrock for non-English
+                result = add_entity_extraction_bedrock(result, language_code)
+                service_used = 'aws_transcribe_standard'
+
+            elif language_code in WHISPER_LANGUAGES or is_fulfulde_variant(language_code):
+                result = transcribe_with_whisper(
+                    s3_uri=media_uri,
+                    language_code=language_code,
+                    appointment_id=appointment_id,
+                    job_suffix=suffix,
+                    timeline=prepared['kept'] if prepared else None
+                )
+                service_used = 'openai_whisper'
+
+            else:
+                # Default to Whisper for unknown languages (best multilingual support)
+                logger.warning(f"Unknown language code: {language_code}, defaulting to Whisper")
+                result = transcribe_with_whisper(
+                    s3_uri=media_uri,
+                    language_code=language_code,
+                    appointment_id=appointment_id,
+                    job_suffix=suffix,
+                    timeline=prepared['kept'] if prepared else None
+                )
+                service_used = 'openai_whisper'
+
+        except Exception as e:
+            # Release the key so a retry can start a new job
+            fail(request_key, str(e))
+            raise
+
+        if prepared:
+            result['preprocessing'] = {k: v for k, v in prepared.items() if k != 'kept'}
+
+        # Duplicates get the job without the transcript text (it is in the session row and segment store)
+        complete(
+            request_key,
+            {**{k: v for k, v in result.items() if k != 'transcript'}, 'service_used': service_used},
+            job_name=result.get('job_name')
+        )
 
         # Store result in Supabase
         store_transcription_result(
@@ -229,6 +276,11 @@ def normalize_language_code(code: str) -> str:
     return variations.get(code, code)
 
 
+def uses_whisper(code: str) -> bool:
+    """True if a normalized language code is routed to Whisper rather than AWS Transcribe."""
+    return code not in AWS_TRANSCRIBE_MEDICAL_LANGUAGES and code not in AWS_TRANSCRIBE_STANDARD_LANGUAGES
+
+
 def is_fulfulde_variant(code: str) -> bool:
     """Check if language code is a Fulfulde variant."""
     fulfulde_codes = ['ff', 'fub', 'fuc', 'fue', 'fuf', 'fuh', 'fuq', 'fuv', 'ful']
@@ -249,13 +301,14 @@ def transcribe_with_aws_medical(
     s3_uri: str,
     language_code: str,
     appointment_id: str,
-    medical_specialty: str = 'PRIMARYCARE'
+    medical_specialty: str = 'PRIMARYCARE',
+    job_suffix: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Transcribe using AWS Transcribe Medical.
     Includes medical entity extraction.
     """
-    job_name = f"medzen-medical-{appointment_id}-{uuid.uuid4().hex[:8]}"
+    job_name = f"medzen-medical-{appointment_id}-{job_suffix or uuid.uuid4().hex[:8]}"
 
     # Parse S3 URI
     parsed = urlparse(s3_uri)
@@ -266,22 +319,30 @@ def transcribe_with_aws_medical(
     media_format = get_media_format(key)
 
     # Start medical transcription job
-    response = transcribe_medical_client.start_medical_transcription_job(
-        MedicalTranscriptionJobName=job_name,
-        LanguageCode=language_code,
-        MediaFormat=media_format,
-        Media={'MediaFileUri': s3_uri},
-        OutputBucketName=OUTPUT_BUCKET,
-        OutputKey=f"transcriptions/{appointment_id}/",
-        Specialty=medical_specialty,
-        Type='CONVERSATION',
-        ContentIdentificationType='PHI',  # Enable PHI identification
-        Settings={
-            'ShowSpeakerLabels': True,
-            'MaxSpeakerLabels': 2,  # Provider and patient
-            'VocabularyName': os.environ.get('MEDICAL_VOCABULARY', None)
-        }
-    )
+    with span('transcribe', 'start_medical_transcription_job', language=language_code, specialty=medical_specialty) as start:
+        start.set('JobName', job_name)
+        try:
+            response = transcribe_client.start_medical_transcription_job(
+                MedicalTranscriptionJobName=job_name,
+                LanguageCode=language_code,
+                MediaFormat=media_format,
+                Media={'MediaFileUri': s3_uri},
+                OutputBucketName=OUTPUT_BUCKET,
+                OutputKey=f"transcriptions/{appointment_id}/",
+                Specialty=medical_specialty,
+                Type='CONVERSATION',
+                ContentIdentificationType='PHI',  # Enable PHI identification
+                Settings={
+                    'ShowSpeakerLabels': True,
+                    'MaxSpeakerLabels': 2,  # Provider and patient
+                    'VocabularyName': os.environ.get('MEDICAL_VOCABULARY', None)
+                }
+            )
+        except Exception as e:
+            if not is_job_conflict(e):
+                raise
+            start.metric('DuplicatesAvoided', 1)
+            logger.info(f"Transcription job {job_name} already started by a duplicate request")
 
     # Wait for job completion (for Lambda, we'd typically use Step Functions)
     # For now, return job info for async processing
@@ -298,13 +359,14 @@ def transcribe_with_aws_medical(
 def transcribe_with_aws_standard(
     s3_uri: str,
     language_code: str,
-    appointment_id: str
+    appointment_id: str,
+    job_suffix: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Transcribe using AWS Transcribe Standard.
     Used for French and other non-English supported languages.
     """
-    job_name = f"medzen-standard-{appointment_id}-{uuid.uuid4().hex[:8]}"
+    job_name = f"medzen-standard-{appointment_id}-{job_suffix or uuid.uuid4().hex[:8]}"
 
     # Parse S3 URI
     parsed = urlparse(s3_uri)
@@ -315,24 +377,32 @@ def transcribe_with_aws_standard(
     media_format = get_media_format(key)
 
     # Start standard transcription job
-    response = transcribe_client.start_transcription_job(
-        TranscriptionJobName=job_name,
-        LanguageCode=language_code,
-        MediaFormat=media_format,
-        Media={'MediaFileUri': s3_uri},
-        OutputBucketName=OUTPUT_BUCKET,
-        OutputKey=f"transcriptions/{appointment_id}/",
-        Settings={
-            'ShowSpeakerLabels': True,
-            'MaxSpeakerLabels': 2,
-            'VocabularyName': os.environ.get('FRENCH_VOCABULARY', None)
-        },
-        ContentRedaction={
-            'RedactionType': 'PII',
-            'RedactionOutput': 'redacted_and_unredacted',
-            'PiiEntityTypes': ['NAME', 'ADDRESS', 'EMAIL', 'PHONE', 'SSN', 'CREDIT_DEBIT_NUMBER']
-        }
-    )
+    with span('transcribe', 'start_transcription_job', language=language_code) as start:
+        start.set('JobName', job_name)
+        try:
+            response = transcribe_client.start_transcription_job(
+                TranscriptionJobName=job_name,
+                LanguageCode=language_code,
+                MediaFormat=media_format,
+                Media={'MediaFileUri': s3_uri},
+                OutputBucketName=OUTPUT_BUCKET,
+                OutputKey=f"transcriptions/{appointment_id}/",
+                Settings={
+                    'ShowSpeakerLabels': True,
+                    'MaxSpeakerLabels': 2,
+                    'VocabularyName': os.environ.get('FRENCH_VOCABULARY', None)
+                },
+                ContentRedaction={
+                    'RedactionType': 'PII',
+                    'RedactionOutput': 'redacted_and_unredacted',
+                    'PiiEntityTypes': ['NAME', 'ADDRESS', 'EMAIL', 'PHONE', 'SSN', 'CREDIT_DEBIT_NUMBER']
+                }
+            )
+        except Exception as e:
+            if not is_job_conflict(e):
+                raise
+            start.metric('DuplicatesAvoided', 1)
+            logger.info(f"Transcription job {job_name} already started by a duplicate request")
 
     return {
         'job_name': job_name,
@@ -347,11 +417,14 @@ def transcribe_with_aws_standard(
 def transcribe_with_whisper(
     s3_uri: str,
     language_code: str,
-    appointment_id: str
+    appointment_id: str,
+    job_suffix: Optional[str] = None,
+    timeline: Optional[list] = None
 ) -> Dict[str, Any]:
     """
     Transcribe using OpenAI Whisper API.
     Used for Fulfulde, Pidgin English, and Central African languages.
+    A timeline (kept ranges of trimmed audio) maps segment times back to the recording.
     """
     import requests
     import tempfile
@@ -366,12 +439,14 @@ def transcribe_with_whisper(
 
     # Download audio file from S3
     with tempfile.NamedTemporaryFile(suffix=get_file_extension(key), delete=False) as tmp_file:
-        s3_client.download_file(bucket, key, tmp_file.name)
+        with span('s3', 'download_file') as download:
+            s3_client.download_file(bucket, key, tmp_file.name)
+            download.metric('Bytes', os.path.getsize(tmp_file.name), 'Bytes')
         tmp_path = tmp_file.name
 
     try:
         # Call OpenAI Whisper API
-        with open(tmp_path, 'rb') as audio_file:
+        with open(tmp_path, 'rb') as audio_file, span('whisper', 'transcribe', language=language_code) as call:
             response = requests.post(
                 'https://api.openai.com/v1/audio/transcriptions',
                 headers={
@@ -387,6 +462,8 @@ def transcribe_with_whisper(
                     'timestamp_granularities[]': 'segment'
                 }
             )
+            if response.status_code != 200:
+                call.fail(f"HTTP {response.status_code}")
 
         if response.status_code != 200:
             raise Exception(f"Whisper API error: {response.text}")
@@ -399,9 +476,25 @@ def transcribe_with_whisper(
             language_code=language_code
         )
 
+        # Store segments as compressed chunks; the result (and session row) keeps only a summary
+        segments = whisper_result.get('segments', [])
+        duration = whisper_result.get('duration', 0)
+        if timeline:
+            remap_segments(segments, timeline)
+            duration = original_time(duration, timeline)
+        # Keyed by job name like the callback's, so a retry or a second recording for the same
+        # appointment does not overwrite chunks an earlier row still points to
+        job_name = f"whisper-{appointment_id}-{job_suffix or uuid.uuid4().hex[:8]}"
+        store = write_transcript(
+            OUTPUT_BUCKET,
+            f"transcriptions/{appointment_id}/{job_name}",
+            segments,
+            duration=duration
+        )
+
         # Format result
         result = {
-            'job_name': f"whisper-{appointment_id}-{uuid.uuid4().hex[:8]}",
+            'job_name': job_name,
             'job_status': 'COMPLETED',
             'service': 'openai_whisper',
             'language_code': language_code,
@@ -409,23 +502,14 @@ def transcribe_with_whisper(
             'async': False,
             'transcript': {
                 'text': whisper_result.get('text', ''),
-                'segments': whisper_result.get('segments', []),
-                'duration': whisper_result.get('duration', 0)
+                'segment_count': store['segment_count'],
+                'duration': duration
             },
+            'transcript_store': store,
             'entities': entities,
-            'output_uri': None  # Inline result
+            'output_uri': store['manifest_uri']
         }
 
-        # Store transcript to S3
-        output_key = f"transcriptions/{appointment_id}/whisper-result.json"
-        s3_client.put_object(
-            Bucket=OUTPUT_BUCKET,
-            Key=output_key,
-            Body=json.dumps(result, ensure_ascii=False),
-            ContentType='application/json'
-        )
-        result['output_uri'] = f"s3://{OUTPUT_BUCKET}/{output_key}"
-
         return result
 
     finally:
@@ -476,30 +560,42 @@ Return a JSON array with this format for each entity found:
 Only return valid JSON, no other text."""
 
     try:
-        response = bedrock_runtime.invoke_model(
-            modelId='anthropic.claude-3-5-sonnet-20241022-v2:0',
-            body=json.dumps({
-                'anthropic_version': 'bedrock-2023-05-31',
-                'max_tokens': 4096,
-                'messages': [
-                    {
-                        'role': 'user',
-                        'content': prompt
-                    }
-                ]
-            })
-        )
+        with span('bedrock', 'invoke_model', model=ENTITY_MODEL_ID, language=language_code) as call:
+            response = bedrock_runtime.invoke_model(
+                modelId=ENTITY_MODEL_ID,
+                body=json.dumps({
+                    'anthropic_version': 'bedrock-2023-05-31',
+                    'max_tokens': 4096,
+                    'messages': [
+                        {
+                            'role': 'user',
+                            'content': prompt
+                        }
+                    ]
+                })
+            )
+            response_body = json.loads(response['body'].read())
+            usage = response_body.get('usage', {})
+            call.metric('InputTokens', usage.get('input_tokens', 0))
+            call.metric('OutputTokens', usage.get('output_tokens', 0))
 
-        response_body = json.loads(response['body'].read())
         content = response_body.get('content', [{}])[0].get('text', '[]')
 
-        # Parse JSON response
-        entities = json.loads(content)
+        # Parse JSON response (keeps the complete entities if the array was cut off)
+        with span('json', 'parse_entities', language=language_code) as parse:
+            extraction = extract_json(content, expect='array')
+            parse.metric('Repairs', len(extraction['repairs']))
+            if extraction['error']:
+                parse.fail(extraction['error'])
+        if extraction['error']:
+            logger.error(f"Failed to parse entity extraction response: {extraction['error']}")
+            return []
+        if extraction['repairs']:
+            logger.warning(f"Repaired entity extraction response: {', '.join(extraction['repairs'])}")
+
+        entities = extraction['data']
         return entities if isinstance(entities, list) else []
 
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse entity extraction response: {e}")
-        return []
     except Exception as e:
         logger.error(f"Entity extraction error: {e}")
         return []
@@ -523,8 +619,6 @@ def store_transcription_result(
     service_used: str
 ) -> None:
     """Store transcription result in Supabase."""
-    import requests
-
     if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
         logger.warning("Supabase credentials not configured, skipping database update")
         return
@@ -543,34 +637,50 @@ def store_transcription_result(
 
         # If we have inline transcript (Whisper), store it
         if not result.get('async') and result.get('transcript'):
-            data['raw_transcript'] = json.dumps(result['transcript'], ensure_ascii=False)
+            data['raw_transcript'] = result['transcript']['text']
+            if result.get('transcript_store'):
+                data['transcript_manifest_uri'] = result['transcript_store']['manifest_uri']
+                data['transcript_summary'] = result['transcript_store']
             data['medical_entities'] = json.dumps(result.get('entities', []), ensure_ascii=False)
             data['transcription_completed_at'] = datetime.utcnow().isoformat()
 
+        if result.get('preprocessing'):
+            data['audio_preprocessed_uri'] = result['preprocessing']['s3_uri']
+            data['audio_original_seconds'] = result['preprocessing']['original_seconds']
+            data['audio_seconds_saved'] = result['preprocessing']['seconds_saved']
+
         # Use session_id or appointment_id for update
         filter_key = 'id' if session_id else 'appointment_id'
         filter_value = session_id or appointment_id
 
-        response = requests.patch(
-            f"{SUPABASE_URL}/rest/v1/video_call_sessions?{filter_key}=eq.{filter_value}",
-            headers={
-                'apikey': SUPABASE_SERVICE_KEY,
-                'Authorization': f'Bearer {SUPABASE_SERVICE_KEY}',
-                'Content-Type': 'application/json',
-                'Prefer': 'return=minimal'
-            },
-            json=data
+        SupabaseClient(SUPABASE_URL, SUPABASE_SERVICE_KEY).update(
+            'video_call_sessions', {filter_key: filter_value}, data
         )
+        logger.info(f"Transcription result stored for appointment {appointment_id}")
 
-        if response.status_code not in [200, 201, 204]:
-            logger.error(f"Supabase update failed: {response.status_code} - {response.text}")
-        else:
-            logger.info(f"Transcription result stored for appointment {appointment_id}")
+    except SupabaseError as e:
+        logger.error(f"Supabase update failed: {e.status} - {e.body}")
 
     except Exception as e:
         logger.error(f"Failed to store transcription result: {e}")
 
 
+def get_object_etag(s3_uri: str) -> str:
+    """ETag of the recording, so a re-uploaded file under the same key counts as a new request."""
+    parsed = urlparse(s3_uri)
+    try:
+        with span('s3', 'head_object'):
+            return s3_client.head_object(Bucket=parsed.netloc, Key=parsed.path.lstrip('/'))['ETag'].strip('"')
+    except Exception as e:
+        logger.warning(f"Could not read ETag for {s3_uri}: {e}")
+        return ''
+
+
+def is_job_conflict(error: Exception) -> bool:
+    """True if Transcribe rejected a start because a job with that name already exists."""
+    return getattr(error, 'response', {}).get('Error', {}).get('Code') == 'ConflictException'
+
+
 def get_media_format(filename: str) -> str:
     """Determine media format from filename."""
     extension = filename.lower().split('.')[-1]
@@ -644,6 +754,22 @@ def success_response(data: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
+def duplicate_response(record: Dict[str, Any], language_code: str, appointment_id: str) -> Dict[str, Any]:
+    """Response for a repeated request: the first request's job (or its status while it runs)."""
+    transcription = record.get('result') or {
+        'job_name': record.get('job_name') or None,
+        'job_status': record.get('status'),
+    }
+    return success_response({
+        'transcription': transcription,
+        'language_code': language_code,
+        'language_name': get_language_name(language_code),
+        'service_used': transcription.get('service_used'),
+        'appointment_id': appointment_id,
+        'deduplicated': True
+    })
+
+
 def error_response(status_code: int, message: str) -> Dict[str, Any]:
     """Format error response."""
     return {
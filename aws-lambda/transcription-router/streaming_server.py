@@ -0,0 +1,510 @@
+"""
+MedZen Streaming Transcription Server
+
+Real-time counterpart of the router for live calls. A WebSocket relay (the media bridge that
+taps the call's audio) connects once per call and streams 16 kHz mono s16le PCM:
+
+    GET /stream?appointment_id=<id>&language_code=en[&session_id=<id>]
+    Authorization: Bearer <STREAMING_RELAY_TOKEN>
+
+    relay -> server   binary frames of PCM (50-200 ms each)
+                      {"type": "end"} text frame at hang-up
+    server -> relay   {"type": "partial" | "final", "segment": {speaker, start_time, end_time, text}}
+                      {"type": "completed", "transcript_store": {...}, "store_seconds": 0.4}
+
+Audio goes to Amazon Transcribe streaming through medzen_runtime.streaming. At hang-up the
+final segments are stored in the transcript segment store (a prefix of their own per stream)
+and the video_call_sessions row is marked COMPLETED, so SOAP generation can start seconds
+after the call instead of waiting for a batch job. Languages streaming cannot serve (Whisper languages) are refused with 400 and
+go through the batch router after the call. A relay that closes without {"type": "end"} has
+dropped, not hung up: its segments are stored, the row is marked FAILED with their location,
+and a reconnect starts a new stream.
+
+With MEDZEN_SOAP_DRAFTING=true the SOAP note is drafted during the call as well
+(medzen_runtime.soap_draft): final segments feed the drafter in the background, hang-up only
+runs its finalize call, and the note is handed to the SOAP save Lambda (session_id required).
+The completed message then also carries {"soap": {...}}.
+
+Runs as a long-lived process (ECS task or container), not as a Lambda:
+
+    pip install amazon-transcribe
+    STREAMING_RELAY_TOKEN=... python3 streaming_server.py --port 8765
+
+It refuses to start without STREAMING_RELAY_TOKEN; --insecure accepts unauthenticated relays
+for local development and binds to 127.0.0.1 unless --host says otherwise.
+
+Author: MedZen Development Team
+Version: 1.0.0
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import struct
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+from medzen_runtime.clients import LazyClient
+from medzen_runtime.config import get_config
+from medzen_runtime.soap_draft import SoapDrafter
+from medzen_runtime.streaming import StreamingSession, TranscribeStreamingTransport, streaming_language
+from medzen_runtime.supabase import SupabaseClient, SupabaseError
+from medzen_runtime.tracing import span
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Initialize AWS clients (built on first use)
+lambda_client = LazyClient('lambda', 'us-east-1')
+
+# Environment variables
+SUPABASE_URL = os.environ.get('SUPABASE_URL')
+SUPABASE_SERVICE_KEY = os.environ.get('SUPABASE_SERVICE_KEY')
+OUTPUT_BUCKET = os.environ.get('OUTPUT_BUCKET', 'medzen-transcriptions')
+RELAY_TOKEN = os.environ.get('STREAMING_RELAY_TOKEN', '')
+STREAMING_PORT = int(os.environ.get('STREAMING_PORT', '8765'))
+SOAP_DRAFTING = os.environ.get('MEDZEN_SOAP_DRAFTING', 'false').lower() == 'true'
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+# Largest single WebSocket frame accepted (a 200 ms PCM frame is 6.4 KB), and largest
+# message assembled from continuation frames
+MAX_FRAME_BYTES = 1 << 20
+MAX_MESSAGE_BYTES = 1 << 20
+
+OP_CONTINUATION, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+CLOSE_PROTOCOL_ERROR, CLOSE_MESSAGE_TOO_BIG = 1002, 1009
+
+
+class ProtocolError(Exception):
+    """The relay broke RFC 6455; the connection is closed with this status code."""
+
+    def __init__(self, code: int, reason: str):
+        super().__init__(reason)
+        self.code = code
+
+
+class WebSocket:
+    """Minimal server side of RFC 6455 on asyncio streams: enough for one relay connection."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.closed = False
+        self._send_lock = asyncio.Lock()
+
+    async def _frame(self):
+        head = await self.reader.readexactly(2)
+        fin, opcode = head[0] & 0x80, head[0] & 0x0F
+        masked, length = head[1] & 0x80, head[1] & 0x7F
+        if not masked:
+            raise ProtocolError(CLOSE_PROTOCOL_ERROR, 'client frames must be masked')
+        if length == 126:
+            length = struct.unpack('!H', await self.reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', await self.reader.readexactly(8))[0]
+        if length > MAX_FRAME_BYTES:
+            raise ProtocolError(CLOSE_MESSAGE_TOO_BIG, f"frame of {length} bytes exceeds {MAX_FRAME_BYTES}")
+        mask = await self.reader.readexactly(4)
+        payload = await self.reader.readexactly(length)
+        if length:
+            # XOR the whole payload at once instead of byte by byte
+            key = (mask * (length // 4 + 1))[:length]
+            payload = (int.from_bytes(payload, 'big') ^ int.from_bytes(key, 'big')).to_bytes(length, 'big')
+        return bool(fin), opcode, payload
+
+    async def receive(self):
+        """
+        Next data message.
+
+        Returns:
+            (opcode, payload) for a text or binary message; (OP_CLOSE, b'') when the peer closes
+            or breaks the protocol (the connection is then closed with 1002 or 1009)
+        """
+        message = bytearray()
+        message_opcode = None
+        while True:
+            try:
+                fin, opcode, payload = await self._frame()
+            except (asyncio.IncompleteReadError, ConnectionError):
+                self.closed = True
+                return OP_CLOSE, b''
+            except ProtocolError as e:
+                logger.warning(f"Closing relay connection: {e}")
+                await self.close(e.code)
+                return OP_CLOSE, b''
+            if opcode == OP_PING:
+                await self.send(payload, OP_PONG)
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode == OP_CLOSE:
+                await self.close()
+                return OP_CLOSE, b''
+            if opcode == OP_CONTINUATION and message_opcode is None:
+                logger.warning('Closing relay connection: continuation frame without a message')
+                await self.close(CLOSE_PROTOCOL_ERROR)
+                return OP_CLOSE, b''
+            if opcode != OP_CONTINUATION:
+                message_opcode = opcode
+            if len(message) + len(payload) > MAX_MESSAGE_BYTES:
+                logger.warning(f"Closing relay connection: message exceeds {MAX_MESSAGE_BYTES} bytes")
+                await self.close(CLOSE_MESSAGE_TOO_BIG)
+                return OP_CLOSE, b''
+            message.extend(payload)
+            if fin:
+                return message_opcode, bytes(message)
+
+    async def send(self, payload: bytes, opcode: int = OP_BINARY) -> None:
+        if self.closed and opcode != OP_CLOSE:
+            raise ConnectionError('WebSocket is closed')
+        length = len(payload)
+        if length < 126:
+            head = struct.pack('!BB', 0x80 | opcode, length)
+        elif length < 1 << 16:
+            head = struct.pack('!BBH', 0x80 | opcode, 126, length)
+        else:
+            head = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+        async with self._send_lock:
+            self.writer.write(head + payload)
+            await self.writer.drain()
+
+    async def send_json(self, message: Dict[str, Any]) -> None:
+        await self.send(json.dumps(message, ensure_ascii=False).encode('utf-8'), OP_TEXT)
+
+    async def close(self, code: int = 1000) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            await self.send(struct.pack('!H', code), OP_CLOSE)
+        except ConnectionError:
+            pass
+
+
+async def read_request(reader: asyncio.StreamReader):
+    """(method, target, headers) of the HTTP upgrade request."""
+    request_line = (await reader.readline()).decode('latin-1').strip()
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1')
+        if line in ('\r\n', '\n', ''):
+            break
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    method, _, rest = request_line.partition(' ')
+    return method, rest.rpartition(' ')[0], headers
+
+
+def reject(writer: asyncio.StreamWriter, status: str, message: str) -> None:
+    body = json.dumps({'success': False, 'error': message}).encode('utf-8')
+    writer.write(
+        f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+        f"Connection: close\r\n\r\n".encode('latin-1') + body
+    )
+
+
+def accept_key(key: str) -> str:
+    return base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode('ascii')).digest()).decode('ascii')
+
+
+async def audio_frames(socket: WebSocket, hung_up: asyncio.Event) -> AsyncIterator[bytes]:
+    """PCM frames from the relay until it sends {"type": "end"} (hung_up is set) or closes."""
+    while True:
+        opcode, payload = await socket.receive()
+        if opcode == OP_BINARY:
+            if payload:
+                yield payload
+        elif opcode == OP_TEXT:
+            try:
+                control = json.loads(payload)
+            except ValueError:
+                continue
+            if control.get('type') == 'end':
+                hung_up.set()
+                return
+        else:
+            return
+
+
+def update_session(
+    appointment_id: str,
+    session_id: Optional[str],
+    data: Dict[str, Any]
+) -> None:
+    """Update the video_call_sessions row by session id, or appointment id."""
+    if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
+        logger.warning("Supabase credentials not configured, skipping database update")
+        return
+
+    filter_key = 'id' if session_id else 'appointment_id'
+    try:
+        SupabaseClient(SUPABASE_URL, SUPABASE_SERVICE_KEY).update(
+            'video_call_sessions', {filter_key: session_id or appointment_id}, data
+        )
+    except SupabaseError as e:
+        logger.error(f"Supabase update failed: {e.status} - {e.body}")
+    except Exception as e:
+        logger.error(f"Failed to update session {appointment_id}: {e}")
+
+
+def completed_data(result: Dict[str, Any], language_code: str) -> Dict[str, Any]:
+    """Row update for a finished stream, matching what the batch callback writes."""
+    data = {
+        'transcription_status': 'COMPLETED',
+        'transcription_completed_at': datetime.utcnow().isoformat(),
+        'raw_transcript': result['text'],
+        'transcription_language': language_code,
+        'transcription_service': 'aws_transcribe_streaming',
+        'updated_at': datetime.utcnow().isoformat()
+    }
+    if result.get('transcript_store'):
+        data['transcript_manifest_uri'] = result['transcript_store']['manifest_uri']
+        data['transcript_summary'] = result['transcript_store']
+    return data
+
+
+def dropped_data(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Row update for a stream the relay dropped before hang-up; a reconnect sets IN_PROGRESS again."""
+    stored = result.get('transcript_store')
+    partial = f"; {len(result['segments'])} segments stored at {stored['manifest_uri']}" if stored else ''
+    return {
+        'transcription_status': 'FAILED',
+        'transcription_error': f"Relay disconnected before hang-up{partial}",
+        'updated_at': datetime.utcnow().isoformat()
+    }
+
+
+def save_soap_note(appointment_id: str, session_id: Optional[str], draft: Dict[str, Any]) -> bool:
+    """Hand a finalized note to the SOAP save Lambda, as the Step Functions workflow does."""
+    if not session_id:
+        logger.warning(f"No session_id for appointment {appointment_id}; drafted SOAP note not saved")
+        return False
+
+    tokens = {'input_tokens': 0, 'output_tokens': 0}
+    for usage in draft['bedrock_tokens'].values():
+        tokens['input_tokens'] += usage.get('input', 0) + usage.get('cache_read', 0) + usage.get('cache_write', 0)
+        tokens['output_tokens'] += usage.get('output', 0)
+    try:
+        with span('lambda', 'invoke', target=get_config('soap_save_function')):
+            lambda_client.invoke(
+                FunctionName=get_config('soap_save_function'),
+                InvocationType='Event',
+                Payload=json.dumps({
+                    'sessionId': session_id,
+                    'appointmentId': appointment_id,
+                    'soapData': draft['soap_note'],
+                    'bedrockTokens': tokens,
+                    'aiModel': draft.get('model_id'),
+                }, ensure_ascii=False, default=str)
+            )
+        return True
+    except Exception as e:
+        logger.error(f"Failed to hand drafted SOAP note to {get_config('soap_save_function')}: {e}")
+        return False
+
+
+async def finalize_soap(
+    drafter: SoapDrafter,
+    appointment_id: str,
+    session_id: Optional[str]
+) -> Dict[str, Any]:
+    """Finalize the drafted note after hang-up and save it; returns the 'soap' part of the completed message."""
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    draft = await loop.run_in_executor(None, drafter.finalize)
+    finalize_seconds = round(loop.time() - started, 3)
+    if draft['statusCode'] != 200:
+        logger.error(f"SOAP drafting failed for appointment {appointment_id}: {draft.get('message')}")
+        return {'statusCode': draft['statusCode'], 'error': draft.get('error'), 'finalize_seconds': finalize_seconds}
+
+    saved = await loop.run_in_executor(None, save_soap_note, appointment_id, session_id, draft)
+    return {
+        'statusCode': 200,
+        'soap_note': draft['soap_note'],
+        'sections_regenerated': draft['sections_regenerated'],
+        'calls': draft['calls'],
+        'bedrock_tokens': draft['bedrock_tokens'],
+        'finalize_seconds': finalize_seconds,
+        'saved': saved,
+    }
+
+
+async def handle_connection(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    transport: Any = None,
+    insecure: bool = False
+) -> None:
+    """Serve one relay connection: handshake, stream, store, report."""
+    loop = asyncio.get_running_loop()
+    try:
+        method, target, headers = await read_request(reader)
+        url = urlparse(target)
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        appointment_id = query.get('appointment_id')
+        language_code = streaming_language(query.get('language_code', 'en'))
+
+        if method != 'GET' or url.path != '/stream' or headers.get('upgrade', '').lower() != 'websocket':
+            reject(writer, '404 Not Found', 'Expected a WebSocket upgrade on /stream')
+            return
+        if RELAY_TOKEN:
+            authorized = hmac.compare_digest(headers.get('authorization', ''), f"Bearer {RELAY_TOKEN}")
+        else:
+            authorized = insecure
+        if not authorized:
+            reject(writer, '401 Unauthorized', 'Invalid relay token')
+            return
+        if not appointment_id or not headers.get('sec-websocket-key'):
+            reject(writer, '400 Bad Request', 'appointment_id and Sec-WebSocket-Key are required')
+            return
+        if not language_code:
+            reject(writer, '400 Bad Request',
+                   f"Language {query.get('language_code')} is not available for streaming; use the batch router")
+            return
+
+        writer.write(
+            "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept_key(headers['sec-websocket-key'])}\r\n\r\n".encode('latin-1')
+        )
+        await writer.drain()
+        socket = WebSocket(reader, writer)
+        session_id = query.get('session_id')
+        logger.info(f"Streaming transcription started for appointment {appointment_id} ({language_code})")
+
+        await loop.run_in_executor(None, update_session, appointment_id, session_id, {
+            'transcription_status': 'IN_PROGRESS',
+            'transcription_language': language_code,
+            'transcription_service': 'aws_transcribe_streaming',
+            'transcription_started_at': datetime.utcnow().isoformat(),
+            'updated_at': datetime.utcnow().isoformat()
+        })
+
+        drafter = None
+        if SOAP_DRAFTING:
+            drafter = SoapDrafter({
+                'appointment_id': appointment_id,
+                'session_id': session_id,
+                'language': language_code.split('-')[0],
+            })
+        drafting = []
+
+        async def send_segment(segment: Dict[str, Any], final: bool) -> None:
+            if drafter and final:
+                drafter.add(segment)
+                # One drafting step at a time, off the event loop; step() returns at once if nothing is due
+                if not drafting or drafting[-1].done():
+                    drafting.append(loop.run_in_executor(None, drafter.step))
+            if not socket.closed:
+                await socket.send_json({'type': 'final' if final else 'partial', 'segment': segment})
+
+        session = StreamingSession(
+            appointment_id,
+            language_code,
+            transport or TranscribeStreamingTransport(),
+            output_bucket=OUTPUT_BUCKET,
+            on_segment=send_segment,
+            stream_id=f"{session_id}-{uuid.uuid4().hex[:8]}" if session_id else None,
+        )
+        hung_up = asyncio.Event()
+        try:
+            result = await session.run(audio_frames(socket, hung_up))
+        except Exception as e:
+            logger.error(f"Streaming transcription failed for appointment {appointment_id}: {e}")
+            await loop.run_in_executor(None, update_session, appointment_id, session_id, {
+                'transcription_status': 'FAILED',
+                'transcription_error': str(e)[:1000],
+                'updated_at': datetime.utcnow().isoformat()
+            })
+            if not socket.closed:
+                await socket.send_json({'type': 'error', 'error': str(e)})
+                await socket.close(1011)
+            return
+
+        if not hung_up.is_set():
+            # The relay went away mid-call: not a hang-up, so the call is not completed
+            logger.warning(
+                f"Relay dropped for appointment {appointment_id} before hang-up "
+                f"({len(result['segments'])} segments stored)"
+            )
+            if drafting:
+                await asyncio.gather(*drafting, return_exceptions=True)
+            await loop.run_in_executor(None, update_session, appointment_id, session_id, dropped_data(result))
+            return
+
+        await loop.run_in_executor(None, update_session, appointment_id, session_id, completed_data(result, language_code))
+        logger.info(
+            f"Streaming transcription stored for appointment {appointment_id}: "
+            f"{len(result['segments'])} segments, {result['store_seconds']}s after hang-up"
+        )
+        completed = {
+            'type': 'completed',
+            'transcript_store': result['transcript_store'],
+            'audio_seconds': result['audio_seconds'],
+            'store_seconds': result['store_seconds'],
+        }
+        if drafter:
+            if drafting:
+                await asyncio.gather(*drafting, return_exceptions=True)
+            completed['soap'] = await finalize_soap(drafter, appointment_id, session_id)
+        if not socket.closed:
+            await socket.send_json(completed)
+            await socket.close()
+
+    except (asyncio.IncompleteReadError, ConnectionError) as e:
+        logger.warning(f"Relay connection dropped: {e}")
+    finally:
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+
+async def serve(
+    host: str = '0.0.0.0',
+    port: int = STREAMING_PORT,
+    transport: Any = None,
+    insecure: bool = False
+) -> asyncio.AbstractServer:
+    """
+    Start listening; pass a transport to replace Transcribe streaming (local replay).
+
+    Raises:
+        RuntimeError: STREAMING_RELAY_TOKEN is not set and insecure is False
+    """
+    if not RELAY_TOKEN:
+        if not insecure:
+            raise RuntimeError('STREAMING_RELAY_TOKEN is not set; refusing to accept unauthenticated relays '
+                               '(pass --insecure for local development)')
+        logger.warning('STREAMING_RELAY_TOKEN is not set: accepting unauthenticated relays')
+    return await asyncio.start_server(
+        lambda reader, writer: handle_connection(reader, writer, transport, insecure), host, port
+    )
+
+
+async def main(host: str, port: int, insecure: bool = False) -> None:
+    server = await serve(host, port, insecure=insecure)
+    logger.info(f"Streaming transcription server listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='MedZen streaming transcription server')
+    parser.add_argument('--host', help='interface to bind (default 0.0.0.0, or 127.0.0.1 with --insecure)')
+    parser.add_argument('--port', type=int, default=STREAMING_PORT)
+    parser.add_argument('--insecure', action='store_true',
+                        help='accept relays without STREAMING_RELAY_TOKEN (local development only)')
+    args = parser.parse_args()
+    if not RELAY_TOKEN and not args.insecure:
+        parser.error('STREAMING_RELAY_TOKEN is not set; pass --insecure to accept unauthenticated relays locally')
+    asyncio.run(main(args.host or ('127.0.0.1' if args.insecure else '0.0.0.0'), args.port, args.insecure))
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Behaviour checks and savings estimate for medzen_runtime.audio preprocessing
+
+Checks the silencedetect parser, the cut planner (leading/trailing silence, long and short
+pauses, all-silent and silence-free recordings), mapping trimmed times back to the recording
+and the fallback to the original recording when ffmpeg is unavailable. It then estimates the
+billed transcription minutes saved over synthetic consultations (lead-in, lead-out and
+pauses drawn from --seed), counting Transcribe's 15 second minimum per job.
+
+If ffmpeg is on PATH (or MEDZEN_FFMPEG_PATH), a generated WAV with known speech and silence
+is also run through both ffmpeg passes for FLAC and Opus and the measured durations are
+checked; otherwise that part is reported as skipped.
+
+Usage:
+    python3 bench/audio_preprocess_bench.py [--sessions 500] [--seed 7] [--output report.json]
+
+Exits non-zero if any check fails.
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import statistics
+import struct
+import sys
+import tempfile
+import wave
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / 'aws-deployment' / 'lambda-layers' / 'medzen-runtime' / 'python'))
+
+from medzen_runtime import audio, tracing  # noqa: E402
+
+SILENCEDETECT_LOG = """\
+[silencedetect @ 0x5581] silence_start: -0.0123
+[silencedetect @ 0x5581] silence_end: 42.5 | silence_duration: 42.512
+size=N/A time=00:01:00.00 bitrate=N/A speed= 512x
+[silencedetect @ 0x5581] silence_start: 100.25
+[silencedetect @ 0x5581] silence_end: 101.0 | silence_duration: 0.75
+[silencedetect @ 0x5581] silence_start: 200
+[silencedetect @ 0x5581] silence_end: 230 | silence_duration: 30
+[silencedetect @ 0x5581] silence_start: 580.5
+"""
+
+
+def trimmed_time(t, kept):
+    """Inverse of audio.original_time for a time inside a kept range."""
+    offset = 0.0
+    for start, end in kept:
+        if start <= t <= end:
+            return offset + (t - start)
+        offset += end - start
+    raise ValueError(f"{t} is not kept")
+
+
+def run_checks():
+    """Return a list of failed check descriptions."""
+    failures = []
+
+    def check(condition, description):
+        if not condition:
+            failures.append(description)
+
+    silences = audio.parse_silences(SILENCEDETECT_LOG, 600.0)
+    check(silences == [(0.0, 42.5), (100.25, 101.0), (200.0, 230.0), (580.5, 600.0)], 'parse_silences')
+
+    kept = audio.plan_cuts(silences, 600.0, min_pause=2.0, pad=0.3)
+    check(kept == [(42.2, 200.3), (229.7, 580.8)], f"plan_cuts lead/pause/tail (got {kept})")
+    check(audio.plan_cuts([], 300.0) == [(0.0, 300.0)], 'plan_cuts without silence keeps everything')
+    check(audio.plan_cuts([(50.0, 51.5)], 300.0, min_pause=2.0) == [(0.0, 300.0)], 'short pause kept whole')
+    everything = audio.plan_cuts([(0.0, 300.0)], 300.0, pad=0.3)
+    check(len(everything) == 1 and everything[0][1] - everything[0][0] <= 0.31, 'all-silent recording keeps only padding')
+
+    for t in (42.2, 100.0, 200.0, 229.7, 400.0, 580.8):
+        mapped = audio.original_time(trimmed_time(t, kept), kept)
+        check(abs(mapped - t) < 0.002, f"original_time round trip at {t} (got {mapped})")
+    check(audio.original_time(10_000, kept) == 580.8, 'original_time clamps past the end')
+    check(audio.original_time(12.5, []) == 12.5, 'original_time without timeline')
+
+    segments = [{'start': 0.0, 'end': 2.0}, {'start_time': 160.0, 'end_time': 161.0, 'speaker': 'spk_1'}]
+    audio.remap_segments(segments, kept)
+    check(segments[0] == {'start': 42.2, 'end': 44.2}, 'remap Whisper segment')
+    check(abs(segments[1]['start_time'] - 231.6) < 0.002 and segments[1]['speaker'] == 'spk_1', 'remap Transcribe segment')
+
+    check(audio._aselect([(0.0, 1.5), (3.0, 4.0)]) ==
+          "aselect='between(t,0.000,1.500)+between(t,3.000,4.000)',asetpts=N/SR/TB", 'aselect filter')
+
+    # Enabled without ffmpeg: callers fall back to the original recording
+    saved = audio.ENABLED, audio.FFMPEG_PATH, os.environ.get('PATH', '')
+    audio.ENABLED, audio.FFMPEG_PATH, os.environ['PATH'] = True, '/nonexistent/ffmpeg', ''
+    logging.disable(logging.CRITICAL)
+    try:
+        check(audio.preprocess_recording('s3://b/k.mp4', 'out', 'preprocessed/a/s') is None, 'missing ffmpeg falls back')
+    finally:
+        logging.disable(logging.NOTSET)
+        audio.ENABLED, audio.FFMPEG_PATH, os.environ['PATH'] = saved
+    return failures
+
+
+def billed_seconds(seconds):
+    """Transcribe bills per second with a 15 second minimum per job."""
+    return max(15.0, math.ceil(seconds))
+
+
+def synthetic_session(rng):
+    """(duration, silences) for one consultation recording."""
+    t = rng.uniform(20, 180)  # waiting for the other party to join
+    silences = [(0.0, t)]
+    speech_until = t + rng.uniform(8, 30) * 60
+    while t < speech_until:
+        t += rng.lognormvariate(1.6, 0.8)  # a turn of speech
+        pause = rng.lognormvariate(0.3, 1.0)  # gap before the next turn
+        if pause >= audio.DETECT_SECONDS:
+            silences.append((t, t + pause))
+        t += pause
+    duration = t + rng.uniform(10, 120)  # lead-out before the recording stops
+    silences.append((t, duration))
+    return duration, silences
+
+
+def estimate(sessions, seed):
+    rng = random.Random(seed)
+    before, after, saved = [], [], []
+    for _ in range(sessions):
+        duration, silences = synthetic_session(rng)
+        kept = audio.plan_cuts(silences, duration)
+        trimmed = sum(end - start for start, end in kept)
+        before.append(billed_seconds(duration))
+        after.append(billed_seconds(trimmed))
+        saved.append(duration - trimmed)
+    return {
+        'sessions': sessions,
+        'billed_minutes_before': round(sum(before) / 60, 1),
+        'billed_minutes_after': round(sum(after) / 60, 1),
+        'billed_reduction': round(1 - sum(after) / sum(before), 4),
+        'seconds_saved_per_session': {
+            'p50': round(statistics.median(saved), 1),
+            'mean': round(statistics.fmean(saved), 1),
+            'max': round(max(saved), 1),
+        },
+    }
+
+
+def write_wav(path, pattern, rate=44100):
+    """Stereo 44.1 kHz WAV of tone bursts ('speech') and digital silence, to exercise downmix and resampling."""
+    with wave.open(str(path), 'wb') as out:
+        out.setnchannels(2)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        for kind, seconds in pattern:
+            frames = int(seconds * rate)
+            if kind == 'speech':
+                samples = (int(8000 * math.sin(2 * math.pi * 220 * n / rate)) for n in range(frames))
+                out.writeframes(b''.join(struct.pack('<hh', s, s) for s in samples))
+            else:
+                out.writeframes(b'\x00\x00\x00\x00' * frames)
+
+
+def run_ffmpeg(failures):
+    if not audio.ffmpeg_binary():
+        return {'skipped': 'ffmpeg not found'}
+
+    pattern = [('silence', 20), ('speech', 10), ('silence', 1), ('speech', 10), ('silence', 15), ('speech', 5), ('silence', 30)]
+    expected = 10 + 1 + 10 + 2 * audio.PAD_SECONDS + 5 + 2 * audio.PAD_SECONDS
+    results = {}
+    with tempfile.TemporaryDirectory() as work:
+        source = Path(work) / 'recording.wav'
+        write_wav(source, pattern)
+        for audio_format in ('flac', 'ogg'):
+            output = Path(work) / f"audio.{audio_format}"
+            stats = audio.preprocess_file(str(source), str(output), audio_format)
+            results[audio_format] = dict(stats, bytes_in=source.stat().st_size, bytes_out=output.stat().st_size)
+            if abs(stats['seconds'] - expected) > 0.5:
+                failures.append(f"ffmpeg {audio_format}: kept {stats['seconds']}s, expected about {expected:.1f}s")
+            if abs(stats['original_seconds'] - sum(s for _, s in pattern)) > 0.1:
+                failures.append(f"ffmpeg {audio_format}: original duration {stats['original_seconds']}s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sessions', type=int, default=500, help='synthetic consultations for the estimate')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='write JSON report to this file')
+    args = parser.parse_args()
+
+    tracing.METRICS_ENABLED = False
+    failures = run_checks()
+    report = {
+        'settings': {
+            'silence_db': audio.SILENCE_DB,
+            'min_pause_seconds': audio.MIN_PAUSE_SECONDS,
+            'pad_seconds': audio.PAD_SECONDS,
+        },
+        'estimate': estimate(args.sessions, args.seed),
+        'ffmpeg': run_ffmpeg(failures),
+        'failures': failures,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    print(output)
+
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
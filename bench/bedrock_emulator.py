@@ -0,0 +1,382 @@
+"""
+Deterministic Bedrock runtime emulator for the offline benchmarks
+
+Serves `invoke_model` and `invoke_model_with_response_stream` for the Anthropic Messages
+API with scripted responses, token usage, sampled latency and the errors Bedrock returns.
+Handlers get it the same way they get any boto3 client:
+
+    emulator = BedrockEmulator(models={PRIMARY: {'rpm': 100}}, seed=7, time_scale=0.01)
+    register_client('bedrock-runtime', emulator, 'us-east-1')
+
+Every decision for a request (random throttling, output faults, latency) is drawn from a
+generator seeded with (seed, model, request body, attempt number), so a run is reproducible
+regardless of how threads interleave. Quotas are enforced per model over `clock`:
+requests and tokens per rolling minute, and tokens per day until `reset_day()`. Pass a
+ManualClock to make quota decisions reproducible as well.
+
+Per-model profile keys (unset keys fall back to DEFAULT_PROFILE):
+    rpm, tpm, tokens_per_day   quotas; None is unlimited
+    latency                    time-to-first-token distribution, e.g.
+                               {'dist': 'lognormal', 'p50_ms': 600, 'sigma': 0.35},
+                               {'dist': 'uniform', 'low_ms': 200, 'high_ms': 900}, {'dist': 'fixed', 'ms': 300}
+    ms_per_output_token        generation time per output token
+    throttle_rate              fraction of admitted requests throttled anyway
+    unavailable_rate           fraction failing with ServiceUnavailableException
+    output_faults              {corpus file stem: rate}, e.g. {'truncated_mid_plan': 0.02}
+    prompt_caching             whether cache_control blocks are honoured (prefixes of at least
+                               CACHE_MIN_TOKENS, as on Bedrock)
+"""
+
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+
+from botocore.exceptions import ClientError
+
+CORPUS_DIR = Path(__file__).resolve().parent / 'corpus' / 'llm_json'
+CHARS_PER_TOKEN = 4
+CACHE_MIN_TOKENS = 1024
+
+DEFAULT_PROFILE = {
+    'rpm': None,
+    'tpm': None,
+    'tokens_per_day': None,
+    'latency': {'dist': 'lognormal', 'p50_ms': 600.0, 'sigma': 0.35},
+    'ms_per_output_token': 0.0,
+    'throttle_rate': 0.0,
+    'unavailable_rate': 0.0,
+    'output_faults': {},
+    'prompt_caching': True,
+}
+
+# Messages returned by Bedrock for each quota
+QUOTA_MESSAGES = {
+    'rpm': 'Too many requests, please wait before trying again.',
+    'tpm': 'Too many tokens, please wait before trying again.',
+    'tokens_per_day': 'Too many tokens per day, please wait before trying again.',
+}
+
+_SECTIONS_RE = re.compile(r'generating ONLY these sections: ([\w, ]+)')
+
+
+def sample_latency_ms(spec, rng):
+    """One draw from a latency distribution spec (see module docstring)."""
+    dist = spec.get('dist', 'fixed')
+    if dist == 'fixed':
+        return float(spec['ms'])
+    if dist == 'uniform':
+        return rng.uniform(spec['low_ms'], spec['high_ms'])
+    if dist == 'lognormal':
+        return spec['p50_ms'] * math.exp(rng.gauss(0.0, spec.get('sigma', 0.35)))
+    raise ValueError(f"Unknown latency distribution: {dist}")
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+class ManualClock:
+    """Clock advanced explicitly by the caller, for reproducible quota windows."""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class StreamingBody:
+    def __init__(self, data):
+        self.data = data
+
+    def read(self):
+        return self.data
+
+
+class EventStream:
+    """Iterable of {'chunk': {'bytes': ...}} events, paced like a streaming response."""
+
+    def __init__(self, events, first_byte_s, per_event_s):
+        self.events = events
+        self.first_byte_s = first_byte_s
+        self.per_event_s = per_event_s
+
+    def __iter__(self):
+        if self.first_byte_s:
+            time.sleep(self.first_byte_s)
+        for index, event in enumerate(self.events):
+            if index and self.per_event_s:
+                time.sleep(self.per_event_s)
+            yield {'chunk': {'bytes': json.dumps(event).encode('utf-8')}}
+
+    def close(self):
+        pass
+
+
+def _error(cls, code, message, status):
+    return cls(
+        {'Error': {'Code': code, 'Message': message}, 'ResponseMetadata': {'HTTPStatusCode': status}},
+        'InvokeModel'
+    )
+
+
+class BedrockEmulator:
+    """bedrock-runtime client stand-in; see the module docstring for the profile keys."""
+
+    class exceptions:
+        class ThrottlingException(ClientError):
+            pass
+
+        class ServiceUnavailableException(ClientError):
+            pass
+
+        class ValidationException(ClientError):
+            pass
+
+    def __init__(self, models=None, default=None, seed=0, time_scale=1.0, clock=time.monotonic, scripts=None):
+        self.default = dict(DEFAULT_PROFILE, **(default or {}))
+        self.profiles = {model_id: dict(self.default, **profile) for model_id, profile in (models or {}).items()}
+        self.seed = seed
+        self.time_scale = time_scale
+        self.clock = clock
+        # (substring of the last user message, response text or function of the prompt returning it),
+        # checked before the built-in responses
+        self.scripts = list(scripts or [])
+        self.corpus = {path.stem: path.read_text(encoding='utf-8') for path in CORPUS_DIR.iterdir() if path.is_file()}
+        self._lock = threading.Lock()
+        self._attempts = {}
+        self._windows = {}  # model -> deque of (time, tokens) within the last minute
+        self._daily_tokens = {}
+        self._cached_prefixes = set()
+        self._stats = {}
+
+    # Configuration
+
+    def profile(self, model_id):
+        return self.profiles.get(model_id, self.default)
+
+    def configure(self, model_id, **profile):
+        """Change a model's profile mid-run (e.g. lift a quota)."""
+        with self._lock:
+            self.profiles[model_id] = dict(self.profile(model_id), **profile)
+
+    def reset_day(self):
+        """Start a new quota day: daily token counts go back to zero."""
+        with self._lock:
+            self._daily_tokens.clear()
+
+    # Statistics
+
+    def _count(self, model_id, key, amount=1):
+        stats = self._stats.setdefault(model_id, {'latency_ms': []})
+        stats[key] = stats.get(key, 0) + amount
+
+    def stats(self):
+        """Per-model counters plus p50/p95/p99 of the emulated latency."""
+        with self._lock:
+            report = {}
+            for model_id, stats in sorted(self._stats.items()):
+                latencies = sorted(stats['latency_ms'])
+                entry = {key: value for key, value in sorted(stats.items()) if key != 'latency_ms'}
+                if latencies:
+                    pick = lambda q: latencies[min(len(latencies) - 1, int(round(q * (len(latencies) - 1))))]  # noqa: E731
+                    entry['latency_ms'] = {
+                        'p50': round(pick(0.50), 1), 'p95': round(pick(0.95), 1), 'p99': round(pick(0.99), 1)
+                    }
+                report[model_id] = entry
+            return report
+
+    # Request handling
+
+    def _rng(self, model_id, body):
+        """Generator for one request, keyed by its content and how often it was seen before."""
+        digest = hashlib.sha256(f"{self.seed}\x00{model_id}\x00{body}".encode('utf-8')).hexdigest()
+        with self._lock:
+            attempt = self._attempts.get(digest, 0)
+            self._attempts[digest] = attempt + 1
+        return random.Random(f"{digest}:{attempt}")
+
+    def _prompt(self, request):
+        messages = request.get('messages') or [{}]
+        content = messages[-1].get('content', '')
+        if isinstance(content, str):
+            return content
+        return ' '.join(block.get('text', '') for block in content if isinstance(block, dict))
+
+    def _note(self, prompt):
+        return json.loads(self.corpus['soap_note_fr' if 'Transcript Language: fr' in prompt else 'soap_note_en'])
+
+    def _response_text(self, request, profile, rng):
+        """(text, fault name or None) scripted for a request."""
+        prompt = self._prompt(request)
+        for match, text in self.scripts:
+            if match in prompt:
+                return (text(prompt) if callable(text) else text), None
+        if 'extract medical entities' in prompt:
+            return self.corpus['entities_fr'], None
+        sections = _SECTIONS_RE.search(prompt)
+        if sections:
+            note = self._note(prompt)
+            names = [name.strip() for name in sections.group(1).split(',')]
+            return json.dumps({name: note.get(name, {}) for name in names}, ensure_ascii=False, indent=2), None
+        for fault, rate in sorted(profile['output_faults'].items()):
+            if rng.random() < rate:
+                return self.corpus[fault], fault
+        return json.dumps(self._note(prompt), ensure_ascii=False, indent=2), None
+
+    def _prompt_tokens(self, model_id, request, profile):
+        """(uncached input, cache read, cache write) tokens for a request."""
+        system = request.get('system')
+        blocks = system if isinstance(system, list) else []
+        total = estimate_tokens(json.dumps(request, ensure_ascii=False))
+        cached_text = ''.join(block.get('text', '') for block in blocks if 'cache_control' in block)
+        if not cached_text or not profile['prompt_caching']:
+            return total, 0, 0
+        cached = estimate_tokens(cached_text)
+        if cached < CACHE_MIN_TOKENS:
+            # Bedrock sends prefixes below the minimum uncached
+            return total, 0, 0
+        key = (model_id, hashlib.sha256(cached_text.encode('utf-8')).hexdigest())
+        with self._lock:
+            hit = key in self._cached_prefixes
+            self._cached_prefixes.add(key)
+        return max(1, total - cached), (cached if hit else 0), (0 if hit else cached)
+
+    def _admit(self, model_id, profile, tokens):
+        """Apply the minute and daily quotas; returns the exceeded quota name or None."""
+        now = self.clock()
+        with self._lock:
+            window = self._windows.setdefault(model_id, deque())
+            while window and window[0][0] <= now - 60:
+                window.popleft()
+            exceeded = None
+            if profile['tokens_per_day'] is not None and self._daily_tokens.get(model_id, 0) + tokens > profile['tokens_per_day']:
+                exceeded = 'tokens_per_day'
+            elif profile['rpm'] is not None and len(window) >= profile['rpm']:
+                exceeded = 'rpm'
+            elif profile['tpm'] is not None and sum(t for _, t in window) + tokens > profile['tpm']:
+                exceeded = 'tpm'
+            if exceeded:
+                self._count(model_id, f"throttled_{exceeded}")
+                return exceeded
+            window.append((now, tokens))
+            self._daily_tokens[model_id] = self._daily_tokens.get(model_id, 0) + tokens
+            return None
+
+    def _generate(self, modelId, body):
+        """Run admission and fault injection, then build the message; raises the Bedrock error on failure."""
+        body = body.decode('utf-8') if isinstance(body, bytes) else body
+        profile = self.profile(modelId)
+        rng = self._rng(modelId, body)
+        try:
+            request = json.loads(body)
+        except ValueError:
+            raise _error(self.exceptions.ValidationException, 'ValidationException', 'Malformed input request', 400)
+
+        text, fault = self._response_text(request, profile, rng)
+        stop_reason = 'max_tokens' if fault and fault.startswith('truncated') else 'end_turn'
+        max_tokens = request.get('max_tokens', 4096)
+        if estimate_tokens(text) > max_tokens:
+            text, stop_reason = text[:max_tokens * CHARS_PER_TOKEN], 'max_tokens'
+        input_tokens, cache_read, cache_write = self._prompt_tokens(modelId, request, profile)
+        output_tokens = estimate_tokens(text)
+
+        with self._lock:
+            self._count(modelId, 'requests')
+        exceeded = self._admit(modelId, profile, input_tokens + cache_read + cache_write + output_tokens)
+        if exceeded:
+            raise _error(self.exceptions.ThrottlingException, 'ThrottlingException', QUOTA_MESSAGES[exceeded], 429)
+        if rng.random() < profile['throttle_rate']:
+            with self._lock:
+                self._count(modelId, 'throttled_random')
+            raise _error(self.exceptions.ThrottlingException, 'ThrottlingException', QUOTA_MESSAGES['rpm'], 429)
+        if rng.random() < profile['unavailable_rate']:
+            with self._lock:
+                self._count(modelId, 'unavailable')
+            raise _error(self.exceptions.ServiceUnavailableException, 'ServiceUnavailableException', 'Service unavailable', 503)
+
+        first_byte_ms = sample_latency_ms(profile['latency'], rng)
+        total_ms = first_byte_ms + profile['ms_per_output_token'] * output_tokens
+        usage = {'input_tokens': input_tokens, 'output_tokens': output_tokens}
+        if cache_read or cache_write:
+            usage['cache_read_input_tokens'] = cache_read
+            usage['cache_creation_input_tokens'] = cache_write
+
+        with self._lock:
+            self._count(modelId, 'ok')
+            self._count(modelId, 'input_tokens', input_tokens)
+            self._count(modelId, 'output_tokens', output_tokens)
+            self._count(modelId, 'cache_read_tokens', cache_read)
+            self._count(modelId, 'cache_write_tokens', cache_write)
+            if fault:
+                self._count(modelId, f"fault_{fault}")
+            self._stats[modelId]['latency_ms'].append(total_ms)
+
+        message = {
+            'id': f"msg_bdrk_{uuid.UUID(int=rng.getrandbits(128)).hex[:24]}",
+            'type': 'message',
+            'role': 'assistant',
+            'model': modelId,
+            'content': [{'type': 'text', 'text': text}],
+            'stop_reason': stop_reason,
+            'stop_sequence': None,
+            'usage': usage,
+        }
+        return message, first_byte_ms, total_ms
+
+    def invoke_model(self, modelId, body, **kwargs):
+        message, _, total_ms = self._generate(modelId, body)
+        if self.time_scale:
+            time.sleep(total_ms * self.time_scale / 1000)
+        usage = message['usage']
+        return {
+            'body': StreamingBody(json.dumps(message, ensure_ascii=False).encode('utf-8')),
+            'contentType': 'application/json',
+            'ResponseMetadata': {
+                'HTTPStatusCode': 200,
+                'HTTPHeaders': {
+                    'x-amzn-bedrock-invocation-latency': str(int(total_ms)),
+                    'x-amzn-bedrock-input-token-count': str(usage['input_tokens']),
+                    'x-amzn-bedrock-output-token-count': str(usage['output_tokens']),
+                },
+            },
+        }
+
+    def invoke_model_with_response_stream(self, modelId, body, **kwargs):
+        message, first_byte_ms, total_ms = self._generate(modelId, body)
+        text = message['content'][0]['text']
+        usage = message['usage']
+        # Deltas of roughly 16 tokens, as the service batches them
+        deltas = [text[i:i + 16 * CHARS_PER_TOKEN] for i in range(0, len(text), 16 * CHARS_PER_TOKEN)] or ['']
+        start = dict(message, content=[], stop_reason=None, usage=dict(usage, output_tokens=1))
+        events = [{'type': 'message_start', 'message': start},
+                  {'type': 'content_block_start', 'index': 0, 'content_block': {'type': 'text', 'text': ''}}]
+        events += [{'type': 'content_block_delta', 'index': 0, 'delta': {'type': 'text_delta', 'text': d}} for d in deltas]
+        events += [
+            {'type': 'content_block_stop', 'index': 0},
+            {'type': 'message_delta', 'delta': {'stop_reason': message['stop_reason'], 'stop_sequence': None},
+             'usage': {'output_tokens': usage['output_tokens']}},
+            {'type': 'message_stop', 'amazon-bedrock-invocationMetrics': {
+                'inputTokenCount': usage['input_tokens'],
+                'outputTokenCount': usage['output_tokens'],
+                'invocationLatency': int(total_ms),
+                'firstByteLatency': int(first_byte_ms),
+            }},
+        ]
+        scale = self.time_scale / 1000
+        per_event_s = (total_ms - first_byte_ms) * scale / max(1, len(events) - 1)
+        return {
+            'body': EventStream(events, first_byte_ms * scale, per_event_s),
+            'contentType': 'application/json',
+            'ResponseMetadata': {'HTTPStatusCode': 200},
+        }
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Load and failure-mode benchmark for Bedrock throttling, fallback and the SOAP retry queue
+
+Runs generate-soap-from-transcript and process-soap-queue against the Bedrock emulator in
+bench/bedrock_emulator.py, with SQS and Lambda from bench/stand_ins.py and a local
+PostgREST server for the token-usage inserts. Scenarios:
+
+    determinism     identical seeds give identical responses, errors and latencies,
+                    sequentially and across threads
+    streaming       invoke_model_with_response_stream reassembles to the invoke_model
+                    response and reports the same usage
+    fallback_chain  --rpm requests per minute for --duration seconds with the primary
+                    model's RPM quota below the offered load: throttled requests must be
+                    served by the fallback model, none queued
+    daily_quota     both models run out of daily tokens: requests are queued, the queue
+                    keeps them while the quota is exhausted, and every queued session is
+                    generated once reset_day() starts a new quota day; retry amplification
+                    (extra messages and redundant generations) is reported
+
+Quotas are counted on the wall clock; --time-scale only shortens the emulated latency
+so that thousands of requests per minute fit on a few threads.
+
+Usage:
+    python3 bench/bedrock_load_bench.py [--rpm 3000] [--duration 20] [--time-scale 0.01]
+        [--workers 32] [--seed 7] [--output report.json]
+
+Exits non-zero if any scenario check fails.
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from botocore.exceptions import ClientError
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / 'aws-deployment' / 'lambda-layers' / 'medzen-runtime' / 'python'))
+
+from medzen_runtime.clients import register_client  # noqa: E402
+from medzen_runtime.config import DEFAULT_CONFIG  # noqa: E402
+from bedrock_emulator import BedrockEmulator, ManualClock  # noqa: E402
+from pipeline_bench import (  # noqa: E402
+    FUNCTIONS_DIR, SOAP_FUNCTION, EmfSink, load_module, span_rollup, summarize, synthetic_turns
+)
+from stand_ins import LocalLambda, LocalPostgREST, LocalSQS, sqs_event  # noqa: E402
+
+PRIMARY = DEFAULT_CONFIG['model_id_primary']
+FALLBACK = DEFAULT_CONFIG['model_id_fallback']
+REGIONS = (None, 'us-east-1', 'eu-central-1')
+
+
+class Harness:
+    """generate-soap and process-soap-queue wired to a fresh emulator and queue per scenario."""
+
+    def __init__(self, seed):
+        self.seed = seed
+        self.postgrest = LocalPostgREST().start()
+        os.environ.update({
+            'AWS_DEFAULT_REGION': 'us-east-1',
+            'SUPABASE_URL': self.postgrest.url,
+            'SUPABASE_SERVICE_KEY': 'bench',
+        })
+        self.generate = load_module(FUNCTIONS_DIR / 'generate-soap-from-transcript.py', 'load_generate')
+        self.queue = load_module(FUNCTIONS_DIR / 'process-soap-queue.py', 'load_queue')
+        self.generated = {}  # sessionId -> statusCodes returned through the retry queue
+        self._lock = threading.Lock()
+
+        rng = random.Random(seed)
+        self.transcripts = [
+            '\n'.join(f"{speaker}: {text}" for speaker, text in synthetic_turns('en', length, rng))
+            for length in ('short', 'medium', 'long')
+        ]
+
+    def _retried_generation(self, event, context):
+        response = self.generate.lambda_handler(event, context)
+        with self._lock:
+            self.generated.setdefault(event.get('sessionId'), []).append(response.get('statusCode'))
+        return response
+
+    def install(self, emulator):
+        self.emulator = emulator
+        self.sqs = LocalSQS()
+        self.generated = {}
+        for region in REGIONS:
+            register_client('bedrock-runtime', emulator, region)
+            register_client('sqs', self.sqs, region)
+            register_client('lambda', LocalLambda({SOAP_FUNCTION: self._retried_generation}), region)
+
+    def events(self, scenario, count):
+        return [{
+            'sessionId': f"{scenario}-{index:05d}",
+            'appointmentId': f"appt-{scenario}-{index:05d}",
+            'providerId': 'provider-bench',
+            'providerName': 'Dr. Bench',
+            'patientName': 'Bench Patient',
+            'transcript': self.transcripts[index % len(self.transcripts)],
+            'transcriptLanguage': 'en',
+        } for index in range(count)]
+
+    def drive(self, events, rpm, workers):
+        """Open-loop arrivals at `rpm`; returns ([(response, ms)], wall seconds)."""
+        interval = 60.0 / rpm
+
+        def timed(event):
+            started = time.perf_counter()
+            response = self.generate.lambda_handler(event, None)
+            return response, (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = []
+            for index, event in enumerate(events):
+                delay = started + index * interval - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(pool.submit(timed, event))
+            results = [future.result() for future in futures]
+        return results, time.perf_counter() - started
+
+    def drain(self, rounds):
+        """process-soap-queue over the whole queue, `rounds` visibility timeouts; returns messages deleted."""
+        processed = 0
+        for _ in range(rounds):
+            while True:
+                messages = self.sqs.receive_message(QueueUrl='bench', MaxNumberOfMessages=10).get('Messages', [])
+                if not messages:
+                    break
+                processed += self.queue.lambda_handler(sqs_event(messages), None).get('processed', 0)
+            self.sqs.expire_visibility()
+            if not self.sqs.depth():
+                break
+        return processed
+
+
+def outcome(response):
+    if response.get('statusCode') == 200:
+        return 'fallback' if 'Fallback' in response.get('bedrockTokens', {}).get('model', '') else 'primary'
+    if response.get('statusCode') == 429:
+        return 'queued' if response.get('queued') else 'throttled_not_queued'
+    return f"error_{response.get('statusCode')}_{response.get('error')}"
+
+
+def count(values):
+    counts = {}
+    for value in values:
+        counts[value] = counts.get(value, 0) + 1
+    return dict(sorted(counts.items()))
+
+
+def scenario_determinism(harness, args):
+    failures = []
+
+    def trail(seed):
+        clock = ManualClock()
+        emulator = BedrockEmulator(
+            models={PRIMARY: {'rpm': 8, 'throttle_rate': 0.15, 'output_faults': {'fenced_with_prose': 0.3}}},
+            seed=seed, time_scale=0, clock=clock,
+        )
+        steps = []
+        for index in range(80):
+            # Repeated bodies check that retries of one request draw fresh decisions
+            body = json.dumps({'max_tokens': 4096, 'messages': [{'role': 'user', 'content': f"Transcript {index % 25}"}]})
+            try:
+                response = emulator.invoke_model(modelId=PRIMARY, body=body)
+                message = json.loads(response['body'].read())
+                steps.append(('ok', message['id'], message['usage']['output_tokens'],
+                              response['ResponseMetadata']['HTTPHeaders']['x-amzn-bedrock-invocation-latency']))
+            except ClientError as e:
+                steps.append(('error', e.response['Error']['Message']))
+            clock.advance(2.5)
+        return steps, emulator.stats()
+
+    first, stats = trail(args.seed)
+    again, _ = trail(args.seed)
+    other, _ = trail(args.seed + 1)
+    if first != again:
+        failures.append('determinism: same seed gave a different trail')
+    if first == other:
+        failures.append('determinism: different seeds gave the same trail')
+    kinds = count(step[0] if step[0] == 'ok' else step[1] for step in first)
+    if len(kinds) < 2:
+        failures.append(f"determinism: trail did not mix successes and throttles ({kinds})")
+
+    # Without quotas every decision depends only on the request, so thread order does not matter
+    bodies = [json.dumps({'max_tokens': 4096, 'messages': [{'role': 'user', 'content': f"Note {i}"}]}) for i in range(300)]
+
+    def outcomes(threads):
+        emulator = BedrockEmulator(default={'throttle_rate': 0.3, 'unavailable_rate': 0.05}, seed=args.seed, time_scale=0)
+
+        def call(body):
+            try:
+                return json.loads(emulator.invoke_model(modelId=PRIMARY, body=body)['body'].read())['id']
+            except ClientError as e:
+                return e.response['Error']['Code']
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            return list(pool.map(call, bodies))
+
+    sequential, threaded = outcomes(1), outcomes(16)
+    if sequential != threaded:
+        failures.append('determinism: threaded run diverged from the sequential run')
+
+    return {'trail_outcomes': kinds, 'trail_stats': stats[PRIMARY], 'threaded_outcomes': count(
+        value if value.endswith('Exception') else 'ok' for value in threaded)}, failures
+
+
+def scenario_streaming(harness, args):
+    failures = []
+    request = json.dumps({
+        'anthropic_version': 'bedrock-2023-05-31',
+        'max_tokens': 4096,
+        'messages': [{'role': 'user', 'content': 'Please generate a SOAP note from the following medical transcript.\n' + harness.transcripts[1]}],
+    })
+    latency = {'latency': {'dist': 'fixed', 'ms': 500}, 'ms_per_output_token': 2.0}
+    plain = BedrockEmulator(default=latency, seed=args.seed, time_scale=args.time_scale)
+    streamed = BedrockEmulator(default=latency, seed=args.seed, time_scale=args.time_scale)
+
+    expected = json.loads(plain.invoke_model(modelId=PRIMARY, body=request)['body'].read())
+    started = time.perf_counter()
+    first_text_ms = None
+    text = []
+    events = []
+    for event in streamed.invoke_model_with_response_stream(modelId=PRIMARY, body=request)['body']:
+        chunk = json.loads(event['chunk']['bytes'])
+        events.append(chunk['type'])
+        if chunk['type'] == 'content_block_delta':
+            if first_text_ms is None:
+                first_text_ms = (time.perf_counter() - started) * 1000
+            text.append(chunk['delta']['text'])
+        elif chunk['type'] == 'message_delta':
+            output_tokens = chunk['usage']['output_tokens']
+        elif chunk['type'] == 'message_stop':
+            metrics = chunk['amazon-bedrock-invocationMetrics']
+    total_ms = (time.perf_counter() - started) * 1000
+
+    if ''.join(text) != expected['content'][0]['text']:
+        failures.append('streaming: reassembled text differs from invoke_model')
+    if output_tokens != expected['usage']['output_tokens'] or metrics['inputTokenCount'] != expected['usage']['input_tokens']:
+        failures.append('streaming: usage differs from invoke_model')
+    if events[0] != 'message_start' or events[-1] != 'message_stop':
+        failures.append(f"streaming: unexpected event order {events[:2]}...{events[-2:]}")
+
+    return {
+        'events': len(events),
+        'first_text_ms': round(first_text_ms, 2),
+        'total_ms': round(total_ms, 2),
+        'emulated_first_byte_ms': metrics['firstByteLatency'],
+        'emulated_total_ms': metrics['invocationLatency'],
+    }, failures
+
+
+def scenario_fallback_chain(harness, args):
+    failures = []
+    total = int(args.rpm * args.duration / 60)
+    harness.install(BedrockEmulator(
+        models={
+            # The primary model admits about a third of the offered load in the first minute
+            PRIMARY: {'rpm': max(1, total // 3), 'throttle_rate': 0.02,
+                      'output_faults': {'fenced_with_prose': 0.02, 'truncated_mid_plan': 0.01}},
+            FALLBACK: {'latency': {'dist': 'lognormal', 'p50_ms': 450.0, 'sigma': 0.3}},
+        },
+        default={'latency': {'dist': 'lognormal', 'p50_ms': 900.0, 'sigma': 0.35}, 'ms_per_output_token': 1.0},
+        seed=args.seed, time_scale=args.time_scale,
+    ))
+    results, wall = harness.drive(harness.events('fallback', total), args.rpm, args.workers)
+    outcomes = count(outcome(response) for response, _ in results)
+    stats = harness.emulator.stats()
+    primary_throttled = sum(v for k, v in stats.get(PRIMARY, {}).items() if k.startswith('throttled_'))
+
+    if outcomes.get('queued') or outcomes.get('throttled_not_queued'):
+        failures.append(f"fallback_chain: requests queued although the fallback had capacity ({outcomes})")
+    if stats.get(FALLBACK, {}).get('requests', 0) != primary_throttled:
+        failures.append(f"fallback_chain: {primary_throttled} primary throttles but {stats.get(FALLBACK, {}).get('requests', 0)} fallback calls")
+    errors = {k: v for k, v in outcomes.items() if k.startswith('error_')}
+    if errors:
+        failures.append(f"fallback_chain: handler errors {errors}")
+    achieved = total / wall * 60
+    if achieved < args.rpm * 0.9:
+        failures.append(f"fallback_chain: offered {args.rpm} rpm but sustained {achieved:.0f}")
+
+    return {
+        'requests': total,
+        'offered_rpm': args.rpm,
+        'achieved_rpm': round(achieved, 1),
+        'outcomes': outcomes,
+        'handler_latency': summarize([ms for _, ms in results]),
+        'emulator': stats,
+    }, failures
+
+
+def scenario_daily_quota(harness, args):
+    failures = []
+    requests = 60
+    # Enough daily tokens for a few notes per model
+    harness.install(BedrockEmulator(
+        default={'tokens_per_day': 60000, 'latency': {'dist': 'fixed', 'ms': 300}},
+        seed=args.seed, time_scale=args.time_scale,
+    ))
+    results, _ = harness.drive(harness.events('quota', requests), args.rpm, min(args.workers, 8))
+    outcomes = count(outcome(response) for response, _ in results)
+    queued_sessions = {response['sessionId'] for response, _ in results if response.get('statusCode') == 429}
+    depth = harness.sqs.depth()
+    if outcomes.get('throttled_not_queued'):
+        failures.append(f"daily_quota: throttled requests were not queued ({outcomes})")
+    if depth != len(queued_sessions) or not queued_sessions:
+        failures.append(f"daily_quota: {len(queued_sessions)} sessions throttled but queue depth {depth}")
+
+    # Quota still exhausted: process-soap-queue keeps the original messages
+    sent_before = harness.sqs.sent
+    deleted_while_exhausted = harness.drain(rounds=1)
+    depth_exhausted = harness.sqs.depth()
+    if depth_exhausted < len(queued_sessions):
+        failures.append(f"daily_quota: queue depth {depth_exhausted} below {len(queued_sessions)} queued sessions while exhausted")
+
+    # Next quota day: the queue drains
+    harness.emulator.reset_day()
+    harness.emulator.configure(PRIMARY, tokens_per_day=None)
+    deleted_after_reset = harness.drain(rounds=args.drain_rounds)
+    final_depth = harness.sqs.depth()
+    if final_depth:
+        failures.append(f"daily_quota: {final_depth} messages left after the quota reset")
+    recovered = {session for session, codes in harness.generated.items() if 200 in codes}
+    if not queued_sessions <= recovered:
+        failures.append(f"daily_quota: {len(queued_sessions - recovered)} queued sessions never generated")
+    generations = sum(codes.count(200) for codes in harness.generated.values())
+
+    return {
+        'requests': requests,
+        'outcomes': outcomes,
+        'queued_sessions': len(queued_sessions),
+        'queue_depth_while_exhausted': depth_exhausted,
+        # A re-throttled retry enqueues a copy while process-soap-queue keeps the original;
+        # copies are redelivered at once and dropped when they reach max_retry_attempts
+        'messages_added_while_exhausted': harness.sqs.sent - sent_before,
+        'dropped_at_max_retries': deleted_while_exhausted,
+        'deleted_after_reset': deleted_after_reset,
+        'successful_retried_generations': generations,
+        'redundant_generations': generations - len(recovered),
+        'emulator': harness.emulator.stats(),
+    }, failures
+
+
+SCENARIOS = {
+    'determinism': scenario_determinism,
+    'streaming': scenario_streaming,
+    'fallback_chain': scenario_fallback_chain,
+    'daily_quota': scenario_daily_quota,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rpm', type=int, default=3000, help='offered load for the fallback scenario')
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds of offered load')
+    parser.add_argument('--time-scale', type=float, default=0.01, help='real seconds per emulated second of latency')
+    parser.add_argument('--workers', type=int, default=32, help='concurrent handler invocations')
+    parser.add_argument('--drain-rounds', type=int, default=8, help='visibility timeouts allowed to drain the queue')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help='run only these scenarios')
+    parser.add_argument('--output', help='write JSON report to this file')
+    args = parser.parse_args()
+
+    sink = EmfSink()
+    logging.disable(logging.CRITICAL)
+    report = {'benchmark': 'bedrock_load', 'seed': args.seed, 'time_scale': args.time_scale, 'scenarios': {}}
+    failures = []
+    harness = None
+    try:
+        with contextlib.redirect_stdout(sink):
+            harness = Harness(args.seed)
+            for name in args.scenario or SCENARIOS:
+                started = time.perf_counter()
+                result, found = SCENARIOS[name](harness, args)
+                result['wall_s'] = round(time.perf_counter() - started, 3)
+                report['scenarios'][name] = result
+                failures += found
+    finally:
+        logging.disable(logging.NOTSET)
+        if harness:
+            harness.postgrest.stop()
+
+    report['spans'] = {key: value for key, value in span_rollup(sink.records).items() if key.startswith('bedrock/')}
+    report['failures'] = failures
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Cold-start (module init) benchmark for the transcription router and SOAP workflow Lambdas
+
+Each Lambda module is loaded in a fresh interpreter under `python -X importtime`, the
+way the Lambda runtime imports a handler on a cold start. The report gives the module init
+time (median of --runs) and the heaviest top-level imports. With --ref, the same files
+are also loaded from that git revision (e.g. the commit before the lazy client registry)
+so the delta can be read off directly.
+
+AWS credentials are faked and instance-metadata lookups are disabled, so client creation
+costs only what it would cost locally (service model loading and signer setup); in Lambda,
+credential resolution adds to the eager figure.
+
+Usage:
+    python3 bench/cold_start_bench.py [--runs 5] [--ref <git-ref>] [--output report.json]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+LAYER_PATH = REPO_ROOT / 'aws-deployment' / 'lambda-layers' / 'medzen-runtime' / 'python'
+
+TARGETS = [
+    'aws-lambda/transcription-router/index.py',
+    'aws-lambda/transcription-router/callback_handler.py',
+    'aws-deployment/lambda-functions/validate-session-supabase.py',
+    'aws-deployment/lambda-functions/fetch-transcript.py',
+    'aws-deployment/lambda-functions/enrich-metadata.py',
+    'aws-deployment/lambda-functions/generate-soap-from-transcript.py',
+    'aws-deployment/lambda-functions/parse-bedrock-response.py',
+    'aws-deployment/lambda-functions/save-soap-to-supabase.py',
+    'aws-deployment/lambda-functions/update-session-status-supabase.py',
+    'aws-deployment/lambda-functions/update-supabase-soap.py',
+    'aws-deployment/lambda-functions/send-notification.py',
+    'aws-deployment/lambda-functions/process-soap-queue.py',
+    'aws-deployment/lambda-functions/monitor-bedrock-usage.py',
+]
+
+# Loads one handler module the way the Lambda runtime does and prints the init time
+LOADER = """
+import importlib.util, json, sys, time
+started = time.perf_counter()
+spec = importlib.util.spec_from_file_location('handler', sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+sys.stderr.write('-- handler init --\\n')
+spec.loader.exec_module(module)
+print(json.dumps({'init_ms': (time.perf_counter() - started) * 1000}))
+"""
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def lambda_env():
+    env = dict(os.environ)
+    env.update({
+        'PYTHONPATH': str(LAYER_PATH),
+        'PYTHONDONTWRITEBYTECODE': '1',
+        'AWS_ACCESS_KEY_ID': 'bench',
+        'AWS_SECRET_ACCESS_KEY': 'bench',
+        'AWS_DEFAULT_REGION': 'us-east-1',
+        'AWS_REGION': 'us-east-1',
+        'AWS_EC2_METADATA_DISABLED': 'true',
+        'SUPABASE_URL': 'https://bench.supabase.co',
+        'SUPABASE_SERVICE_KEY': 'bench',
+    })
+    return env
+
+
+def measure(path, runs):
+    """Median init time and top-level import costs for one module file."""
+    init_times = []
+    imports = {}
+    error = None
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', LOADER, str(path)],
+            capture_output=True, text=True, env=lambda_env(), cwd=str(path.parent)
+        )
+        if proc.returncode != 0:
+            error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}"
+            break
+        init_times.append(json.loads(proc.stdout.strip().splitlines()[-1])['init_ms'])
+        # Skip interpreter startup and the loader's own imports
+        handler_lines = proc.stderr.split('-- handler init --\n', 1)[-1]
+        for line in handler_lines.splitlines():
+            match = IMPORTTIME_RE.match(line)
+            # Only imports made directly by the handler module (one level of indentation)
+            if match and len(match.group(3)) == 1:
+                imports.setdefault(match.group(4), []).append(int(match.group(2)) / 1000)
+
+    if error:
+        return {'error': error}
+
+    heaviest = sorted(((name, statistics.median(ms)) for name, ms in imports.items()), key=lambda x: -x[1])
+    return {
+        'init_ms': round(statistics.median(init_times), 1),
+        'top_imports_ms': {name: round(ms, 1) for name, ms in heaviest[:5]},
+    }
+
+
+def files_at_ref(ref, workdir):
+    """Write each target as it was at a git revision into workdir; returns {target: path}."""
+    paths = {}
+    for target in TARGETS:
+        proc = subprocess.run(['git', 'show', f"{ref}:{target}"], capture_output=True, cwd=str(REPO_ROOT))
+        if proc.returncode != 0:
+            continue
+        path = Path(workdir) / target
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(proc.stdout)
+        paths[target] = path
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per module')
+    parser.add_argument('--ref', help='git revision to compare against')
+    parser.add_argument('--output', help='write JSON report to this file')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        baseline = files_at_ref(args.ref, workdir) if args.ref else {}
+        for target in TARGETS:
+            current = measure(REPO_ROOT / target, args.runs)
+            entry = {'current': current}
+            if target in baseline:
+                entry['ref'] = measure(baseline[target], args.runs)
+                if 'init_ms' in current and 'init_ms' in entry['ref']:
+                    entry['delta_ms'] = round(current['init_ms'] - entry['ref']['init_ms'], 1)
+            results[target] = entry
+            print(f"{target}: {json.dumps(entry.get('delta_ms', current.get('init_ms')))}", file=sys.stderr)
+
+    report = {
+        'benchmark': 'cold_start',
+        'python': sys.version.split()[0],
+        'runs': args.runs,
+        'ref': args.ref,
+        'modules': results,
+    }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Behaviour checks and latency benchmark for medzen_runtime.config
+
+Runs the config and prompt loader against an in-process S3 stand-in that implements
+object versions, ETags and If-None-Match. The checks cover bundled defaults,
+memoization between refreshes, 304 revalidation, picking up a changed object,
+pinned prompt versions and fallback when S3 fails. It then compares lookup latency
+with a plain GET per request, using a simulated S3 round trip.
+
+Usage:
+    python3 bench/config_loader_bench.py [--lookups 10000] [--s3-latency-ms 25] [--output report.json]
+
+Exits non-zero if any check fails.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / 'aws-deployment' / 'lambda-layers' / 'medzen-runtime' / 'python'))
+
+from medzen_runtime import config  # noqa: E402
+from medzen_runtime.clients import register_client  # noqa: E402
+from stand_ins import LocalS3  # noqa: E402
+
+BUCKET = 'medzen-config-bench'
+PROMPT = 'soap-generation-system-prompt.md'
+
+
+def use_s3(s3):
+    """Route the loader to a stand-in bucket and start from a cold cache."""
+    register_client('s3', s3, config.CONFIG_BUCKET_REGION)
+    config.reset_artifacts()
+
+
+def run_checks():
+    """Return a list of failed check descriptions."""
+    failures = []
+
+    def check(condition, description):
+        if not condition:
+            failures.append(description)
+
+    # No bucket configured: bundled defaults, no S3 access at all
+    s3 = LocalS3(BUCKET)
+    config.CONFIG_BUCKET = ''
+    use_s3(s3)
+    check(config.get_config('max_retry_attempts') == config.DEFAULT_CONFIG['max_retry_attempts'], 'bundled default config')
+    check(config.get_prompt(PROMPT, 'bundled prompt') == 'bundled prompt', 'bundled default prompt')
+    check(s3.calls['get'] == 0, 'no S3 calls without a bucket')
+
+    # Bucket configured: fetched once, then served from memory until the refresh interval
+    config.CONFIG_BUCKET = BUCKET
+    config.REFRESH_SECONDS = 300
+    use_s3(s3)
+    s3.put_object(config.CONFIG_KEY, json.dumps({'max_retry_attempts': 7}))
+    s3.put_object(config.PROMPT_PREFIX + PROMPT, 'prompt v1')
+    for _ in range(100):
+        value = config.get_config('max_retry_attempts')
+        prompt = config.get_prompt(PROMPT, 'bundled prompt')
+    check(value == 7, 'S3 config override applied')
+    check(config.get_config('model_id_primary') == config.DEFAULT_CONFIG['model_id_primary'], 'defaults kept for keys not overridden')
+    check(prompt == 'prompt v1', 'S3 prompt loaded')
+    check(s3.calls['get'] == 2, f"one GET per artifact within the refresh interval (got {s3.calls['get']})")
+
+    # Refresh due: unchanged objects revalidate with 304, changed objects are re-read
+    config.REFRESH_SECONDS = 0
+    config.get_prompt(PROMPT, 'bundled prompt')
+    check(s3.calls['not_modified'] >= 1, 'unchanged artifact revalidated with If-None-Match')
+    s3.put_object(config.PROMPT_PREFIX + PROMPT, 'prompt v2')
+    check(config.get_prompt(PROMPT, 'bundled prompt') == 'prompt v2', 'changed prompt picked up without redeploy')
+
+    # Pinned version: immutable, never re-fetched even when a refresh is due
+    s3.put_object(config.CONFIG_KEY, json.dumps({'prompt_versions': {PROMPT: 'v1'}}))
+    config.REFRESH_SECONDS = 300
+    use_s3(s3)
+    check(config.get_prompt(PROMPT, 'bundled prompt') == 'prompt v1', 'pinned prompt version served')
+    config.REFRESH_SECONDS = 0
+    before = s3.calls['get']
+    config.get_prompt(PROMPT, 'bundled prompt')
+    pinned_gets = s3.calls['get'] - before
+    check(pinned_gets == 1, f"pinned prompt not re-fetched (only the config is revalidated, got {pinned_gets} GETs)")
+
+    # Transient failure fetching a pinned version: bundled until the next refresh, then the pin
+    use_s3(s3)
+    config.REFRESH_SECONDS = 300
+    config.get_config()
+    s3.fail = True
+    check(config.get_prompt(PROMPT, 'bundled prompt') == 'bundled prompt', 'pinned prompt falls back while S3 fails')
+    s3.fail = False
+    before = s3.calls['get']
+    config.get_prompt(PROMPT, 'bundled prompt')
+    check(s3.calls['get'] == before, 'bundled fallback for a pinned prompt not retried before the refresh interval')
+    config.REFRESH_SECONDS = 0
+    check(config.get_prompt(PROMPT, 'bundled prompt') == 'prompt v1', 'pinned prompt loaded once S3 recovers')
+
+    # Outage: last good values are kept; cold containers fall back to bundled defaults
+    s3.fail = True
+    check(config.get_prompt(PROMPT, 'bundled prompt') == 'prompt v1', 'last good prompt kept during outage')
+    use_s3(s3)
+    check(config.get_config('max_retry_attempts') == config.DEFAULT_CONFIG['max_retry_attempts'], 'cold start falls back to defaults')
+    check(config.get_prompt(PROMPT, 'bundled prompt') == 'bundled prompt', 'cold start falls back to bundled prompt')
+
+    return failures
+
+
+def time_lookups(func, count):
+    samples = []
+    for _ in range(count):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1_000_000)
+    return samples
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'calls': len(ordered),
+        'p50_us': round(statistics.median(ordered), 2),
+        'p99_us': round(ordered[int(len(ordered) * 0.99) - 1], 2),
+        'mean_us': round(statistics.fmean(ordered), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--lookups', type=int, default=10000)
+    parser.add_argument('--s3-latency-ms', type=float, default=25.0, help='simulated S3 GET round trip')
+    parser.add_argument('--output', help='write JSON report to this file')
+    args = parser.parse_args()
+
+    failures = run_checks()
+
+    s3 = LocalS3(BUCKET, latency_s=args.s3_latency_ms / 1000)
+    s3.put_object(config.CONFIG_KEY, json.dumps({'max_retry_attempts': 7}))
+    s3.put_object(config.PROMPT_PREFIX + PROMPT, (REPO_ROOT / 'aws-deployment' / 'prompts' / PROMPT).read_text(encoding='utf-8'))
+    config.CONFIG_BUCKET = BUCKET
+    config.REFRESH_SECONDS = 300
+    use_s3(s3)
+    config.get_prompt(PROMPT, '')  # cold start
+
+    cached = time_lookups(lambda: config.get_prompt(PROMPT, ''), args.lookups)
+    per_request_count = max(1, min(args.lookups, 40))
+    per_request = time_lookups(
+        lambda: s3.get_object(Bucket=BUCKET, Key=config.PROMPT_PREFIX + PROMPT)['Body'].read(),
+        per_request_count
+    )
+
+    report = {
+        'benchmark': 'config_loader',
+        'checks_failed': len(failures),
+        'simulated_s3_latency_ms': args.s3_latency_ms,
+        'timings': {
+            'memoized_lookup': summarize(cached),
+            'get_per_request': summarize(per_request),
+        },
+        'artifacts': config.artifact_status(),
+    }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
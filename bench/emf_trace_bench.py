@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+EMF output checks and overhead benchmark for medzen_runtime.tracing
+
+Captures the stdout of tracing spans and of instrumented handlers run against in-process
+stand-ins (Supabase connection pool, Bedrock, Transcribe), parses every Embedded Metric
+Format line and checks it against the EMF specification: each declared dimension and
+metric is present at the top level with the right type, within the CloudWatch limits.
+It then checks the span semantics (errors, tolerated failures, skipped dimensions,
+disabled output), that the expected service spans carry their model / language / table
+dimensions, and measures the cost of one span. The captured Latency values are rolled
+up into p50/p95/p99 per service and operation, as a dashboard would show them.
+
+Usage:
+    python3 bench/emf_trace_bench.py [--spans 20000] [--output report.json]
+
+Exits non-zero if any check fails.
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / 'aws-deployment' / 'lambda-layers' / 'medzen-runtime' / 'python'))
+
+os.environ.update({
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'AWS_REGION': 'eu-central-1',
+    'SUPABASE_URL': 'https://bench.supabase.co',
+    'SUPABASE_SERVICE_KEY': 'bench',
+})
+
+from medzen_runtime import supabase, tracing  # noqa: E402
+from medzen_runtime.clients import register_client  # noqa: E402
+from medzen_runtime.prompt_cache import cache_eligible, cached_system  # noqa: E402
+from medzen_runtime.tracing import span  # noqa: E402
+
+FUNCTIONS_DIR = REPO_ROOT / 'aws-deployment' / 'lambda-functions'
+ROUTER_DIR = REPO_ROOT / 'aws-lambda' / 'transcription-router'
+SEED_NOTE = BENCH_DIR / 'corpus' / 'llm_json' / 'soap_note_en.json'
+
+EMF_UNITS = {
+    'Seconds', 'Microseconds', 'Milliseconds', 'Bytes', 'Kilobytes', 'Megabytes', 'Gigabytes',
+    'Terabytes', 'Bits', 'Kilobits', 'Megabits', 'Gigabits', 'Terabits', 'Percent', 'Count',
+    'Bytes/Second', 'Kilobytes/Second', 'Megabytes/Second', 'Gigabytes/Second', 'Terabytes/Second',
+    'Bits/Second', 'Kilobits/Second', 'Megabits/Second', 'Gigabits/Second', 'Terabits/Second',
+    'Count/Second', 'None',
+}
+
+
+def emf_problems(record):
+    """EMF specification violations in one parsed log line."""
+    problems = []
+    meta = record.get('_aws')
+    if not isinstance(meta, dict):
+        return ['missing _aws metadata']
+    if not isinstance(meta.get('Timestamp'), int):
+        problems.append('_aws.Timestamp must be an integer (epoch ms)')
+    directives = meta.get('CloudWatchMetrics')
+    if not isinstance(directives, list) or not directives:
+        return problems + ['_aws.CloudWatchMetrics must be a non-empty list']
+
+    for directive in directives:
+        if not isinstance(directive.get('Namespace'), str) or not directive['Namespace']:
+            problems.append('Namespace must be a non-empty string')
+        for dimension_set in directive.get('Dimensions', []):
+            if len(dimension_set) > 30:
+                problems.append(f"dimension set has {len(dimension_set)} > 30 dimensions")
+            for name in dimension_set:
+                if not isinstance(record.get(name), str):
+                    problems.append(f"dimension {name} is not a top-level string")
+        metrics = directive.get('Metrics', [])
+        if len(metrics) > 100:
+            problems.append(f"{len(metrics)} > 100 metrics")
+        for metric in metrics:
+            value = record.get(metric.get('Name'))
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                problems.append(f"metric {metric.get('Name')} is not a top-level number")
+            if metric.get('Unit', 'None') not in EMF_UNITS:
+                problems.append(f"metric {metric.get('Name')} has unknown unit {metric.get('Unit')}")
+    return problems
+
+
+@contextlib.contextmanager
+def captured():
+    """Collect EMF records printed inside the block (other output is dropped)."""
+    buffer = io.StringIO()
+    records = []
+    with contextlib.redirect_stdout(buffer):
+        yield records
+    for line in buffer.getvalue().splitlines():
+        if line.startswith('{') and '"_aws"' in line:
+            records.append(json.loads(line))
+
+
+def load_module(path, name):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class Response:
+    def __init__(self, status, data):
+        self.status = status
+        self.data = json.dumps(data).encode('utf-8') if data is not None else b''
+
+
+class LocalPool:
+    """Stand-in for the urllib3 pool behind medzen_runtime.supabase: routes by method and table."""
+
+    def __init__(self, routes):
+        self.routes = routes
+
+    def request(self, method, url, body=None, headers=None, timeout=None):
+        for (route_method, fragment), response in self.routes.items():
+            if route_method == method and fragment in url:
+                return response
+        return Response(404, {'message': 'no route'})
+
+
+class StreamingBody:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def read(self):
+        return json.dumps(self.payload).encode('utf-8')
+
+
+class LocalBedrock:
+    """Returns a fixed Messages API response with usage."""
+
+    class exceptions:
+        class ThrottlingException(Exception):
+            pass
+
+    def __init__(self, text):
+        self.text = text
+
+    def invoke_model(self, **kwargs):
+        return {'body': StreamingBody({
+            'content': [{'type': 'text', 'text': self.text}],
+            'usage': {'input_tokens': 5200, 'output_tokens': 2100, 'cache_read_input_tokens': 4800},
+        })}
+
+
+class LocalTranscribe:
+    def start_medical_transcription_job(self, **kwargs):
+        return {'MedicalTranscriptionJob': {'MedicalTranscriptionJobName': kwargs['MedicalTranscriptionJobName']}}
+
+    def start_transcription_job(self, **kwargs):
+        return {'TranscriptionJob': {'TranscriptionJobName': kwargs['TranscriptionJobName']}}
+
+
+def find(records, service, operation):
+    return [r for r in records if r.get('Service') == service and r.get('Operation') == operation]
+
+
+def run_checks():
+    """Return (failed check descriptions, all captured EMF records)."""
+    failures = []
+    collected = []
+
+    def check(condition, description):
+        if not condition:
+            failures.append(description)
+
+    # Span semantics
+    with captured() as records:
+        with span('bedrock', 'invoke_model', model='model-a', language=None) as s:
+            s.metric('InputTokens', 10)
+            s.set('JobName', 'job-1')
+    check(len(records) == 1, 'one EMF line per span')
+    record = records[0]
+    check(record['Model'] == 'model-a' and 'Language' not in record, 'None dimensions are skipped')
+    check(record['Errors'] == 0 and record['InputTokens'] == 10 and record['JobName'] == 'job-1', 'metrics and properties emitted')
+    check(
+        record['_aws']['CloudWatchMetrics'][0]['Dimensions'] == [['Service', 'Operation'], ['Service', 'Operation', 'Model']],
+        'service roll-up plus per-model dimension set'
+    )
+    collected += records
+
+    with captured() as records:
+        try:
+            with span('supabase', 'GET', table='users'):
+                raise TimeoutError('bench')
+        except TimeoutError:
+            pass
+        else:
+            failures.append('span swallowed the exception')
+        with span('notification', 'fcm_send') as s:
+            s.fail('HTTP 503')
+    check(records[0]['Errors'] == 1 and records[0]['Error'] == 'TimeoutError', 'exceptions count as errors')
+    check(records[1]['Errors'] == 1 and records[1]['Error'] == 'HTTP 503', 'tolerated failures count as errors')
+    collected += records
+
+    tracing.METRICS_ENABLED = False
+    with captured() as records:
+        with span('s3', 'get_object'):
+            pass
+    tracing.METRICS_ENABLED = True
+    check(not records, 'MEDZEN_METRICS_ENABLED=false silences spans')
+
+    # Workflow Lambdas over the shared Supabase client
+    supabase._pool = LocalPool({
+        ('GET', 'video_call_sessions'): Response(200, [{'id': 's1', 'appointment_id': 'a1'}]),
+        ('GET', 'users'): Response(200, [{'id': 'p1', 'fcm_token': None}]),
+        ('GET', 'soap_notes'): Response(200, [{'appointment_id': 'a1', 'chief_complaint': 'cough'}]),
+        ('POST', 'call_notifications'): Response(201, [{'id': 'n1'}]),
+    })
+    validate = load_module(FUNCTIONS_DIR / 'validate-session-supabase.py', 'validate_session')
+    notify = load_module(FUNCTIONS_DIR / 'send-notification.py', 'send_notification')
+    with captured() as records:
+        validate.lambda_handler({'sessionId': 's1'}, None)
+        validate.lambda_handler({}, None)
+        notify.lambda_handler({'type': 'soap_generated', 'providerId': 'p1', 'soapNoteId': 'n1', 'sessionId': 's1'}, None)
+    gets = find(records, 'supabase', 'GET')
+    check(gets and gets[0].get('Table') == 'video_call_sessions' and gets[0].get('HttpStatus') == 200, 'Supabase span with Table dimension')
+    check(len(find(records, 'supabase', 'POST')) == 1, 'Supabase insert span')
+    invocations = find(records, 'lambda', 'invocation')
+    check(len(invocations) == 3 and all('ColdStart' in r for r in invocations), 'invocation span per handler call')
+    check(invocations[1]['StatusCode'] == 400 and invocations[1]['Errors'] == 0, '400 responses are not counted as errors')
+    collected += records
+
+    # Bedrock call and JSON parsing in generate-soap
+    register_client('bedrock-runtime', LocalBedrock(SEED_NOTE.read_text(encoding='utf-8')), 'us-east-1')
+    generate = load_module(FUNCTIONS_DIR / 'generate-soap-from-transcript.py', 'generate_soap')
+    with captured() as records:
+        generate.invoke_bedrock('Provider: what brings you in?\nPatient: a cough for three days.')
+    bedrock = find(records, 'bedrock', 'invoke_model')
+    check(bedrock and bedrock[0].get('Model', '').startswith('us.anthropic'), 'Bedrock span with Model dimension')
+    check(bedrock and bedrock[0].get('CacheReadTokens') == 4800, 'token metrics on the Bedrock span')
+    # The bundled system prompt reaches the cache minimum; a short one does not
+    check(bedrock and bedrock[0].get('CacheEligible') == 1, 'bundled prompt not reported as cacheable')
+    check(not cache_eligible({'system': cached_system('Return a SOAP note as JSON.')}), 'short prompt reported as cacheable')
+    check(find(records, 'json', 'parse_soap_note'), 'JSON parse span')
+    collected += records
+
+    # Transcribe start in the transcription router
+    register_client('transcribe', LocalTranscribe())
+    router = load_module(ROUTER_DIR / 'index.py', 'router_index')
+    supabase._pool = LocalPool({('PATCH', 'video_call_sessions'): Response(204, None)})
+    with captured() as records:
+        router.lambda_handler({'s3_uri': 's3://bench/audio/a1.mp4', 'language_code': 'fr', 'appointment_id': 'a1'}, None)
+        router.lambda_handler({'s3_uri': 's3://bench/audio/a2.wav', 'language_code': 'en', 'appointment_id': 'a2'}, None)
+    starts = find(records, 'transcribe', 'start_transcription_job') + find(records, 'transcribe', 'start_medical_transcription_job')
+    check({r.get('Language') for r in starts} == {'fr-FR', 'en-US'}, 'Transcribe start spans with Language dimension')
+    check(len(find(records, 'supabase', 'PATCH')) == 2, 'router stores results through the Supabase span')
+    collected += records
+
+    for record in collected:
+        for problem in emf_problems(record):
+            failures.append(f"{record.get('Service')}/{record.get('Operation')}: {problem}")
+
+    return failures, collected
+
+
+def percentiles(records):
+    """p50/p95/p99 of Latency per service/operation, the way a CloudWatch dashboard rolls it up."""
+    groups = {}
+    for record in records:
+        groups.setdefault(f"{record['Service']}/{record['Operation']}", []).append(record['Latency'])
+    report = {}
+    for key, values in sorted(groups.items()):
+        ordered = sorted(values)
+        pick = lambda q: ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]  # noqa: E731
+        report[key] = {'count': len(ordered), 'p50_ms': pick(0.5), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99)}
+    return report
+
+
+def span_overhead(count):
+    """Mean cost of one span including JSON serialization, with stdout discarded."""
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(count):
+            started = time.perf_counter()
+            with span('supabase', 'GET', table='video_call_sessions') as s:
+                s.set('HttpStatus', 200)
+            samples.append((time.perf_counter() - started) * 1_000_000)
+    ordered = sorted(samples)
+    return {
+        'spans': count,
+        'p50_us': round(statistics.median(ordered), 2),
+        'p99_us': round(ordered[int(len(ordered) * 0.99) - 1], 2),
+        'mean_us': round(statistics.fmean(ordered), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--spans', type=int, default=20000, help='spans timed for the overhead figure')
+    parser.add_argument('--output', help='write JSON report to this file')
+    args = parser.parse_args()
+
+    failures, records = run_checks()
+
+    report = {
+        'benchmark': 'emf_trace',
+        'checks_failed': len(failures),
+        'emf_lines_checked': len(records),
+        'span_overhead': span_overhead(args.spans),
+        'latency_rollup': percentiles(records),
+    }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Duplicate-request checks and overhead benchmark for idempotent transcription starts
+
+Runs the transcription router against in-process S3, Transcribe and DynamoDB stand-ins
+(bench/stand_ins.py) with the medzen_runtime.idempotency registry enabled. Scenarios:
+
+    burst           --burst identical requests released at once start exactly one job;
+                    the rest are answered from the registry
+    retry           a client retry after the start returns the same job
+    new_etag        re-uploading the recording under the same key starts a new job
+    language        the same recording in another language starts a new job
+    failed_start    a start that fails releases the key; the retry starts a fresh job
+    failed_job      a job reported FAILED by the callback releases the key
+    no_registry     without a table, duplicate Transcribe starts collide on the job name
+    outage          with DynamoDB failing, requests still start (once) instead of erroring
+
+The report counts jobs started, duplicates avoided (from the DuplicatesAvoided EMF metric)
+and the latency the registry adds per request, with a simulated DynamoDB round trip.
+
+Usage:
+    python3 bench/idempotency_bench.py [--burst 25] [--requests 200] [--dynamodb-latency-ms 5]
+        [--output report.json]
+
+Exits non-zero if any check fails.
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+ROUTER_DIR = REPO_ROOT / 'aws-lambda' / 'transcription-router'
+sys.path.insert(0, str(REPO_ROOT / 'aws-deployment' / 'lambda-layers' / 'medzen-runtime' / 'python'))
+
+os.environ.update({
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'AWS_REGION': 'eu-central-1',
+    'OUTPUT_BUCKET': 'medzen-transcriptions-bench',
+    'MEDZEN_IDEMPOTENCY_TABLE': 'medzen-transcription-idempotency-bench',
+})
+os.environ.pop('SUPABASE_URL', None)
+
+from medzen_runtime import idempotency  # noqa: E402
+from medzen_runtime.clients import register_client  # noqa: E402
+from pipeline_bench import EmfSink, load_module, summarize  # noqa: E402
+from stand_ins import LocalDynamoDB, LocalS3, LocalTranscribe  # noqa: E402
+
+RECORDINGS_BUCKET = 'medzen-chime-recordings-bench'
+REGIONS = (None, 'us-east-1', 'eu-central-1')
+
+
+class Harness:
+    """Router and callback wired to fresh stand-ins."""
+
+    def __init__(self, args):
+        self.s3 = LocalS3(RECORDINGS_BUCKET)
+        self.transcribe = LocalTranscribe(self.s3, latency_s=args.transcribe_latency_ms / 1000)
+        self.dynamodb = LocalDynamoDB(latency_s=args.dynamodb_latency_ms / 1000)
+        for region in REGIONS:
+            register_client('s3', self.s3, region)
+            register_client('transcribe', self.transcribe, region)
+            register_client('dynamodb', self.dynamodb, region)
+        self.router = load_module(ROUTER_DIR / 'index.py', 'bench_router')
+        self.callback = load_module(ROUTER_DIR / 'callback_handler.py', 'bench_callback')
+        self.uploads = 0
+
+    def upload(self, name, body=None):
+        """Store a recording and return its s3:// URI."""
+        self.uploads += 1
+        key = f"recordings/{name}.mp4"
+        self.s3.put_object(Bucket=RECORDINGS_BUCKET, Key=key, Body=body or f"audio {name} {self.uploads}".encode())
+        return f"s3://{RECORDINGS_BUCKET}/{key}"
+
+    def request(self, s3_uri, appointment_id, language='en'):
+        response = self.router.lambda_handler(
+            {'s3_uri': s3_uri, 'appointment_id': appointment_id, 'language_code': language}, None
+        )
+        return response['statusCode'], json.loads(response['body'])
+
+    def burst(self, count, s3_uri, appointment_id):
+        """Release `count` identical requests at the same moment."""
+        barrier = threading.Barrier(count)
+
+        def one(_):
+            barrier.wait()
+            return self.request(s3_uri, appointment_id)
+
+        with ThreadPoolExecutor(max_workers=count) as pool:
+            return list(pool.map(one, range(count)))
+
+    def jobs_for(self, appointment_id):
+        return sorted(name for name in self.transcribe.jobs if f"-{appointment_id}-" in name)
+
+
+def duplicates_avoided(records, start):
+    return sum(record.get('DuplicatesAvoided', 0) for record in records[start:])
+
+
+def run_checks(harness, sink, args):
+    """Return (scenario results, failed check descriptions)."""
+    failures = []
+    results = {}
+
+    def check(condition, description):
+        if not condition:
+            failures.append(description)
+
+    def job_name(body):
+        return body.get('data', {}).get('transcription', {}).get('job_name')
+
+    def deduplicated(body):
+        return body.get('data', {}).get('deduplicated', False)
+
+    # burst: exactly one job for N concurrent identical requests
+    uri = harness.upload('burst')
+    mark = len(sink.records)
+    responses = harness.burst(args.burst, uri, 'apptburst')
+    jobs = harness.jobs_for('apptburst')
+    avoided = duplicates_avoided(sink.records, mark)
+    results['burst'] = {
+        'requests': args.burst,
+        'jobs_started': len(jobs),
+        'deduplicated_responses': sum(deduplicated(body) for _, body in responses),
+        'duplicates_avoided_metric': avoided,
+    }
+    check(all(status == 200 for status, _ in responses), 'burst: all requests succeed')
+    check(len(jobs) == 1, f"burst: one job started (got {len(jobs)})")
+    check(avoided == args.burst - 1, f"burst: DuplicatesAvoided == {args.burst - 1} (got {avoided})")
+    check({job_name(body) for _, body in responses} <= {jobs[0] if jobs else None, None}, 'burst: no other job names')
+
+    # retry: the first request's job comes back
+    status, body = harness.request(uri, 'apptburst')
+    results['retry'] = {'deduplicated': deduplicated(body), 'job_name': job_name(body)}
+    check(status == 200 and deduplicated(body) and job_name(body) == jobs[0], 'retry: same job returned')
+    check(len(harness.jobs_for('apptburst')) == 1, 'retry: no new job')
+
+    # new_etag: a re-upload under the same key is a new request
+    harness.upload('burst', b're-recorded audio')
+    status, body = harness.request(uri, 'apptburst')
+    results['new_etag'] = {'deduplicated': deduplicated(body), 'jobs': len(harness.jobs_for('apptburst'))}
+    check(not deduplicated(body) and len(harness.jobs_for('apptburst')) == 2, 'new_etag: new job started')
+
+    # language: same recording, different language
+    status, body = harness.request(uri, 'apptburst', 'fr')
+    results['language'] = {'deduplicated': deduplicated(body), 'job_name': job_name(body)}
+    check(not deduplicated(body) and 'medzen-standard-apptburst-' in (job_name(body) or ''), 'language: new job started')
+
+    # failed_start: the key is released and the retry runs as attempt 1
+    uri = harness.upload('failstart')
+    harness.transcribe.fail = True
+    status, _ = harness.request(uri, 'apptfailstart')
+    harness.transcribe.fail = False
+    retry_status, body = harness.request(uri, 'apptfailstart')
+    key = idempotency.idempotency_key('apptfailstart', uri, harness.router.get_object_etag(uri), 'en')
+    results['failed_start'] = {'first_status': status, 'retry_status': retry_status, 'job_name': job_name(body)}
+    check(status == 500, 'failed_start: first request fails')
+    check(retry_status == 200 and not deduplicated(body), 'failed_start: retry starts a job')
+    check(job_name(body) == f"medzen-medical-apptfailstart-{idempotency.job_suffix(key, 1)}", 'failed_start: retry is attempt 1')
+
+    # failed_job: the callback's failure handling releases the key
+    uri = harness.upload('failjob')
+    _, body = harness.request(uri, 'apptfailjob')
+    harness.callback.handle_failed_job(job_name(body), is_medical=True)
+    _, retry = harness.request(uri, 'apptfailjob')
+    results['failed_job'] = {'first_job': job_name(body), 'retry_job': job_name(retry)}
+    check(not deduplicated(retry) and job_name(retry) != job_name(body), 'failed_job: retry starts a new job')
+
+    # no_registry: deterministic job names still collapse concurrent Transcribe starts
+    table = idempotency.TABLE_NAME
+    idempotency.TABLE_NAME = ''
+    try:
+        uri = harness.upload('noregistry')
+        mark = len(sink.records)
+        responses = harness.burst(args.burst, uri, 'apptnoregistry')
+        jobs = harness.jobs_for('apptnoregistry')
+        avoided = duplicates_avoided(sink.records, mark)
+    finally:
+        idempotency.TABLE_NAME = table
+    results['no_registry'] = {'requests': args.burst, 'jobs_started': len(jobs), 'duplicates_avoided_metric': avoided}
+    check(all(status == 200 for status, _ in responses), 'no_registry: all requests succeed')
+    check(len(jobs) == 1, f"no_registry: one job started (got {len(jobs)})")
+    check(avoided == args.burst - 1, f"no_registry: DuplicatesAvoided == {args.burst - 1} (got {avoided})")
+
+    # outage: DynamoDB errors never block a transcription
+    uri = harness.upload('outage')
+    harness.dynamodb.fail = True
+    try:
+        responses = harness.burst(4, uri, 'apptoutage')
+    finally:
+        harness.dynamodb.fail = False
+    results['outage'] = {'statuses': sorted({status for status, _ in responses}), 'jobs_started': len(harness.jobs_for('apptoutage'))}
+    check(all(status == 200 for status, _ in responses), 'outage: requests succeed without the registry')
+    check(len(harness.jobs_for('apptoutage')) == 1, 'outage: job names still de-duplicate')
+    return results, failures
+
+
+def overhead(harness, args):
+    """Router latency for unique requests with and without the registry."""
+    timings = {}
+    for label, table in (('without_registry', ''), ('with_registry', idempotency.TABLE_NAME)):
+        saved = idempotency.TABLE_NAME
+        idempotency.TABLE_NAME = table
+        samples = []
+        try:
+            for n in range(args.requests):
+                uri = harness.upload(f"overhead-{label}-{n}")
+                started = time.perf_counter()
+                harness.request(uri, f"apptoverhead{n}")
+                samples.append((time.perf_counter() - started) * 1000)
+        finally:
+            idempotency.TABLE_NAME = saved
+        timings[label] = summarize(samples)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--burst', type=int, default=25, help='identical requests released at once')
+    parser.add_argument('--requests', type=int, default=200, help='unique requests for the overhead measurement')
+    parser.add_argument('--dynamodb-latency-ms', type=float, default=5.0, help='simulated DynamoDB round trip')
+    parser.add_argument('--transcribe-latency-ms', type=float, default=50.0, help='simulated StartTranscriptionJob call')
+    parser.add_argument('--output', help='write JSON report to this file')
+    args = parser.parse_args()
+
+    sink = EmfSink()
+    logging.disable(logging.CRITICAL)
+    try:
+        with contextlib.redirect_stdout(sink):
+            harness = Harness(args)
+            scenarios, failures = run_checks(harness, sink, args)
+            args.transcribe_latency_ms = 0
+            harness.transcribe.latency_s = 0
+            timings = overhead(harness, args)
+    finally:
+        logging.disable(logging.NOTSET)
+
+    report = {
+        'benchmark': 'idempotency',
+        'dynamodb_latency_ms': args.dynamodb_latency_ms,
+        'scenarios': scenarios,
+        'router_latency_ms': timings,
+        'failures': failures,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
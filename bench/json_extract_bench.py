@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Fuzz corpus and speed benchmark for medzen_runtime.json_extract
+
+Builds malformed variants of the seed model outputs in bench/corpus/llm_json
+(truncation, code fences, trailing commas, smart quotes), checks the extractor
+never raises and never returns altered section content (sections reported as
+truncated excepted), checks hand-written cases (a final scalar cut short, bracketed
+prose before the JSON), and compares speed and recovery rate against the extraction
+code the SOAP Lambdas used before.
+
+Usage:
+    python3 bench/json_extract_bench.py [--mutants 200] [--repeat 50] [--seed 7] [--output report.json]
+
+Exits non-zero if any fuzz invariant is violated.
+"""
+
+import argparse
+import json
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / 'aws-deployment' / 'lambda-layers' / 'medzen-runtime' / 'python'))
+
+from medzen_runtime.json_extract import extract_json  # noqa: E402
+
+CORPUS_DIR = BENCH_DIR / 'corpus' / 'llm_json'
+
+# (model output, expected data, expected truncated_sections)
+CASES = [
+    # A complete final scalar is kept; a number running to the end may have lost digits
+    ('{"a": 1, "b": true', {'a': 1, 'b': True}, []),
+    ('{"a": 1, "b": 2\n', {'a': 1, 'b': 2}, []),
+    ('{"a": 1, "b": 2', {'a': 1, 'b': 2}, ['b']),
+    ('{"a": 1, "b": tr', {'a': 1}, ['b']),
+    # Bracketed prose before the JSON is skipped
+    ('Sure {not json}: {"a": 1}', {'a': 1}, []),
+    ('See [1] and {this}. ```json\n{"a": [1, 2]}\n```', {'a': [1, 2]}, []),
+]
+
+
+def legacy_split_extract(text):
+    """Extraction previously used by invoke_bedrock (split on triple backticks)."""
+    json_str = text
+    if '```json' in json_str:
+        json_str = json_str.split('```json')[1].split('```')[0].strip()
+    elif '```' in json_str:
+        json_str = json_str.split('```')[1].split('```')[0].strip()
+    try:
+        return json.loads(json_str)
+    except json.JSONDecodeError:
+        return None
+
+
+def legacy_regex_extract(text):
+    """Extraction previously used by parse-bedrock-response.py (DOTALL regex + trailing comma fix)."""
+    json_match = re.search(r'```(?:json)?\s*\n?(.*?)\n?```', text, re.DOTALL)
+    if json_match:
+        json_str = json_match.group(1).strip()
+    else:
+        brace_index = text.find('{')
+        if brace_index == -1:
+            return None
+        json_str = text[brace_index:]
+    try:
+        return json.loads(json_str)
+    except json.JSONDecodeError:
+        json_str = re.sub(r',(\s*[}\]])', r'\1', json_str)
+        try:
+            return json.loads(json_str)
+        except json.JSONDecodeError:
+            return None
+
+
+def mutate(original, rng):
+    """Return (kind, text) for one malformed rendering of a seed value."""
+    text = json.dumps(original, indent=rng.choice([None, 2]), ensure_ascii=rng.random() < 0.3)
+    kind = rng.choice(['fence', 'prose', 'trailing_commas', 'smart_quotes', 'truncate', 'combined'])
+
+    if kind in ('trailing_commas', 'combined'):
+        text = re.sub(r'(["\d\]}el])(\s*)([}\]])', lambda m: m.group(1) + (',' if rng.random() < 0.5 else '') + m.group(2) + m.group(3), text)
+    if kind in ('smart_quotes', 'combined') and isinstance(original, dict):
+        for key in original:
+            if rng.random() < 0.5:
+                text = text.replace(f'"{key}":', f'“{key}”:', 1)
+    if kind in ('fence', 'combined'):
+        text = f"```json\n{text}\n```"
+    if kind in ('prose', 'combined'):
+        text = f"Here is the requested output:\n{text}\nLet me know if you need changes."
+    if kind in ('truncate', 'combined'):
+        text = text[:rng.randint(1, len(text) - 1)]
+        kind = 'truncate' if kind == 'truncate' else 'combined_truncate'
+
+    return kind, text
+
+
+def check_invariants(original, result, kind):
+    """Return a list of invariant violations for one extraction result."""
+    errors = []
+    data = result['data']
+    truncated = kind.endswith('truncate')
+
+    if not truncated:
+        if data != original:
+            errors.append(f"{kind}: recovered value differs from original ({result['error']})")
+        return errors
+
+    if data is None:
+        return errors  # Truncated before the first complete member; nothing to salvage
+    if isinstance(original, dict):
+        if not isinstance(data, dict):
+            return [f"{kind}: expected object, got {type(data).__name__}"]
+        for key, value in data.items():
+            if original.get(key) != value and key not in result['truncated_sections']:
+                errors.append(f"{kind}: salvaged section '{key}' differs from original")
+        for key in result['truncated_sections']:
+            if key not in original:
+                errors.append(f"{kind}: unknown truncated section '{key}'")
+    elif isinstance(original, list):
+        if not isinstance(data, list) or data != original[:len(data)]:
+            errors.append(f"{kind}: salvaged array is not a prefix of the original")
+    return errors
+
+
+def time_calls(func, texts, repeat):
+    """Per-call latency samples in microseconds."""
+    samples = []
+    for text in texts:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func(text)
+            samples.append((time.perf_counter() - started) * 1_000_000)
+    return samples
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'calls': len(ordered),
+        'p50_us': round(statistics.median(ordered), 1),
+        'p95_us': round(ordered[int(len(ordered) * 0.95) - 1], 1),
+        'mean_us': round(statistics.fmean(ordered), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--mutants', type=int, default=200, help='malformed variants per seed')
+    parser.add_argument('--repeat', type=int, default=20, help='timing repetitions per sample')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='write JSON report to this file')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    seeds = {p.name: json.loads(p.read_text(encoding='utf-8')) for p in sorted(CORPUS_DIR.glob('*.json'))}
+    samples = {p.name: p.read_text(encoding='utf-8') for p in sorted(CORPUS_DIR.glob('*.txt'))}
+
+    violations = []
+    for text, expected, truncated in CASES:
+        result = extract_json(text)
+        if result['data'] != expected or result['truncated_sections'] != truncated:
+            violations.append(f"{text!r}: got {result['data']} truncated {result['truncated_sections']}, "
+                              f"expected {expected} truncated {truncated}")
+
+    # Fuzz: every mutant must extract without raising and without altering content
+    recovered = {'extract_json': 0, 'legacy_split': 0, 'legacy_regex': 0}
+    salvaged_sections = 0
+    fuzz_texts = []
+    for name, original in seeds.items():
+        for _ in range(args.mutants):
+            kind, text = mutate(original, rng)
+            fuzz_texts.append(text)
+            try:
+                result = extract_json(text)
+            except Exception as e:  # noqa: BLE001 - any exception is a fuzz failure
+                violations.append(f"{name}/{kind}: raised {type(e).__name__}: {e}")
+                continue
+            violations.extend(f"{name}/{v}" for v in check_invariants(original, result, kind))
+            if result['data'] is not None:
+                recovered['extract_json'] += 1
+                if not result['complete'] and isinstance(result['data'], dict):
+                    salvaged_sections += len(result['sections'])
+            if legacy_split_extract(text) is not None:
+                recovered['legacy_split'] += 1
+            if legacy_regex_extract(text) is not None:
+                recovered['legacy_regex'] += 1
+
+    # Speed: clean seeds (fast path), hand-written samples and fuzz mutants (repair path)
+    clean_texts = [json.dumps(v, indent=2, ensure_ascii=False) for v in seeds.values()]
+    malformed_texts = list(samples.values()) + fuzz_texts[:100]
+    timings = {}
+    for label, func in (('extract_json', extract_json),
+                        ('legacy_split', legacy_split_extract),
+                        ('legacy_regex', legacy_regex_extract)):
+        timings[label] = {
+            'clean': summarize(time_calls(func, clean_texts, args.repeat)),
+            'malformed': summarize(time_calls(func, malformed_texts, max(1, args.repeat // 5))),
+        }
+
+    total = len(fuzz_texts)
+    report = {
+        'benchmark': 'json_extract',
+        'fuzz_cases': total,
+        'violations': len(violations),
+        'recovery_rate': {k: round(v / total, 3) for k, v in recovered.items()},
+        'salvaged_sections': salvaged_sections,
+        'timings': timings,
+    }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+
+    for violation in violations[:20]:
+        print(f"❌ {violation}", file=sys.stderr)
+
+    return 1 if violations else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Deployment package size and init-time benchmark for the Supabase-backed SOAP workflow Lambdas
+
+Builds each function's deployment zip the way it is deployed now (the handler file alone;
+Supabase access comes from medzen_runtime.supabase in the shared layer, over the urllib3
+that the Lambda Python runtime already ships) and, with --ref, the way it was deployed at
+that git revision (the handler plus `requests` and its dependencies vendored next to it,
+as `pip install requests -t .` produces). For each zip the report gives the compressed and
+unpacked size, the time to extract it, and the module init time measured from the extracted
+directory with bench/cold_start_bench.py.
+
+The vendored packages are copied from this interpreter's site-packages, so the figures
+match the installed requests release rather than a fresh download.
+
+Usage:
+    python3 bench/package_size_bench.py [--ref <git-ref>] [--runs 5] [--output report.json]
+"""
+
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import zipfile
+from importlib import metadata
+from pathlib import Path
+
+from cold_start_bench import LAYER_PATH, REPO_ROOT, files_at_ref, measure
+
+FUNCTIONS_DIR = 'aws-deployment/lambda-functions'
+
+TARGETS = [
+    f'{FUNCTIONS_DIR}/validate-session-supabase.py',
+    f'{FUNCTIONS_DIR}/fetch-transcript.py',
+    f'{FUNCTIONS_DIR}/enrich-metadata.py',
+    f'{FUNCTIONS_DIR}/generate-soap-from-transcript.py',
+    f'{FUNCTIONS_DIR}/save-soap-to-supabase.py',
+    f'{FUNCTIONS_DIR}/update-session-status-supabase.py',
+    f'{FUNCTIONS_DIR}/update-supabase-soap.py',
+    f'{FUNCTIONS_DIR}/send-notification.py',
+    f'{FUNCTIONS_DIR}/monitor-bedrock-usage.py',
+]
+
+# `pip install requests -t .` pulls in these distributions
+VENDORED_DISTRIBUTIONS = ['requests', 'urllib3', 'idna', 'charset-normalizer', 'certifi']
+
+
+def vendored_files():
+    """(archive name, path) for every installed file of the vendored distributions, bytecode included."""
+    files = []
+    for name in VENDORED_DISTRIBUTIONS:
+        dist = metadata.distribution(name)
+        for entry in dist.files or []:
+            # Keep the compiled .pyc files pip writes; skip console scripts outside site-packages
+            if '..' in Path(entry).parts:
+                continue
+            path = Path(dist.locate_file(entry))
+            if path.is_file():
+                files.append((Path(entry).as_posix(), path))
+    return files
+
+
+def build_zip(members):
+    """Deflated zip of (archive name, path) pairs, returned as bytes."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, path in members:
+            archive.write(path, name)
+    return buffer.getvalue()
+
+
+def layer_zip():
+    members = [
+        (('python' / path.relative_to(LAYER_PATH)).as_posix(), path)
+        for path in sorted(LAYER_PATH.rglob('*.py'))
+    ]
+    return build_zip(members)
+
+
+def extract(data, destination, runs):
+    """Extract a zip `runs` times; returns (median extract ms, unpacked bytes)."""
+    times = []
+    for run in range(runs):
+        target = Path(destination) / f"run{run}"
+        started = time.perf_counter()
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            archive.extractall(target)
+        times.append((time.perf_counter() - started) * 1000)
+    unpacked = sum(path.stat().st_size for path in target.rglob('*') if path.is_file())
+    return round(statistics.median(times), 2), unpacked
+
+
+def restore_mtimes(directory, members):
+    """
+    Give extracted files their source mtimes again.
+
+    zipfile does not restore them, and a .pyc whose recorded source mtime no longer matches
+    is recompiled on import, which would charge the vendored packages for compilation.
+    """
+    for name, path in members:
+        stat = path.stat()
+        os.utime(Path(directory) / name, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+def package_report(handler_path, extra_members, workdir, runs):
+    """Build, extract and cold-start one deployment package."""
+    members = [(handler_path.name, handler_path)] + extra_members
+    data = build_zip(members)
+    extract_ms, unpacked = extract(data, workdir, runs)
+    restore_mtimes(Path(workdir) / 'run0', members)
+    init = measure(Path(workdir) / 'run0' / handler_path.name, runs)
+    return {
+        'zip_bytes': len(data),
+        'unpacked_bytes': unpacked,
+        'files': len(extra_members) + 1,
+        'extract_ms': extract_ms,
+        **init,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--ref', help='git revision whose handlers vendored requests')
+    parser.add_argument('--runs', type=int, default=5, help='extractions and fresh interpreters per package')
+    parser.add_argument('--output', help='write JSON report to this file')
+    args = parser.parse_args()
+
+    vendored = vendored_files()
+    results = {}
+    totals = {'current_zip_bytes': 0, 'ref_zip_bytes': 0}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        baseline = files_at_ref(args.ref, Path(workdir) / 'ref-src') if args.ref else {}
+        for target in TARGETS:
+            name = Path(target).stem
+            entry = {'current': package_report(REPO_ROOT / target, [], Path(workdir) / 'current' / name, args.runs)}
+            totals['current_zip_bytes'] += entry['current']['zip_bytes']
+
+            ref_path = baseline.get(target)
+            if ref_path is not None:
+                entry['ref'] = package_report(ref_path, vendored, Path(workdir) / 'ref' / name, args.runs)
+                totals['ref_zip_bytes'] += entry['ref']['zip_bytes']
+                for key in ('zip_bytes', 'unpacked_bytes', 'extract_ms', 'init_ms'):
+                    if key in entry['current'] and key in entry['ref']:
+                        entry[f'delta_{key}'] = round(entry['current'][key] - entry['ref'][key], 2)
+
+            results[name] = entry
+            print(f"{name}: {json.dumps({k: v for k, v in entry.items() if k.startswith('delta')})}", file=sys.stderr)
+
+    layer = layer_zip()
+    report = {
+        'benchmark': 'package_size',
+        'python': sys.version.split()[0],
+        'runs': args.runs,
+        'ref': args.ref,
+        'vendored': {
+            name: metadata.version(name) for name in VENDORED_DISTRIBUTIONS
+        },
+        # Published once and shared by every function
+        'layer_zip_bytes': len(layer),
+        'totals': totals,
+        'functions': results,
+    }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,599 @@
+#!/usr/bin/env python3
+"""
+End-to-end throughput and latency benchmark for the transcription and SOAP pipelines
+
+Runs the real handlers offline: S3, SQS, Transcribe and Lambda are the stand-ins in
+bench/stand_ins.py and Bedrock is bench/bedrock_emulator.py (configurable latency and
+throttling), all registered as boto3 clients; Supabase is a local PostgREST server reached
+over HTTP. Each encounter gets a seeded synthetic transcript in English or French, short,
+medium or long.
+
+Transcription pipeline, per encounter:
+    transcription-router/index.py (en -> Transcribe Medical, fr -> Transcribe + Bedrock entities)
+    callback_handler.py for the EventBridge job-state event
+
+SOAP pipeline, per encounter, in the order of soap-workflow-definition.json:
+    validate-session -> fetch-transcript -> enrich-metadata -> generate-soap ->
+    save-soap -> update-session-status -> send-notification
+Throttled generations go to the retry queue, which is then drained by process-soap-queue.
+
+Encounters run concurrently on --workers threads. The report gives per-stage latency
+percentiles, end-to-end latency by transcript length, throughput per minute, and the
+p50/p95/p99 of every tracing span (Supabase, Bedrock, S3, Transcribe, JSON parsing) taken
+from the EMF lines the handlers print. With --baseline, p95 latencies and throughput are
+compared against an earlier report, e.g. one written at the previous commit.
+
+Usage:
+    python3 bench/pipeline_bench.py [--encounters 48] [--workers 8] [--bedrock-latency-ms 300]
+        [--throttle-rate 0.05] [--supabase-latency-ms 10] [--output report.json]
+        [--baseline previous.json] [--max-regression 0.25]
+
+Exits non-zero if a stage fails or, with --baseline, if a tracked figure regressed.
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / 'aws-deployment' / 'lambda-layers' / 'medzen-runtime' / 'python'))
+
+from medzen_runtime.clients import register_client  # noqa: E402
+from bedrock_emulator import BedrockEmulator  # noqa: E402
+from stand_ins import LocalLambda, LocalPostgREST, LocalS3, LocalSQS, LocalTranscribe, sqs_event  # noqa: E402
+
+FUNCTIONS_DIR = REPO_ROOT / 'aws-deployment' / 'lambda-functions'
+ROUTER_DIR = REPO_ROOT / 'aws-lambda' / 'transcription-router'
+
+RECORDINGS_BUCKET = 'medzen-call-recordings'
+OUTPUT_BUCKET = 'medzen-transcriptions'
+SOAP_FUNCTION = 'medzen-generate-soap-from-transcript'
+AI_MODEL = 'claude-opus-4-5-20251101-v1:0'
+REGIONS = (None, 'us-east-1', 'eu-central-1')
+
+LANGUAGES = ('en', 'fr')
+LENGTHS = {'short': 12, 'medium': 60, 'long': 240}  # dialogue turns
+
+PHRASES = {
+    'en': {
+        'Provider': [
+            "Good morning, what brings you in today?",
+            "How long have you had these symptoms?",
+            "Do you have any fever, chills or night sweats?",
+            "Are you currently taking any medications?",
+            "Any allergies to medications that you know of?",
+            "Let me listen to your lungs, take a deep breath.",
+            "Your blood pressure is 128 over 82 and your temperature is 38.1.",
+            "I am going to prescribe amoxicillin 500 mg three times a day for seven days.",
+            "Please come back if the pain gets worse or you have trouble breathing.",
+            "Has anyone at home been sick recently?",
+        ],
+        'Patient': [
+            "I have had a sore throat and a cough for about four days.",
+            "It started with a runny nose and now it hurts to swallow.",
+            "I took ibuprofen twice yesterday but it did not help much.",
+            "I am allergic to penicillin, I get a rash.",
+            "My daughter had a cold last week.",
+            "I also feel very tired and my head aches in the evening.",
+            "No, I do not smoke, but my husband does.",
+            "I have type 2 diabetes and I take metformin every morning.",
+            "The cough is worse at night and keeps me awake.",
+            "Okay, thank you doctor.",
+        ],
+    },
+    'fr': {
+        'Provider': [
+            "Bonjour, qu'est-ce qui vous amène aujourd'hui ?",
+            "Depuis combien de temps avez-vous ces symptômes ?",
+            "Avez-vous de la fièvre ou des frissons ?",
+            "Prenez-vous des médicaments en ce moment ?",
+            "Avez-vous des allergies à des médicaments ?",
+            "Je vais écouter vos poumons, respirez profondément.",
+            "Votre tension est à 13 sur 8 et vous avez 38,2 de température.",
+            "Je vous prescris du paracétamol 1 g trois fois par jour pendant cinq jours.",
+            "Revenez me voir si la douleur augmente ou si vous avez du mal à respirer.",
+            "Quelqu'un est-il malade à la maison ?",
+        ],
+        'Patient': [
+            "J'ai mal à la gorge et je tousse depuis quatre jours.",
+            "Ça a commencé par le nez qui coule et maintenant j'ai mal en avalant.",
+            "J'ai pris du paracétamol deux fois hier mais ça n'a pas beaucoup aidé.",
+            "Je suis allergique à la pénicilline, ça me donne des plaques.",
+            "Mon fils a eu un rhume la semaine dernière.",
+            "Je suis très fatiguée et j'ai mal à la tête le soir.",
+            "Non, je ne fume pas.",
+            "J'ai du diabète et je prends de la metformine le matin.",
+            "La toux est pire la nuit et m'empêche de dormir.",
+            "D'accord, merci docteur.",
+        ],
+    },
+}
+
+
+class EmfSink(io.TextIOBase):
+    """stdout replacement that keeps the EMF lines printed by tracing spans from any thread."""
+
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+
+    def write(self, text):
+        if text.startswith('{"_aws"'):
+            record = json.loads(text)
+            with self._lock:
+                self.records.append(record)
+        return len(text)
+
+
+def load_module(path, name):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def synthetic_turns(language, length, rng):
+    """Alternating provider / patient dialogue with `LENGTHS[length]` turns."""
+    phrases = PHRASES[language]
+    turns = []
+    for index in range(LENGTHS[length]):
+        speaker = 'Provider' if index % 2 == 0 else 'Patient'
+        sentences = rng.sample(phrases[speaker], rng.randint(1, 3))
+        turns.append((speaker, ' '.join(sentences)))
+    return turns
+
+
+def build_encounters(count, seed):
+    """Encounters spread evenly over languages and lengths, with the Supabase rows they need."""
+    encounters = []
+    for index in range(count):
+        rng = random.Random(seed * 100003 + index)
+        language = LANGUAGES[index % len(LANGUAGES)]
+        length = list(LENGTHS)[(index // len(LANGUAGES)) % len(LENGTHS)]
+        turns = synthetic_turns(language, length, rng)
+        encounters.append({
+            'index': index,
+            'language': language,
+            'length': length,
+            'turns': turns,
+            # Transcribe job names embed the appointment id and are split on '-'
+            'appointment_id': uuid.UUID(int=rng.getrandbits(128)).hex,
+            'session_id': str(uuid.UUID(int=rng.getrandbits(128))),
+            'transcript_id': str(uuid.UUID(int=rng.getrandbits(128))),
+            'provider_id': str(uuid.UUID(int=rng.getrandbits(128))),
+            'patient_id': str(uuid.UUID(int=rng.getrandbits(128))),
+        })
+    return encounters
+
+
+def seed_tables(encounters):
+    tables = {name: [] for name in ('video_call_sessions', 'appointments', 'users', 'call_transcripts')}
+    for encounter in encounters:
+        raw_text = '\n'.join(f"{speaker}: {text}" for speaker, text in encounter['turns'])
+        tables['video_call_sessions'].append({
+            'id': encounter['session_id'],
+            'appointment_id': encounter['appointment_id'],
+            'provider_id': encounter['provider_id'],
+            'patient_id': encounter['patient_id'],
+            'transcription_enabled': True,
+            'transcript_id': encounter['transcript_id'],
+            'transcript_language': encounter['language'],
+            'status': 'ended',
+            'start_time': '2026-01-12T09:00:00Z',
+            'end_time': '2026-01-12T09:20:00Z',
+        })
+        tables['appointments'].append({
+            'id': encounter['appointment_id'],
+            'start_time': '2026-01-12T09:00:00Z',
+            'end_time': '2026-01-12T09:20:00Z',
+            'timezone': 'Africa/Douala',
+            'reason_for_visit': 'Sore throat and cough',
+            'provider_id': encounter['provider_id'],
+            'patient_id': encounter['patient_id'],
+            'medical_provider_profiles': {'id': encounter['provider_id'], 'display_name': 'Dr. Bench', 'specialty': 'Family Medicine'},
+            'patient_profiles': {'id': encounter['patient_id'], 'display_name': 'Bench Patient', 'age': 42, 'gender': 'female'},
+        })
+        tables['users'].append({'id': encounter['provider_id'], 'fcm_token': 'bench-fcm-token', 'display_name': 'Dr. Bench'})
+        tables['call_transcripts'].append({
+            'id': encounter['transcript_id'],
+            'session_id': encounter['session_id'],
+            'raw_text': raw_text,
+            'speaker_map': {'spk_0': 'Provider', 'spk_1': 'Patient'},
+            'total_duration_seconds': len(raw_text.split()) * 0.35,
+            'confidence_overall': 0.93,
+            'source': 'chime_live',
+            'processing_status': 'completed',
+            'total_segments': len(encounter['turns']),
+            'created_at': '2026-01-12T09:20:05Z',
+        })
+    return tables
+
+
+class Pipeline:
+    """Handlers, stand-ins and per-stage timings for one benchmark run."""
+
+    def __init__(self, args):
+        self.args = args
+        self.timings = {}  # stage -> [ms]
+        self.failures = []
+        self._lock = threading.Lock()
+
+    def setup(self, encounters):
+        args = self.args
+        self.postgrest = LocalPostgREST(
+            seed_tables(encounters), latency_ms=args.supabase_latency_ms, aliases={'soap_notes': 'clinical_notes'}
+        ).start()
+        os.environ.update({
+            'AWS_DEFAULT_REGION': 'us-east-1',
+            'AWS_REGION': 'eu-central-1',
+            'SUPABASE_URL': self.postgrest.url,
+            'SUPABASE_SERVICE_KEY': 'bench',
+            'FCM_SERVER_KEY': 'bench',
+            'OUTPUT_BUCKET': OUTPUT_BUCKET,
+        })
+
+        self.s3 = LocalS3(RECORDINGS_BUCKET, latency_s=args.s3_latency_ms / 1000)
+        self.sqs = LocalSQS()
+        self.transcribe = LocalTranscribe(self.s3, latency_s=args.transcribe_latency_ms / 1000)
+        self.bedrock = BedrockEmulator(
+            default={
+                'latency': {'dist': 'lognormal', 'p50_ms': args.bedrock_latency_ms, 'sigma': 0.25},
+                'ms_per_output_token': args.bedrock_ms_per_token,
+                'throttle_rate': args.throttle_rate,
+            },
+            seed=args.seed,
+        )
+
+        handlers = {
+            'router': (ROUTER_DIR / 'index.py', 'bench_router'),
+            'callback': (ROUTER_DIR / 'callback_handler.py', 'bench_callback'),
+            'validate': (FUNCTIONS_DIR / 'validate-session-supabase.py', 'bench_validate'),
+            'fetch': (FUNCTIONS_DIR / 'fetch-transcript.py', 'bench_fetch'),
+            'enrich': (FUNCTIONS_DIR / 'enrich-metadata.py', 'bench_enrich'),
+            'generate': (FUNCTIONS_DIR / 'generate-soap-from-transcript.py', 'bench_generate'),
+            'save': (FUNCTIONS_DIR / 'save-soap-to-supabase.py', 'bench_save'),
+            'update_status': (FUNCTIONS_DIR / 'update-session-status-supabase.py', 'bench_update_status'),
+            'notify': (FUNCTIONS_DIR / 'send-notification.py', 'bench_notify'),
+            'queue': (FUNCTIONS_DIR / 'process-soap-queue.py', 'bench_queue'),
+        }
+        self.modules = {stage: load_module(path, name) for stage, (path, name) in handlers.items()}
+        # FCM is answered by the local server as well
+        self.modules['notify'].FCM_SEND_URL = f"{self.postgrest.url}/fcm/send"
+
+        lambda_service = LocalLambda({SOAP_FUNCTION: self.modules['generate'].lambda_handler})
+        for region in REGIONS:
+            register_client('s3', self.s3, region)
+            register_client('sqs', self.sqs, region)
+            register_client('transcribe', self.transcribe, region)
+            register_client('bedrock-runtime', self.bedrock, region)
+            register_client('lambda', lambda_service, region)
+
+        for encounter in encounters:
+            key = f"{encounter['appointment_id']}/recording.mp4"
+            self.s3.put_object(Key=key, Body=b'\x00' * 1024)
+            self.transcribe.scripts[f"s3://{RECORDINGS_BUCKET}/{key}"] = encounter['turns']
+
+    def call(self, stage, event, expected=(200,)):
+        """Invoke one handler, record its wall time, and return its response (None on failure)."""
+        started = time.perf_counter()
+        try:
+            response = self.modules[stage].lambda_handler(event, None)
+        except Exception as e:
+            response = {'statusCode': 'exception', 'error': f"{type(e).__name__}: {e}"}
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.timings.setdefault(stage, []).append(elapsed)
+        if response.get('statusCode') not in expected:
+            with self._lock:
+                self.failures.append(
+                    f"{stage}: status {response.get('statusCode')} {response.get('error') or response.get('body', '')}"[:300]
+                )
+            return None
+        return response
+
+    def transcription(self, encounter):
+        """Router then callback for one recording; returns end-to-end ms or None."""
+        started = time.perf_counter()
+        routed = self.call('router', {
+            's3_uri': f"s3://{RECORDINGS_BUCKET}/{encounter['appointment_id']}/recording.mp4",
+            'language_code': encounter['language'],
+            'appointment_id': encounter['appointment_id'],
+            'session_id': encounter['session_id'],
+            'provider_id': encounter['provider_id'],
+            'patient_id': encounter['patient_id'],
+        })
+        if routed is None:
+            return None
+        job_name = json.loads(routed['body'])['data']['transcription']['job_name']
+        status_key = 'MedicalTranscriptionJobStatus' if job_name.startswith('medzen-medical-') else 'TranscriptionJobStatus'
+        name_key = 'MedicalTranscriptionJobName' if job_name.startswith('medzen-medical-') else 'TranscriptionJobName'
+        if self.call('callback', {
+            'source': 'aws.transcribe',
+            'detail-type': 'Transcribe Job State Change',
+            'detail': {name_key: job_name, status_key: 'COMPLETED'},
+        }) is None:
+            return None
+        return (time.perf_counter() - started) * 1000
+
+    def soap(self, encounter):
+        """SOAP workflow for one session; returns (outcome, end-to-end ms)."""
+        started = time.perf_counter()
+        session_id = encounter['session_id']
+
+        validated = self.call('validate', {'sessionId': session_id})
+        if validated is None:
+            return 'failed', None
+        session = validated['sessionData']
+
+        transcript = self.call('fetch', {'sessionId': session_id, 'transcriptId': session['transcriptId']})
+        if transcript is None:
+            return 'failed', None
+
+        enriched = self.call('enrich', {
+            'appointmentId': session['appointmentId'], 'sessionId': session_id, 'transcript': transcript
+        })
+        if enriched is None:
+            return 'failed', None
+        context = enriched['enrichedData']
+
+        generated = self.call('generate', {
+            'sessionId': session_id,
+            'appointmentId': session['appointmentId'],
+            'providerId': session['providerId'],
+            'providerName': context['provider']['name'],
+            'providerSpecialty': context['provider']['specialty'],
+            'patientName': context['patient']['name'],
+            'transcript': transcript['rawText'],
+            'callStartTime': session['startTime'],
+            'callEndTime': session['endTime'],
+            'transcriptLanguage': session['language'],
+        }, expected=(200, 429))
+        if generated is None:
+            return 'failed', None
+        if generated['statusCode'] == 429:
+            # BedrockUnavailable -> QueueForLaterRetry
+            return ('queued' if generated.get('queued') else 'failed'), None
+
+        saved = self.call('save', {
+            'sessionId': session_id,
+            'appointmentId': session['appointmentId'],
+            'soapData': generated['soapNote'],
+            'bedrockTokens': generated.get('bedrockTokens', {}),
+            'aiModel': AI_MODEL,
+        })
+        if saved is None:
+            return 'failed', None
+
+        if self.call('update_status', {'sessionId': session_id, 'status': 'soap_generated', 'soapGenerated': True}) is None:
+            return 'failed', None
+
+        if self.call('notify', {
+            'type': 'soap_generated',
+            'providerId': session['providerId'],
+            'soapNoteId': saved['soapNote']['id'],
+            'sessionId': session_id,
+            'appointmentId': session['appointmentId'],
+        }) is None:
+            return 'failed', None
+
+        return 'completed', (time.perf_counter() - started) * 1000
+
+    def drain_retry_queue(self, rounds):
+        """Feed queued generations to process-soap-queue in SQS batches of 10."""
+        recovered = 0
+        for _ in range(rounds):
+            if not self.sqs.depth():
+                break
+            while True:
+                messages = self.sqs.receive_message(QueueUrl='bench', MaxNumberOfMessages=10).get('Messages', [])
+                if not messages:
+                    break
+                response = self.call('queue', sqs_event(messages))
+                if response:
+                    recovered += response.get('processed', 0)
+            # Messages reported in batchItemFailures become visible again after the timeout
+            self.sqs.expire_visibility()
+        return recovered
+
+
+def summarize(samples):
+    """count, mean and p50/p95/p99/max of millisecond samples."""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]  # noqa: E731
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered), 2),
+        'p50_ms': round(pick(0.50), 2),
+        'p95_ms': round(pick(0.95), 2),
+        'p99_ms': round(pick(0.99), 2),
+        'max_ms': round(ordered[-1], 2),
+    }
+
+
+def span_rollup(records):
+    """Latency percentiles per service/operation from the captured EMF lines."""
+    groups = {}
+    errors = {}
+    for record in records:
+        key = f"{record['Service']}/{record['Operation']}"
+        groups.setdefault(key, []).append(record['Latency'])
+        errors[key] = errors.get(key, 0) + record.get('Errors', 0)
+    return {key: dict(summarize(values), errors=errors[key]) for key, values in sorted(groups.items())}
+
+
+def run_phase(pipeline, work, encounters, workers):
+    """Run `work` over the encounters on a thread pool; returns (results, wall seconds)."""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(work, encounters))
+    return results, time.perf_counter() - started
+
+
+def commit_id():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def regressions(report, baseline, tolerance):
+    """Tracked figures that got worse than `tolerance` (a fraction) relative to the baseline report."""
+    found = []
+
+    def compare(path, current, previous, higher_is_better=False):
+        if not current or not previous:
+            return
+        change = (current - previous) / previous
+        if (-change if higher_is_better else change) > tolerance:
+            found.append(f"{path}: {previous} -> {current} ({change:+.0%})")
+
+    for phase in ('transcription', 'soap'):
+        current, previous = report.get(phase, {}), baseline.get(phase, {})
+        compare(f"{phase}.throughput_per_min", current.get('throughput_per_min'), previous.get('throughput_per_min'), True)
+        compare(f"{phase}.end_to_end.p95_ms", current.get('end_to_end', {}).get('p95_ms'), previous.get('end_to_end', {}).get('p95_ms'))
+        for stage, figures in current.get('stages', {}).items():
+            compare(f"{phase}.stages.{stage}.p95_ms", figures.get('p95_ms'), previous.get('stages', {}).get(stage, {}).get('p95_ms'))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--encounters', type=int, default=48, help='encounters per pipeline')
+    parser.add_argument('--workers', type=int, default=8, help='concurrent encounters')
+    parser.add_argument('--seed', type=int, default=7, help='transcript and throttling seed')
+    parser.add_argument('--bedrock-latency-ms', type=float, default=300.0, help='Bedrock time to first token')
+    parser.add_argument('--bedrock-ms-per-token', type=float, default=0.5, help='Bedrock time per output token')
+    parser.add_argument('--throttle-rate', type=float, default=0.05, help='fraction of Bedrock calls throttled')
+    parser.add_argument('--supabase-latency-ms', type=float, default=10.0, help='PostgREST latency per request')
+    parser.add_argument('--s3-latency-ms', type=float, default=15.0, help='S3 GET latency')
+    parser.add_argument('--transcribe-latency-ms', type=float, default=40.0, help='Transcribe start-job latency')
+    parser.add_argument('--drain-rounds', type=int, default=5, help='visibility timeouts to drain the retry queue')
+    parser.add_argument('--baseline', help='earlier report to compare p95 latency and throughput against')
+    parser.add_argument('--max-regression', type=float, default=0.25, help='allowed relative regression vs --baseline')
+    parser.add_argument('--output', help='write JSON report to this file')
+    args = parser.parse_args()
+
+    encounters = build_encounters(args.encounters, args.seed)
+    pipeline = Pipeline(args)
+    sink = EmfSink()
+    # Handlers log throttling and pool warnings; the report carries the counts
+    logging.disable(logging.CRITICAL)
+
+    try:
+        with contextlib.redirect_stdout(sink):
+            pipeline.setup(encounters)
+            transcribed, transcription_s = run_phase(pipeline, pipeline.transcription, encounters, args.workers)
+            stage_timings = dict(pipeline.timings)
+            pipeline.timings = {}
+            outcomes, soap_s = run_phase(pipeline, pipeline.soap, encounters, args.workers)
+            queued_before_drain = pipeline.sqs.depth()
+            recovered = pipeline.drain_retry_queue(args.drain_rounds)
+        # Two calls on a fresh Bedrock with the bundled system prompt: the second reads the cached prefix
+        probe = BedrockEmulator(default={'latency': {'dist': 'fixed', 'ms': 0}}, seed=args.seed)
+        for region in REGIONS:
+            register_client('bedrock-runtime', probe, region)
+        transcript = '\n'.join(f"{speaker}: {text}" for speaker, text in encounters[0]['turns'])
+        with contextlib.redirect_stdout(EmfSink()):
+            cache_probe = [pipeline.modules['generate'].invoke_bedrock(transcript).get('bedrock_tokens', {})
+                           for _ in range(2)]
+    finally:
+        logging.disable(logging.NOTSET)
+        pipeline.postgrest.stop()
+
+    sessions = {row['id']: row for row in pipeline.postgrest.rows('video_call_sessions')}
+    for encounter in encounters:
+        if sessions[encounter['session_id']].get('transcription_status') != 'COMPLETED':
+            pipeline.failures.append(f"transcription not stored for appointment {encounter['appointment_id']}")
+
+    completed = [ms for outcome, ms in outcomes if outcome == 'completed']
+    by_length = {
+        length: summarize([ms for encounter, (outcome, ms) in zip(encounters, outcomes) if encounter['length'] == length and ms])
+        for length in LENGTHS
+    }
+    queue_timings = pipeline.timings.pop('queue', [])
+    notes_saved = len(pipeline.postgrest.rows('clinical_notes'))
+    if notes_saved != len(completed):
+        pipeline.failures.append(f"{notes_saved} clinical notes saved for {len(completed)} completed sessions")
+
+    spans = span_rollup(sink.records)
+    if spans.get('s3/get_object', {}).get('errors'):
+        pipeline.failures.append(f"{spans['s3/get_object']['errors']} S3 GETs recorded as errors")
+    if not (cache_probe[0].get('cache_write') and cache_probe[1].get('cache_read')):
+        pipeline.failures.append(f"bundled system prompt not served from the prompt cache: {cache_probe}")
+
+    report = {
+        'benchmark': 'pipeline',
+        'commit': commit_id(),
+        'python': sys.version.split()[0],
+        'settings': {name: value for name, value in vars(args).items() if name not in ('output', 'baseline')},
+        'corpus': {
+            'languages': {lang: sum(e['language'] == lang for e in encounters) for lang in LANGUAGES},
+            'lengths': {length: sum(e['length'] == length for e in encounters) for length in LENGTHS},
+            'transcript_words': summarize([sum(len(text.split()) for _, text in e['turns']) for e in encounters]),
+        },
+        'transcription': {
+            'wall_s': round(transcription_s, 3),
+            'throughput_per_min': round(len([ms for ms in transcribed if ms]) / transcription_s * 60, 1),
+            'end_to_end': summarize([ms for ms in transcribed if ms]),
+            'stages': {stage: summarize(values) for stage, values in stage_timings.items()},
+        },
+        'soap': {
+            'wall_s': round(soap_s, 3),
+            'throughput_per_min': round(len(completed) / soap_s * 60, 1),
+            'completed': len(completed),
+            'queued': sum(outcome == 'queued' for outcome, _ in outcomes),
+            'failed': sum(outcome == 'failed' for outcome, _ in outcomes),
+            'end_to_end': summarize(completed),
+            'end_to_end_by_length': by_length,
+            'stages': {stage: summarize(values) for stage, values in pipeline.timings.items()},
+        },
+        'retry_queue': {
+            'depth_after_soap': queued_before_drain,
+            'messages_sent': pipeline.sqs.sent,
+            'recovered': recovered,
+            'depth_after_drain': pipeline.sqs.depth(),
+            'batches': summarize(queue_timings),
+        },
+        'bedrock': pipeline.bedrock.stats(),
+        'prompt_cache_probe': cache_probe,
+        'supabase_requests': dict(sorted(pipeline.postgrest.requests.items())),
+        'spans': spans,
+        'failures': pipeline.failures,
+    }
+
+    found = []
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+        found = regressions(report, baseline, args.max_regression)
+        report['baseline'] = {'commit': baseline.get('commit'), 'max_regression': args.max_regression, 'regressions': found}
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+
+    for failure in pipeline.failures + found:
+        print(f"❌ {failure}", file=sys.stderr)
+    return 1 if pipeline.failures or found else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+PowerSync MCP server tools against a local PowerSync stand-in: concurrent probes, caching, pagination, latency, pooling, fleet
+
+Runs each tool of powersync-mcp-server/src/powersync_mcp_server.py through its MCP call_tool
+handler against bench/stand_ins.py's LocalPowerSync (every endpoint delayed by --latency-ms,
+--sync-rules deployed, by default the repo's multi-role rules). Reports per tool the wall time
+and requests of a cold call and of a repeat within the cache TTL.
+
+Checks:
+    - a tool probing N endpoints takes about one endpoint's latency, not N
+    - a repeat within the TTL makes no requests; concurrent calls share in-flight requests
+    - a call after the TTL refetches, and counter changes between scrapes are reported
+    - bucket and connection lists page with limit/offset
+    - a wrong API key, an unreachable instance and missing sync rules are reported, not raised
+    - latency histogram percentiles are within 2% of exact ones, in fixed memory
+    - 30 days of samples land in the right 1h/24h/7d/30d windows and a rising trend is seen
+    - the background sampler records samples and get_sync_latency reports them
+    - repeated uncached tool calls reuse pooled connections (--connect-ms per new connection),
+      the pool stays within its connection limit, uses per-instance tokens and closes cleanly
+    - check_fleet_health over a region map of stand-ins (one --slow-ms, one hanging past
+      --fleet-timeout, one unreachable) takes about the slowest instance, not the sum, reports
+      every instance in one table, and never probes more than `concurrency` instances at once;
+      with more instances in flight than POWERSYNC_MAX_CLIENTS, no probe loses its client
+
+Usage:
+    python3 bench/powersync_mcp_bench.py [--latency-ms 100] [--output report.json]
+
+Exits non-zero if any check fails.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / 'powersync-mcp-server' / 'src'))
+
+from stand_ins import LocalPowerSync  # noqa: E402
+
+API_KEY = 'bench-token'
+TABLES = ['users', 'electronic_health_records', 'vital_signs', 'lab_results', 'prescriptions',
+          'immunizations', 'medical_records', 'appointments', 'ehrbase_sync_queue']
+
+
+async def call(mcp_server, name, **arguments):
+    """Text of one tool call through the MCP handler, and its wall time in ms."""
+    started = time.perf_counter()
+    content = await mcp_server.handle_call_tool(name, arguments)
+    return content[0].text, round((time.perf_counter() - started) * 1000, 1)
+
+
+async def run(args, powersync, mcp_server, failures):
+    def check(condition, description):
+        if not condition:
+            failures.append(description)
+
+    def requests_made():
+        return sum(powersync.requests.values())
+
+    url = powersync.url
+    latency = args.latency_ms
+    tools = {
+        'get_sync_status': {},
+        'list_active_connections': {},
+        'get_sync_metrics': {'time_range': '1h'},
+        'check_instance_health': {},
+        'get_bucket_info': {},
+    }
+    results = {}
+    # Create the pooled client and its SSL context first, so cold calls time the probes
+    await call(mcp_server, 'check_instance_health', instance_url=url)
+    for name, arguments in tools.items():
+        mcp_server.clear_cache()
+        before = requests_made()
+        text, cold_ms = await call(mcp_server, name, instance_url=url, **arguments)
+        cold_requests = requests_made() - before
+        before = requests_made()
+        _, warm_ms = await call(mcp_server, name, instance_url=url, **arguments)
+        warm_requests = requests_made() - before
+        results[name] = {'cold_ms': cold_ms, 'cold_requests': cold_requests,
+                         'cached_ms': warm_ms, 'cached_requests': warm_requests}
+        check('Error' not in text.split('\n', 1)[0], f"{name}: returned an error: {text[:120]}")
+        check(cold_requests >= 2, f"{name}: expected several probes, made {cold_requests}")
+        check(cold_ms < latency * 1.8 + 100,
+              f"{name}: {cold_requests} probes took {cold_ms} ms, not concurrent (endpoint latency {latency} ms)")
+        check(warm_requests == 0, f"{name}: repeat within the TTL made {warm_requests} requests")
+
+    # Concurrent calls share in-flight probes
+    mcp_server.clear_cache()
+    before = dict(powersync.requests)
+    await asyncio.gather(*(call(mcp_server, name, instance_url=url, **arguments) for name, arguments in tools.items()))
+    per_route = {route: count - before.get(route, 0) for route, count in powersync.requests.items()}
+    shared = sum(per_route.values())
+    check(all(count <= 1 for count in per_route.values()), f"concurrent tool calls repeated requests: {per_route}")
+
+    # Refetch after the TTL; counter deltas between scrapes
+    mcp_server.CACHE_TTL = 0.2
+    await call(mcp_server, 'get_sync_metrics', instance_url=url, time_range='1h')
+    powersync.counters['powersync_operations_synced_total'] += 1200
+    await asyncio.sleep(0.25)
+    before = requests_made()
+    text, _ = await call(mcp_server, 'get_sync_metrics', instance_url=url, time_range='1h')
+    check(requests_made() - before > 0, 'call after the TTL was served from the cache')
+    check('+1,200' in text, f"operations synced change not reported:\n{text}")
+    mcp_server.CACHE_TTL = args.ttl
+
+    # Pagination
+    text, _ = await call(mcp_server, 'get_bucket_info', instance_url=url, limit=1)
+    check('Next page: offset=1' in text, f"bucket list not paged:\n{text}")
+    text, _ = await call(mcp_server, 'get_bucket_info', instance_url=url, bucket_name='user_data', limit=3, offset=3)
+    check('Showing queries 4-6 of' in text, f"bucket queries not paged:\n{text}")
+    text, _ = await call(mcp_server, 'get_bucket_info', instance_url=url, offset=1000)
+    check('No buckets at offset 1000' in text, f"offset past the end not reported:\n{text}")
+    text, _ = await call(mcp_server, 'get_sync_status', instance_url=url)
+    check(f"Active Connections: {powersync.client_connections}" in text, f"client count missing:\n{text}")
+
+    # Failure modes
+    mcp_server.clear_cache()
+    mcp_server.POWERSYNC_API_KEY = 'wrong'
+    text, _ = await call(mcp_server, 'list_active_connections', instance_url=url)
+    check('HTTP 401 (check POWERSYNC_API_KEY)' in text, f"bad API key not explained:\n{text}")
+    mcp_server.POWERSYNC_API_KEY = API_KEY
+
+    text, unreachable_ms = await call(mcp_server, 'check_instance_health', instance_url='http://127.0.0.1:9')
+    check('Unreachable' in text, f"unreachable instance not reported:\n{text}")
+
+    rules, powersync.sync_rules = powersync.sync_rules, ''
+    mcp_server.clear_cache()
+    text, _ = await call(mcp_server, 'get_bucket_info', instance_url=url)
+    check('no sync rules deployed' in text, f"missing sync rules not reported:\n{text}")
+    powersync.sync_rules = rules
+
+    results['concurrent_requests'] = shared
+    results['unreachable_ms'] = unreachable_ms
+    results['latency'] = await run_latency(args, powersync, mcp_server, check)
+    results['pool'] = await run_pool(args, powersync, mcp_server, check)
+    results['fleet'] = await run_fleet(args, powersync, mcp_server, check)
+    return results
+
+
+async def run_fleet(args, powersync, mcp_server, check):
+    """check_fleet_health over several stand-ins: wall time vs the slowest and the sum, timeouts, concurrency."""
+    mcp_server.clear_cache()
+    fast = [LocalPowerSync(api_key=API_KEY, latency_ms=args.latency_ms, tables=TABLES[:2], lag_bytes=1024 * (i + 1)).start()
+            for i in range(3)]
+    slow = LocalPowerSync(api_key=API_KEY, latency_ms=args.slow_ms, tables=TABLES[:2], lag_bytes=65536).start()
+    hung = LocalPowerSync(api_key=API_KEY, latency_ms=args.fleet_timeout * 3000, tables=TABLES[:2]).start()
+    stand_ins = fast + [slow, hung]
+    regions = {
+        'af-south-1': [powersync.url, fast[0].url],
+        'eu-west-1': [fast[1].url, slow.url],
+        'us-east-1': [fast[2].url, hung.url, 'http://127.0.0.1:9'],
+    }
+    instances = sum(regions.values(), [])
+    try:
+        text, fleet_ms = await call(mcp_server, 'check_fleet_health', regions=regions, timeout=args.fleet_timeout)
+        latencies = [args.latency_ms] * 4 + [args.slow_ms]
+        slowest_ms = args.fleet_timeout * 1000
+        check(fleet_ms < slowest_ms + 400, f"fleet check took {fleet_ms} ms, slowest instance is capped at {slowest_ms:.0f} ms")
+        check(fleet_ms < sum(latencies) + slowest_ms, f"fleet check took {fleet_ms} ms, about the sum of the instances")
+        check(all(url in text for url in instances), f"fleet table misses instances:\n{text}")
+        check(text.count('✅ healthy') == 5 and 'timeout' in text and 'unreachable' in text,
+              f"fleet statuses wrong:\n{text}")
+        check('65536' in text and 'us-east-1' in text, f"fleet table lacks lag or regions:\n{text}")
+
+        # Bounded parallelism: four fast instances, at most 8, 2 and 1 at a time
+        mcp_server.clear_cache()
+        fast_only = [powersync.url] + [stand_in.url for stand_in in fast]
+        _, parallel_ms = await call(mcp_server, 'check_fleet_health', instances=fast_only)
+        mcp_server.clear_cache()
+        _, bounded_ms = await call(mcp_server, 'check_fleet_health', instances=fast_only, concurrency=2)
+        mcp_server.clear_cache()
+        _, serial_ms = await call(mcp_server, 'check_fleet_health', instances=fast_only, concurrency=1)
+        check(parallel_ms < args.latency_ms * 2 + 100, f"4 instances in parallel took {parallel_ms} ms")
+        check(bounded_ms >= args.latency_ms * 2, f"concurrency=2 over 4 instances took {bounded_ms} ms, under two rounds")
+        check(serial_ms >= args.latency_ms * 4, f"concurrency=1 over 4 instances took {serial_ms} ms, under four rounds")
+
+        # More instances in flight than pooled clients: busy clients are not evicted under their requests
+        pooled_pool = mcp_server.pool
+        mcp_server.pool = mcp_server.ClientPool(pooled_pool.limits, max_clients=2)
+        mcp_server.clear_cache()
+        try:
+            text, _ = await call(mcp_server, 'check_fleet_health', instances=fast_only, concurrency=4)
+            check(text.count('✅ healthy') == 4, f"fleet check over a 2-client pool failed probes:\n{text}")
+            check(len(mcp_server.pool._clients) <= 2, f"pool kept {len(mcp_server.pool._clients)} clients after the check")
+        finally:
+            await mcp_server.pool.aclose()
+            mcp_server.pool = pooled_pool
+    finally:
+        for stand_in in stand_ins:
+            stand_in.stop()
+    return {
+        'instances': len(instances),
+        'slow_ms': args.slow_ms,
+        'timeout_s': args.fleet_timeout,
+        'fleet_ms': fleet_ms,
+        'sum_of_instances_ms': sum(latencies) + slowest_ms,
+        'four_fast_ms': {'concurrency_8': parallel_ms, 'concurrency_2': bounded_ms, 'concurrency_1': serial_ms},
+    }
+
+
+async def run_pool(args, powersync, mcp_server, check):
+    """Repeated uncached calls through the pool vs a connection per request; limits, tokens, shutdown."""
+    import httpx
+
+    mcp_server.CACHE_TTL = 0
+    url = powersync.url
+
+    async def repeated():
+        mcp_server.clear_cache()
+        connections = powersync.connections
+        timings = []
+        for _ in range(args.calls):
+            _, ms = await call(mcp_server, 'check_instance_health', instance_url=url)
+            timings.append(ms)
+        ordered = sorted(timings)
+        return {
+            'calls': args.calls,
+            'first_ms': timings[0],
+            'p50_ms': ordered[len(ordered) // 2],
+            'p95_ms': ordered[int(len(ordered) * 0.95)],
+            'new_connections': powersync.connections - connections,
+        }
+
+    pooled_pool = mcp_server.pool
+    await pooled_pool.aclose()
+    pooled = await repeated()
+    text, _ = await call(mcp_server, 'check_instance_health', instance_url=url)
+    check('Connection: reused HTTP/1.1' in text, f"health check does not report connection reuse:\n{text}")
+    await pooled_pool.aclose()
+
+    mcp_server.pool = mcp_server.ClientPool(httpx.Limits(max_keepalive_connections=0))
+    unpooled = await repeated()
+    await mcp_server.pool.aclose()
+    mcp_server.pool = pooled_pool
+    check(pooled['new_connections'] <= mcp_server.MAX_KEEPALIVE_CONNECTIONS,
+          f"pooled calls opened {pooled['new_connections']} connections")
+    check(pooled['p50_ms'] < unpooled['p50_ms'], f"pooled p50 {pooled['p50_ms']} ms not below unpooled {unpooled['p50_ms']} ms")
+
+    # Connection limit under a burst of concurrent tool calls
+    mcp_server.pool = mcp_server.ClientPool(httpx.Limits(max_connections=2, max_keepalive_connections=2))
+    mcp_server.clear_cache()
+    powersync.max_open = powersync.open_connections
+    await asyncio.gather(*(call(mcp_server, name, instance_url=url) for name in
+                           ('get_sync_status', 'check_instance_health', 'get_bucket_info', 'list_active_connections')))
+    limited_open = powersync.max_open
+    check(limited_open <= 2, f"{limited_open} connections open at once with max_connections=2")
+    await mcp_server.pool.aclose()
+    mcp_server.pool = pooled_pool
+
+    # Per-instance token: the instance's own key beats POWERSYNC_API_KEY
+    mcp_server.POWERSYNC_API_KEY = 'wrong'
+    mcp_server.POWERSYNC_API_KEYS = {url: API_KEY}
+    text, _ = await call(mcp_server, 'list_active_connections', instance_url=url)
+    check('Client connections: ' in text and 'HTTP 401' not in text, f"per-instance token not used:\n{text}")
+    mcp_server.POWERSYNC_API_KEY, mcp_server.POWERSYNC_API_KEYS = API_KEY, {}
+
+    # Eviction past max_clients skips clients with requests in flight, and catches up once they finish
+    small = mcp_server.ClientPool(pooled_pool.limits, max_clients=1)
+    async with small.lease('http://busy.invalid') as busy:
+        async with small.lease('http://other.invalid') as other:
+            await asyncio.sleep(0)
+            check(not busy.is_closed and not other.is_closed, 'pool closed a client with a request in flight')
+        await asyncio.sleep(0)
+        check(not busy.is_closed, 'pool closed a client with a request in flight')
+    await asyncio.sleep(0)
+    check(other.is_closed and list(small._clients) == ['http://busy.invalid'],
+          f"idle client not evicted after its request: {list(small._clients)}")
+    await small.aclose()
+
+    clients = list(pooled_pool._clients.values())
+    await pooled_pool.aclose()
+    check(clients and all(client.is_closed for client in clients), 'pool left clients open after aclose()')
+    mcp_server.CACHE_TTL = args.ttl
+    return {
+        'connect_ms': args.connect_ms,
+        'http2_available': mcp_server.HTTP2,
+        'pooled': pooled,
+        'connection_per_request': unpooled,
+        'max_open_with_limit_2': limited_open,
+        'per_instance_stats': {instance: {key: round(value, 1) for key, value in stats.items()}
+                               for instance, stats in pooled_pool.stats.items() if instance == url},
+    }
+
+
+async def run_latency(args, powersync, mcp_server, check):
+    """Histogram accuracy and windows, then the sampler and get_sync_latency against the stand-in."""
+    import latency_histogram
+
+    rng = random.Random(args.seed)
+    values = [rng.lognormvariate(math.log(40), 0.6) for _ in range(20000)]
+    histogram = latency_histogram.LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    exact = sorted(values)
+    accuracy = {}
+    for quantile, estimate in zip((0.5, 0.95, 0.99), histogram.percentiles(0.5, 0.95, 0.99)):
+        true = exact[round(quantile * len(exact)) - 1]
+        accuracy[f"p{round(quantile * 100)}"] = {'exact_ms': round(true, 2), 'histogram_ms': round(estimate, 2),
+                                                 'error_pct': round(abs(estimate - true) / true * 100, 2)}
+        check(abs(estimate - true) / true < 0.02, f"histogram p{round(quantile * 100)} {estimate:.2f} vs exact {true:.2f}")
+
+    # 30 days sampled every 5 minutes, latency rising linearly from 20 to 80 ms
+    tracker = latency_histogram.LatencyTracker()
+    now = 1_800_000_000.0
+    step = 300
+    count = 30 * 86400 // step
+    for n in range(count):
+        tracker.record(20 + 60 * n / count, now - (count - 1 - n) * step)
+    windows = {}
+    for time_range, seconds in latency_histogram.TIME_RANGES.items():
+        summary = tracker.summary(time_range, now)
+        windows[time_range] = {key: summary[key] for key in ('samples', 'p50', 'p95')}
+        expected = seconds // step
+        check(abs(summary['samples'] - expected) <= 12, f"{time_range}: {summary['samples']} samples, expected ~{expected}")
+    trend = tracker.summary('30d', now)['trend']
+    check(all(b > a for a, b in zip(trend, trend[1:])), f"30d trend not rising: {trend}")
+    tracker_bytes = sum(slot[1].counts.itemsize * len(slot[1].counts)
+                        for ring in (tracker.minutes, tracker.hours) for slot in ring.slots if slot)
+
+    # Background sampler against the stand-in
+    mcp_server.clear_cache()
+    mcp_server.SAMPLE_INTERVAL = 1.0
+    mcp_server.track_instance(powersync.url)
+    await asyncio.sleep(1.3)
+    await mcp_server.stop_sampler()
+    sampled = mcp_server._latency[(powersync.url, 'liveness')].summary('1h')['samples']
+    check(sampled >= 2, f"background sampler took {sampled} samples in 1.3 s at a 1 s interval")
+    text, _ = await call(mcp_server, 'get_sync_latency', instance_url=powersync.url, time_range='1h')
+    check('Liveness probe' in text and 'Checkpoint age' in text, f"get_sync_latency rows missing:\n{text}")
+    await mcp_server.stop_sampler()
+    text, _ = await call(mcp_server, 'get_sync_status', instance_url=powersync.url)
+    check('Sync Latency (checkpoint age, 1h)' in text, f"get_sync_status has no sampled latency:\n{text}")
+    await mcp_server.stop_sampler()
+
+    return {
+        'accuracy': accuracy,
+        'histogram_bytes': histogram.counts.itemsize * len(histogram.counts),
+        'tracker_bytes_30d': tracker_bytes,
+        'windows': windows,
+        'sampler_samples': sampled,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--latency-ms', type=float, default=100.0, help='delay of every stand-in response')
+    parser.add_argument('--sync-rules', default=str(REPO_ROOT / 'POWERSYNC_SYNC_RULES_COMPLETE.yaml'),
+                        help='sync rules YAML served as the deployed rules')
+    parser.add_argument('--ttl', type=float, default=15.0, help='POWERSYNC_CACHE_TTL for the run')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--connect-ms', type=float, default=20.0, help='stand-in delay per new connection (handshake)')
+    parser.add_argument('--calls', type=int, default=30, help='repeated uncached health checks per pool setting')
+    parser.add_argument('--slow-ms', type=float, default=600.0, help='latency of the slow fleet instance')
+    parser.add_argument('--fleet-timeout', type=float, default=1.0, help='per-instance timeout of the fleet check')
+    parser.add_argument('--output', help='write JSON report to this file')
+    args = parser.parse_args()
+
+    powersync = LocalPowerSync(
+        sync_rules=Path(args.sync_rules).read_text(encoding='utf-8'),
+        client_connections=237,
+        api_key=API_KEY,
+        latency_ms=args.latency_ms,
+        tables=TABLES,
+        lag_bytes=4096,
+        connect_ms=args.connect_ms,
+    ).start()
+    os.environ.update({'POWERSYNC_URL': powersync.url, 'POWERSYNC_API_KEY': API_KEY,
+                       'POWERSYNC_CACHE_TTL': str(args.ttl), 'POWERSYNC_SAMPLE_INTERVAL': '0'})
+    import powersync_mcp_server as mcp_server
+
+    failures = []
+    try:
+        results = asyncio.run(run(args, powersync, mcp_server, failures))
+    finally:
+        powersync.stop()
+
+    report = {
+        'benchmark': 'powersync_mcp',
+        'latency_ms': args.latency_ms,
+        'tools': results,
+        'failures': failures,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Precompression and manifest builder: parallel cold build, incremental rebuilds, serve.py caching
+
+Runs scripts/precompress_web_build.py's build_manifest on a synthetic Flutter web build
+(bench/serve_bench.py's, without siblings) and reports the cold build with one worker and
+with --workers, then the rebuild cases a Flutter developer hits.
+
+Checks:
+    - siblings decode to their file, incompressible files get none, manifest hashes are right
+    - a rebuild with nothing changed rehashes and recompresses nothing
+    - a rebuild that rewrites every file with the same content (flutter build web) rehashes
+      but recompresses nothing; changing three files recompresses exactly those
+    - a deleted file's siblings are removed, a .gz asset of the build is kept, and new
+      compression settings recompress everything
+    - serve.py takes ETags from the manifest (stable across same-content rebuilds), serves
+      `path?v=<hash>` as immutable, and ignores entries of files changed since the manifest
+
+Usage:
+    python3 bench/precompress_bench.py [--assets 300] [--workers 4] [--output report.json]
+
+Exits non-zero if any check fails.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / 'scripts'))
+
+import precompress_web_build as builder  # noqa: E402
+from serve_bench import Target, build_web, fetch  # noqa: E402
+
+HASHED_ASSET = 'assets/js/chunk.3f9a1b2c4d5e.js'
+GZ_ASSET = 'assets/data/records.tar.gz'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--assets', type=int, default=300, help='small assets in the synthetic build')
+    parser.add_argument('--main-kb', type=int, default=3000, help='size of main.dart.js')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='processes for the parallel build')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='write JSON report to this file')
+    args = parser.parse_args()
+
+    failures = []
+
+    def check(condition, description):
+        if not condition:
+            failures.append(description)
+
+    workdir = Path(tempfile.mkdtemp(prefix='precompress-bench-'))
+    results = {'cpus': os.cpu_count(), 'workers': args.workers, 'brotli': builder.brotli is not None}
+    try:
+        root = workdir / 'web'
+        files, _ = build_web(root, args.assets, args.main_kb, args.seed, precompress=False)
+        files[HASHED_ASSET] = files['flutter.js']
+        files[GZ_ASSET] = gzip.compress(b'records' * 1000)
+        for name in (HASHED_ASSET, GZ_ASSET):
+            (root / name).write_bytes(files[name])
+
+        results['serial'] = builder.build_manifest(root, workers=1, force=True)
+        results['parallel'] = builder.build_manifest(root, workers=args.workers, force=True)
+        if (os.cpu_count() or 1) > 1 and args.workers > 1:
+            check(results['parallel']['seconds'] < results['serial']['seconds'],
+                  f"{args.workers} workers took {results['parallel']['seconds']}s, one took {results['serial']['seconds']}s")
+
+        manifest = builder.load_manifest(root)
+        entries = manifest['files']
+        check(set(entries) == set(files), f"manifest files differ: {sorted(set(entries) ^ set(files))[:5]}")
+        for name, data in files.items():
+            entry = entries.get(name, {})
+            check(entry.get('sha256') == hashlib.sha256(data).hexdigest(), f"{name}: wrong hash")
+            for encoding in entry.get('encodings', {}):
+                sibling = (root / (name + builder.SUFFIXES[encoding])).read_bytes()
+                decoded = gzip.decompress(sibling) if encoding == 'gzip' else builder.brotli.decompress(sibling)
+                check(decoded == data, f"{name}: {encoding} sibling does not decode to the file")
+        check('gzip' in entries['main.dart.js']['encodings'], 'main.dart.js was not precompressed')
+        check(not entries['assets/images/icon_2.png']['encodings'] and not (root / 'assets/images/icon_2.png.gz').exists(),
+              'incompressible image got a sibling')
+        check(entries[HASHED_ASSET]['cache_control'] == builder.IMMUTABLE
+              and entries['main.dart.js']['cache_control'] == builder.REVALIDATE, 'cache policy wrong')
+        check(entries['canvaskit/canvaskit.wasm']['content_type'] == 'application/wasm', 'wasm content type wrong')
+
+        unchanged = builder.build_manifest(root, workers=args.workers)
+        results['unchanged'] = unchanged
+        check(unchanged['hashed'] == 0 and unchanged['compressed'] == 0,
+              f"unchanged rebuild hashed {unchanged['hashed']}, compressed {unchanged['compressed']}")
+
+        # flutter build web rewrites every file, mostly with the same content
+        for name in files:
+            os.utime(root / name, ns=(time.time_ns(), time.time_ns() + 10**9))
+        rewritten = builder.build_manifest(root, workers=args.workers)
+        results['same_content_rewrite'] = rewritten
+        check(rewritten['hashed'] == len(files) and rewritten['compressed'] == 0,
+              f"same-content rewrite hashed {rewritten['hashed']}, compressed {rewritten['compressed']}")
+
+        # serve.py: content-hash ETags survive the rewrite; versioned URLs are immutable
+        target = Target(root, True, None)
+        try:
+            conn = target.connection()
+            main_hash = builder.load_manifest(root)['files']['main.dart.js']['sha256']
+            status, headers, body = fetch(conn, '/main.dart.js', {'Accept-Encoding': 'gzip'})
+            check(headers.get('ETag') == f'"{main_hash[:16]}-gzip"' and gzip.decompress(body) == files['main.dart.js'],
+                  f"served ETag {headers.get('ETag')} is not the manifest hash, or the sibling was refused")
+            check(headers.get('Cache-Control') == builder.REVALIDATE, f"unversioned Cache-Control {headers.get('Cache-Control')}")
+            status, headers, _ = fetch(conn, f'/main.dart.js?v={main_hash[:12]}')
+            check(status == 200 and headers.get('Cache-Control') == builder.IMMUTABLE,
+                  f"versioned URL Cache-Control {headers.get('Cache-Control')}")
+            status, headers, _ = fetch(conn, '/main.dart.js?v=0123456789ab')
+            check(headers.get('Cache-Control') == builder.REVALIDATE, 'wrong version served as immutable')
+            status, headers, _ = fetch(conn, f'/{HASHED_ASSET}')
+            check(headers.get('Cache-Control') == builder.IMMUTABLE, 'hashed file name not immutable')
+
+            os.utime(root / 'main.dart.js', ns=(time.time_ns(), time.time_ns() + 2 * 10**9))
+            builder.build_manifest(root, workers=args.workers)
+            status, _, _ = fetch(conn, '/main.dart.js', {'Accept-Encoding': 'gzip', 'If-None-Match': f'"{main_hash[:16]}-gzip"'})
+            check(status == 304, f"same-content rebuild invalidated the ETag: {status}")
+
+            # Changed after the manifest was written: the entry is ignored
+            (root / 'flutter.js').write_bytes(b'// edited\n' + files['flutter.js'])
+            status, headers, body = fetch(conn, '/flutter.js')
+            check(body.startswith(b'// edited') and entries['flutter.js']['sha256'][:16] not in headers.get('ETag', ''),
+                  f"stale manifest entry used for an edited file: {headers.get('ETag')}")
+            conn.close()
+        finally:
+            target.stop()
+
+        changed = ['flutter.js', 'assets/js/chunk_0.js', 'assets/data/strings_1.json']
+        for name in changed[1:]:
+            (root / name).write_bytes(b'/* v2 */ ' + files[name])
+        edited = builder.build_manifest(root, workers=args.workers)
+        results['three_changed'] = edited
+        check(edited['compressed'] == 3 and edited['hashed'] == 3,
+              f"three changed files: hashed {edited['hashed']}, compressed {edited['compressed']}")
+        check(gzip.decompress((root / 'flutter.js.gz').read_bytes()).startswith(b'// edited'), 'changed sibling not rewritten')
+
+        (root / 'assets/js/chunk_3.js').unlink()
+        removed = builder.build_manifest(root, workers=args.workers)
+        check(removed['removed'] >= 1 and not (root / 'assets/js/chunk_3.js.gz').exists(), 'deleted file kept its sibling')
+        check((root / GZ_ASSET).exists() and GZ_ASSET in builder.load_manifest(root)['files'], '.gz asset of the build removed')
+
+        resettled = builder.build_manifest(root, workers=args.workers, gzip_level=6)
+        check(resettled['reused'] == 0 and resettled['compressed'] > 0,
+              'new settings did not recompress everything')
+        results['new_settings'] = resettled
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {'benchmark': 'precompress', **results, 'failures': failures}
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Page loads against local-https-server/serve.py: threaded vs single-threaded, precompressed assets, revalidation
+
+Builds a synthetic Flutter web build (index.html, main.dart.js, canvaskit.wasm, fonts and
+--assets small assets) with .gz siblings (.br too when brotli is installed) and serves it
+with serve.make_server over TLS (a throwaway self-signed certificate from openssl) in each
+mode. --phones concurrent page loads then fetch index.html and every asset over 6
+keep-alive connections each, as a browser does, while --slow-clients connections trickle
+their request headers in (a phone on a bad link). A warm reload sends If-None-Match.
+
+Checks:
+    - with slow clients connected, threaded page loads are faster than single-threaded ones
+    - a warm reload gets only 304s; precompressed page loads move fewer bytes
+    - .gz/.br siblings are served when accepted and decode to the file; stale siblings are not
+    - single byte ranges (206), suffix ranges, 416 and If-Range; HEAD and OPTIONS on keep-alive
+    - the Chime SDK route gets the same ETag, 304 and range handling
+    - the same over plain HTTP, where bodies go out with sendfile()
+
+Usage:
+    python3 bench/serve_bench.py [--phones 4] [--slow-clients 2] [--assets 200] [--output report.json]
+
+Exits non-zero if any check fails.
+"""
+
+import argparse
+import gzip
+import http.client
+import json
+import os
+import queue
+import random
+import shutil
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / 'local-https-server'))
+
+import serve  # noqa: E402
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = ('.html', '.js', '.json', '.wasm', '.otf', '.css')
+BROWSER_CONNECTIONS = 6
+JS_WORDS = ('function', 'return', 'var', 'this', 'null', 'prototype', 'call', 'apply', 'length',
+            'dart', 'core', 'async', 'Future', 'List', 'Map', '$', '_', '(', ')', '{', '}', ';', '.', '=')
+
+
+def pseudo_js(rng, size):
+    words = []
+    total = 0
+    while total < size:
+        word = rng.choice(JS_WORDS) + (str(rng.randrange(64)) if rng.random() < 0.3 else '')
+        words.append(word)
+        total += len(word) + 1
+    return ' '.join(words).encode('utf-8')[:size]
+
+
+def build_web(root, assets, main_kb, seed, precompress=True):
+    """Synthetic build/web, with .gz/.br siblings if precompress; returns its files and the assets fetched after index.html."""
+    rng = random.Random(seed)
+    files = {
+        'index.html': b'<!DOCTYPE html><html><head><script src="flutter.js"></script></head><body>'
+                      + pseudo_js(rng, 1500) + b'</body></html>',
+        'flutter.js': pseudo_js(rng, 12_000),
+        'main.dart.js': pseudo_js(rng, main_kb * 1024),
+        'canvaskit/canvaskit.wasm': bytes(rng.choice(b'\x00\x01\x02\x41\x7f\x20\x21') for _ in range(600_000)),
+        'assets/fonts/MaterialIcons-Regular.otf': bytes(rng.randrange(96) for _ in range(150_000)),
+        'amazon-chime-sdk-medzen.min.js': pseudo_js(rng, 200_000),
+    }
+    for i in range(assets):
+        kind = i % 3
+        if kind == 0:
+            files[f'assets/js/chunk_{i}.js'] = pseudo_js(rng, rng.randrange(2_000, 30_000))
+        elif kind == 1:
+            files[f'assets/data/strings_{i}.json'] = json.dumps(
+                {f'key_{k}': pseudo_js(rng, 40).decode() for k in range(rng.randrange(20, 200))}).encode()
+        else:
+            files[f'assets/images/icon_{i}.png'] = rng.randbytes(rng.randrange(1_000, 20_000))
+    for name, data in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        if precompress and path.suffix in COMPRESSIBLE:
+            (root / f'{name}.gz').write_bytes(gzip.compress(data, 9, mtime=0))
+            if brotli is not None:
+                (root / f'{name}.br').write_bytes(brotli.compress(data))
+    return files, [name for name in files if name not in ('index.html', 'amazon-chime-sdk-medzen.min.js')]
+
+
+def self_signed(directory):
+    """(cert, key) from openssl, or None when openssl is not available."""
+    cert, key = directory / 'bench.crt', directory / 'bench.key'
+    try:
+        subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-keyout', str(key),
+                        '-out', str(cert), '-days', '1', '-subj', '/CN=localhost'],
+                       check=True, capture_output=True, timeout=60)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return cert, key
+
+
+class Target:
+    """A running serve.py server and how to connect to it."""
+
+    def __init__(self, root, threaded, certificate):
+        context = None
+        if certificate:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(*certificate)
+        self.httpd = serve.make_server(0, str(root), threaded=threaded, context=context, quiet=True, host='127.0.0.1')
+        self.port = self.httpd.server_address[1]
+        self.client_context = None
+        if certificate:
+            self.client_context = ssl.create_default_context()
+            self.client_context.check_hostname = False
+            self.client_context.verify_mode = ssl.CERT_NONE
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def connection(self):
+        if self.client_context:
+            return http.client.HTTPSConnection('127.0.0.1', self.port, context=self.client_context, timeout=60)
+        return http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def fetch(conn, path, headers=None, method='GET'):
+    conn.request(method, path, headers=headers or {})
+    response = conn.getresponse()
+    return response.status, dict(response.getheaders()), response.read()
+
+
+def load_page(target, assets, accept_encoding='gzip, br', etags=None):
+    """index.html, then every asset over BROWSER_CONNECTIONS keep-alive connections."""
+    started = time.perf_counter()
+    statuses, seen_etags, received = {}, {}, [0]
+    lock = threading.Lock()
+
+    def get(conn, path):
+        headers = {'Accept-Encoding': accept_encoding}
+        if etags and path in etags:
+            headers['If-None-Match'] = etags[path]
+        try:
+            status, response_headers, body = fetch(conn, '/' + path, headers)
+        except (OSError, http.client.HTTPException):
+            conn.close()  # reconnects on the next request
+            status, response_headers, body = 'error', {}, b''
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+            received[0] += len(body)
+            if 'ETag' in response_headers:
+                seen_etags[path] = response_headers['ETag']
+
+    conn = target.connection()
+    get(conn, 'index.html')
+    pending = queue.Queue()
+    for path in assets:
+        pending.put(path)
+
+    def worker(conn):
+        while True:
+            try:
+                path = pending.get_nowait()
+            except queue.Empty:
+                break
+            get(conn, path)
+        conn.close()
+
+    threads = [threading.Thread(target=worker, args=(conn if i == 0 else target.connection(),))
+               for i in range(BROWSER_CONNECTIONS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {'ms': round((time.perf_counter() - started) * 1000, 1), 'bytes': received[0],
+            'statuses': statuses, 'etags': seen_etags}
+
+
+def slow_client(target, stop, delay_s):
+    """Send one request at a time, a few header bytes per delay_s, until stopped."""
+    request = b'GET /flutter.js HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept-Encoding: gzip\r\nConnection: close\r\n\r\n'
+    while not stop.is_set():
+        try:
+            raw = socket.create_connection(('127.0.0.1', target.port), timeout=30)
+            sock = target.client_context.wrap_socket(raw) if target.client_context else raw
+            with sock:
+                for i in range(0, len(request), 8):
+                    sock.sendall(request[i:i + 8])
+                    time.sleep(delay_s)
+                while sock.recv(65536):
+                    pass
+        except OSError:
+            if stop.is_set():
+                break
+
+
+def run_page_loads(target, assets, args):
+    """Concurrent page loads with slow clients connected; then a warm reload."""
+    stop = threading.Event()
+    slow = [threading.Thread(target=slow_client, args=(target, stop, args.slow_delay_ms / 1000), daemon=True)
+            for _ in range(args.slow_clients)]
+    for thread in slow:
+        thread.start()
+    time.sleep(0.05)
+    results = [None] * args.phones
+
+    def phone(i):
+        results[i] = load_page(target, assets)
+
+    threads = [threading.Thread(target=phone, args=(i,)) for i in range(args.phones)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stop.set()
+    for thread in slow:
+        thread.join()
+
+    cold = sorted(result['ms'] for result in results)
+    errors = sum(result['statuses'].get('error', 0) for result in results)
+    warm = load_page(target, assets, etags=results[0]['etags'])
+    identity = load_page(target, assets, accept_encoding='identity')
+    return {
+        'page_load_ms': {'p50': cold[len(cold) // 2], 'max': cold[-1]},
+        'cold_bytes': results[0]['bytes'],
+        'cold_statuses': results[0]['statuses'],
+        'cold_errors': errors,
+        'identity_bytes': identity['bytes'],
+        'warm_ms': warm['ms'],
+        'warm_bytes': warm['bytes'],
+        'warm_statuses': warm['statuses'],
+    }
+
+
+def run_checks(target, root, files, check, label):
+    """Content negotiation, validators, ranges, HEAD/OPTIONS and the SDK route."""
+    conn = target.connection()
+    main = files['main.dart.js']
+
+    status, headers, body = fetch(conn, '/main.dart.js', {'Accept-Encoding': 'gzip'})
+    check(status == 200 and headers.get('Content-Encoding') == 'gzip' and gzip.decompress(body) == main,
+          f"{label}: .gz sibling not served or does not decode to main.dart.js")
+    check(headers.get('Vary') == 'Accept-Encoding' and headers.get('Cache-Control') == serve.CACHE_CONTROL,
+          f"{label}: Vary/Cache-Control missing: {headers}")
+    if brotli is not None:
+        status, headers, body = fetch(conn, '/main.dart.js', {'Accept-Encoding': 'gzip, deflate, br'})
+        check(headers.get('Content-Encoding') == 'br' and brotli.decompress(body) == main,
+              f"{label}: .br sibling not preferred")
+    status, headers, body = fetch(conn, '/main.dart.js', {'Accept-Encoding': 'gzip;q=0'})
+    check(status == 200 and 'Content-Encoding' not in headers and body == main, f"{label}: q=0 not honoured")
+
+    status, headers, body = fetch(conn, '/main.dart.js')
+    etag = headers.get('ETag')
+    check(body == main and etag, f"{label}: identity body or ETag wrong")
+    status, headers, body = fetch(conn, '/main.dart.js', {'If-None-Match': etag})
+    check(status == 304 and not body, f"{label}: If-None-Match got {status}")
+    status, _, _ = fetch(conn, '/main.dart.js', {'If-Modified-Since': headers.get('Last-Modified', '')})
+    check(status == 304, f"{label}: If-Modified-Since got {status}")
+
+    status, headers, body = fetch(conn, '/main.dart.js', {'Range': 'bytes=100-199', 'Accept-Encoding': 'gzip'})
+    check(status == 206 and body == main[100:200] and headers.get('Content-Range') == f"bytes 100-199/{len(main)}",
+          f"{label}: range got {status} {headers.get('Content-Range')}")
+    status, _, body = fetch(conn, '/main.dart.js', {'Range': 'bytes=-50'})
+    check(status == 206 and body == main[-50:], f"{label}: suffix range got {status}")
+    status, headers, body = fetch(conn, '/main.dart.js', {'Range': f'bytes={len(main)}-'})
+    check(status == 416 and headers.get('Content-Range') == f"bytes */{len(main)}", f"{label}: past-the-end range got {status}")
+    status, headers, body = fetch(conn, '/main.dart.js', {'Range': 'bytes=-0'})
+    check(status == 416 and headers.get('Content-Range') == f"bytes */{len(main)}", f"{label}: zero-length suffix got {status}")
+    status, _, body = fetch(conn, '/main.dart.js', {'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+    check(status == 200 and body == main, f"{label}: If-Range mismatch got {status}")
+
+    status, headers, body = fetch(conn, '/main.dart.js', method='HEAD')
+    check(status == 200 and int(headers['Content-Length']) == len(main) and not body, f"{label}: HEAD wrong")
+    status, headers, _ = fetch(conn, '/main.dart.js', method='OPTIONS')
+    check(status == 200 and headers.get('Access-Control-Allow-Origin') == '*', f"{label}: OPTIONS got {status}")
+    status, _, body = fetch(conn, '/')
+    check(status == 200 and body == files['index.html'], f"{label}: / did not serve index.html")
+    status, headers, _ = fetch(conn, '/assets')
+    check(status == 301, f"{label}: directory without slash got {status}")
+    status, _, _ = fetch(conn, '/missing.js')
+    check(status == 404, f"{label}: missing file got {status}")
+
+    sdk = files['amazon-chime-sdk-medzen.min.js']
+    status, headers, body = fetch(conn, serve.SDK_ROUTE)
+    check(status == 200 and body == sdk and headers.get('ETag'), f"{label}: Chime SDK route got {status}")
+    status, _, _ = fetch(conn, serve.SDK_ROUTE, {'If-None-Match': headers.get('ETag', '')})
+    check(status == 304, f"{label}: Chime SDK route revalidation got {status}")
+    status, _, body = fetch(conn, serve.SDK_ROUTE, {'Range': 'bytes=0-99'})
+    check(status == 206 and body == sdk[:100], f"{label}: Chime SDK route range got {status}")
+
+    # A sibling older than its file is from an earlier build
+    stale = root / 'flutter.js'
+    os.utime(stale, ns=(time.time_ns(), time.time_ns() + 10**9))
+    status, headers, body = fetch(conn, '/flutter.js', {'Accept-Encoding': 'gzip'})
+    check('Content-Encoding' not in headers and body == files['flutter.js'], f"{label}: stale .gz served")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--phones', type=int, default=4, help='concurrent page loads')
+    parser.add_argument('--slow-clients', type=int, default=2, help='connections trickling their requests in')
+    parser.add_argument('--slow-delay-ms', type=float, default=20.0, help='delay per 8 request bytes of a slow client')
+    parser.add_argument('--assets', type=int, default=200, help='small assets in the synthetic build')
+    parser.add_argument('--main-kb', type=int, default=1500, help='size of main.dart.js')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='write JSON report to this file')
+    args = parser.parse_args()
+
+    failures = []
+
+    def check(condition, description):
+        if not condition:
+            failures.append(description)
+
+    workdir = Path(tempfile.mkdtemp(prefix='serve-bench-'))
+    sdk_dir = serve.LOCAL_SDK_DIR
+    results = {}
+    try:
+        root = workdir / 'web'
+        files, assets = build_web(root, args.assets, args.main_kb, args.seed)
+        serve.LOCAL_SDK_DIR = str(root)
+        certificate = self_signed(workdir)
+        results['tls'] = certificate is not None
+        results['brotli'] = brotli is not None
+        results['requests_per_page'] = len(assets) + 1
+
+        for mode, threaded in (('single_threaded', False), ('threaded', True)):
+            target = Target(root, threaded, certificate)
+            try:
+                results[mode] = run_page_loads(target, assets, args)
+            finally:
+                target.stop()
+            loads = results[mode]
+            check(not loads['cold_errors'], f"{mode}: {loads['cold_errors']} requests failed during the page loads")
+            check(loads['warm_statuses'] == {304: len(assets) + 1}, f"{mode}: warm reload got {loads['warm_statuses']}")
+            check(loads['cold_bytes'] < loads['identity_bytes'],
+                  f"{mode}: precompressed load moved {loads['cold_bytes']} bytes, identity {loads['identity_bytes']}")
+
+        single, threaded = results['single_threaded'], results['threaded']
+        check(threaded['page_load_ms']['p50'] < single['page_load_ms']['p50'],
+              f"threaded p50 page load {threaded['page_load_ms']['p50']} ms not below "
+              f"single-threaded {single['page_load_ms']['p50']} ms")
+        results['speedup'] = round(single['page_load_ms']['p50'] / threaded['page_load_ms']['p50'], 1)
+
+        for label, certificate_used in (('tls', certificate), ('plain', None)):
+            if label == 'tls' and not certificate:
+                continue
+            target = Target(root, True, certificate_used)
+            try:
+                run_checks(target, root, files, check, label)
+            finally:
+                target.stop()
+            os.utime(root / 'flutter.js')
+            os.utime(root / 'flutter.js.gz')
+    finally:
+        serve.LOCAL_SDK_DIR = sdk_dir
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {'benchmark': 'serve', 'phones': args.phones, 'slow_clients': args.slow_clients, **results,
+              'failures': failures}
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Time-to-note benchmark: incremental SOAP drafting during the call vs the batch SOAP Lambda
+
+For each dialogue length, the same synthetic consultation (pipeline_bench's turns, timed as
+the streaming stand-in lays them out) is turned into a SOAP note twice, against
+bench/bedrock_emulator.py:
+
+    batch        generate-soap-from-transcript.py's lambda_handler on the whole transcript,
+                 as the Step Functions workflow runs it after the batch transcript exists
+    incremental  medzen_runtime.soap_draft: final segments are added as the call goes and
+                 step() runs after each; at hang-up only finalize() is on the critical path
+
+Emulator latency (first byte plus per output token, per model) is summed over the Bedrock calls
+each flow makes after hang-up, so the comparison does not depend on this machine. Facts
+updates are answered by a scripted extractor that files each new line under a category by
+keyword. End-to-end time-to-note adds the transcript wait: the batch Transcribe job
+(--batch-transcription-ratio of the call length, an assumption) vs storing the streamed
+transcript (--streaming-store-ms, from bench/streaming_replay_bench.py).
+
+Checks: both flows return a valid note and fall back to the same bundled system prompt,
+which carries the SOAP schema; finalize is on the critical path for less emulated
+time than the batch SOAP call (prompt sizes are reported, not checked: for a short call the
+draft note in a repair prompt outweighs the transcript); with the draft model throttled for the whole call, finalize still produces the
+note from the unabsorbed lines.
+
+Usage:
+    python3 bench/soap_draft_bench.py [--lengths short,medium,long] [--seed 7] [--output report.json]
+
+Exits non-zero if any check fails.
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import random
+import re
+import sys
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+FUNCTIONS_DIR = REPO_ROOT / 'aws-deployment' / 'lambda-functions'
+sys.path.insert(0, str(REPO_ROOT / 'aws-deployment' / 'lambda-layers' / 'medzen-runtime' / 'python'))
+
+from medzen_runtime import soap_draft, tracing  # noqa: E402
+from medzen_runtime.clients import register_client  # noqa: E402
+from medzen_runtime.config import get_config  # noqa: E402
+from bedrock_emulator import BedrockEmulator  # noqa: E402
+from pipeline_bench import LENGTHS, load_module, synthetic_turns  # noqa: E402
+from stand_ins import LocalPostgREST, LocalTranscribeStreaming  # noqa: E402
+
+REGIONS = (None, 'us-east-1', 'eu-central-1')
+
+# Keyword rules for the scripted facts extractor, first match wins
+FACT_RULES = [
+    ('red_flags', re.compile(r'trouble breathing|gets worse|chest pain', re.I)),
+    ('allergies', re.compile(r'allerg', re.I)),
+    ('plan', re.compile(r'prescribe|come back|follow up|rest and', re.I)),
+    ('medications', re.compile(r'\bmg\b|ibuprofen|metformin|taking any medications', re.I)),
+    ('observations', re.compile(r'blood pressure|temperature|listen to your lungs', re.I)),
+    ('history', re.compile(r'diabetes|smoke|at home|daughter|husband', re.I)),
+    ('symptoms', re.compile(r'throat|cough|tired|aches|fever|runny|swallow|symptoms', re.I)),
+]
+LINE_RE = re.compile(r'^\[[\d.]+\] (\S+): (.+)$', re.M)
+
+
+def scripted_update(prompt):
+    """Facts delta for the lines between the NEW TRANSCRIPT LINES markers."""
+    block = prompt.split('---NEW TRANSCRIPT LINES START---', 1)[1].split('---NEW TRANSCRIPT LINES END---', 1)[0]
+    add = {}
+    complaint = None
+    for speaker, text in LINE_RE.findall(block):
+        for sentence in re.split(r'(?<=[.?!])\s+', text):
+            for category, rule in FACT_RULES:
+                if rule.search(sentence):
+                    add.setdefault(category, []).append(sentence.strip())
+                    if category == 'symptoms' and complaint is None and not sentence.endswith('?'):
+                        complaint = sentence.strip()
+                    break
+    facts = json.loads(prompt.split('Current facts:\n', 1)[1].split('\n\nRolling summary:', 1)[0])
+    summary = f"Telemedicine consultation; {sum(len(v) for v in facts.values() if isinstance(v, list))} facts so far."
+    return json.dumps({
+        'add': add,
+        'remove': {},
+        'chief_complaint': complaint if not facts.get('chief_complaint') else None,
+        'summary': summary,
+    }, ensure_ascii=False)
+
+
+def segments_for(turns):
+    """Final segments with the timing the streaming stand-in gives the same turns."""
+    stream = LocalTranscribeStreaming(turns)
+    segments = []
+    for utterance in stream.utterances:
+        words = utterance['words']
+        segments.append({
+            'speaker': f"spk_{utterance['speaker']}",
+            'start_time': words[0]['StartTime'],
+            'end_time': words[-1]['EndTime'],
+            'text': ' '.join(word['Content'] for word in words),
+        })
+    return segments, stream.duration
+
+
+class Latency:
+    """Emulated Bedrock latency and calls since a mark, summed over all models."""
+
+    def __init__(self, emulator):
+        self.emulator = emulator
+        self.mark()
+
+    def _samples(self):
+        return {model: list(stats['latency_ms']) for model, stats in self.emulator._stats.items()}
+
+    def mark(self):
+        self._start = {model: len(samples) for model, samples in self._samples().items()}
+
+    def since(self):
+        calls, total = 0, 0.0
+        for model, samples in self._samples().items():
+            new = samples[self._start.get(model, 0):]
+            calls += len(new)
+            total += sum(new)
+        return calls, round(total, 1)
+
+
+def run_batch(generate, turns, metadata):
+    transcript = '\n\n'.join(f"{speaker}: {text}" for speaker, text in turns)
+    response = generate.lambda_handler({
+        'sessionId': metadata['session_id'],
+        'appointmentId': metadata['appointment_id'],
+        'transcript': transcript,
+        'providerName': 'Dr. Bench',
+        'transcriptLanguage': 'en',
+    }, None)
+    tokens = response.get('bedrockTokens', {})
+    return response, {'input': tokens.get('input', 0) + tokens.get('cache_read', 0) + tokens.get('cache_write', 0),
+                      'output': tokens.get('output', 0)}
+
+
+def run_incremental(segments, metadata):
+    drafter = soap_draft.SoapDrafter(metadata)
+    for segment in segments:
+        drafter.add(segment)
+        drafter.step()
+    return drafter
+
+
+def prompt_tokens(usage):
+    return usage.get('input', 0) + usage.get('cache_read', 0) + usage.get('cache_write', 0)
+
+
+def measure(length, args, emulator, generate, failures):
+    def check(condition, description):
+        if not condition:
+            failures.append(f"{length}: {description}")
+
+    turns = synthetic_turns('en', length, random.Random(args.seed))
+    segments, duration = segments_for(turns)
+    metadata = {'appointment_id': f"apptdraft{length}", 'session_id': f"session-{length}", 'language': 'en'}
+    latency = Latency(emulator)
+
+    latency.mark()
+    response, batch_tokens = run_batch(generate, turns, metadata)
+    batch_calls, batch_ms = latency.since()
+    check(response.get('statusCode') == 200, f"batch note generated (got {response.get('statusCode')})")
+
+    latency.mark()
+    drafter = run_incremental(segments, metadata)
+    live_calls, live_ms = latency.since()
+    latency.mark()
+    result = drafter.finalize()
+    final_calls, final_ms = latency.since()
+    check(result['statusCode'] == 200, f"drafted note finalized (got {result.get('message')})")
+    check(not result.get('validation', {}).get('invalid_sections'), 'drafted note passes the SOAP schema')
+    check(final_ms < batch_ms, f"finalize ({final_ms} ms) faster than batch ({batch_ms} ms)")
+    finalize_tokens = result['bedrock_tokens']['finalize']
+
+    batch_transcript_ms = args.batch_transcription_ratio * duration * 1000
+    return {
+        'turns': len(turns),
+        'call_seconds': round(duration, 1),
+        'batch': {
+            'bedrock_calls': batch_calls,
+            'soap_ms': batch_ms,
+            'input_tokens': batch_tokens['input'],
+            'output_tokens': batch_tokens['output'],
+            'time_to_note_ms': round(batch_transcript_ms + batch_ms, 1),
+        },
+        'incremental': {
+            'live_bedrock_calls': live_calls,
+            'live_bedrock_ms': live_ms,
+            'live_tokens': result['bedrock_tokens']['live'],
+            'facts': {category: len(facts) for category, facts in drafter.facts.items() if isinstance(facts, list)},
+            'finalize_calls': final_calls,
+            'finalize_ms': final_ms,
+            'finalize_input_tokens': prompt_tokens(finalize_tokens),
+            'finalize_output_tokens': finalize_tokens.get('output', 0),
+            'sections_regenerated': result['sections_regenerated'],
+            'time_to_note_ms': round(args.streaming_store_ms + final_ms, 1),
+        },
+        'speedup': {
+            'soap_call': round(batch_ms / final_ms, 1) if final_ms else None,
+            'time_to_note': round((batch_transcript_ms + batch_ms) / (args.streaming_store_ms + final_ms), 1),
+        },
+    }
+
+
+def draft_model_outage(args, emulator, failures):
+    """Throttle the draft model for a whole call: facts never update, finalize must still deliver."""
+    draft_model = get_config('soap_draft_model_id')
+    emulator.configure(draft_model, throttle_rate=1.0)
+    try:
+        segments, _ = segments_for(synthetic_turns('en', 'short', random.Random(args.seed + 1)))
+        drafter = run_incremental(segments, {'appointment_id': 'apptoutage', 'language': 'en'})
+        result = drafter.finalize()
+    finally:
+        emulator.configure(draft_model, throttle_rate=0.0)
+    outcome = {'statusCode': result['statusCode'], 'calls': result.get('calls'), 'segments': len(segments)}
+    if result['statusCode'] != 200:
+        failures.append(f"draft model outage: finalize failed ({result.get('message')})")
+    elif result['calls']['update'] != 0 or result['calls']['note'] != 1:
+        failures.append(f"draft model outage: expected no updates and one full note (got {result['calls']})")
+    return outcome
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--lengths', default='short,medium,long', help=f"comma-separated of {', '.join(LENGTHS)}")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--primary-ms-per-token', type=float, default=25.0, help='note model generation time per token')
+    parser.add_argument('--draft-ms-per-token', type=float, default=12.0, help='draft model generation time per token')
+    parser.add_argument('--batch-transcription-ratio', type=float, default=0.3,
+                        help='assumed batch Transcribe turnaround as a fraction of the call length')
+    parser.add_argument('--streaming-store-ms', type=float, default=260.0,
+                        help='hang-up to stored streamed transcript (see streaming_replay_bench.py)')
+    parser.add_argument('--output', help='write JSON report to this file')
+    args = parser.parse_args()
+
+    config = get_config()
+    emulator = BedrockEmulator(
+        models={
+            config['model_id_primary']: {'latency': {'dist': 'fixed', 'ms': 900}, 'ms_per_output_token': args.primary_ms_per_token},
+            config['soap_draft_model_id']: {'latency': {'dist': 'fixed', 'ms': 500}, 'ms_per_output_token': args.draft_ms_per_token},
+        },
+        seed=args.seed,
+        time_scale=0,
+        scripts=[('CLINICAL FACTS UPDATE', scripted_update)],
+    )
+    for region in REGIONS:
+        register_client('bedrock-runtime', emulator, region)
+    postgrest = LocalPostgREST({}).start()
+    os.environ.update({'SUPABASE_URL': postgrest.url, 'SUPABASE_SERVICE_KEY': 'bench'})
+
+    failures = []
+    tracing.METRICS_ENABLED = False
+    logging.disable(logging.CRITICAL)
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            generate = load_module(FUNCTIONS_DIR / 'generate-soap-from-transcript.py', 'bench_generate')
+        if generate.SYSTEM_PROMPT is not soap_draft.SYSTEM_PROMPT or '"schema_version"' not in soap_draft.SYSTEM_PROMPT:
+            failures.append('drafted and batch notes do not fall back to the same schema-bearing system prompt')
+        results = {length: measure(length, args, emulator, generate, failures) for length in args.lengths.split(',')}
+        outage = draft_model_outage(args, emulator, failures)
+    finally:
+        logging.disable(logging.NOTSET)
+        postgrest.stop()
+
+    report = {
+        'benchmark': 'soap_draft',
+        'assumptions': {
+            'batch_transcription_ratio': args.batch_transcription_ratio,
+            'streaming_store_ms': args.streaming_store_ms,
+            'primary_ms_per_token': args.primary_ms_per_token,
+            'draft_ms_per_token': args.draft_ms_per_token,
+        },
+        'lengths': results,
+        'draft_model_outage': outage,
+        'failures': failures,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Drift check and speed benchmark for medzen_runtime.soap_schema
+
+Compares the field paths of the compiled SOAP schema with the JSON schema block in
+aws-deployment/prompts/soap-generation-system-prompt.md and checks that the bundled
+SYSTEM_PROMPT carries the same schema and reaches the prompt cache minimum, then times
+validation of the seed SOAP notes in bench/corpus/llm_json and of damaged copies (wrong
+types, missing sections, stringified numbers).
+
+Usage:
+    python3 bench/soap_schema_bench.py [--repeat 500] [--output report.json]
+
+Exits non-zero if the schema and the prompt have drifted apart or a seed note is invalid.
+"""
+
+import argparse
+import copy
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / 'aws-deployment' / 'lambda-layers' / 'medzen-runtime' / 'python'))
+
+from medzen_runtime.prompt_cache import CACHE_MIN_TOKENS, cache_eligible, cached_system  # noqa: E402
+from medzen_runtime.soap_schema import SOAP_SCHEMA, validate_soap_note  # noqa: E402
+from medzen_runtime.soap_sections import SYSTEM_PROMPT  # noqa: E402
+
+CORPUS_DIR = BENCH_DIR / 'corpus' / 'llm_json'
+PROMPT_PATH = REPO_ROOT / 'aws-deployment' / 'prompts' / 'soap-generation-system-prompt.md'
+
+
+def spec_paths(spec, prefix=''):
+    """Dotted field paths declared by a schema spec ('[]' marks list items)."""
+    paths = set()
+    if isinstance(spec, dict):
+        for key, sub in spec.items():
+            path = f"{prefix}.{key}" if prefix else key
+            paths.add(path)
+            paths |= spec_paths(sub, path)
+    elif spec[0] == 'list':
+        paths |= spec_paths(spec[1], f"{prefix}[]")
+    return paths
+
+
+def example_paths(value, prefix=''):
+    """Dotted field paths present in an example JSON document."""
+    paths = set()
+    if isinstance(value, dict):
+        for key, sub in value.items():
+            path = f"{prefix}.{key}" if prefix else key
+            paths.add(path)
+            paths |= example_paths(sub, path)
+    elif isinstance(value, list):
+        for item in value:
+            paths |= example_paths(item, f"{prefix}[]")
+    return paths
+
+
+def load_prompt_schema():
+    """The first ```json block of the system prompt markdown."""
+    text = PROMPT_PATH.read_text(encoding='utf-8')
+    block = text.split('```json', 1)[1].split('```', 1)[0]
+    return json.loads(block)
+
+
+def damage(note):
+    """Copy of a note with the kinds of defects model output actually has."""
+    note = copy.deepcopy(note)
+    note.pop('coding_billing', None)
+    note['safety'] = 'none noted'
+    vitals = note.get('objective', {}).get('vitals')
+    if isinstance(vitals, dict):
+        vitals['hr_bpm'] = '88 '
+        vitals['temp_c'] = 'unknown'
+    if isinstance(note.get('doctor_editing'), dict):
+        note['doctor_editing']['draft_quality'] = 'Medium'
+    return note
+
+
+def time_validation(notes, repeat):
+    """Per-call latency samples in microseconds (copying is excluded)."""
+    samples = []
+    for note in notes:
+        copies = [copy.deepcopy(note) for _ in range(repeat)]
+        for item in copies:
+            started = time.perf_counter()
+            validate_soap_note(item)
+            samples.append((time.perf_counter() - started) * 1_000_000)
+    return samples
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'calls': len(ordered),
+        'p50_us': round(statistics.median(ordered), 1),
+        'p95_us': round(ordered[int(len(ordered) * 0.95) - 1], 1),
+        'mean_us': round(statistics.fmean(ordered), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--repeat', type=int, default=500, help='validations per note')
+    parser.add_argument('--output', help='write JSON report to this file')
+    args = parser.parse_args()
+
+    errors = []
+
+    # Drift: every field in the prompt schema must be declared, and vice versa
+    declared = spec_paths(SOAP_SCHEMA)
+    documented = example_paths(load_prompt_schema())
+    for path in sorted(documented - declared):
+        errors.append(f"prompt field missing from SOAP_SCHEMA: {path}")
+    for path in sorted(declared - documented):
+        errors.append(f"SOAP_SCHEMA field not in prompt schema: {path}")
+
+    # The bundled SYSTEM_PROMPT carries the same schema, and stays long enough to be cached
+    bundled = json.loads(SYSTEM_PROMPT.split('JSON Schema (you MUST follow this exactly):', 1)[1])
+    if bundled != load_prompt_schema():
+        errors.append('bundled SYSTEM_PROMPT schema differs from the prompt file')
+    if not cache_eligible({'system': cached_system(SYSTEM_PROMPT)}):
+        errors.append(f"bundled SYSTEM_PROMPT is below the {CACHE_MIN_TOKENS}-token prompt cache minimum")
+
+    seeds = {}
+    for path in sorted(CORPUS_DIR.glob('soap_note_*.json')):
+        seeds[path.name] = json.loads(path.read_text(encoding='utf-8'))
+        result = validate_soap_note(copy.deepcopy(seeds[path.name]))
+        if result['invalid_sections']:
+            errors.append(f"{path.name}: invalid sections {result['invalid_sections']}")
+
+    damaged = [damage(note) for note in seeds.values()]
+    damaged_result = validate_soap_note(copy.deepcopy(damaged[0])) if damaged else None
+
+    report = {
+        'benchmark': 'soap_schema',
+        'declared_fields': len(declared),
+        'drift': len(errors),
+        'timings': {
+            'valid': summarize(time_validation(seeds.values(), args.repeat)),
+            'damaged': summarize(time_validation(damaged, args.repeat)),
+        },
+        'damaged_example': {
+            'invalid_sections': damaged_result['invalid_sections'],
+            'violations': [v['path'] for v in damaged_result['violations']],
+            'coerced': damaged_result['coerced'],
+        } if damaged_result else None,
+    }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+
+    for error in errors:
+        print(f"❌ {error}", file=sys.stderr)
+
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,930 @@
+"""
+In-process stand-ins for the AWS services and the Supabase REST API used by the Lambdas
+
+Shared by the offline benchmarks (Bedrock is emulated in bench/bedrock_emulator.py). The boto3 stand-ins are installed with
+medzen_runtime.clients.register_client, so handlers that use LazyClient / get_client call
+them unchanged; errors are raised as botocore ClientError with the service's error codes.
+LocalPostgREST is a real HTTP server on 127.0.0.1, so medzen_runtime.supabase is exercised
+over its urllib3 connection pool exactly as in Lambda.
+LocalPowerSync does the same for the PowerSync endpoints the MCP server probes.
+
+    s3 = LocalS3('medzen-transcriptions')
+    register_client('s3', s3)
+    postgrest = LocalPostgREST({'video_call_sessions': [{'id': 's1'}]}).start()
+    os.environ['SUPABASE_URL'] = postgrest.url
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, unquote, urlparse
+
+from botocore.exceptions import ClientError
+
+def client_error(code, message, operation, status=400):
+    """botocore ClientError as boto3 raises it for a service error response."""
+    return ClientError(
+        {'Error': {'Code': code, 'Message': message}, 'ResponseMetadata': {'HTTPStatusCode': status}},
+        operation
+    )
+
+
+class LocalS3:
+    """Versioned in-memory S3 with one default bucket; supports the calls the Lambdas and loader make."""
+
+    def __init__(self, bucket, latency_s=0.0):
+        self.bucket = bucket
+        self.objects = {}  # (bucket, key) -> list of (version_id, etag, body)
+        self.latency_s = latency_s
+        self.calls = {'get': 0, 'not_modified': 0, 'put': 0}
+        self.fail = False
+        self._lock = threading.Lock()
+
+    def put_object(self, Key, Body, Bucket=None, **kwargs):
+        body = Body.encode('utf-8') if isinstance(Body, str) else Body
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        with self._lock:
+            self.calls['put'] += 1
+            versions = self.objects.setdefault((Bucket or self.bucket, Key), [])
+            version_id = f"v{len(versions) + 1}"
+            versions.append((version_id, etag, body))
+        return {'VersionId': version_id, 'ETag': etag}
+
+    def get_object(self, Bucket, Key, VersionId=None, IfNoneMatch=None):
+        with self._lock:
+            self.calls['get'] += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        if self.fail:
+            raise client_error('ServiceUnavailable', 'stand-in outage', 'GetObject', 503)
+        versions = self.objects.get((Bucket, Key))
+        if not versions:
+            raise client_error('NoSuchKey', Key, 'GetObject', 404)
+
+        if VersionId:
+            matches = [v for v in versions if v[0] == VersionId]
+            if not matches:
+                raise client_error('NoSuchVersion', VersionId, 'GetObject', 404)
+            version_id, etag, body = matches[0]
+        else:
+            version_id, etag, body = versions[-1]
+
+        if IfNoneMatch and IfNoneMatch == etag:
+            with self._lock:
+                self.calls['not_modified'] += 1
+            raise client_error('304', 'Not Modified', 'GetObject', 304)
+        return {'Body': io.BytesIO(body), 'ETag': etag, 'VersionId': version_id, 'ContentLength': len(body)}
+
+    def head_object(self, Bucket, Key):
+        versions = self.objects.get((Bucket, Key))
+        if not versions:
+            raise client_error('404', 'Not Found', 'HeadObject', 404)
+        version_id, etag, body = versions[-1]
+        return {'ETag': etag, 'VersionId': version_id, 'ContentLength': len(body)}
+
+    def download_file(self, Bucket, Key, Filename):
+        Path(Filename).write_bytes(self.get_object(Bucket=Bucket, Key=Key)['Body'].read())
+
+
+class LocalSQS:
+    """Single in-memory queue with in-flight messages, as a visibility timeout leaves them."""
+
+    def __init__(self):
+        self.visible = []  # (message_id, body)
+        self.in_flight = {}  # receipt handle -> (message_id, body)
+        self.sent = 0
+        self.deleted = 0
+        self._lock = threading.Lock()
+
+    def send_message(self, QueueUrl, MessageBody, **kwargs):
+        message_id = str(uuid.uuid4())
+        with self._lock:
+            self.visible.append((message_id, MessageBody))
+            self.sent += 1
+        return {'MessageId': message_id}
+
+    def receive_message(self, QueueUrl, MaxNumberOfMessages=1, **kwargs):
+        with self._lock:
+            batch, self.visible = self.visible[:MaxNumberOfMessages], self.visible[MaxNumberOfMessages:]
+            messages = []
+            for message_id, body in batch:
+                receipt = uuid.uuid4().hex
+                self.in_flight[receipt] = (message_id, body)
+                messages.append({'MessageId': message_id, 'ReceiptHandle': receipt, 'Body': body})
+        return {'Messages': messages} if messages else {}
+
+    def delete_message(self, QueueUrl, ReceiptHandle):
+        with self._lock:
+            if self.in_flight.pop(ReceiptHandle, None) is None:
+                raise client_error('ReceiptHandleIsInvalid', ReceiptHandle, 'DeleteMessage')
+            self.deleted += 1
+        return {}
+
+    def expire_visibility(self):
+        """Make undeleted in-flight messages visible again."""
+        with self._lock:
+            self.visible.extend(self.in_flight.values())
+            self.in_flight.clear()
+
+    def depth(self):
+        with self._lock:
+            return len(self.visible) + len(self.in_flight)
+
+
+def sqs_event(messages):
+    """Lambda SQS trigger event for received messages."""
+    return {'Records': [
+        {'messageId': m['MessageId'], 'receiptHandle': m['ReceiptHandle'], 'body': m['Body'], 'eventSource': 'aws:sqs'}
+        for m in messages
+    ]}
+
+
+class LocalLambda:
+    """Synchronous `invoke` routed to in-process handlers by function name."""
+
+    def __init__(self, handlers):
+        self.handlers = handlers
+
+    def invoke(self, FunctionName, InvocationType='RequestResponse', Payload=b'{}'):
+        handler = self.handlers.get(FunctionName)
+        if handler is None:
+            raise client_error('ResourceNotFoundException', FunctionName, 'Invoke', 404)
+        result = handler(json.loads(Payload), None)
+        return {'StatusCode': 200, 'Payload': io.BytesIO(json.dumps(result, default=str).encode('utf-8'))}
+
+
+class LocalDynamoDB:
+    """
+    In-memory DynamoDB tables with conditional writes, for the registry-style calls the runtime makes.
+
+    Supports get_item, put_item and update_item with ConditionExpression (AND / OR / parentheses,
+    comparisons, attribute_exists / attribute_not_exists) and UpdateExpression SET (values,
+    if_not_exists, + / -) and REMOVE. Items use the low-level {'S': ...} / {'N': ...} format.
+    """
+
+    TOKEN = re.compile(r"\s*(<=|>=|<>|[=<>(),+-]|[#:]?[A-Za-z_][A-Za-z0-9_.]*)")
+
+    def __init__(self, latency_s=0.0):
+        self.tables = {}  # table -> {key value: item}
+        self.latency_s = latency_s
+        self.calls = {'get': 0, 'put': 0, 'update': 0, 'condition_failed': 0}
+        self.fail = False
+        self._lock = threading.Lock()
+
+    def _call(self, operation):
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        if self.fail:
+            raise client_error('InternalServerError', 'stand-in outage', operation, 500)
+
+    @staticmethod
+    def _hash_key(key):
+        (name, value), = key.items()
+        return name, next(iter(value.values()))
+
+    @staticmethod
+    def _plain(value):
+        if value is None:
+            return None
+        if 'N' in value:
+            return float(value['N'])
+        return next(iter(value.values()))
+
+    def _tokens(self, expression):
+        return [match.group(1) for match in self.TOKEN.finditer(expression)]
+
+    def _operand(self, token, item, names, values):
+        if token.startswith(':'):
+            return values[token]
+        return item.get(names.get(token, token))
+
+    def _condition(self, expression, item, names, values):
+        tokens = self._tokens(expression)
+        position = 0
+
+        def peek():
+            return tokens[position] if position < len(tokens) else None
+
+        def take():
+            nonlocal position
+            position += 1
+            return tokens[position - 1]
+
+        def factor():
+            token = take()
+            if token == '(':
+                result = disjunction()
+                take()  # ')'
+                return result
+            if token in ('attribute_exists', 'attribute_not_exists'):
+                take()
+                name = take()
+                take()
+                exists = names.get(name, name) in item
+                return exists if token == 'attribute_exists' else not exists
+            left = self._plain(self._operand(token, item, names, values))
+            operator = take()
+            right = self._plain(self._operand(take(), item, names, values))
+            if left is None or right is None:
+                return operator == '<>' and left != right
+            return {
+                '=': left == right, '<>': left != right, '<': left < right,
+                '>': left > right, '<=': left <= right, '>=': left >= right,
+            }[operator]
+
+        def conjunction():
+            result = factor()
+            while peek() == 'AND':
+                take()
+                result = factor() and result
+            return result
+
+        def disjunction():
+            result = conjunction()
+            while peek() == 'OR':
+                take()
+                result = conjunction() or result
+            return result
+
+        return disjunction()
+
+    def _update(self, expression, item, names, values):
+        action = None
+        clauses = {'SET': [], 'REMOVE': []}
+        depth = 0
+        current = []
+        for token in self._tokens(expression):
+            if token in clauses and depth == 0:
+                if current:
+                    clauses[action].append(current)
+                action, current = token, []
+            elif token == ',' and depth == 0:
+                clauses[action].append(current)
+                current = []
+            else:
+                depth += (token == '(') - (token == ')')
+                current.append(token)
+        if current:
+            clauses[action].append(current)
+
+        for clause in clauses['SET']:
+            target, rest = names.get(clause[0], clause[0]), clause[2:]
+            if rest[0] == 'if_not_exists':
+                existing = item.get(names.get(rest[2], rest[2]))
+                value, rest = existing if existing is not None else values[rest[4]], rest[6:]
+            else:
+                value, rest = self._operand(rest[0], item, names, values), rest[1:]
+            if rest:
+                delta = self._plain(values[rest[1]]) * (1 if rest[0] == '+' else -1)
+                value = {'N': str(int(self._plain(value) + delta))}
+            item[target] = value
+        for clause in clauses['REMOVE']:
+            item.pop(names.get(clause[0], clause[0]), None)
+
+    def get_item(self, TableName, Key, ConsistentRead=False):
+        self._call('GetItem')
+        with self._lock:
+            self.calls['get'] += 1
+            item = self.tables.get(TableName, {}).get(self._hash_key(Key)[1])
+            return {'Item': dict(item)} if item else {}
+
+    def put_item(self, TableName, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, **kwargs):
+        self._call('PutItem')
+        table = self.tables.setdefault(TableName, {})
+        with self._lock:
+            self.calls['put'] += 1
+            key = next(iter(next(iter(Item.values())).values()))
+            existing = table.get(key, {})
+            if ConditionExpression and not self._condition(
+                    ConditionExpression, existing, ExpressionAttributeNames or {}, ExpressionAttributeValues or {}):
+                self.calls['condition_failed'] += 1
+                raise client_error('ConditionalCheckFailedException', 'The conditional request failed', 'PutItem')
+            table[key] = dict(Item)
+        return {}
+
+    def update_item(self, TableName, Key, UpdateExpression, ConditionExpression=None,
+                    ExpressionAttributeNames=None, ExpressionAttributeValues=None,
+                    ReturnValues='NONE', ReturnValuesOnConditionCheckFailure='NONE'):
+        self._call('UpdateItem')
+        table = self.tables.setdefault(TableName, {})
+        names = ExpressionAttributeNames or {}
+        values = ExpressionAttributeValues or {}
+        key_name, key_value = self._hash_key(Key)
+        with self._lock:
+            self.calls['update'] += 1
+            existing = table.get(key_value, {})
+            if ConditionExpression and not self._condition(ConditionExpression, existing, names, values):
+                self.calls['condition_failed'] += 1
+                error = client_error('ConditionalCheckFailedException', 'The conditional request failed', 'UpdateItem')
+                if ReturnValuesOnConditionCheckFailure == 'ALL_OLD' and existing:
+                    error.response['Item'] = dict(existing)
+                raise error
+            item = dict(existing, **Key)
+            self._update(UpdateExpression, item, names, values)
+            table[key_value] = item
+        return {'Attributes': dict(item)} if ReturnValues == 'ALL_NEW' else {}
+
+
+def transcribe_output(job_name, turns, seconds_per_word=0.35):
+    """Transcribe result document (results.transcripts, items, speaker_labels) for (speaker, text) turns."""
+    items = []
+    segments = []
+    clock = 0.0
+    speakers = {}
+    for speaker, text in turns:
+        label = speakers.setdefault(speaker, f"spk_{len(speakers)}")
+        start = clock
+        segment_items = []
+        for word in text.split():
+            times = {'start_time': f"{clock:.2f}", 'end_time': f"{clock + seconds_per_word:.2f}"}
+            items.append(dict(times, type='pronunciation', alternatives=[{'confidence': '0.97', 'content': word}]))
+            segment_items.append(dict(times, speaker_label=label))
+            clock += seconds_per_word
+        segments.append({
+            'speaker_label': label, 'start_time': f"{start:.2f}", 'end_time': f"{clock:.2f}", 'items': segment_items
+        })
+    return {
+        'jobName': job_name,
+        'status': 'COMPLETED',
+        'results': {
+            'transcripts': [{'transcript': ' '.join(text for _, text in turns)}],
+            'speaker_labels': {'speakers': len(speakers), 'segments': segments},
+            'items': items,
+        },
+    }
+
+
+class LocalTranscribe:
+    """
+    Transcribe and Transcribe Medical jobs that complete immediately, and custom vocabularies.
+
+    The result for a job is built from `scripts[media_uri]` (a list of (speaker, text) turns)
+    and written to the job's OutputBucketName/OutputKey in the given LocalS3, as Transcribe does.
+
+    A created or updated vocabulary is PENDING for `ready_after_s`, then READY, or FAILED if a
+    phrase has characters Transcribe rejects (letters outside a-z only count as valid for
+    French). A vocabulary given by VocabularyFileUri is read from the LocalS3 when it is
+    submitted; a table also FAILs with a row that has both IPA and SoundsLike, or over
+    50 KB. More than `max_concurrent_submits` creates or
+    updates in flight raise LimitExceededException. `calls` counts calls per operation and
+    `max_in_flight` the most concurrent creates/updates.
+    """
+
+    INVALID_PHRASE = re.compile(r"[^\w'.\- ]|[\d_]")
+    NON_ASCII = re.compile(r'[^\x00-\x7f]')
+
+    def __init__(self, s3=None, latency_s=0.0, ready_after_s=0.0, max_concurrent_submits=None):
+        self.s3 = s3
+        self.latency_s = latency_s
+        self.scripts = {}
+        self.jobs = {}
+        self.fail = False
+        self.ready_after_s = ready_after_s
+        self.max_concurrent_submits = max_concurrent_submits
+        self.vocabularies = {}
+        self.tags = {}
+        self.calls = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _start(self, job_name, params, operation):
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        if self.fail:
+            raise client_error('LimitExceededException', 'stand-in job quota exceeded', operation)
+        with self._lock:
+            if job_name in self.jobs:
+                raise client_error('ConflictException', 'The requested job name already exists.', operation)
+            self.jobs[job_name] = None
+        media_uri = params['Media']['MediaFileUri']
+        bucket = params['OutputBucketName']
+        key = params.get('OutputKey', '') + f"{job_name}.json"
+        document = transcribe_output(job_name, self.scripts.get(media_uri, [('spk', '')]))
+        self.s3.put_object(Key=key, Body=json.dumps(document, ensure_ascii=False), Bucket=bucket)
+        job = {
+            'LanguageCode': params['LanguageCode'],
+            'TranscriptionJobStatus': 'COMPLETED',
+            'Media': params['Media'],
+            'Transcript': {'TranscriptFileUri': f"s3://{bucket}/{key}"},
+        }
+        self.jobs[job_name] = job
+        return dict(job, TranscriptionJobStatus='IN_PROGRESS')
+
+    def _get(self, job_name, operation):
+        job = self.jobs.get(job_name)
+        if job is None:
+            raise client_error('BadRequestException', 'The requested job couldn\'t be found.', operation)
+        return job
+
+    def start_medical_transcription_job(self, **params):
+        name = params['MedicalTranscriptionJobName']
+        job = self._start(name, params, 'StartMedicalTranscriptionJob')
+        return {'MedicalTranscriptionJob': dict(job, MedicalTranscriptionJobName=name)}
+
+    def start_transcription_job(self, **params):
+        name = params['TranscriptionJobName']
+        job = self._start(name, params, 'StartTranscriptionJob')
+        return {'TranscriptionJob': dict(job, TranscriptionJobName=name)}
+
+    def get_medical_transcription_job(self, MedicalTranscriptionJobName):
+        job = self._get(MedicalTranscriptionJobName, 'GetMedicalTranscriptionJob')
+        return {'MedicalTranscriptionJob': dict(job, MedicalTranscriptionJobName=MedicalTranscriptionJobName)}
+
+    def get_transcription_job(self, TranscriptionJobName):
+        job = self._get(TranscriptionJobName, 'GetTranscriptionJob')
+        return {'TranscriptionJob': dict(job, TranscriptionJobName=TranscriptionJobName)}
+
+    # Custom vocabularies
+
+    def _call(self, operation):
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+    def _vocabulary(self, name, operation):
+        vocabulary = self.vocabularies.get(name)
+        if vocabulary is None:
+            raise client_error('BadRequestException', "The requested vocabulary couldn't be found.", operation)
+        if vocabulary['VocabularyState'] == 'PENDING' and time.monotonic() >= vocabulary['ready_at']:
+            vocabulary['VocabularyState'] = 'FAILED' if vocabulary['FailureReason'] else 'READY'
+        return vocabulary
+
+    def _read_vocabulary_file(self, uri, operation):
+        """(phrases, table rows or None, size) of an s3:// vocabulary file in the LocalS3."""
+        bucket, _, key = uri[len('s3://'):].partition('/')
+        try:
+            body = self.s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+        except Exception:
+            raise client_error('BadRequestException', f"The specified S3 URI can't be accessed: {uri}", operation)
+        lines = [line for line in body.decode('utf-8').splitlines() if line.strip()]
+        if lines and lines[0].startswith('Phrase\t'):
+            rows = [(line.split('\t') + [''] * 4)[:4] for line in lines[1:]]
+            return [row[0] for row in rows], rows, len(body)
+        return lines, None, len(body)
+
+    def _submit(self, name, language_code, phrases, operation, exists, file_uri=None):
+        if file_uri:
+            phrases, table, size = self._read_vocabulary_file(file_uri, operation)
+        else:
+            table, size = None, 0
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+            if self.max_concurrent_submits is not None and self.in_flight >= self.max_concurrent_submits:
+                raise client_error('LimitExceededException', 'You have exceeded your request rate.', operation)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency_s:
+                time.sleep(self.latency_s)
+            with self._lock:
+                current = self.vocabularies.get(name)
+                if exists and current is None:
+                    raise client_error('BadRequestException', "The requested vocabulary couldn't be found.", operation)
+                if not exists and current is not None:
+                    raise client_error('ConflictException', 'The requested vocabulary name already exists.', operation)
+                if current is not None and self._vocabulary(name, operation)['VocabularyState'] == 'PENDING':
+                    raise client_error('ConflictException', 'The vocabulary is being processed.', operation)
+                invalid = [phrase for phrase in phrases if self.INVALID_PHRASE.search(phrase)
+                           or (not language_code.startswith('fr') and self.NON_ASCII.search(phrase))]
+                if invalid:
+                    reason = f"The following phrases contain invalid characters: {', '.join(invalid[:5])}"
+                elif size > 50 * 1024:
+                    reason = 'The vocabulary file exceeds the 50 KB size limit.'
+                elif table and any(row[1] and row[2] for row in table):
+                    reason = 'A row can have IPA or SoundsLike, not both.'
+                else:
+                    reason = None
+                vocabulary = {
+                    'VocabularyName': name,
+                    'LanguageCode': language_code,
+                    'VocabularyState': 'PENDING',
+                    'LastModifiedTime': time.time(),
+                    'FailureReason': reason,
+                    'Phrases': list(phrases),
+                    'Table': table,
+                    'ready_at': time.monotonic() + self.ready_after_s,
+                }
+                self.vocabularies[name] = vocabulary
+            return {key: vocabulary[key] for key in ('VocabularyName', 'LanguageCode', 'VocabularyState')}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def create_vocabulary(self, VocabularyName, LanguageCode, Phrases=None, VocabularyFileUri=None, Tags=None):
+        result = self._submit(VocabularyName, LanguageCode, Phrases, 'CreateVocabulary', exists=False,
+                              file_uri=VocabularyFileUri)
+        if Tags:
+            self.tags[VocabularyName] = {tag['Key']: tag['Value'] for tag in Tags}
+        return result
+
+    def update_vocabulary(self, VocabularyName, LanguageCode, Phrases=None, VocabularyFileUri=None):
+        return self._submit(VocabularyName, LanguageCode, Phrases, 'UpdateVocabulary', exists=True,
+                            file_uri=VocabularyFileUri)
+
+    def get_vocabulary(self, VocabularyName):
+        self._call('GetVocabulary')
+        with self._lock:
+            vocabulary = self._vocabulary(VocabularyName, 'GetVocabulary')
+            return {key: value for key, value in vocabulary.items() if key not in ('Phrases', 'Table', 'ready_at')}
+
+    def list_vocabularies(self, MaxResults=5, NextToken=None, NameContains=None, StateEquals=None):
+        self._call('ListVocabularies')
+        with self._lock:
+            names = sorted(name for name in self.vocabularies if not NameContains or NameContains in name)
+            summaries = [
+                {key: vocabulary[key] for key in ('VocabularyName', 'LanguageCode', 'VocabularyState', 'LastModifiedTime')}
+                for vocabulary in (self._vocabulary(name, 'ListVocabularies') for name in names)
+                if not StateEquals or vocabulary['VocabularyState'] == StateEquals
+            ]
+        start = int(NextToken or 0)
+        page = summaries[start:start + MaxResults]
+        response = {'Vocabularies': page}
+        if start + MaxResults < len(summaries):
+            response['NextToken'] = str(start + MaxResults)
+        return response
+
+    def delete_vocabulary(self, VocabularyName):
+        self._call('DeleteVocabulary')
+        with self._lock:
+            self._vocabulary(VocabularyName, 'DeleteVocabulary')
+            del self.vocabularies[VocabularyName]
+            self.tags.pop(VocabularyName, None)
+
+    def tag_resource(self, ResourceArn, Tags):
+        self._call('TagResource')
+        name = ResourceArn.rsplit('/', 1)[-1]
+        with self._lock:
+            self._vocabulary(name, 'TagResource')
+            self.tags.setdefault(name, {}).update({tag['Key']: tag['Value'] for tag in Tags})
+
+    def list_tags_for_resource(self, ResourceArn):
+        self._call('ListTagsForResource')
+        name = ResourceArn.rsplit('/', 1)[-1]
+        with self._lock:
+            self._vocabulary(name, 'ListTagsForResource')
+            tags = self.tags.get(name, {})
+        return {'ResourceArn': ResourceArn, 'Tags': [{'Key': key, 'Value': value} for key, value in tags.items()]}
+
+
+class LocalTranscribeStreaming:
+    """
+    Transcribe streaming session driven by the audio clock (bytes received / byte rate).
+
+    Scripted (speaker, text) turns are laid out like transcribe_output(), with `gap_s` between
+    turns. While a turn's words are being heard a partial result is emitted every `partial_s`
+    of audio; the final result follows `stabilize_s` of audio after its last word. At the end
+    of the stream the service flushes whatever is left after `flush_latency_s` (wall clock).
+    Results use the streaming API's JSON shape, as medzen_runtime.streaming expects.
+    """
+
+    def __init__(self, turns, seconds_per_word=0.35, gap_s=0.8, partial_s=0.5, stabilize_s=1.0, flush_latency_s=0.25):
+        self.utterances = []
+        clock = 0.0
+        speakers = {}
+        for speaker, text in turns:
+            words = []
+            for word in text.split():
+                words.append({'Content': word, 'StartTime': round(clock, 3), 'EndTime': round(clock + seconds_per_word, 3)})
+                clock += seconds_per_word
+            label = speakers.setdefault(speaker, str(len(speakers)))
+            self.utterances.append({'speaker': label, 'words': words})
+            clock += gap_s
+        self.duration = clock
+        self.partial_s = partial_s
+        self.stabilize_s = stabilize_s
+        self.flush_latency_s = flush_latency_s
+        self.languages = []
+
+    def _result(self, n, words, speaker, partial):
+        items = [dict(word, Type='pronunciation', Speaker=speaker) for word in words]
+        return {
+            'ResultId': f"result-{n}",
+            'StartTime': words[0]['StartTime'],
+            'EndTime': words[-1]['EndTime'],
+            'IsPartial': partial,
+            'Alternatives': [{'Transcript': ' '.join(word['Content'] for word in words), 'Items': items}],
+        }
+
+    async def transcribe(self, frames, language_code, sample_rate=16000):
+        self.languages.append(language_code)
+        queue = asyncio.Queue()
+        state = {'next': 0, 'last_partial': {}}
+
+        def advance(clock, flush=False):
+            while state['next'] < len(self.utterances):
+                n = state['next']
+                utterance = self.utterances[n]
+                heard = [word for word in utterance['words'] if word['EndTime'] <= clock]
+                ends = utterance['words'][-1]['EndTime'] if utterance['words'] else 0.0
+                if flush or clock >= ends + self.stabilize_s:
+                    if heard:
+                        queue.put_nowait(self._result(n, heard, utterance['speaker'], False))
+                    state['next'] += 1
+                    continue
+                if heard and clock - state['last_partial'].get(n, -self.partial_s) >= self.partial_s:
+                    state['last_partial'][n] = clock
+                    queue.put_nowait(self._result(n, heard, utterance['speaker'], True))
+                break
+
+        async def receive():
+            clock = 0.0
+            try:
+                async for frame in frames:
+                    clock += len(frame) / (sample_rate * 2)
+                    advance(clock)
+                await asyncio.sleep(self.flush_latency_s)
+                advance(clock, flush=True)
+            finally:
+                queue.put_nowait(None)
+
+        receiver = asyncio.ensure_future(receive())
+        try:
+            while True:
+                result = await queue.get()
+                if result is None:
+                    break
+                yield result
+            await receiver
+        finally:
+            receiver.cancel()
+
+
+class LocalPostgREST:
+    """
+    PostgREST subset over HTTP: eq filters, order, limit, Prefer return=representation, and a
+    409 for a duplicate id on insert. Tables are lists of row dicts held in memory; `aliases`
+    maps a name to another table, as a view over it would.
+
+    POST /fcm/send is answered as Firebase Cloud Messaging would, so the notification
+    Lambda can be pointed at the same server.
+    """
+
+    def __init__(self, tables=None, latency_ms=0.0, aliases=None):
+        self.tables = {name: list(rows) for name, rows in (tables or {}).items()}
+        self.aliases = aliases or {}
+        self.latency_ms = latency_ms
+        self.requests = {}  # "METHOD table" -> count
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, payload=None):
+                data = json.dumps(payload).encode('utf-8') if payload is not None else b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                status, payload = stand_in.handle(self.command, self.path, body, self.headers.get('Prefer', ''))
+                self._reply(status, payload)
+
+            do_GET = do_POST = do_PATCH = _handle
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def rows(self, table):
+        with self._lock:
+            return [dict(row) for row in self.tables.get(self.aliases.get(table, table), [])]
+
+    def handle(self, method, path, body, prefer):
+        """(status, JSON payload) for one request."""
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        parsed = urlparse(path)
+        if parsed.path == '/fcm/send':
+            return 200, {'success': 1, 'failure': 0, 'results': [{'message_id': uuid.uuid4().hex}]}
+        if not parsed.path.startswith('/rest/v1/'):
+            return 404, {'message': f"no route {parsed.path}"}
+
+        table = unquote(parsed.path[len('/rest/v1/'):])
+        table = self.aliases.get(table, table)
+        query = dict(parse_qsl(parsed.query))
+        order = query.pop('order', None)
+        limit = query.pop('limit', None)
+        query.pop('select', None)
+        filters = {column: value[3:] for column, value in query.items() if value.startswith('eq.')}
+        representation = 'return=representation' in prefer
+
+        def matches(row):
+            return all(str(row.get(column)) == value for column, value in filters.items())
+
+        with self._lock:
+            key = f"{method} {table}"
+            self.requests[key] = self.requests.get(key, 0) + 1
+            rows = self.tables.setdefault(table, [])
+
+            if method == 'GET':
+                selected = [row for row in rows if matches(row)]
+                if order:
+                    column, _, direction = order.partition('.')
+                    selected.sort(key=lambda row: str(row.get(column, '')), reverse=direction == 'desc')
+                if limit:
+                    selected = selected[:int(limit)]
+                return 200, selected
+
+            if method == 'POST':
+                records = body if isinstance(body, list) else [body]
+                existing = {row.get('id') for row in rows if 'id' in row}
+                for record in records:
+                    if record.get('id') is not None and record['id'] in existing:
+                        return 409, {'code': '23505', 'message': f'duplicate key value violates unique constraint "{table}_pkey"'}
+                rows.extend(dict(record) for record in records)
+                return 201, (records if representation else None)
+
+            if method == 'PATCH':
+                updated = []
+                for row in rows:
+                    if matches(row):
+                        row.update(body or {})
+                        updated.append(dict(row))
+                return (200, updated) if representation else (204, None)
+
+        return 405, {'message': f"{method} not supported"}
+
+
+class LocalPowerSync:
+    """
+    PowerSync service subset over HTTP: the health probes, the admin API diagnostics and
+    current sync rules routes (POST, Bearer API token, responses wrapped in {"data": ...}) and
+    the Prometheus metrics endpoint. `latency_ms` delays every response and `connect_ms`
+    every new connection (a TLS handshake stand-in); `counters` are advanced by the caller
+    between scrapes. `requests` counts requests per path, `connections` new connections and
+    `max_open` the most connections open at once.
+    """
+
+    def __init__(self, sync_rules='', client_connections=0, api_key=None, latency_ms=0.0, tables=(), lag_bytes=0,
+                 connect_ms=0.0):
+        self.connect_ms = connect_ms
+        self.connections = 0
+        self.open_connections = 0
+        self.max_open = 0
+        self.sync_rules = sync_rules
+        self.client_connections = client_connections
+        self.api_key = api_key
+        self.latency_ms = latency_ms
+        self.tables = list(tables)
+        self.lag_bytes = lag_bytes
+        self.errors = []
+        self.counters = {
+            'powersync_data_synced_bytes_total': 0,
+            'powersync_operations_synced_total': 0,
+            'powersync_rows_replicated_total': 0,
+            'powersync_transactions_replicated_total': 0,
+        }
+        self.requests = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with stand_in._lock:
+                    stand_in.connections += 1
+                    stand_in.open_connections += 1
+                    stand_in.max_open = max(stand_in.max_open, stand_in.open_connections)
+                if stand_in.connect_ms:
+                    time.sleep(stand_in.connect_ms / 1000)
+
+            def finish(self):
+                super().finish()
+                with stand_in._lock:
+                    stand_in.open_connections -= 1
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    self.rfile.read(length)
+                status, content_type, data = stand_in.handle(self.command, self.path, self.headers.get('Authorization', ''))
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', content_type)
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client timed out and hung up while the response was delayed
+                    self.close_connection = True
+
+            do_GET = do_POST = _handle
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def diagnostics(self):
+        now = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        return {
+            'connections': [{'id': 'default', 'postgres_uri': 'postgresql://powersync@db:5432/postgres',
+                             'connected': True, 'errors': []}],
+            'active_sync_rules': {
+                'id': '1',
+                'tag': 'default',
+                'errors': list(self.errors),
+                'connections': [{
+                    'id': 'default',
+                    'tag': 'default',
+                    'slot_name': 'powersync_1_a1b2',
+                    'initial_replication_done': True,
+                    'last_lsn': '0/1A2B3C4D',
+                    'last_keepalive_ts': now,
+                    'last_checkpoint_ts': now,
+                    'replication_lag_bytes': self.lag_bytes,
+                    'tables': [{'schema': 'public', 'name': name, 'replication_id': ['id'],
+                                'data_queries': True, 'parameter_queries': False, 'errors': []}
+                               for name in self.tables],
+                }],
+            },
+            'deploying_sync_rules': None,
+        }
+
+    def metrics(self):
+        lines = ['# TYPE powersync_concurrent_connections gauge',
+                 f'powersync_concurrent_connections{{instance="local"}} {self.client_connections}']
+        for name, value in self.counters.items():
+            lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name}{{instance="local"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def handle(self, method, path, authorization):
+        """(status, content type, body bytes) for one request."""
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        route = urlparse(path).path
+        with self._lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+
+        def reply(status, payload):
+            return status, 'application/json', json.dumps(payload).encode('utf-8')
+
+        if route in ('/probes/liveness', '/probes/startup'):
+            return reply(200, {'ready': True, 'started': True})
+        if route == '/metrics':
+            return 200, 'text/plain; version=0.0.4', self.metrics().encode('utf-8')
+        if route.startswith('/api/'):
+            if self.api_key and authorization != f"Bearer {self.api_key}":
+                return reply(401, {'error': {'code': 'PSYNC_S2101', 'description': 'Authentication required'}})
+            if method != 'POST':
+                return reply(405, {'error': 'POST required'})
+            if route == '/api/admin/v1/diagnostics':
+                return reply(200, {'data': self.diagnostics()})
+            if route == '/api/sync-rules/v1/current':
+                current = {'version': '1', 'id': 1, 'content': self.sync_rules,
+                           'slot_name': 'powersync_1_a1b2', 'errors': []} if self.sync_rules else None
+                return reply(200, {'data': {'current': current, 'next': None}})
+        return reply(404, {'error': f"no route {route}"})
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Real-time replay harness for the streaming transcription server
+
+Starts aws-lambda/transcription-router/streaming_server.py on 127.0.0.1 with the Transcribe
+streaming stand-in (bench/stand_ins.py LocalTranscribeStreaming), LocalS3 and LocalPostgREST,
+then plays the part of the WebSocket relay for --calls concurrent calls: PCM frames are sent
+at real-time speed (scaled by --speed), {"type": "end"} marks the hang-up, and the partial,
+final and completed messages coming back are recorded.
+
+The audio is 16 kHz mono s16le, synthesized to the length of the scripted dialogue or read
+from --wav. The stand-in's words come from one scripted dialogue (pipeline_bench's synthetic turns),
+timed against each call's audio clock, so results are the same at any speed.
+
+Checks: the final segments match the script (text and speaker turns) and are in the
+transcript segment store; some finals arrive before hang-up; the session row is COMPLETED
+with the manifest; replay pacing matches --speed; unsupported languages and a bad relay token
+are refused; the server will not start without a relay token unless told it is insecure;
+unmasked frames and stray continuations close the connection with 1002, and a message
+assembled past MAX_MESSAGE_BYTES with 1009; a relay that drops mid-call leaves the row FAILED,
+not COMPLETED, and its reconnect stores under a new prefix without touching the first stream. The report gives hang-up to completed latency
+per call.
+
+Usage:
+    python3 bench/streaming_replay_bench.py [--calls 4] [--length short] [--speed 10]
+        [--frame-ms 100] [--wav call.wav] [--output report.json]
+
+Exits non-zero if any check fails.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import os
+import random
+import re
+import struct
+import sys
+import time
+import wave
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+ROUTER_DIR = REPO_ROOT / 'aws-lambda' / 'transcription-router'
+sys.path.insert(0, str(REPO_ROOT / 'aws-deployment' / 'lambda-layers' / 'medzen-runtime' / 'python'))
+
+from medzen_runtime import streaming, tracing  # noqa: E402
+from medzen_runtime.clients import register_client  # noqa: E402
+from medzen_runtime.transcript_store import read_segments  # noqa: E402
+from pipeline_bench import LENGTHS, load_module, summarize, synthetic_turns  # noqa: E402
+from stand_ins import LocalPostgREST, LocalS3, LocalTranscribeStreaming  # noqa: E402
+
+OUTPUT_BUCKET = 'medzen-transcriptions-bench'
+REGIONS = (None, 'us-east-1', 'eu-central-1')
+RELAY_TOKEN = 'bench-relay-token'
+
+
+def synthetic_pcm(seconds, seed):
+    """Low-level noise, so frames are not all zeros."""
+    rng = random.Random(seed)
+    samples = int(seconds * streaming.SAMPLE_RATE)
+    return struct.pack(f"<{samples}h", *(rng.randint(-300, 300) for _ in range(samples)))
+
+
+def read_pcm(path):
+    with wave.open(str(path), 'rb') as source:
+        if (source.getnchannels(), source.getsampwidth(), source.getframerate()) != (1, 2, streaming.SAMPLE_RATE):
+            raise SystemExit(f"{path}: expected 16 kHz mono 16-bit PCM "
+                             f"(ffmpeg -i in -ac 1 -ar 16000 -c:a pcm_s16le out.wav)")
+        return source.readframes(source.getnframes())
+
+
+async def send_frame(writer, opcode, payload, fin=True):
+    """Client frames must be masked (RFC 6455 5.3)."""
+    mask = os.urandom(4)
+    length = len(payload)
+    first = (0x80 if fin else 0) | opcode
+    if length < 126:
+        head = struct.pack('!BB', first, 0x80 | length)
+    elif length < 1 << 16:
+        head = struct.pack('!BBH', first, 0x80 | 126, length)
+    else:
+        head = struct.pack('!BBQ', first, 0x80 | 127, length)
+    key = (mask * (length // 4 + 1))[:length]
+    masked = (int.from_bytes(payload, 'big') ^ int.from_bytes(key, 'big')).to_bytes(length, 'big') if length else b''
+    writer.write(head + mask + masked)
+    await writer.drain()
+
+
+async def read_frame(reader):
+    """(opcode, payload) of one server frame; server frames are not masked."""
+    head = await reader.readexactly(2)
+    length = head[1] & 0x7F
+    if length == 126:
+        length = struct.unpack('!H', await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack('!Q', await reader.readexactly(8))[0]
+    return head[0] & 0x0F, await reader.readexactly(length)
+
+
+async def handshake(port, appointment_id, language='en', token=RELAY_TOKEN, session_id=None):
+    """(status, headers, key, reader, writer) of a relay's WebSocket upgrade."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    key = base64.b64encode(os.urandom(16)).decode('ascii')
+    session = f"&session_id={session_id}" if session_id else ''
+    writer.write(
+        f"GET /stream?appointment_id={appointment_id}&language_code={language}{session} HTTP/1.1\r\n"
+        f"Host: 127.0.0.1:{port}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+        f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n"
+        f"Authorization: Bearer {token}\r\n\r\n".encode('latin-1')
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1')
+        if line in ('\r\n', ''):
+            break
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return status, headers, key, reader, writer
+
+
+async def protocol_close(port, *frames):
+    """Send raw frames after the handshake; the status code of the server's close frame."""
+    status, _, _, reader, writer = await handshake(port, 'apptprotocol')
+    if status != 101:
+        writer.close()
+        return status
+    try:
+        for frame in frames:
+            if isinstance(frame, bytes):
+                writer.write(frame)
+                await writer.drain()
+            else:
+                await send_frame(writer, *frame)
+        while True:
+            opcode, payload = await asyncio.wait_for(read_frame(reader), timeout=10)
+            if opcode == 0x8:
+                return struct.unpack('!H', payload[:2])[0]
+    except (asyncio.IncompleteReadError, ConnectionError, asyncio.TimeoutError):
+        return None
+    finally:
+        writer.close()
+
+
+async def relay_call(server_module, port, pcm, appointment_id, args, language='en', token=RELAY_TOKEN,
+                     session_id=None, hang_up=True):
+    """Replay one call through the server; returns what the relay saw. hang_up=False drops the relay instead."""
+    status, headers, key, reader, writer = await handshake(port, appointment_id, language, token, session_id)
+    if status != 101:
+        writer.close()
+        return {'status': status}
+    accepted = headers.get('sec-websocket-accept') == server_module.accept_key(key)
+
+    messages = []
+
+    async def receive():
+        while True:
+            try:
+                opcode, payload = await read_frame(reader)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return
+            if opcode == server_module.OP_CLOSE:
+                await send_frame(writer, server_module.OP_CLOSE, payload[:2])
+                return
+            if opcode == server_module.OP_TEXT:
+                messages.append((time.perf_counter(), json.loads(payload)))
+
+    receiver = asyncio.ensure_future(receive())
+    frame = streaming.frame_bytes(args.frame_ms)
+    started = time.perf_counter()
+    for n, offset in enumerate(range(0, len(pcm), frame)):
+        # Pace against the start time so scheduling jitter does not accumulate
+        delay = started + n * args.frame_ms / 1000 / args.speed - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await send_frame(writer, server_module.OP_BINARY, pcm[offset:offset + frame])
+    hung_up = time.perf_counter()
+    if hang_up:
+        await send_frame(writer, server_module.OP_TEXT, b'{"type": "end"}')
+    else:
+        writer.write_eof()
+    # The server closes once the transcript is stored; receive() answers its close frame
+    await asyncio.wait_for(receiver, timeout=30)
+    writer.close()
+
+    completed = [(at, message) for at, message in messages if message['type'] == 'completed']
+    return {
+        'status': status,
+        'accepted': accepted,
+        'replay_seconds': hung_up - started,
+        'partials': [message['segment'] for _, message in messages if message['type'] == 'partial'],
+        'finals': [message['segment'] for _, message in messages if message['type'] == 'final'],
+        'finals_before_hangup': sum(1 for at, message in messages if message['type'] == 'final' and at < hung_up),
+        'completed': completed[0][1] if completed else None,
+        'hangup_to_completed_ms': (completed[0][0] - hung_up) * 1000 if completed else None,
+    }
+
+
+def run_checks():
+    """Return failed check descriptions for the result conversion."""
+    failures = []
+
+    def check(condition, description):
+        if not condition:
+            failures.append(description)
+
+    result = {
+        'ResultId': 'r1', 'StartTime': 1.0, 'EndTime': 4.0, 'IsPartial': False,
+        'Alternatives': [{'Transcript': 'Any pain? No, none.', 'Items': [
+            {'Content': 'Any', 'Type': 'pronunciation', 'Speaker': '0', 'StartTime': 1.0, 'EndTime': 1.3},
+            {'Content': 'pain', 'Type': 'pronunciation', 'Speaker': '0', 'StartTime': 1.3, 'EndTime': 1.7},
+            {'Content': '?', 'Type': 'punctuation'},
+            {'Content': 'No', 'Type': 'pronunciation', 'Speaker': '1', 'StartTime': 2.5, 'EndTime': 2.8},
+            {'Content': ',', 'Type': 'punctuation'},
+            {'Content': 'none', 'Type': 'pronunciation', 'Speaker': '1', 'StartTime': 2.9, 'EndTime': 4.0},
+            {'Content': '.', 'Type': 'punctuation'},
+        ]}],
+    }
+    check(streaming.result_segments(result) == [
+        {'speaker': 'spk_0', 'start_time': 1.0, 'end_time': 1.7, 'text': 'Any pain?'},
+        {'speaker': 'spk_1', 'start_time': 2.5, 'end_time': 4.0, 'text': 'No, none.'},
+    ], 'result_segments splits speaker turns and attaches punctuation')
+    check(streaming.result_segments({'StartTime': 0, 'EndTime': 1, 'Alternatives': [{'Transcript': 'hello', 'Items': []}]})
+          == [{'speaker': 'Unknown', 'start_time': 0.0, 'end_time': 1.0, 'text': 'hello'}], 'result without items')
+
+    assembler = streaming.TranscriptAssembler()
+    assembler.add(dict(result, IsPartial=True))
+    check(assembler.partials.get('r1') and not assembler.final, 'partial is held, not final')
+    assembler.add(result)
+    check(not assembler.partials and len(assembler.final) == 2, 'final replaces the partial')
+    check(assembler.text() == 'Any pain? No, none.', 'assembled text')
+
+    check(streaming.streaming_language('en') == 'en-US' and streaming.streaming_language('fr_FR') == 'fr-FR',
+          'streaming_language maps request languages')
+    check(streaming.streaming_language('ff') is None, 'Whisper languages are not streamed')
+    check(streaming.frame_bytes(100) == 3200, '100 ms frame is 3200 bytes')
+    return failures
+
+
+async def run_calls(args, failures):
+    s3 = LocalS3(OUTPUT_BUCKET)
+    for region in REGIONS:
+        register_client('s3', s3, region)
+    appointments = [f"apptstream{n}" for n in range(args.calls)]
+    postgrest = LocalPostgREST({'video_call_sessions': [
+        {'id': f"session-{appointment}", 'appointment_id': appointment} for appointment in appointments + ['apptdrop']
+    ]}).start()
+    os.environ.update({
+        'SUPABASE_URL': postgrest.url,
+        'SUPABASE_SERVICE_KEY': 'bench',
+        'OUTPUT_BUCKET': OUTPUT_BUCKET,
+        'STREAMING_RELAY_TOKEN': RELAY_TOKEN,
+    })
+    server_module = load_module(ROUTER_DIR / 'streaming_server.py', 'bench_streaming_server')
+
+    def check(condition, description):
+        if not condition:
+            failures.append(description)
+
+    turns = synthetic_turns('en', args.length, random.Random(args.seed))
+    transport = LocalTranscribeStreaming(turns)
+    server = await server_module.serve('127.0.0.1', 0, transport=transport)
+    port = server.sockets[0].getsockname()[1]
+
+    try:
+        rejected = {
+            'unsupported_language': (await relay_call(server_module, port, b'', 'apptreject', args, language='ff'))['status'],
+            'bad_token': (await relay_call(server_module, port, b'', 'apptreject', args, token='wrong'))['status'],
+        }
+        check(rejected['unsupported_language'] == 400, f"unsupported language refused (got {rejected['unsupported_language']})")
+        check(rejected['bad_token'] == 401, f"bad relay token refused (got {rejected['bad_token']})")
+
+        half = server_module.MAX_MESSAGE_BYTES // 2 + 1
+        rejected['unmasked_frame'] = await protocol_close(port, struct.pack('!BB', 0x80 | server_module.OP_BINARY, 4) + b'\0' * 4)
+        rejected['stray_continuation'] = await protocol_close(port, (server_module.OP_CONTINUATION, b'\0' * 4))
+        rejected['oversized_message'] = await protocol_close(port, (server_module.OP_BINARY, b'\0' * half, False),
+                                                             (server_module.OP_CONTINUATION, b'\0' * half, False))
+        check(rejected['unmasked_frame'] == 1002, f"unmasked frame closed with 1002 (got {rejected['unmasked_frame']})")
+        check(rejected['stray_continuation'] == 1002,
+              f"continuation without a message closed with 1002 (got {rejected['stray_continuation']})")
+        check(rejected['oversized_message'] == 1009,
+              f"message past MAX_MESSAGE_BYTES closed with 1009 (got {rejected['oversized_message']})")
+
+        server_module.RELAY_TOKEN = ''
+        try:
+            await server_module.serve('127.0.0.1', 0, transport=transport)
+            check(False, 'server starts without STREAMING_RELAY_TOKEN')
+        except RuntimeError:
+            pass
+        finally:
+            server_module.RELAY_TOKEN = RELAY_TOKEN
+
+        pcm = {}
+        for n, appointment in enumerate(appointments):
+            if args.wav:
+                pcm[appointment] = read_pcm(args.wav)
+            else:
+                pcm[appointment] = synthetic_pcm(transport.duration, args.seed + n)
+
+        seen = await asyncio.gather(*(
+            relay_call(server_module, port, pcm[appointment], appointment, args) for appointment in appointments
+        ))
+
+        # A relay that drops mid-call and reconnects: the first stream is not a hang-up, and
+        # the second must not overwrite its segments
+        audio = pcm[appointments[0]]
+        dropped = await relay_call(server_module, port, audio[:len(audio) // 2], 'apptdrop', args,
+                                   session_id='session-apptdrop', hang_up=False)
+        dropped_row = dict(next(row for row in postgrest.rows('video_call_sessions') if row['appointment_id'] == 'apptdrop'))
+        reconnected = await relay_call(server_module, port, audio, 'apptdrop', args, session_id='session-apptdrop')
+    finally:
+        server.close()
+        await server.wait_closed()
+
+    results = []
+    rows = {row['appointment_id']: row for row in postgrest.rows('video_call_sessions')}
+
+    check(dropped['completed'] is None and dropped_row.get('transcription_status') == 'FAILED',
+          f"dropped relay marked {dropped_row.get('transcription_status')}, expected FAILED")
+    first = re.search(r'(\d+) segments stored at (s3://\S+)', dropped_row.get('transcription_error') or '')
+    second_manifest = (reconnected.get('completed') or {}).get('transcript_store', {}).get('manifest_uri')
+    check(first and second_manifest and first.group(2) != second_manifest
+          and '/streaming/session-apptdrop-' in second_manifest,
+          f"reconnected stream reused the dropped stream's keys: {dropped_row.get('transcription_error')}, {second_manifest}")
+    if first:
+        kept = [seg['text'] for seg in read_segments(first.group(2))]
+        check(len(kept) == int(first.group(1)) < len(reconnected.get('finals', []))
+              and kept[:len(dropped['finals'])] == [seg['text'] for seg in dropped['finals']],
+              f"dropped stream segments overwritten by the reconnect ({len(kept)} stored)")
+    check(rows['apptdrop'].get('transcription_status') == 'COMPLETED'
+          and rows['apptdrop'].get('transcript_manifest_uri') == second_manifest, 'reconnected stream completes the row')
+    for appointment, call in zip(appointments, seen):
+        audio_seconds = len(pcm[appointment]) / (streaming.SAMPLE_RATE * streaming.SAMPLE_WIDTH)
+        label = f"{appointment}:"
+        check(call['status'] == 101 and call['accepted'], f"{label} WebSocket handshake")
+        check(call['completed'] is not None, f"{label} completed message")
+        if not call.get('completed'):
+            continue
+
+        heard = turns if not args.wav else turns[:len(call['finals'])]
+        check([seg['text'] for seg in call['finals']] == [text for _, text in heard], f"{label} final texts match the script")
+        speakers = {}
+        consistent = all(speakers.setdefault(seg['speaker'], speaker) == speaker
+                         for seg, (speaker, _) in zip(call['finals'], heard))
+        check(consistent and len(speakers) == len({speaker for speaker, _ in heard}), f"{label} speaker turns")
+        check(call['partials'] and call['finals_before_hangup'] > 0, f"{label} partials and finals arrive during the call")
+
+        store = call['completed']['transcript_store']
+        stored = [seg['text'] for seg in read_segments(store['manifest_uri'])]
+        check(stored == [seg['text'] for seg in call['finals']], f"{label} stored segments match the finals")
+        row = rows.get(appointment, {})
+        check(row.get('transcription_status') == 'COMPLETED' and row.get('transcript_manifest_uri') == store['manifest_uri'],
+              f"{label} session row completed with the manifest")
+        check(row.get('raw_transcript') == ' '.join(seg['text'] for seg in call['finals']), f"{label} raw transcript")
+        pacing = audio_seconds / args.speed / call['replay_seconds']
+        check(0.85 <= pacing <= 1.05, f"{label} replay pacing {pacing:.2f}x of --speed")
+
+        results.append({
+            'audio_seconds': round(audio_seconds, 1),
+            'replay_seconds': round(call['replay_seconds'], 2),
+            'partials': len(call['partials']),
+            'finals': len(call['finals']),
+            'finals_before_hangup': call['finals_before_hangup'],
+            'hangup_to_completed_ms': round(call['hangup_to_completed_ms'], 1),
+            'server_store_seconds': call['completed']['store_seconds'],
+        })
+    postgrest.stop()
+    return rejected, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--calls', type=int, default=4, help='concurrent calls replayed')
+    parser.add_argument('--length', choices=sorted(LENGTHS), default='short', help='scripted dialogue length')
+    parser.add_argument('--speed', type=float, default=10.0, help='replay speed (1 = real time)')
+    parser.add_argument('--frame-ms', type=int, default=streaming.FRAME_MS, help='audio per WebSocket frame')
+    parser.add_argument('--wav', help='16 kHz mono 16-bit WAV to replay instead of synthesized audio')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='write JSON report to this file')
+    args = parser.parse_args()
+
+    tracing.METRICS_ENABLED = False
+    failures = run_checks()
+    logging.disable(logging.CRITICAL)
+    try:
+        rejected, calls = asyncio.run(run_calls(args, failures))
+    finally:
+        logging.disable(logging.NOTSET)
+
+    report = {
+        'benchmark': 'streaming_replay',
+        'speed': args.speed,
+        'frame_ms': args.frame_ms,
+        'rejected': rejected,
+        'calls': calls,
+        'hangup_to_completed_ms': summarize([call['hangup_to_completed_ms'] for call in calls]),
+        'failures': failures,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Sync rules analyzer against a synthetic SQLite snapshot of the MedZen schema
+
+Builds a snapshot of the tables and provider / facility admin views that the repo's
+POWERSYNC_SYNC_RULES_COMPLETE.yaml reads: patients with vitals, labs, prescriptions and
+appointments spread over providers and facilities, one system admin, and indexes on some
+filter columns but not all. It then runs powersync-mcp-server/src/sync_rules_analyzer.py over
+it (library, CLI and MCP tool) and compares its counts with direct queries.
+
+Checks:
+    - each role gets its buckets (patient, provider, facility admin, system admin, global)
+    - rows per bucket match direct counts for a patient, a provider and the system admin
+    - the system admin's data queries are the heaviest rules
+    - unindexed filter columns, casts on indexed columns and views are flagged; indexed ones are not
+    - a query the snapshot cannot run is reported, not raised
+    - the CLI and the analyze_sync_rules tool produce the report
+
+Usage:
+    python3 bench/sync_rules_bench.py [--patients 400] [--users 100] [--output report.json]
+
+Exits non-zero if any check fails.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / 'powersync-mcp-server' / 'src'))
+
+import sync_rules_analyzer  # noqa: E402
+
+RULES = REPO_ROOT / 'POWERSYNC_SYNC_RULES_COMPLETE.yaml'
+
+PATIENT_TABLES = ['vital_signs', 'lab_results', 'prescriptions', 'immunizations', 'medical_records', 'allergies']
+INDEXED = [('users', 'id'), ('patient_profiles', 'user_id'), ('medical_provider_profiles', 'user_id'),
+           ('facility_admin_profiles', 'user_id'), ('system_admin_profiles', 'user_id'),
+           ('vital_signs', 'patient_id'), ('lab_results', 'patient_id'), ('prescriptions', 'patient_id'),
+           ('appointments', 'patient_id'), ('appointments', 'provider_id')]
+LOOKUP_TABLES = ['facility_types', 'blood_types', 'specialties', 'countries', 'archetypes']
+
+SCHEMA = """
+CREATE TABLE users (id TEXT PRIMARY KEY, firebase_uid TEXT, role TEXT);
+CREATE TABLE patient_profiles (id TEXT PRIMARY KEY, user_id TEXT);
+CREATE TABLE medical_provider_profiles (id TEXT PRIMARY KEY, user_id TEXT);
+CREATE TABLE facility_admin_profiles (id TEXT PRIMARY KEY, user_id TEXT, facility_id TEXT);
+CREATE TABLE system_admin_profiles (id TEXT PRIMARY KEY, user_id TEXT);
+CREATE TABLE electronic_health_records (id TEXT PRIMARY KEY, patient_id TEXT);
+CREATE TABLE appointments (id TEXT PRIMARY KEY, patient_id TEXT, provider_id TEXT, facility_id TEXT);
+CREATE TABLE ehrbase_sync_queue (id TEXT PRIMARY KEY, record_id TEXT);
+CREATE TABLE facilities (id TEXT PRIMARY KEY);
+CREATE TABLE facility_departments (id TEXT PRIMARY KEY, facility_id TEXT);
+CREATE TABLE facility_reports (id TEXT PRIMARY KEY, facility_id TEXT);
+CREATE TABLE facility_providers (id TEXT PRIMARY KEY, provider_id TEXT, facility_id TEXT);
+CREATE TABLE provider_availability (id TEXT PRIMARY KEY, provider_id TEXT);
+CREATE TABLE provider_schedule_exceptions (id TEXT PRIMARY KEY, provider_id TEXT);
+CREATE TABLE user_activity_logs (id TEXT PRIMARY KEY, user_id TEXT);
+CREATE TABLE email_logs (id TEXT PRIMARY KEY, user_id TEXT);
+CREATE TABLE feedback (id TEXT PRIMARY KEY, user_id TEXT);
+""" + "".join(f"CREATE TABLE {table} (id TEXT PRIMARY KEY, patient_id TEXT);\n" for table in PATIENT_TABLES) \
+    + "".join(f"CREATE TABLE {table} (id TEXT PRIMARY KEY);\n" for table in LOOKUP_TABLES) + """
+CREATE VIEW v_provider_accessible_patients AS
+    SELECT DISTINCT mp.user_id AS provider_user_id, a.patient_id
+    FROM appointments a JOIN medical_provider_profiles mp ON mp.id = a.provider_id;
+CREATE VIEW v_provider_appointments AS
+    SELECT a.*, mp.user_id AS provider_user_id
+    FROM appointments a JOIN medical_provider_profiles mp ON mp.id = a.provider_id;
+""" + "".join(f"""CREATE VIEW v_provider_accessible_{table} AS
+    SELECT t.*, pa.provider_user_id FROM {table} t JOIN v_provider_accessible_patients pa ON pa.patient_id = t.patient_id;
+""" for table in ('vital_signs', 'lab_results', 'prescriptions', 'medical_records')) + """
+CREATE VIEW v_facility_admin_accessible_appointments AS
+    SELECT a.*, fa.user_id AS admin_user_id FROM appointments a JOIN facility_admin_profiles fa ON fa.facility_id = a.facility_id;
+CREATE VIEW v_facility_admin_accessible_providers AS
+    SELECT fp.*, fa.user_id AS admin_user_id FROM facility_providers fp JOIN facility_admin_profiles fa ON fa.facility_id = fp.facility_id;
+CREATE VIEW v_facility_admin_accessible_patients AS
+    SELECT DISTINCT a.patient_id, fa.user_id AS admin_user_id FROM appointments a JOIN facility_admin_profiles fa ON fa.facility_id = a.facility_id;
+"""
+
+
+def build_snapshot(path, patients, providers, facilities, seed):
+    """Write the synthetic snapshot; returns {role: [firebase uids]}."""
+    rng = random.Random(seed)
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    db.executescript(''.join(f"CREATE INDEX idx_{table}_{column} ON {table} ({column});\n"
+                             for table, column in INDEXED if column != 'id'))
+    roles = {'patient': [], 'provider': [], 'facility_admin': [], 'system_admin': []}
+    counter = iter(range(10 ** 9))
+
+    def new_id(prefix):
+        return f"{prefix}-{next(counter)}"
+
+    def add_user(role):
+        user_id, uid = new_id('user'), new_id('fb')
+        db.execute("INSERT INTO users VALUES (?, ?, ?)", (user_id, uid, role))
+        roles[role].append(uid)
+        return user_id
+
+    facility_ids = [new_id('facility') for _ in range(facilities)]
+    db.executemany("INSERT INTO facilities VALUES (?)", [(f,) for f in facility_ids])
+    for facility in facility_ids:
+        db.executemany("INSERT INTO facility_departments VALUES (?, ?)", [(new_id('dept'), facility) for _ in range(6)])
+        db.executemany("INSERT INTO facility_reports VALUES (?, ?)", [(new_id('report'), facility) for _ in range(20)])
+        db.execute("INSERT INTO facility_admin_profiles VALUES (?, ?, ?)", (new_id('fap'), add_user('facility_admin'), facility))
+
+    provider_ids = []
+    for _ in range(providers):
+        profile = new_id('mpp')
+        db.execute("INSERT INTO medical_provider_profiles VALUES (?, ?)", (profile, add_user('provider')))
+        provider_ids.append(profile)
+        db.execute("INSERT INTO facility_providers VALUES (?, ?, ?)", (new_id('fp'), profile, rng.choice(facility_ids)))
+        db.executemany("INSERT INTO provider_availability VALUES (?, ?)", [(new_id('avail'), profile) for _ in range(7)])
+        db.executemany("INSERT INTO provider_schedule_exceptions VALUES (?, ?)",
+                       [(new_id('exc'), profile) for _ in range(rng.randint(0, 4))])
+
+    for _ in range(patients):
+        user_id = add_user('patient')
+        db.execute("INSERT INTO patient_profiles VALUES (?, ?)", (new_id('pp'), user_id))
+        db.execute("INSERT INTO electronic_health_records VALUES (?, ?)", (new_id('ehr'), user_id))
+        for table in PATIENT_TABLES:
+            db.executemany(f"INSERT INTO {table} VALUES (?, ?)",
+                           [(new_id(table), user_id) for _ in range(int(rng.expovariate(1 / 12)))])
+        for _ in range(rng.randint(0, 6)):
+            db.execute("INSERT INTO appointments VALUES (?, ?, ?, ?)",
+                       (new_id('appt'), user_id, rng.choice(provider_ids), rng.choice(facility_ids)))
+        db.executemany("INSERT INTO ehrbase_sync_queue VALUES (?, ?)",
+                       [(new_id('sync'), user_id) for _ in range(rng.randint(0, 3))])
+
+    db.execute("INSERT INTO system_admin_profiles VALUES (?, ?)", (new_id('sap'), add_user('system_admin')))
+    for table in ('user_activity_logs', 'email_logs', 'feedback'):
+        db.executemany(f"INSERT INTO {table} VALUES (?, ?)", [(new_id(table), None) for _ in range(patients)])
+    for table in LOOKUP_TABLES:
+        db.executemany(f"INSERT INTO {table} VALUES (?)", [(new_id(table),) for _ in range(25)])
+    db.commit()
+    db.close()
+    return roles
+
+
+def scalar(db, sql, *params):
+    return db.execute(sql, params).fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--patients', type=int, default=400)
+    parser.add_argument('--providers', type=int, default=25)
+    parser.add_argument('--facilities', type=int, default=4)
+    parser.add_argument('--users', type=int, default=100, help='token user ids the analyzer samples')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='write JSON report to this file')
+    args = parser.parse_args()
+
+    failures = []
+
+    def check(condition, description):
+        if not condition:
+            failures.append(description)
+
+    rules = RULES.read_text(encoding='utf-8')
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'snapshot.sqlite')
+        roles = build_snapshot(path, args.patients, args.providers, args.facilities, args.seed)
+        db = sqlite3.connect(path)
+        snapshot = sync_rules_analyzer.open_snapshot(path)
+
+        started = time.perf_counter()
+        report = sync_rules_analyzer.analyze(rules, snapshot, sample=args.users, seed=args.seed)
+        analysis_ms = round((time.perf_counter() - started) * 1000, 1)
+        total_users = sum(len(uids) for uids in roles.values())
+        check(report['total_users'] == total_users, f"total users {report['total_users']} != {total_users}")
+        check(report['users_sampled'] == min(args.users, total_users), f"sampled {report['users_sampled']} users")
+        check(not report['errors'], f"queries failed on the snapshot: {report['errors']}")
+
+        # Buckets per role
+        expected = {
+            'patient': {'user_data', 'patient_data', 'global'},
+            'provider': {'user_data', 'provider_data', 'global'},
+            'facility_admin': {'user_data', 'facility_admin_data', 'global'},
+            'system_admin': {'user_data', 'system_admin_data', 'global'},
+        }
+        per_role = {}
+        for role, uids in roles.items():
+            single = sync_rules_analyzer.analyze(rules, snapshot, users=[uids[0]])
+            held = {name for name, bucket in single['buckets'].items() if bucket['users_with_bucket']}
+            per_role[role] = {'buckets': sorted(held), 'rows': single['per_user']['rows']['max']}
+            check(held == expected[role], f"{role}: buckets {sorted(held)}, expected {sorted(expected[role])}")
+
+            if role == 'patient':
+                user_id = scalar(db, "SELECT id FROM users WHERE firebase_uid = ?", uids[0])
+                truth = sum(scalar(db, f"SELECT COUNT(*) FROM {table} WHERE patient_id = ?", user_id)
+                            for table in PATIENT_TABLES + ['appointments'])
+                truth += scalar(db, "SELECT COUNT(*) FROM ehrbase_sync_queue WHERE record_id = ?", user_id)
+                got = single['buckets']['patient_data']['rows_per_bucket']['max']
+                check(got == truth, f"patient_data rows {got} != direct count {truth}")
+            if role == 'provider':
+                user_id = scalar(db, "SELECT id FROM users WHERE firebase_uid = ?", uids[0])
+                truth = scalar(db, "SELECT COUNT(*) FROM v_provider_appointments WHERE provider_user_id = ?", user_id)
+                rule = next(r for r in single['buckets']['provider_data']['data_queries'] if 'v_provider_appointments' in r['query'])
+                check(rule['rows_per_bucket']['max'] == truth, f"provider appointments {rule['rows_per_bucket']['max']} != {truth}")
+            if role == 'system_admin':
+                tables = [q.split()[3] for q in sync_rules_analyzer.parse_bucket_definitions(rules)['system_admin_data']['data']]
+                truth = sum(scalar(db, f"SELECT COUNT(*) FROM {table}") for table in tables)
+                got = single['buckets']['system_admin_data']['rows_per_bucket']['max']
+                check(got == truth, f"system_admin_data rows {got} != direct count {truth}")
+
+        admin = sync_rules_analyzer.analyze(rules, snapshot, users=roles['system_admin'] + roles['patient'][:20])
+        check(all(rule['bucket'] == 'system_admin_data' for rule in admin['heaviest_rules'][:3]),
+              f"heaviest rules not the system admin's: {[r['bucket'] for r in admin['heaviest_rules'][:3]]}")
+
+        # Index findings
+        flagged = {(f['table'], f['column']): f['reason'] for f in report['unindexed']}
+        check(flagged.get(('users', 'firebase_uid')) == 'no index', f"users.firebase_uid not flagged: {flagged}")
+        check(flagged.get(('immunizations', 'patient_id')) == 'no index', 'immunizations.patient_id not flagged')
+        check(flagged.get(('users', 'id'), '').startswith('cast to text'), 'users.id::text cast not flagged')
+        check(flagged.get(('v_provider_appointments', 'provider_user_id'), '').startswith('view'), 'view not flagged')
+        check(('vital_signs', 'patient_id') not in flagged, 'indexed vital_signs.patient_id flagged')
+        check(('patient_profiles', 'user_id') not in flagged, 'indexed patient_profiles.user_id flagged')
+
+        # A query the snapshot cannot run
+        broken = rules.replace('SELECT * FROM countries', 'SELECT * FROM no_such_table')
+        broken_report = sync_rules_analyzer.analyze(broken, snapshot, sample=5)
+        check(any('no_such_table' in e['query'] for e in broken_report['errors']), 'failing query not reported')
+
+        # CLI
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            code = sync_rules_analyzer.main([str(RULES), '--db', path, '--users', '20', '--json'])
+        cli = json.loads(out.getvalue())
+        check(code == 0 and cli['users_sampled'] == 20, 'CLI --json run failed')
+
+        # MCP tool
+        os.environ['POWERSYNC_SAMPLE_INTERVAL'] = '0'
+        import powersync_mcp_server
+        text = asyncio.run(powersync_mcp_server.handle_call_tool(
+            'analyze_sync_rules', {'sync_rules_path': str(RULES), 'database': path, 'sample_users': 20}))[0].text
+        check('Heaviest data queries' in text and 'users.firebase_uid' in text, f"tool report incomplete:\n{text}")
+        snapshot.close()
+        db.close()
+
+    summary = {
+        'benchmark': 'sync_rules',
+        'snapshot': {'patients': args.patients, 'providers': args.providers, 'facilities': args.facilities},
+        'analysis_ms': analysis_ms,
+        'users_sampled': report['users_sampled'],
+        'per_user': report['per_user'],
+        'per_role': per_role,
+        'estimated_total': report['estimated_total'],
+        'heaviest_rules': [{'bucket': r['bucket'], 'query': r['query'], 'rows_per_user': r['rows_per_user']}
+                           for r in report['heaviest_rules'][:5]],
+        'unindexed': report['unindexed'],
+        'failures': failures,
+    }
+    output = json.dumps(summary, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Behaviour checks and size/latency benchmark for medzen_runtime.transcript_store
+
+Builds a synthetic Whisper verbose_json result (segments with token ids and scores, two
+speakers) and stores it both ways: the previous single JSON blob (whisper-result.json plus
+raw_transcript as a JSON string in video_call_sessions) and the chunked segment store. The
+checks cover lossless round trips, time-range and speaker slicing, chunk pruning and
+byte-identical rewrites. The report compares session row size, stored bytes and the latency
+of reading a window against loading the whole transcript, with a simulated S3 round trip.
+
+Usage:
+    python3 bench/transcript_store_bench.py [--minutes 60] [--s3-latency-ms 20] [--output report.json]
+
+Exits non-zero if any check fails.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / 'aws-deployment' / 'lambda-layers' / 'medzen-runtime' / 'python'))
+
+from medzen_runtime import tracing  # noqa: E402
+from medzen_runtime import transcript_store as store  # noqa: E402
+from medzen_runtime.clients import register_client  # noqa: E402
+from stand_ins import LocalS3  # noqa: E402
+
+BUCKET = 'medzen-transcriptions-bench'
+WORDS = ('patient', 'reports', 'chest', 'pain', 'since', 'yesterday', 'no', 'fever', 'blood',
+         'pressure', 'is', 'elevated', 'we', 'will', 'start', 'amlodipine', 'five', 'milligrams',
+         'daily', 'and', 'review', 'in', 'two', 'weeks', 'any', 'allergies', 'to', 'medication')
+
+
+def whisper_result(minutes, seed):
+    """Whisper verbose_json-shaped result with alternating speakers."""
+    rng = random.Random(seed)
+    segments, t = [], 0.0
+    while t < minutes * 60:
+        length = rng.uniform(2.0, 7.0)
+        words = [rng.choice(WORDS) for _ in range(int(length * 2.5))]
+        segments.append({
+            'id': len(segments),
+            'seek': int(t * 100),
+            'start': round(t, 2),
+            'end': round(t + length, 2),
+            'text': ' ' + ' '.join(words),
+            'tokens': [rng.randrange(50257) for _ in range(len(words) + 2)],
+            'temperature': 0.0,
+            'avg_logprob': round(rng.uniform(-0.6, -0.1), 4),
+            'compression_ratio': round(rng.uniform(1.1, 1.8), 4),
+            'no_speech_prob': round(rng.uniform(0, 0.05), 4),
+            'speaker': f"spk_{len(segments) % 2}",
+        })
+        t += length + rng.uniform(0.1, 1.0)
+    return {
+        'text': ''.join(seg['text'] for seg in segments).strip(),
+        'segments': segments,
+        'duration': round(t, 2),
+        'language': 'en',
+    }
+
+
+def expected_window(compacted, start=None, end=None, speakers=None):
+    return [
+        seg for seg in compacted
+        if (start is None or seg['end'] >= start)
+        and (end is None or seg['start'] <= end)
+        and (speakers is None or seg.get('speaker') in speakers)
+    ]
+
+
+def run_checks(result):
+    """Return a list of failed check descriptions."""
+    failures = []
+
+    def check(condition, description):
+        if not condition:
+            failures.append(description)
+
+    s3 = LocalS3(BUCKET)
+    register_client('s3', s3)
+    compacted = [store.compact_segment(seg, i) for i, seg in enumerate(result['segments'])]
+
+    summary = store.write_transcript(BUCKET, 'transcriptions/appt1/whisper', result['segments'], result['duration'])
+    manifest = store.load_manifest(summary['manifest_uri'])
+    check(summary['segment_count'] == len(result['segments']), 'summary segment count')
+    check(summary['speakers'] == ['spk_0', 'spk_1'], 'summary speakers')
+    check(all('tokens' not in seg for seg in compacted), 'token ids dropped')
+
+    check(list(store.read_segments(manifest)) == compacted, 'full read round trip')
+    check(store.read_text(manifest) == ' '.join(seg['text'] for seg in compacted), 'read_text joins segment text')
+
+    gets = s3.calls['get']
+    window = list(store.read_segments(manifest, start=600, end=660))
+    check(window == expected_window(compacted, 600, 660), 'time-range slice')
+    check(s3.calls['get'] - gets <= 2, 'time-range slice fetches only overlapping chunks')
+
+    speaker = list(store.read_segments(manifest, speakers={'spk_1'}))
+    check(speaker == expected_window(compacted, speakers={'spk_1'}), 'speaker slice')
+    check(list(store.read_segments(manifest, speakers={'spk_9'})) == [], 'unknown speaker yields nothing')
+
+    # Transcribe speaker segments use start_time/end_time
+    transcribe_segments = [
+        {'speaker': seg['speaker'], 'start_time': seg['start'], 'end_time': seg['end'], 'text': seg['text']}
+        for seg in result['segments'][:50]
+    ]
+    callback = store.write_transcript(BUCKET, 'transcriptions/appt1/medzen-standard-appt1-0000', transcribe_segments)
+    first = next(store.read_segments(callback['manifest_uri']))
+    check(first['start'] == compacted[0]['start'] and first['speaker'] == 'spk_0', 'Transcribe segment shape')
+
+    before = {key: versions[-1][1] for key, versions in s3.objects.items()}
+    store.write_transcript(BUCKET, 'transcriptions/appt1/whisper', result['segments'], result['duration'])
+    after = {key: versions[-1][1] for key, versions in s3.objects.items()}
+    check(before == after, 'rewrite is byte-identical')
+
+    empty = store.write_transcript(BUCKET, 'transcriptions/appt2/whisper', [])
+    check(empty['segment_count'] == 0 and list(store.read_segments(empty['manifest_uri'])) == [], 'empty transcript')
+    return failures
+
+
+def timed(func, repeats):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {'p50_ms': round(statistics.median(samples), 3), 'max_ms': round(max(samples), 3)}
+
+
+def measure(result, latency_s, repeats):
+    s3 = LocalS3(BUCKET, latency_s)
+    register_client('s3', s3)
+
+    # Previous layout: one blob in S3 and the transcript JSON in the session row
+    legacy_blob = json.dumps({'transcript': {
+        'text': result['text'], 'segments': result['segments'], 'duration': result['duration']
+    }}, ensure_ascii=False).encode('utf-8')
+    s3.put_object(Bucket=BUCKET, Key='legacy/whisper-result.json', Body=legacy_blob)
+    legacy_row = json.dumps({
+        'raw_transcript': json.dumps({
+            'text': result['text'], 'segments': result['segments'], 'duration': result['duration']
+        }, ensure_ascii=False)
+    }).encode('utf-8')
+
+    summary = store.write_transcript(BUCKET, 'transcriptions/appt1/whisper', result['segments'], result['duration'])
+    row = json.dumps({
+        'raw_transcript': result['text'],
+        'transcript_manifest_uri': summary['manifest_uri'],
+        'transcript_summary': summary,
+    }).encode('utf-8')
+    manifest = store.load_manifest(summary['manifest_uri'])
+    mid = result['duration'] / 2
+
+    def legacy_window():
+        blob = json.loads(s3.get_object(Bucket=BUCKET, Key='legacy/whisper-result.json')['Body'].read())
+        return [seg for seg in blob['transcript']['segments'] if seg['end'] >= mid and seg['start'] <= mid + 60]
+
+    return {
+        'segments': summary['segment_count'],
+        'chunks': summary['chunks'],
+        'row_bytes': {'before': len(legacy_row), 'after': len(row)},
+        'stored_bytes': {'before': len(legacy_blob), 'after': summary['stored_bytes']},
+        'read_60s_window': {
+            'before': timed(legacy_window, repeats),
+            'after': timed(lambda: list(store.read_segments(summary['manifest_uri'], start=mid, end=mid + 60)), repeats),
+            'after_cached_manifest': timed(lambda: list(store.read_segments(manifest, start=mid, end=mid + 60)), repeats),
+        },
+        'read_full': {
+            'before': timed(lambda: json.loads(s3.get_object(Bucket=BUCKET, Key='legacy/whisper-result.json')['Body'].read()), repeats),
+            'after': timed(lambda: list(store.read_segments(manifest)), repeats),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--minutes', type=int, default=60, help='length of the synthetic consultation')
+    parser.add_argument('--s3-latency-ms', type=float, default=20.0, help='simulated S3 GET round trip')
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='write JSON report to this file')
+    args = parser.parse_args()
+
+    tracing.METRICS_ENABLED = False
+    result = whisper_result(args.minutes, args.seed)
+    failures = run_checks(result)
+    report = {
+        'minutes': args.minutes,
+        's3_latency_ms': args.s3_latency_ms,
+        'measurements': measure(result, args.s3_latency_ms / 1000, args.repeats),
+        'failures': failures,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    print(output)
+
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Medical vocabulary deployment against a Transcribe stand-in: diff-based, concurrent, one poller
+
+Runs scripts/deploy-medical-vocabularies.py's deploy_vocabularies on a copy of
+medical-vocabularies/ against bench/stand_ins.py's LocalTranscribe (every call delayed by
+--call-ms, vocabularies READY --ready-s after a create or update). Poll intervals are the
+script's defaults times --scale, and so is the 5 s interval of the serial baseline: the
+previous flow of one create at a time, skipping existing vocabularies, then a
+get_vocabulary loop per vocabulary.
+
+Checks:
+    - a cold deployment creates all vocabularies concurrently and is faster than the baseline
+    - waiting uses one list_vocabularies per poll round and no get_vocabulary calls
+    - a rerun with nothing changed submits nothing; changing two files updates exactly
+      those, where the baseline leaves them stale
+    - a vocabulary that FAILED is reported with its reason and redeployed on the next run
+    - LimitExceededException on submit is retried until every vocabulary is READY
+
+Usage:
+    python3 bench/vocabulary_deploy_bench.py [--call-ms 50] [--ready-s 1.0] [--scale 0.1] [--output report.json]
+
+Exits non-zero if any check fails.
+"""
+
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / 'scripts'))
+
+from pipeline_bench import load_module  # noqa: E402
+from stand_ins import LocalTranscribe  # noqa: E402
+
+ARN_PREFIX = 'arn:aws:transcribe:eu-central-1:000000000000:vocabulary/'
+
+
+def serial_baseline(client, vocab_dir, vocabularies, poll_s):
+    """The previous flow: create one at a time (skipping existing ones), then wait for each in turn."""
+    started = time.monotonic()
+    created = []
+    for filename, name, language_code in vocabularies:
+        entries = [line.strip() for line in (vocab_dir / filename).read_text(encoding='utf-8').splitlines()
+                   if line.strip() and not line.startswith('#')]
+        try:
+            client.get_vocabulary(VocabularyName=name)
+            continue  # already exists: skipped, even if the file changed
+        except Exception:
+            pass
+        client.create_vocabulary(VocabularyName=name, LanguageCode=language_code, Phrases=entries)
+        created.append(name)
+    for name in created:
+        while client.get_vocabulary(VocabularyName=name)['VocabularyState'] == 'PENDING':
+            time.sleep(poll_s)
+    return {'created': len(created), 'seconds': round(time.monotonic() - started, 2)}
+
+
+def stale(client, deployer, vocab_dir):
+    """Vocabularies whose remote phrases differ from the local file."""
+    names = []
+    for filename, name, _ in deployer.VOCABULARIES:
+        entries = deployer.read_vocabulary_file(vocab_dir / filename)
+        remote = client.vocabularies.get(name)
+        if remote is None or remote['Phrases'] != entries:
+            names.append(name)
+    return names
+
+
+def summarize(result):
+    actions = {}
+    for vocabulary in result['vocabularies']:
+        actions[vocabulary['action']] = actions.get(vocabulary['action'], 0) + 1
+    states = {}
+    for vocabulary in result['vocabularies']:
+        if 'state' in vocabulary:
+            states[vocabulary['state']] = states.get(vocabulary['state'], 0) + 1
+    return {'seconds': result['seconds'], 'poll_rounds': result['poll_rounds'], 'actions': actions, 'states': states}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--call-ms', type=float, default=50.0, help='latency of every Transcribe call')
+    parser.add_argument('--ready-s', type=float, default=1.0, help='seconds a vocabulary stays PENDING')
+    parser.add_argument('--scale', type=float, default=0.1, help='factor applied to the poll intervals')
+    parser.add_argument('--concurrency', type=int, default=5)
+    parser.add_argument('--output', help='write JSON report to this file')
+    args = parser.parse_args()
+
+    failures = []
+
+    def check(condition, description):
+        if not condition:
+            failures.append(description)
+
+    deployer = load_module(REPO_ROOT / 'scripts' / 'deploy-medical-vocabularies.py', 'deploy_medical_vocabularies')
+    workdir = Path(tempfile.mkdtemp(prefix='vocab-deploy-bench-'))
+    vocab_dir = workdir / 'medical-vocabularies'
+    shutil.copytree(REPO_ROOT / 'medical-vocabularies', vocab_dir)
+    count = len(deployer.VOCABULARIES)
+    results = {'vocabularies': count}
+
+    def transcribe(**kwargs):
+        return LocalTranscribe(latency_s=args.call_ms / 1000, ready_after_s=args.ready_s, **kwargs)
+
+    def deploy(client, **kwargs):
+        options = dict(concurrency=args.concurrency, initial_delay=5.0 * args.scale, max_delay=30.0 * args.scale,
+                       max_wait=120, log=lambda message: None)
+        options.update(kwargs)
+        return deployer.deploy_vocabularies(client, ARN_PREFIX, vocab_dir, **options)
+
+    try:
+        baseline_client = transcribe()
+        results['serial_baseline'] = serial_baseline(baseline_client, vocab_dir, deployer.VOCABULARIES, 5.0 * args.scale)
+
+        client = transcribe()
+        cold = deploy(client)
+        results['cold'] = summarize(cold)
+        results['cold']['calls'] = dict(client.calls)
+        results['cold']['max_in_flight'] = client.max_in_flight
+        check(results['cold']['states'] == {'READY': count}, f"cold deployment states {results['cold']['states']}")
+        check(client.max_in_flight > 1, 'creates were not submitted concurrently')
+        check(cold['seconds'] < results['serial_baseline']['seconds'],
+              f"cold deployment took {cold['seconds']}s, serial baseline {results['serial_baseline']['seconds']}s")
+        check(client.calls.get('GetVocabulary', 0) == 0, f"poller called get_vocabulary {client.calls.get('GetVocabulary')} times")
+        check(client.calls.get('ListVocabularies') == cold['poll_rounds'] + 1,
+              f"{client.calls.get('ListVocabularies')} list calls for {cold['poll_rounds']} poll rounds")
+
+        client.calls.clear()
+        rerun = deploy(client)
+        results['unchanged'] = summarize(rerun)
+        results['unchanged']['calls'] = dict(client.calls)
+        check(rerun['poll_rounds'] == 0 and not client.calls.get('UpdateVocabulary') and not client.calls.get('CreateVocabulary'),
+              f"unchanged rerun submitted {client.calls}")
+
+        changed = ['medzen-medical-vocab-sw.txt', 'medzen-medical-vocab-ha.txt']
+        for filename in changed:
+            with open(vocab_dir / filename, 'a', encoding='utf-8') as f:
+                f.write('Paracetamol-Forte\n')
+        client.calls.clear()
+        edited = deploy(client)
+        results['two_changed'] = summarize(edited)
+        check(results['two_changed']['actions'] == {'update': 2, 'unchanged': count - 2},
+              f"two changed files: {results['two_changed']['actions']}")
+        check(client.calls.get('UpdateVocabulary') == 2, f"{client.calls.get('UpdateVocabulary')} updates for two changes")
+        check(not stale(client, deployer, vocab_dir), f"stale after deployment: {stale(client, deployer, vocab_dir)}")
+        serial_baseline(baseline_client, vocab_dir, deployer.VOCABULARIES, 5.0 * args.scale)
+        results['baseline_stale_after_change'] = stale(baseline_client, deployer, vocab_dir)
+        check(len(results['baseline_stale_after_change']) == 2, 'baseline did not leave the changed vocabularies stale')
+
+        # A phrase Transcribe rejects for the language (accents in zu-ZA), then the fix
+        bad = vocab_dir / 'medzen-medical-vocab-zu.txt'
+        original = bad.read_text(encoding='utf-8')
+        bad.write_text(original + 'Fièvre\n', encoding='utf-8')
+        failed = deploy(client)
+        zulu = next(v for v in failed['vocabularies'] if v['name'] == 'medzen-medical-vocab-zu')
+        check(zulu.get('state') == 'FAILED' and 'Fièvre' in (zulu.get('error') or ''), f"invalid phrase not reported: {zulu}")
+        bad.write_text(original + 'Lamivudine\n', encoding='utf-8')
+        fixed = deploy(client)
+        zulu = next(v for v in fixed['vocabularies'] if v['name'] == 'medzen-medical-vocab-zu')
+        check(zulu['action'] == 'update' and zulu.get('state') == 'READY', f"fixed vocabulary not redeployed: {zulu}")
+        results['failed_then_fixed'] = {'failed': summarize(failed), 'fixed': summarize(fixed)}
+
+        throttled_client = transcribe(max_concurrent_submits=2)
+        throttled = deploy(throttled_client, concurrency=count)
+        results['throttled'] = summarize(throttled)
+        results['throttled']['max_in_flight'] = throttled_client.max_in_flight
+        check(results['throttled']['states'] == {'READY': count}, f"throttled deployment states {results['throttled']['states']}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {'benchmark': 'vocabulary_deploy', 'call_ms': args.call_ms, 'ready_s': args.ready_s, 'scale': args.scale,
+              **results, 'failures': failures}
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Vocabulary normalizer: one pass with precompiled rule sets against the old clean-up chain
+
+Runs scripts/vocabulary_normalizer.py's normalize_vocabularies on a copy of the
+vocabulary sources, enlarged with --copies synthetic lists per language (terms with
+spaces, digits, accents, boost weights and duplicates), and compares it with the chain
+it replaces: reformat_vocabularies_for_aws.py's rules then ultra_clean_vocabularies.py's,
+each re-reading and rewriting every list.
+
+Checks:
+    - serial and process-pool runs give the same outputs and impact counts
+    - per-rule impact matches what was injected into the synthetic lists
+    - digits are spelled out instead of deleted, French keeps its accents, and the
+      in-place rewrite of the real lists changes nothing
+    - every transcribe output is accepted by bench/stand_ins.py's LocalTranscribe
+    - oversized lists, over-long phrases and rows with both IPA and SoundsLike are
+      reported, and deploy-medical-vocabularies.py does not submit an oversized list
+
+Usage:
+    python3 bench/vocabulary_normalize_bench.py [--copies 40] [--workers 4] [--output report.json]
+
+Exits non-zero if any check fails.
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+import unicodedata
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / 'scripts'))
+
+import vocabulary_normalizer as normalizer  # noqa: E402
+from pipeline_bench import load_module  # noqa: E402
+from stand_ins import LocalTranscribe  # noqa: E402
+
+ARN_PREFIX = 'arn:aws:transcribe:eu-central-1:000000000000:vocabulary/'
+SYLLABLES = ['ka', 'lo', 'mi', 'tu', 'ra', 'ne', 'so', 'di', 'ba', 'fe', 'gu', 'pa']
+
+
+def legacy_chain(paths):
+    """The previous clean-up: reformat_vocabularies_for_aws.py, then ultra_clean_vocabularies.py, in place."""
+    def reformat(term):
+        term = term.strip()
+        if not term or term.startswith('#'):
+            return None
+        term = term.replace(' ', '-').rstrip(',')
+        if ',' in term:
+            term = term.split(',')[0].strip()
+        return term.replace(' ', '-') or None
+
+    def ultra_clean(term):
+        term = term.strip()
+        if not term or term.startswith('#'):
+            return None
+        term = ''.join(c for c in unicodedata.normalize('NFD', term) if unicodedata.category(c) != 'Mn')
+        term = re.sub(r'[0-9]', '', term)
+        term = re.sub(r"[^a-zA-Z\-\.'\s]", '', term)
+        term = re.sub(r'\s+', '-', term)
+        term = re.sub(r'-+', '-', term)
+        return term.strip('-').strip('.') or None
+
+    started = time.perf_counter()
+    for clean in (reformat, ultra_clean):
+        for path in paths:
+            with open(path, encoding='utf-8') as f:
+                terms = [term for term in (clean(line) for line in f) if term]
+            with open(path, 'w', encoding='utf-8') as f:
+                for term in sorted(set(terms)):
+                    f.write(term + '\n')
+    return round(time.perf_counter() - started, 3)
+
+
+def synthetic_list(rng, language, count):
+    """Terms (with some repeated), and {rule: terms that rule should change}."""
+    terms, seen = [], set()
+    while len(terms) < count:
+        words = [''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(rng.randint(1, 3))]
+        kind = rng.random()
+        if kind < 0.1:
+            words.append(str(rng.randint(1, 99)))
+        elif kind < 0.2:
+            words[0] = words[0][:-1] + ('é' if language == 'fr-FR' else 'ñ')
+        term = ' '.join(words)
+        if term in seen:
+            continue
+        seen.add(term)
+        terms.append(term + ', 5' if rng.random() < 0.05 else term)
+    terms += rng.sample(terms, count // 20)
+    bare = [term[:-3] if term.endswith(', 5') else term for term in terms]
+    injected = {
+        'boost-weight': sum(term.endswith(', 5') for term in terms),
+        'spell-digits': sum(bool(re.search(r'\d', term)) for term in bare),
+        'fold-accents': 0 if language == 'fr-FR' else sum(not term.isascii() for term in bare),
+        'spaces-to-hyphens': sum(' ' in term for term in bare),
+    }
+    return terms, injected
+
+
+def run_outputs(root, output_dir, workers):
+    sources = [(path, language) for path, language in normalizer.SOURCES]
+    sources += [(path.relative_to(root).as_posix(), language)
+                for language in ('en-US', 'fr-FR') for path in sorted((root / 'synthetic' / language).glob('*.txt'))]
+    report = normalizer.normalize_vocabularies(sources, output_dir=output_dir, workers=workers, root=root)
+    outputs = {path.relative_to(output_dir).as_posix(): path.read_text(encoding='utf-8')
+               for path in sorted(Path(output_dir).rglob('*')) if path.is_file()}
+    return report, outputs, sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--copies', type=int, default=40, help='synthetic lists per language')
+    parser.add_argument('--terms', type=int, default=1500, help='terms per synthetic list')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seed', type=int, default=11)
+    parser.add_argument('--output', help='write JSON report to this file')
+    args = parser.parse_args()
+
+    failures = []
+
+    def check(condition, description):
+        if not condition:
+            failures.append(description)
+
+    rng = random.Random(args.seed)
+    workdir = Path(tempfile.mkdtemp(prefix='vocab-normalize-bench-'))
+    results = {'cpus': os.cpu_count(), 'workers': args.workers}
+    try:
+        root = workdir / 'repo'
+        for directory in ('medical-vocabularies', 'aws-deployment/vocabularies'):
+            shutil.copytree(REPO_ROOT / directory, root / directory)
+        injected = {}
+        for language in ('en-US', 'fr-FR'):
+            (root / 'synthetic' / language).mkdir(parents=True)
+            for copy in range(args.copies):
+                terms, counts = synthetic_list(rng, language, args.terms)
+                (root / 'synthetic' / language / f"list-{language}-{copy}.txt").write_text('\n'.join(terms) + '\n', encoding='utf-8')
+                for rule, count in counts.items():
+                    injected[rule] = injected.get(rule, 0) + count
+        synthetic_paths = sorted((root / 'synthetic').rglob('*.txt'))
+
+        serial, serial_outputs, sources = run_outputs(root, workdir / 'serial', 1)
+        parallel, parallel_outputs, _ = run_outputs(root, workdir / 'parallel', args.workers)
+        results['sources'] = len(sources)
+        results['terms'] = sum(summary['terms'] for summary in serial['files'])
+        results['normalize_serial_seconds'] = serial['seconds']
+        results['normalize_parallel_seconds'] = parallel['seconds']
+        results['impact'] = serial['impact']
+        results['problems'] = serial['problems']
+        check(serial_outputs == parallel_outputs and serial['impact'] == parallel['impact'],
+              'process-pool run differs from the serial run')
+        check(serial['problems'] == 0, f"{serial['problems']} problems in the repository vocabularies")
+
+        # Impact: the real sources' own changes plus exactly what was injected
+        real_only = normalizer.normalize_vocabularies(normalizer.SOURCES, workers=1, write=False, root=root)
+        for rule, count in injected.items():
+            actual = serial['impact']['transcribe'].get(rule, 0) - real_only['impact']['transcribe'].get(rule, 0)
+            check(actual == count, f"transcribe {rule}: {actual} terms changed, {count} injected")
+
+        # The old chain on the synthetic lists (transcribe targets all three at once; the chain only one)
+        legacy_copy = workdir / 'legacy'
+        shutil.copytree(root / 'synthetic', legacy_copy)
+        results['legacy_chain_seconds'] = legacy_chain(sorted(legacy_copy.rglob('*.txt')))
+        transcribe_only = normalizer.normalize_vocabularies(
+            [(path.relative_to(root).as_posix(), path.parent.name) for path in synthetic_paths],
+            targets=('transcribe',), output_dir=workdir / 'transcribe-only', workers=1, root=root)
+        results['normalize_transcribe_only_seconds'] = transcribe_only['seconds']
+
+        probes = {'type 2 diabetes': 'en-US', 'fièvre jaune': 'fr-FR', 'café au lait': 'en-US', 'Hépatite, 5': 'fr-FR'}
+        probe_file = root / 'probes.txt'
+        legacy_file = workdir / 'probes-legacy.txt'
+        rules = normalizer.COMPILED_RULES['transcribe']
+        normalized = {term: normalizer.apply_rules(rules, term, language) for term, language in probes.items()}
+        probe_file.write_text('\n'.join(probes) + '\n', encoding='utf-8')
+        shutil.copy(probe_file, legacy_file)
+        legacy_chain([legacy_file])
+        results['probes'] = {'normalizer': normalized, 'legacy_chain': legacy_file.read_text(encoding='utf-8').split()}
+        check(normalized['type 2 diabetes'] == 'type-two-diabetes', f"digits: {normalized['type 2 diabetes']}")
+        check(normalized['fièvre jaune'] == 'fièvre-jaune', f"French accents: {normalized['fièvre jaune']}")
+        check(normalized['café au lait'] == 'cafe-au-lait', f"English accents: {normalized['café au lait']}")
+        check(normalized['Hépatite, 5'] == 'Hépatite', f"boost weight: {normalized['Hépatite, 5']}")
+
+        # In place on the real lists: already clean, so nothing is rewritten
+        in_place = normalizer.normalize_vocabularies(normalizer.SOURCES, targets=('transcribe',), in_place=True,
+                                                     workers=1, root=root)
+        check(not in_place['written'], f"in-place rewrite changed {in_place['written']}")
+
+        transcribe = LocalTranscribe()
+        rejected = []
+        for path, content in serial_outputs.items():
+            if path.startswith('transcribe/'):
+                language = 'fr-FR' if re.search(r'-fr[-.]|fr-FR|camfranglais', path) else 'en-US'
+                phrases = content.split()
+                rejected += [phrase for phrase in phrases if transcribe.INVALID_PHRASE.search(phrase)
+                             or (language != 'fr-FR' and transcribe.NON_ASCII.search(phrase))]
+        check(not rejected, f"stand-in rejects normalized phrases: {rejected[:5]}")
+
+        # Limits
+        big = [f"term-{normalizer.spell_number(str(i % 100), 'en')}-{'x' * (i % 7)}-{i:06d}" for i in range(6000)]
+        big = [normalizer.apply_rules(rules, term, 'en-US') for term in big]
+        problems = normalizer.validate_phrases(big)
+        check(any('bytes' in problem for problem in problems), f"oversized list not reported: {problems}")
+        problems = normalizer.validate_phrases(['a' * 300, 'ok'])
+        check(any('characters' in problem for problem in problems), f"over-long phrase not reported: {problems}")
+        problems = normalizer.validate_table([('aloe-vera', 'ˈæloʊ', 'a-lo-e', '')])
+        check(any('both IPA and SoundsLike' in problem for problem in problems), f"IPA with SoundsLike not reported: {problems}")
+        results['oversized_list_problems'] = normalizer.validate_phrases(big)
+
+        vocab_dir = workdir / 'deploy'
+        vocab_dir.mkdir()
+        (vocab_dir / 'medzen-medical-vocab-en.txt').write_text('\n'.join(big) + '\n', encoding='utf-8')
+        deployer = load_module(REPO_ROOT / 'scripts' / 'deploy-medical-vocabularies.py', 'deploy_medical_vocabularies')
+        client = LocalTranscribe()
+        deployed = deployer.deploy_vocabularies(client, ARN_PREFIX, vocab_dir, log=lambda message: None)
+        english = deployed['vocabularies'][0]
+        check(english['action'] == 'error' and 'bytes' in english.get('error', '') and not client.calls.get('CreateVocabulary'),
+              f"oversized list submitted: {english}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {'benchmark': 'vocabulary_normalize', **results, 'injected': injected, 'failures': failures}
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
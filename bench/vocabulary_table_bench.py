@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Vocabulary tables: rule-based pronunciations, DisplayAs, and deployment by VocabularyFileUri
+
+Builds the table target of scripts/vocabulary_normalizer.py for every vocabulary source
+(IPA from scripts/vocabulary_g2p.py for French, SoundsLike syllables for the African
+languages) and deploys the medical-vocabularies/ lists as tables with
+scripts/deploy-medical-vocabularies.py against bench/stand_ins.py's LocalTranscribe
+and LocalS3.
+
+Checks:
+    - known words get the expected IPA or SoundsLike; English words in African lists get none,
+      nor do French terms with an English word (type-deux-diabetes)
+    - French rows with a spelled-out word have IPA from the fr-FR phoneme set, rows
+      Transcribe reads from their plain spelling have none, no row has both IPA and
+      SoundsLike, and curated pronunciations in the sources are kept
+    - every table is at least 5% under the byte limit, and a table closer than that
+      is accepted with a warning
+    - digits and accents survive in DisplayAs while the Phrase is spelled for Transcribe
+    - tables deploy by VocabularyFileUri and reach READY; a rerun uploads and submits
+      nothing; switching from phrase lists to tables updates every vocabulary
+    - an oversized table is reported and neither uploaded nor submitted
+
+Usage:
+    python3 bench/vocabulary_table_bench.py [--output report.json]
+
+Exits non-zero if any check fails.
+"""
+
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / 'scripts'))
+
+import vocabulary_g2p as g2p  # noqa: E402
+import vocabulary_normalizer as normalizer  # noqa: E402
+from pipeline_bench import load_module  # noqa: E402
+from stand_ins import LocalS3, LocalTranscribe  # noqa: E402
+
+ARN_PREFIX = 'arn:aws:transcribe:eu-central-1:000000000000:vocabulary/'
+BUCKET = 'medzen-medical-data'
+TABLES = f"s3://{BUCKET}/vocabularies/"
+
+EXPECTED = {
+    ('ipa-fr', 'fièvre-jaune'): ('f j ɛ v ʁ ʒ o n', ''),
+    ('ipa-fr', 'chirurgie'): ('ʃ i ʁ y ʁ ʒ i', ''),
+    ('ipa-fr', 'douleur'): ('d u l œ ʁ', ''),
+    ('ipa-fr', 'médicament'): ('m e d i k a m ɑ̃', ''),
+    ('ipa-fr', 'infirmière'): ('ɛ̃ f i ʁ m j ɛ ʁ', ''),
+    ('ipa-fr', 'soigner'): ('s w a ɲ e', ''),
+    ('ipa-fr', "l'hépatite-B"): ('l e p a t i t b e', ''),
+    ('ipa-fr', 'ADN'): ('a d e ɛ n', ''),
+    ('syllables', 'maumivu'): ('', 'ma-u-mi-vu'),
+    ('syllables', 'nyama'): ('', 'nya-ma'),
+    ('syllables', 'mtoto'): ('', 'm-to-to'),
+    ('syllables', 'raa-na-jini'): ('', 'raa-na-ji-ni'),
+    ('respell-en', 'wahala'): ('', 'wah-hah-lah'),
+    ('respell-en', 'juju'): ('', 'joo-joo'),
+    ('syllables', 'dermatology'): ('', ''),
+    ('respell-en', 'head-dey-pain-me'): ('', ''),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--output', help='write JSON report to this file')
+    args = parser.parse_args()
+
+    failures = []
+
+    def check(condition, description):
+        if not condition:
+            failures.append(description)
+
+    results = {}
+    for (scheme, phrase), expected in EXPECTED.items():
+        actual = g2p.pronounce(phrase, scheme)
+        check(actual == expected, f"{scheme} {phrase}: {actual}, expected {expected}")
+    english = g2p.pronounce('type-deux-diabetes', 'ipa-fr', normalizer.foreign_words('ipa-fr'))
+    check(english == ('', ''), f"French IPA for an English word: {english}")
+
+    started = time.perf_counter()
+    coverage = {}
+    for path, language in normalizer.SOURCES:
+        scheme = normalizer.PRONUNCIATIONS.get(path)
+        outcome = normalizer.normalize_file(REPO_ROOT / path, language, ('table',), scheme)['targets']['table']
+        rows = outcome['entries']
+        source_rows = {phrase: (ipa, sounds_like) for phrase, ipa, sounds_like, _ in normalizer.read_source(REPO_ROOT / path)}
+        coverage[path] = {
+            'scheme': scheme,
+            'rows': len(rows),
+            'ipa': sum(bool(row[1]) for row in rows),
+            'sounds_like': sum(bool(row[2]) for row in rows),
+            'display_as': sum(bool(row[3]) for row in rows),
+            'bytes': len(normalizer.render_table(rows).encode('utf-8')),
+        }
+        warnings = []
+        problems = normalizer.validate_table(rows, language=language, warnings=warnings)
+        check(not problems, f"{path}: {problems}")
+        check(not warnings, f"{path}: {warnings}")
+        check(not any(row[1] and row[2] for row in rows), f"{path}: row with both IPA and SoundsLike")
+        curated = {phrase: value for phrase, value in source_rows.items() if any(value)}
+        if scheme == 'ipa-fr':
+            foreign = normalizer.foreign_words(scheme)
+            generated = [row for row in rows if row[0].replace('-', ' ') not in curated and row[0] not in curated]
+            bare = [row[0] for row in generated if g2p.spelled_out(row[0]) and not row[1]
+                    and not any(word.lower() in foreign for word in g2p.words(row[0]))]
+            check(not bare, f"{path}: spelled-out French rows without IPA: {bare[:5]}")
+            plain = [row[0] for row in generated if row[1] and not g2p.spelled_out(row[0])]
+            check(not plain, f"{path}: IPA on rows Transcribe reads from the spelling: {plain[:5]}")
+            misread = [row[0] for row in generated if row[1] and any(word.lower() in foreign for word in g2p.words(row[0]))]
+            check(not misread, f"{path}: French IPA on English words: {misread[:5]}")
+        for phrase, (ipa, sounds_like) in curated.items():
+            row = next((row for row in rows if row[0] == phrase.replace(' ', '-')), None)
+            check(row is not None and row[1] == ipa and row[2] == sounds_like.replace(' ', '-'),
+                  f"{path}: curated pronunciation of {phrase} not kept: {row}")
+    results['table_build_seconds'] = round(time.perf_counter() - started, 3)
+    results['coverage'] = coverage
+
+    limit = normalizer.TRANSCRIBE_LIMITS['bytes']
+    near = [('terme-medical', '', '', '')] * (int(limit * 0.975) // len('terme-medical\t\t\t\n'))
+    warnings = []
+    problems = normalizer.validate_table(near, warnings=warnings)
+    results['near_limit'] = {'bytes': len(normalizer.render_table(near).encode('utf-8')), 'warnings': warnings}
+    check(not problems and len(warnings) == 1, f"table near the byte limit: problems {problems}, warnings {warnings}")
+
+    workdir = Path(tempfile.mkdtemp(prefix='vocab-table-bench-'))
+    try:
+        # Source spelling survives in DisplayAs
+        probe = workdir / 'probe-fr.txt'
+        probe.write_text('type 2 diabetes\nVIH viral load\nfièvre jaune\nHépatite B, 5\n', encoding='utf-8')
+        rows = normalizer.normalize_file(probe, 'fr-FR', ('table',), 'ipa-fr')['targets']['table']['entries']
+        by_phrase = {row[0]: row for row in rows}
+        results['display_probe'] = rows
+        check(by_phrase.get('type-deux-diabetes', ('',) * 4)[3] == 'type 2 diabetes', f"digits lost from DisplayAs: {rows}")
+        check(by_phrase.get('VIH-viral-load') == ('VIH-viral-load', '', '', 'VIH viral load')
+              and not by_phrase.get('type-deux-diabetes', ('', 'missing'))[1],
+              f"English words in a French table given IPA: {rows}")
+        check(by_phrase.get('Hépatite-B', ('',) * 4)[1] == 'e p a t i t b e', f"spelled-out letter without IPA: {rows}")
+        check(by_phrase.get('fièvre-jaune', ('',) * 4)[3] == 'fièvre jaune', f"accents lost: {rows}")
+        check(by_phrase.get('Hépatite-B', ('',) * 4)[3] == 'Hépatite B', f"boost weight kept in DisplayAs: {rows}")
+
+        vocab_dir = workdir / 'medical-vocabularies'
+        shutil.copytree(REPO_ROOT / 'medical-vocabularies', vocab_dir)
+        deployer = load_module(REPO_ROOT / 'scripts' / 'deploy-medical-vocabularies.py', 'deploy_medical_vocabularies')
+        count = len(deployer.VOCABULARIES)
+        s3 = LocalS3(BUCKET)
+        transcribe = LocalTranscribe(s3=s3, ready_after_s=0.2)
+
+        def deploy(**kwargs):
+            return deployer.deploy_vocabularies(transcribe, ARN_PREFIX, vocab_dir, initial_delay=0.1, max_delay=0.5,
+                                                max_wait=60, log=lambda message: None, s3=s3, **kwargs)
+
+        lists = deploy()
+        check(all(v.get('state') == 'READY' for v in lists['vocabularies']), 'phrase lists did not deploy')
+
+        transcribe.calls.clear()
+        tables = deploy(tables=TABLES)
+        results['tables'] = {
+            'seconds': tables['seconds'],
+            'actions': sorted({v['action'] for v in tables['vocabularies']}),
+            'states': sorted({v.get('state') for v in tables['vocabularies']}),
+            'uploads': s3.calls['put'],
+        }
+        check(all(v['action'] == 'update' and v.get('state') == 'READY' for v in tables['vocabularies']),
+              f"switch to tables: {[(v['name'], v['action'], v.get('state'), v.get('error')) for v in tables['vocabularies']]}")
+        check(s3.calls['put'] == count, f"{s3.calls['put']} uploads for {count} tables")
+        french = transcribe.vocabularies['medzen-medical-vocab-fr']
+        check(french['Table'] and all(row[1] for row in french['Table'] if g2p.spelled_out(row[0])),
+              'French table reached Transcribe without IPA for its acronyms')
+        swahili = transcribe.vocabularies['medzen-medical-vocab-sw']
+        check(any(row[2] for row in swahili['Table']), 'Swahili table reached Transcribe without SoundsLike')
+
+        uploads = s3.calls['put']
+        transcribe.calls.clear()
+        rerun = deploy(tables=TABLES)
+        check(s3.calls['put'] == uploads and not transcribe.calls.get('UpdateVocabulary'),
+              f"unchanged tables re-uploaded or resubmitted: {transcribe.calls}")
+        check(all(v['action'] == 'unchanged' for v in rerun['vocabularies']), 'unchanged tables not recognised')
+
+        english = vocab_dir / 'medzen-medical-vocab-en.txt'
+        english.write_text(english.read_text(encoding='utf-8') + ''.join(
+            f"term-{normalizer.spell_number(str(i % 100), 'en')}-{i:06d}\n" for i in range(3000)), encoding='utf-8')
+        transcribe.calls.clear()
+        oversized = deploy(tables=TABLES)
+        entry = next(v for v in oversized['vocabularies'] if v['name'] == 'medzen-medical-vocab-en')
+        results['oversized'] = entry.get('error')
+        check(entry['action'] == 'error' and 'bytes' in (entry.get('error') or ''), f"oversized table not reported: {entry}")
+        check(s3.calls['put'] == uploads and not transcribe.calls.get('UpdateVocabulary'), 'oversized table uploaded or submitted')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {'benchmark': 'vocabulary_table', **results, 'failures': failures}
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
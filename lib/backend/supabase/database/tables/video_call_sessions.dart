@@ -191,10 +191,21 @@ class VideoCallSessionsRow extends SupabaseDataRow {
   set detectedLanguages(dynamic? value) =>
       setField<dynamic>('detected_languages', value);
 
+  // Legacy: no longer written by the transcription pipeline; segments are in the S3
+  // segment store referenced by transcriptManifestUri
   dynamic? get transcriptSegments => getField<dynamic>('transcript_segments');
   set transcriptSegments(dynamic? value) =>
       setField<dynamic>('transcript_segments', value);
 
+  String? get transcriptManifestUri =>
+      getField<String>('transcript_manifest_uri');
+  set transcriptManifestUri(String? value) =>
+      setField<String>('transcript_manifest_uri', value);
+
+  dynamic? get transcriptSummary => getField<dynamic>('transcript_summary');
+  set transcriptSummary(dynamic? value) =>
+      setField<dynamic>('transcript_summary', value);
+
   bool? get ttsEnabled => getField<bool>('tts_enabled');
   set ttsEnabled(bool? value) => setField<bool>('tts_enabled', value);
 
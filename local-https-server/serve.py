@@ -3,17 +3,38 @@
 Local HTTPS Server for MedZen Flutter Web App
 Serves the build/web directory over HTTPS for camera/microphone testing.
 
+Each connection is handled on its own thread with HTTP/1.1 keep-alive, so a phone on
+a slow link does not hold up the others while a page load fetches hundreds of assets.
+Static files are served with:
+    - precompressed .br/.gz siblings when the browser accepts them
+    - ETag/Last-Modified and Cache-Control: no-cache, so reloads revalidate to 304s
+    - single byte ranges (206, 416, If-Range) for media and resumed downloads
+    - sendfile() over plain sockets, mmap'd writes over TLS
+The TLS handshake runs on the connection's thread, not in accept().
+
+When scripts/precompress_web_build.py has written build-manifest.json, files it lists
+(and that have not changed since) get the content hash as ETag, so a rebuild does not
+invalidate unchanged assets, and `path?v=<hash>` is served as immutable.
+
 Usage:
-    python3 serve.py
+    python3 serve.py [--port 8443] [--dir ../build/web] [--single-threaded] [--quiet]
 
 Access from any device on the network:
     https://10.10.11.138:8443
 """
 
+import argparse
+import email.utils
+import functools
 import http.server
-import ssl
+import json
+import mmap
 import os
+import re
+import socketserver
+import ssl
 import sys
+import threading
 
 # Configuration
 PORT = 8443
@@ -21,28 +42,259 @@ WEB_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__)
 CERT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server.crt')
 KEY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server.key')
 LOCAL_SDK_DIR = os.path.dirname(os.path.abspath(__file__))  # For SDK file
+SDK_ROUTE = '/amazon-chime-sdk-medzen.min.js'
+
+# Precompressed siblings, in order of preference
+COMPRESSED_VARIANTS = (('br', '.br'), ('gzip', '.gz'))
+# Revalidate on every load; unchanged files cost a 304
+CACHE_CONTROL = 'no-cache'
+IDLE_TIMEOUT = 30  # seconds a keep-alive connection may sit idle
+TLS_CHUNK = 1024 * 1024
+MANIFEST_NAME = 'build-manifest.json'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+VERSION_RE = re.compile(r'(?:^|&)v=([0-9a-f]+)(?:&|$)')
+
+_manifests = {}  # directory -> (manifest mtime_ns, files)
+_manifests_lock = threading.Lock()
+
+
+def load_manifest(directory):
+    """Files of the directory's build manifest, reloaded when it changes; {} without one."""
+    path = os.path.join(directory, MANIFEST_NAME)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return {}
+    cached = _manifests.get(directory)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with _manifests_lock:
+        try:
+            with open(path, encoding='utf-8') as f:
+                files = json.load(f).get('files', {})
+        except (OSError, ValueError):
+            files = {}
+        _manifests[directory] = (mtime, files)
+    return files
+
 
 class CORSHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     """HTTP handler with CORS headers for local development."""
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, directory=WEB_DIR, **kwargs)
+    timeout = IDLE_TIMEOUT
+    extensions_map = {**http.server.SimpleHTTPRequestHandler.extensions_map, '.wasm': 'application/wasm'}
+
+    def __init__(self, *args, directory=WEB_DIR, keep_alive=True, quiet=False, **kwargs):
+        # Keep-alive would let one idle connection hold a single-threaded server
+        self.protocol_version = 'HTTP/1.1' if keep_alive else 'HTTP/1.0'
+        self.quiet = quiet
+        super().__init__(*args, directory=directory, **kwargs)
 
     def do_GET(self):
         """Handle GET requests, with special handling for SDK files."""
-        # Serve Chime SDK from local-https-server directory
-        if self.path == '/amazon-chime-sdk-medzen.min.js':
-            sdk_path = os.path.join(LOCAL_SDK_DIR, 'amazon-chime-sdk-medzen.min.js')
-            if os.path.exists(sdk_path):
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/javascript')
-                self.end_headers()
-                with open(sdk_path, 'rb') as f:
-                    self.wfile.write(f.read())
+        f = self.send_head()
+        if f:
+            try:
+                self.copyfile(f, self.wfile)
+            finally:
+                f.close()
+            if self.path == SDK_ROUTE and not self.quiet:
                 print(f"📦 Served local Chime SDK")
-                return
-        # Default handler for all other requests
-        super().do_GET()
+
+    def send_head(self):
+        """Send the headers of a static file and return it open; other paths go to the default handler."""
+        self._body = None
+        path = self._static_path()
+        if path is None:
+            return super().send_head()
+
+        entry = self._manifest_entry(path)
+        encoding, served = self._variant(path, entry)
+        try:
+            f = open(served, 'rb')
+        except OSError:
+            return super().send_head()
+        try:
+            stat = os.fstat(f.fileno())
+            size = stat.st_size
+            version = entry['sha256'][:16] if entry else f'{stat.st_mtime_ns:x}-{size:x}'
+            etag = f'"{version}{"-" + encoding if encoding else ""}"'
+            if self._not_modified(etag, stat.st_mtime):
+                self.send_response(304)
+                self._send_cache_headers(etag, stat.st_mtime, path, entry)
+                self.end_headers()
+                f.close()
+                return None
+
+            start, length = 0, size
+            byte_range = self._byte_range(size, etag) if encoding is None else None
+            if byte_range == 'unsatisfiable':
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                f.close()
+                return None
+            if byte_range:
+                start, end = byte_range
+                length = end - start + 1
+                self.send_response(206)
+                self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+            else:
+                self.send_response(200)
+            self.send_header('Content-Type', self.guess_type(path))
+            self.send_header('Content-Length', str(length))
+            if encoding:
+                self.send_header('Content-Encoding', encoding)
+            self._send_cache_headers(etag, stat.st_mtime, path, entry)
+            self.end_headers()
+            self._body = (start, length)
+            return f
+        except Exception:
+            f.close()
+            raise
+
+    def copyfile(self, source, outputfile):
+        """sendfile() the selected bytes of a static file; anything else is copied as usual."""
+        if self._body is None:
+            return super().copyfile(source, outputfile)
+        start, length = self._body
+        if not length:
+            return
+        try:
+            if isinstance(self.connection, ssl.SSLSocket):
+                # No sendfile through TLS: write slices of the mapped file, without copying it into bytes
+                with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    view = memoryview(mapped)
+                    try:
+                        for offset in range(start, start + length, TLS_CHUNK):
+                            outputfile.write(view[offset:min(offset + TLS_CHUNK, start + length)])
+                    finally:
+                        view.release()
+            else:
+                self.connection.sendfile(source, start, length)
+        except (BrokenPipeError, ConnectionResetError):
+            # Browsers drop range and prefetch requests they no longer need
+            self.close_connection = True
+
+    def _static_path(self):
+        """File to serve for this request, or None to leave it to the default handler."""
+        route = self.path.split('?', 1)[0].split('#', 1)[0]
+        if route == SDK_ROUTE:
+            # Serve Chime SDK from local-https-server directory
+            sdk_path = os.path.join(LOCAL_SDK_DIR, 'amazon-chime-sdk-medzen.min.js')
+            if os.path.isfile(sdk_path):
+                return sdk_path
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            if not route.endswith('/'):
+                return None  # the default handler redirects to the trailing slash
+            path = os.path.join(path, 'index.html')
+        return path if os.path.isfile(path) else None
+
+    def _manifest_entry(self, path):
+        """The build manifest's entry for a file, if the file is unchanged since it was written."""
+        files = load_manifest(self.directory)
+        if not files:
+            return None
+        relative = os.path.relpath(path, self.directory).replace(os.sep, '/')
+        entry = files.get(relative)
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if (stat.st_size, stat.st_mtime_ns) != (entry['size'], entry['mtime_ns']):
+            return None
+        return entry
+
+    def _variant(self, path, entry=None):
+        """(Content-Encoding, file) of the best precompressed sibling the client accepts."""
+        if 'Range' in self.headers:
+            return None, path
+        accepted = set()
+        for item in self.headers.get('Accept-Encoding', '').split(','):
+            name, _, params = item.strip().partition(';')
+            if name and params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+                accepted.add(name.lower())
+        if not accepted:
+            return None, path
+        if entry is not None:
+            # The manifest lists the siblings written for this content
+            for encoding, suffix in COMPRESSED_VARIANTS:
+                if encoding in accepted and encoding in entry.get('encodings', {}):
+                    return encoding, path + suffix
+            return None, path
+        mtime = None
+        for encoding, suffix in COMPRESSED_VARIANTS:
+            if encoding not in accepted:
+                continue
+            try:
+                variant_mtime = os.stat(path + suffix).st_mtime_ns
+            except OSError:
+                continue
+            mtime = os.stat(path).st_mtime_ns if mtime is None else mtime
+            # A sibling older than the file is left over from an earlier build
+            if variant_mtime >= mtime:
+                return encoding, path + suffix
+        return None, path
+
+    def _not_modified(self, etag, mtime):
+        if 'If-None-Match' in self.headers:
+            tags = [tag.strip().removeprefix('W/') for tag in self.headers['If-None-Match'].split(',')]
+            return '*' in tags or etag in tags
+        if 'If-Modified-Since' in self.headers:
+            try:
+                since = email.utils.parsedate_to_datetime(self.headers['If-Modified-Since'])
+            except (TypeError, ValueError, IndexError, OverflowError):
+                return False
+            return since is not None and int(mtime) <= since.timestamp()
+        return False
+
+    def _byte_range(self, size, etag):
+        """(start, end) of a single satisfiable range, 'unsatisfiable', or None for the whole file."""
+        match = RANGE_RE.match(self.headers.get('Range', '').strip())
+        if not match or not size:
+            return None  # absent, malformed or multiple ranges: send the whole file
+        if_range = self.headers.get('If-Range')
+        if if_range and if_range.strip() != etag:
+            return None
+        first, last = match.groups()
+        if not first:
+            if not last:
+                return None
+            if int(last) == 0:
+                return 'unsatisfiable'  # zero-length suffix (RFC 9110 14.1.2)
+            return max(0, size - int(last)), size - 1
+        start = int(first)
+        if start >= size:
+            return 'unsatisfiable'
+        end = min(int(last), size - 1) if last else size - 1
+        return (start, end) if start <= end else None
+
+    def _send_cache_headers(self, etag, mtime, path, entry=None):
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', self.date_time_string(int(mtime)))
+        self.send_header('Cache-Control', self._cache_control(entry))
+        self.send_header('Accept-Ranges', 'bytes')
+        if entry is not None:
+            compressed = bool(entry.get('encodings'))
+        else:
+            compressed = any(os.path.exists(path + suffix) for _, suffix in COMPRESSED_VARIANTS)
+        if compressed:
+            self.send_header('Vary', 'Accept-Encoding')
+
+    def _cache_control(self, entry):
+        if entry is None:
+            return CACHE_CONTROL
+        # A URL naming the content hash can be cached forever
+        match = VERSION_RE.search(self.path.partition('?')[2])
+        if match and len(match.group(1)) >= 8 and entry['sha256'].startswith(match.group(1)):
+            return IMMUTABLE
+        return entry.get('cache_control', CACHE_CONTROL)
 
     def end_headers(self):
         # Add CORS headers for local development
@@ -57,44 +309,78 @@ class CORSHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     def do_OPTIONS(self):
         """Handle preflight CORS requests."""
         self.send_response(200)
+        self.send_header('Content-Length', '0')
         self.end_headers()
 
     def log_message(self, format, *args):
         """Custom logging with emoji indicators."""
-        print(f"📡 {self.address_string()} - {format % args}")
+        if not self.quiet:
+            print(f"📡 {self.address_string()} - {format % args}")
+
+
+class DevServer(http.server.HTTPServer):
+    """Listen backlog for a page load's burst of connections."""
+
+    request_queue_size = 128
+
+
+class ThreadingDevServer(socketserver.ThreadingMixIn, DevServer):
+    """One thread per connection."""
+
+    daemon_threads = True
+
+
+def make_server(port=PORT, directory=WEB_DIR, threaded=True, context=None, quiet=False, host='0.0.0.0'):
+    """HTTP server for `directory`; HTTPS when an SSL context is given."""
+    handler = functools.partial(CORSHTTPRequestHandler, directory=directory, keep_alive=threaded, quiet=quiet)
+    server_class = ThreadingDevServer if threaded else DevServer
+    httpd = server_class((host, port), handler)
+    if context is not None:
+        # Handshake lazily on the connection's thread, so accept() never waits on a client
+        httpd.socket = context.wrap_socket(httpd.socket, server_side=True, do_handshake_on_connect=False)
+    return httpd
+
 
 def main():
+    parser = argparse.ArgumentParser(description='Local HTTPS server for the MedZen Flutter web build')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--dir', default=WEB_DIR, help='directory to serve (default: build/web)')
+    parser.add_argument('--cert', default=CERT_FILE)
+    parser.add_argument('--key', default=KEY_FILE)
+    parser.add_argument('--single-threaded', action='store_true', help='serve one connection at a time, as before')
+    parser.add_argument('--quiet', action='store_true', help='do not log every request')
+    args = parser.parse_args()
+
     # Verify paths exist
-    if not os.path.exists(WEB_DIR):
-        print(f"❌ Error: Web directory not found: {WEB_DIR}")
+    if not os.path.exists(args.dir):
+        print(f"❌ Error: Web directory not found: {args.dir}")
         print("   Run 'flutter build web --release' first")
         sys.exit(1)
 
-    if not os.path.exists(CERT_FILE) or not os.path.exists(KEY_FILE):
+    if not os.path.exists(args.cert) or not os.path.exists(args.key):
         print(f"❌ Error: SSL certificates not found")
-        print(f"   Expected: {CERT_FILE}")
-        print(f"   Expected: {KEY_FILE}")
+        print(f"   Expected: {args.cert}")
+        print(f"   Expected: {args.key}")
         sys.exit(1)
 
     # Create SSL context
     context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
-    context.load_cert_chain(CERT_FILE, KEY_FILE)
+    context.load_cert_chain(args.cert, args.key)
 
     # Create and configure server
-    server_address = ('0.0.0.0', PORT)
-    httpd = http.server.HTTPServer(server_address, CORSHTTPRequestHandler)
-    httpd.socket = context.wrap_socket(httpd.socket, server_side=True)
+    httpd = make_server(args.port, args.dir, threaded=not args.single_threaded, context=context, quiet=args.quiet)
 
     # Print startup info
     print("=" * 60)
     print("🏥 MedZen Local HTTPS Server")
     print("=" * 60)
-    print(f"📁 Serving: {WEB_DIR}")
-    print(f"🔒 SSL Certificate: {CERT_FILE}")
+    print(f"📁 Serving: {args.dir}")
+    print(f"🔒 SSL Certificate: {args.cert}")
+    print(f"🧵 Mode: {'single-threaded' if args.single_threaded else 'threaded, keep-alive'}")
     print()
     print("🌐 Access URLs:")
-    print(f"   Local:   https://localhost:{PORT}")
-    print(f"   Network: https://10.10.11.138:{PORT}")
+    print(f"   Local:   https://localhost:{args.port}")
+    print(f"   Network: https://10.10.11.138:{args.port}")
     print()
     print("⚠️  Browser will show security warning (self-signed cert)")
     print("   Click 'Advanced' → 'Proceed' to continue")
@@ -106,7 +392,7 @@ def main():
         httpd.serve_forever()
     except KeyboardInterrupt:
         print("\n🛑 Server stopped")
-        httpd.shutdown()
+        httpd.server_close()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,163 @@
+"""
+Fixed-memory latency histograms for the PowerSync MCP server
+
+LatencyHistogram buckets values HDR-style: each power of two is split into
+2**(SUB_BUCKET_BITS - 1) linear sub-buckets, so any recorded value is known to within
+about 1.6% and p50/p95/p99 cost one pass over a fixed array, however many samples
+were recorded.
+
+WindowedHistogram keeps a ring of histograms, one per time slot. LatencyTracker holds
+one-minute slots for the last hour and one-hour slots for the last 30 days, which
+covers the 1h/24h/7d/30d time ranges of the MCP tools. Slots are allocated on first
+use, so memory is bounded by the ring sizes, not by the number of samples.
+"""
+
+import time
+from array import array
+from typing import Optional
+
+SUB_BUCKET_BITS = 6
+MAX_VALUE_US = 60_000_000  # values above one minute are clamped
+
+TIME_RANGES = {"1h": 3600, "24h": 86400, "7d": 7 * 86400, "30d": 30 * 86400}
+
+
+class LatencyHistogram:
+    """Log-linear histogram of latencies in milliseconds (microsecond resolution)."""
+
+    _half = 1 << (SUB_BUCKET_BITS - 1)
+    _size = (max(0, MAX_VALUE_US.bit_length() - SUB_BUCKET_BITS) + 2) * _half
+
+    def __init__(self):
+        self.counts = array("I", bytes(4 * self._size))
+        self.total = 0
+        self.max_ms = 0.0
+
+    @classmethod
+    def _index(cls, value_us: int) -> int:
+        exponent = max(0, value_us.bit_length() - SUB_BUCKET_BITS)
+        return exponent * cls._half + (value_us >> exponent)
+
+    @classmethod
+    def _value_ms(cls, index: int) -> float:
+        """Midpoint of a bucket, in milliseconds."""
+        exponent = max(0, index // cls._half - 1)
+        low = (index - exponent * cls._half) << exponent
+        return (low + ((1 << exponent) - 1) / 2) / 1000
+
+    def record(self, value_ms: float, count: int = 1) -> None:
+        value_us = min(max(int(value_ms * 1000), 0), MAX_VALUE_US)
+        self.counts[self._index(value_us)] += count
+        self.total += count
+        self.max_ms = max(self.max_ms, value_us / 1000)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.total += other.total
+        self.max_ms = max(self.max_ms, other.max_ms)
+
+    def percentiles(self, *quantiles: float) -> list[Optional[float]]:
+        """Values at the given quantiles (0-1), None if nothing was recorded."""
+        if not self.total:
+            return [None] * len(quantiles)
+        targets = sorted((max(1, round(q * self.total)), position) for position, q in enumerate(quantiles))
+        values: list[Optional[float]] = [None] * len(quantiles)
+        seen = 0
+        pending = iter(targets)
+        target, position = next(pending)
+        for index, count in enumerate(self.counts):
+            if not count:
+                continue
+            seen += count
+            while seen >= target:
+                values[position] = min(self._value_ms(index), self.max_ms)
+                try:
+                    target, position = next(pending)
+                except StopIteration:
+                    return values
+        return values
+
+
+class WindowedHistogram:
+    """Ring of per-slot histograms and error counts covering slot_seconds * slots."""
+
+    def __init__(self, slot_seconds: int, slots: int):
+        self.slot_seconds = slot_seconds
+        self.slots: list[Optional[tuple[int, LatencyHistogram, list[int]]]] = [None] * slots
+
+    def _slot(self, now: float) -> tuple[int, LatencyHistogram, list[int]]:
+        number = int(now // self.slot_seconds)
+        position = number % len(self.slots)
+        slot = self.slots[position]
+        if slot is None or slot[0] != number:
+            slot = (number, LatencyHistogram(), [0])
+            self.slots[position] = slot
+        return slot
+
+    def record(self, value_ms: Optional[float], now: float) -> None:
+        """Record a latency, or an error when value_ms is None."""
+        _, histogram, errors = self._slot(now)
+        if value_ms is None:
+            errors[0] += 1
+        else:
+            histogram.record(value_ms)
+
+    def window(self, seconds: float, now: float, parts: int = 1) -> list[tuple[LatencyHistogram, int]]:
+        """The last `seconds` split into `parts` merged (histogram, errors), oldest first."""
+        current = int(now // self.slot_seconds)
+        span = max(1, min(len(self.slots), int(round(seconds / self.slot_seconds))))
+        merged = [(LatencyHistogram(), [0]) for _ in range(parts)]
+        for slot in self.slots:
+            if slot is None or not current - span < slot[0] <= current:
+                continue
+            part = min(parts - 1, (slot[0] - (current - span + 1)) * parts // span)
+            merged[part][0].merge(slot[1])
+            merged[part][1][0] += slot[2][0]
+        return [(histogram, errors[0]) for histogram, errors in merged]
+
+
+class LatencyTracker:
+    """Latency of one probe: one-minute slots for the last hour, one-hour slots for 30 days."""
+
+    def __init__(self):
+        self.minutes = WindowedHistogram(60, 60)
+        self.hours = WindowedHistogram(3600, 30 * 24)
+        self.first_at: Optional[float] = None
+        self.last_at: Optional[float] = None
+
+    def record(self, value_ms: Optional[float], now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        self.minutes.record(value_ms, now)
+        self.hours.record(value_ms, now)
+        self.first_at = self.first_at or now
+        self.last_at = now
+
+    def summary(self, time_range: str, now: Optional[float] = None, trend_parts: int = 6) -> dict:
+        """
+        Percentiles over a time range and a trend of p95 per part of it.
+
+        Returns:
+            Dict with samples, errors, p50, p95, p99, max and trend (p95 per part, oldest
+            first, None where a part has no samples)
+        """
+        now = time.time() if now is None else now
+        seconds = TIME_RANGES[time_range]
+        rings = self.minutes if seconds <= 3600 else self.hours
+        parts = rings.window(seconds, now, trend_parts)
+        total = LatencyHistogram()
+        errors = 0
+        for histogram, part_errors in parts:
+            total.merge(histogram)
+            errors += part_errors
+        p50, p95, p99 = total.percentiles(0.5, 0.95, 0.99)
+        return {
+            "samples": total.total,
+            "errors": errors,
+            "p50": p50,
+            "p95": p95,
+            "p99": p99,
+            "max": total.max_ms if total.total else None,
+            "trend": [histogram.percentiles(0.95)[0] for histogram, _ in parts],
+        }
@@ -4,24 +4,211 @@ PowerSync MCP Server
 
 This MCP server provides tools to interact with PowerSync instances,
 allowing Claude to monitor sync status, manage connections, and query metrics.
+
+Each tool probes the PowerSync service endpoints it needs concurrently with
+asyncio.gather: the health probes (/probes/liveness, /probes/startup), the admin
+API (diagnostics, current sync rules) and the Prometheus metrics endpoint.
+Responses are cached per instance for POWERSYNC_CACHE_TTL seconds, and concurrent
+tool calls needing the same endpoint share one request, so an agent asking several
+questions in a row does not hammer the instance. Long lists (connections, buckets,
+queries) are returned a page at a time with limit/offset.
+
+A background sampler probes POWERSYNC_URL, and every instance a tool was asked about,
+every POWERSYNC_SAMPLE_INTERVAL seconds. It records the probe latencies and the age of
+the last replicated checkpoint in fixed-memory histograms (latency_histogram.py), which
+get_sync_latency reports as p50/p95/p99 with a trend over the tool time ranges.
+
+Requests go through one pooled httpx client per instance: HTTP/2 where the instance
+negotiates it (h2 installed), bounded keep-alive connections, the instance's own API
+token, and connection timing on every probe result. main() closes the pool on exit.
+
+check_fleet_health probes a list of instances, or a region map, concurrently: at most
+POWERSYNC_FLEET_CONCURRENCY at a time, each cut off after POWERSYNC_FLEET_TIMEOUT seconds,
+so the call takes about as long as the slowest instance rather than the sum of them.
+
+analyze_sync_rules runs sync_rules_analyzer.py (also a CLI) on the deployed or a local
+sync rules file against a SQLite or Postgres snapshot of the source database.
 """
 
 import os
+import re
+import json
+import time
 import asyncio
+import contextlib
+import logging
+from collections import OrderedDict, deque
+from datetime import datetime
 import httpx
-from typing import Optional, Any
+from typing import Any, AsyncIterator, Optional
 from mcp.server import Server, NotificationOptions
 from mcp.server.models import InitializationOptions
 import mcp.server.stdio
 import mcp.types as types
 
+from latency_histogram import LatencyTracker, TIME_RANGES
+from sync_rules_analyzer import DEFAULT_SAMPLE_USERS, analyze, format_report, open_snapshot, parse_bucket_definitions
+
+logger = logging.getLogger(__name__)
 
 # PowerSync configuration from environment
 POWERSYNC_URL = os.getenv("POWERSYNC_URL", "")
 POWERSYNC_API_KEY = os.getenv("POWERSYNC_API_KEY", "")
-
-# HTTP client
-client = httpx.AsyncClient(timeout=30.0)
+# Prometheus endpoint of the POWERSYNC_URL instance (self-hosted: PS_PROMETHEUS_PORT);
+# defaults to <instance_url>/metrics
+POWERSYNC_METRICS_URL = os.getenv("POWERSYNC_METRICS_URL", "")
+# Seconds a probe response is reused for
+CACHE_TTL = float(os.getenv("POWERSYNC_CACHE_TTL", "15"))
+PROBE_TIMEOUT = float(os.getenv("POWERSYNC_PROBE_TIMEOUT", "10"))
+DEFAULT_PAGE_SIZE = 100
+# Seconds between latency samples; 0 disables the background sampler
+SAMPLE_INTERVAL = float(os.getenv("POWERSYNC_SAMPLE_INTERVAL", "30"))
+MAX_SAMPLED_INSTANCES = int(os.getenv("POWERSYNC_SAMPLE_MAX_INSTANCES", "8"))
+# Optional client JWT (as issued by the powersync-token function) to sample the write
+# checkpoint endpoint clients call before each sync
+POWERSYNC_CLIENT_TOKEN = os.getenv("POWERSYNC_CLIENT_TOKEN", "")
+# Per-instance admin API tokens as a JSON object {instance_url: token}; other instances
+# use POWERSYNC_API_KEY
+POWERSYNC_API_KEYS = json.loads(os.getenv("POWERSYNC_API_KEYS", "") or "{}")
+# Connection pool per instance
+MAX_CONNECTIONS = int(os.getenv("POWERSYNC_MAX_CONNECTIONS", "10"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("POWERSYNC_MAX_KEEPALIVE", "5"))
+KEEPALIVE_EXPIRY = float(os.getenv("POWERSYNC_KEEPALIVE_EXPIRY", "60"))
+MAX_CLIENTS = int(os.getenv("POWERSYNC_MAX_CLIENTS", "16"))
+# Source database snapshot for analyze_sync_rules: SQLite path or Postgres DSN
+POWERSYNC_ANALYZER_DB = os.getenv("POWERSYNC_ANALYZER_DB", "")
+
+# Instances for check_fleet_health: a JSON list of URLs, or a map of region to URL(s)
+POWERSYNC_INSTANCES = json.loads(os.getenv("POWERSYNC_INSTANCES", "") or "[]")
+FLEET_CONCURRENCY = int(os.getenv("POWERSYNC_FLEET_CONCURRENCY", "8"))
+FLEET_TIMEOUT = float(os.getenv("POWERSYNC_FLEET_TIMEOUT", "5"))
+
+# Probe name -> (method, path, JSON body)
+PROBES = {
+    "liveness": ("GET", "/probes/liveness", None),
+    "startup": ("GET", "/probes/startup", None),
+    "diagnostics": ("POST", "/api/admin/v1/diagnostics", {"sync_rules_content": False}),
+    "sync_rules": ("POST", "/api/sync-rules/v1/current", {}),
+    "metrics": ("GET", "/metrics", None),
+    "write_checkpoint": ("GET", "/write-checkpoint2.json", None),
+}
+# Series recorded by the sampler: the probes, and the age of the last replicated checkpoint
+LATENCY_SERIES = {
+    "liveness": "Liveness probe",
+    "diagnostics": "Admin diagnostics",
+    "write_checkpoint": "Write checkpoint",
+    "checkpoint_age": "Checkpoint age",
+}
+
+# Report label -> Prometheus metric (summed over label sets)
+SYNC_METRICS = {
+    "Client connections": "powersync_concurrent_connections",
+    "Data synced (bytes)": "powersync_data_synced_bytes_total",
+    "Operations synced": "powersync_operations_synced_total",
+    "Data replicated (bytes)": "powersync_data_replicated_bytes_total",
+    "Rows replicated": "powersync_rows_replicated_total",
+    "Transactions replicated": "powersync_transactions_replicated_total",
+    "Chunks replicated": "powersync_chunks_replicated_total",
+    "Replication storage (bytes)": "powersync_replication_storage_size_bytes",
+    "Operation storage (bytes)": "powersync_operation_storage_size_bytes",
+    "Parameter storage (bytes)": "powersync_parameter_storage_size_bytes",
+}
+GAUGES = {
+    "powersync_concurrent_connections",
+    "powersync_replication_storage_size_bytes",
+    "powersync_operation_storage_size_bytes",
+    "powersync_parameter_storage_size_bytes",
+}
+
+try:
+    import h2  # noqa: F401  httpx negotiates HTTP/2 (over TLS) only when h2 is installed
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+
+class ClientPool:
+    """
+    One httpx.AsyncClient per instance URL, each with its own bounded connection pool.
+
+    Clients are created on first use; beyond max_clients the least recently used idle one
+    is closed. A client with requests in flight (taken with lease()) is never closed under
+    them: the pool runs over its size until those requests finish. Clients share one SSL
+    context, so a new client does not reload the CA bundle. Per-instance request counts,
+    new connections and timings are kept in `stats`.
+    """
+
+    def __init__(self, limits: httpx.Limits, http2: bool = HTTP2, max_clients: int = MAX_CLIENTS):
+        self.limits = limits
+        self.http2 = http2
+        self.max_clients = max_clients
+        self._clients: OrderedDict[str, httpx.AsyncClient] = OrderedDict()
+        self._in_flight: dict[str, int] = {}
+        self._ssl_context = None
+        self.stats: dict[str, dict[str, float]] = {}
+
+    def _client(self, instance_url: str) -> httpx.AsyncClient:
+        client = self._clients.pop(instance_url, None)
+        if client is None or client.is_closed:
+            if self._ssl_context is None:
+                self._ssl_context = httpx.create_ssl_context()
+            client = httpx.AsyncClient(
+                http2=self.http2, limits=self.limits, timeout=PROBE_TIMEOUT, verify=self._ssl_context
+            )
+        self._clients[instance_url] = client
+        return client
+
+    def _evict(self) -> None:
+        """Close least recently used idle clients until the pool is within max_clients."""
+        for instance_url in list(self._clients):
+            if len(self._clients) <= self.max_clients:
+                break
+            if not self._in_flight.get(instance_url):
+                asyncio.ensure_future(self._clients.pop(instance_url).aclose())
+
+    @contextlib.asynccontextmanager
+    async def lease(self, instance_url: str) -> AsyncIterator[httpx.AsyncClient]:
+        """The instance's client, kept open (not evicted) until the block exits."""
+        client = self._client(instance_url)
+        self._in_flight[instance_url] = self._in_flight.get(instance_url, 0) + 1
+        self._evict()
+        try:
+            yield client
+        finally:
+            self._in_flight[instance_url] -= 1
+            if not self._in_flight[instance_url]:
+                del self._in_flight[instance_url]
+            self._evict()
+
+    def record(self, instance_url: str, result: dict[str, Any]) -> None:
+        stats = self.stats.setdefault(instance_url, {"requests": 0, "new_connections": 0, "elapsed_ms": 0.0, "connect_ms": 0.0})
+        stats["requests"] += 1
+        stats["new_connections"] += int(result["new_connection"])
+        stats["elapsed_ms"] += result["elapsed_ms"]
+        stats["connect_ms"] += result["connect_ms"] or 0.0
+
+    async def aclose(self) -> None:
+        """Close every client and its connections."""
+        clients, self._clients = list(self._clients.values()), OrderedDict()
+        await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
+
+
+# HTTP clients
+pool = ClientPool(httpx.Limits(
+    max_connections=MAX_CONNECTIONS,
+    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry=KEEPALIVE_EXPIRY,
+))
+
+# (instance_url, probe name) -> (monotonic start time, task resolving to the probe result)
+_probe_cache: dict[tuple[str, str], tuple[float, asyncio.Task]] = {}
+# instance_url -> (wall time, metric values) snapshots, for rates over a time range
+_metric_history: dict[str, deque] = {}
+# (instance_url, series) -> latency histograms
+_latency: dict[tuple[str, str], LatencyTracker] = {}
+# Instances the sampler probes, in the order they were first seen
+_sampled_instances: dict[str, None] = {}
+_sampler: Optional[asyncio.Task] = None
 
 # MCP Server
 server = Server("powersync-mcp-server")
@@ -58,6 +245,11 @@ async def handle_list_tools() -> list[types.Tool]:
                         "type": "integer",
                         "description": "Maximum number of connections to return (default: 100)",
                         "default": 100,
+                    },
+                    "offset": {
+                        "type": "integer",
+                        "description": "Number of connections to skip, for the next page (default: 0)",
+                        "default": 0,
                     }
                 },
             },
@@ -94,6 +286,35 @@ async def handle_list_tools() -> list[types.Tool]:
                 },
             },
         ),
+        types.Tool(
+            name="check_fleet_health",
+            description="Check the health of several PowerSync instances at once: status, latency and replication lag per instance in one table",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "instances": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "PowerSync instance URLs (optional, uses POWERSYNC_INSTANCES env if neither instances nor regions is given)",
+                    },
+                    "regions": {
+                        "type": "object",
+                        "additionalProperties": {
+                            "anyOf": [{"type": "string"}, {"type": "array", "items": {"type": "string"}}],
+                        },
+                        "description": "Map of region to instance URL or URLs, e.g. {\"af-south-1\": \"https://...\"}",
+                    },
+                    "timeout": {
+                        "type": "number",
+                        "description": "Seconds to wait for each instance (default: POWERSYNC_FLEET_TIMEOUT, 5)",
+                    },
+                    "concurrency": {
+                        "type": "integer",
+                        "description": "Maximum number of instances probed at once (default: POWERSYNC_FLEET_CONCURRENCY, 8)",
+                    }
+                },
+            },
+        ),
         types.Tool(
             name="get_bucket_info",
             description="Get information about sync buckets and their configurations",
@@ -107,6 +328,61 @@ async def handle_list_tools() -> list[types.Tool]:
                     "bucket_name": {
                         "type": "string",
                         "description": "Specific bucket name (optional, returns all if not provided)",
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of buckets or queries to return (default: 100)",
+                        "default": 100,
+                    },
+                    "offset": {
+                        "type": "integer",
+                        "description": "Number of buckets or queries to skip, for the next page (default: 0)",
+                        "default": 0,
+                    }
+                },
+            },
+        ),
+        types.Tool(
+            name="get_sync_latency",
+            description="Get sync latency percentiles (p50/p95/p99) and their trend from the background sampler: probe latency and time since the last replicated checkpoint",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "instance_url": {
+                        "type": "string",
+                        "description": "PowerSync instance URL (optional)",
+                    },
+                    "time_range": {
+                        "type": "string",
+                        "description": "Time range for latency (1h, 24h, 7d, 30d)",
+                        "enum": ["1h", "24h", "7d", "30d"],
+                        "default": "1h",
+                    }
+                },
+            },
+        ),
+        types.Tool(
+            name="analyze_sync_rules",
+            description="Estimate buckets per user, rows per bucket and the heaviest sync rules by running the bucket queries against a database snapshot; flags filter columns without an index",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "instance_url": {
+                        "type": "string",
+                        "description": "PowerSync instance whose deployed sync rules to analyze (optional if sync_rules_path is given)",
+                    },
+                    "sync_rules_path": {
+                        "type": "string",
+                        "description": "Local sync rules YAML to analyze instead of the deployed rules",
+                    },
+                    "database": {
+                        "type": "string",
+                        "description": "SQLite snapshot path or postgresql:// DSN (optional, uses POWERSYNC_ANALYZER_DB env if not provided)",
+                    },
+                    "sample_users": {
+                        "type": "integer",
+                        "description": "Number of users to evaluate the rules for (default: 100)",
+                        "default": 100,
                     }
                 },
             },
@@ -124,8 +400,12 @@ async def handle_call_tool(
         arguments = {}
 
     instance_url = arguments.get("instance_url", POWERSYNC_URL)
+    local_rules = name == "analyze_sync_rules" and arguments.get("sync_rules_path")
+    fleet = name == "check_fleet_health" and (
+        arguments.get("instances") or arguments.get("regions") or POWERSYNC_INSTANCES
+    )
 
-    if not instance_url:
+    if not instance_url and not local_rules and not fleet:
         return [
             types.TextContent(
                 type="text",
@@ -133,13 +413,18 @@ async def handle_call_tool(
             )
         ]
 
+    if instance_url and not fleet:
+        track_instance(instance_url)
+
     try:
+        limit = max(1, int(arguments.get("limit", DEFAULT_PAGE_SIZE)))
+        offset = max(0, int(arguments.get("offset", 0)))
+
         if name == "get_sync_status":
             result = await get_sync_status(instance_url)
 
         elif name == "list_active_connections":
-            limit = arguments.get("limit", 100)
-            result = await list_active_connections(instance_url, limit)
+            result = await list_active_connections(instance_url, limit, offset)
 
         elif name == "get_sync_metrics":
             time_range = arguments.get("time_range", "24h")
@@ -148,9 +433,27 @@ async def handle_call_tool(
         elif name == "check_instance_health":
             result = await check_instance_health(instance_url)
 
+        elif name == "check_fleet_health":
+            instances = _fleet_instances(fleet or [instance_url])
+            timeout = float(arguments.get("timeout") or FLEET_TIMEOUT)
+            concurrency = max(1, int(arguments.get("concurrency") or FLEET_CONCURRENCY))
+            result = await check_fleet_health(instances, timeout, concurrency)
+
         elif name == "get_bucket_info":
             bucket_name = arguments.get("bucket_name")
-            result = await get_bucket_info(instance_url, bucket_name)
+            result = await get_bucket_info(instance_url, bucket_name, limit, offset)
+
+        elif name == "get_sync_latency":
+            time_range = arguments.get("time_range", "1h")
+            result = await get_sync_latency(instance_url, time_range)
+
+        elif name == "analyze_sync_rules":
+            result = await analyze_sync_rules(
+                instance_url,
+                arguments.get("sync_rules_path"),
+                arguments.get("database", POWERSYNC_ANALYZER_DB),
+                max(1, int(arguments.get("sample_users", DEFAULT_SAMPLE_USERS))),
+            )
 
         else:
             return [
@@ -171,105 +474,467 @@ async def handle_call_tool(
         ]
 
 
-async def get_sync_status(instance_url: str) -> str:
-    """Get current sync status."""
-    try:
-        # Try to get status from PowerSync API
-        # Note: Actual endpoint may differ based on PowerSync version
-        response = await client.get(
-            f"{instance_url}/api/status",
-            headers={"Authorization": f"Bearer {POWERSYNC_API_KEY}"} if POWERSYNC_API_KEY else {},
-        )
+# Probes
 
-        if response.status_code == 200:
+def _auth_headers(instance_url: str, name: str = "") -> dict[str, str]:
+    if name == "write_checkpoint":
+        token = POWERSYNC_CLIENT_TOKEN
+    else:
+        token = POWERSYNC_API_KEYS.get(instance_url.rstrip("/"), POWERSYNC_API_KEY)
+    return {"Authorization": f"Bearer {token}"} if token else {}
+
+
+def _probe_url(instance_url: str, name: str) -> str:
+    if name == "metrics" and POWERSYNC_METRICS_URL and instance_url == POWERSYNC_URL:
+        return POWERSYNC_METRICS_URL
+    return f"{instance_url.rstrip('/')}{PROBES[name][1]}"
+
+
+async def _fetch(instance_url: str, name: str) -> dict[str, Any]:
+    """One request; transport errors are returned in the result rather than raised."""
+    method, _, body = PROBES[name]
+    started = time.perf_counter()
+    result: dict[str, Any] = {
+        "name": name, "status": None, "data": None, "error": None, "fetched_at": time.time(),
+        "new_connection": False, "connect_ms": None, "http_version": None,
+    }
+    connecting: list[float] = []
+
+    async def trace(event: str, info: dict[str, Any]) -> None:
+        # TCP connect (and TLS handshake) time of a new connection
+        if event == "connection.connect_tcp.started":
+            result["new_connection"] = True
+            connecting.append(time.perf_counter())
+        elif event in ("connection.connect_tcp.complete", "connection.start_tls.complete") and connecting:
+            result["connect_ms"] = round((time.perf_counter() - connecting[0]) * 1000, 2)
+
+    try:
+        async with pool.lease(instance_url) as client:
+            response = await client.request(
+                method,
+                _probe_url(instance_url, name),
+                headers=_auth_headers(instance_url, name),
+                json=body,
+                timeout=PROBE_TIMEOUT,
+                extensions={"trace": trace},
+            )
+        result["status"] = response.status_code
+        result["http_version"] = response.http_version
+        if "json" in response.headers.get("content-type", ""):
             data = response.json()
-            return f"""PowerSync Sync Status:
+            # Admin API responses are wrapped in {"data": ...}
+            if isinstance(data, dict) and isinstance(data.get("data"), dict):
+                data = data["data"]
+            result["data"] = data
+        else:
+            result["data"] = response.text
+    except httpx.ConnectError:
+        result["error"] = "unreachable"
+    except httpx.TimeoutException:
+        result["error"] = f"timed out after {PROBE_TIMEOUT:g}s"
+    except (httpx.HTTPError, ValueError) as e:
+        result["error"] = str(e) or type(e).__name__
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    pool.record(instance_url, result)
+    return result
+
+
+async def probe(instance_url: str, name: str) -> dict[str, Any]:
+    """
+    Cached probe of one endpoint.
+
+    A response is reused for CACHE_TTL seconds; callers arriving while the request is in
+    flight await the same task. Transport errors and 5xx responses are not kept.
+
+    Returns:
+        Dict with name, status (None if no response), data (parsed JSON or text), error,
+        elapsed_ms and fetched_at
+    """
+    key = (instance_url, name)
+    cached = _probe_cache.get(key)
+    if cached and time.monotonic() - cached[0] < CACHE_TTL:
+        task = cached[1]
+    else:
+        task = asyncio.ensure_future(_fetch(instance_url, name))
+        _probe_cache[key] = (time.monotonic(), task)
 
-Connected: {data.get('connected', 'Unknown')}
-Active Connections: {data.get('active_connections', 0)}
-Sync Latency: {data.get('sync_latency_ms', 'N/A')} ms
-Last Sync: {data.get('last_sync_at', 'N/A')}
-Status: {data.get('status', 'Unknown')}
+    result = await asyncio.shield(task)
+    if (result["error"] or (result["status"] or 0) >= 500) and _probe_cache.get(key, (0, None))[1] is task:
+        _probe_cache.pop(key, None)
+    return result
 
-Instance URL: {instance_url}
-"""
-        else:
-            # Fallback: Return basic info
-            return f"""PowerSync Instance Info:
 
-Instance URL: {instance_url}
-API Status: HTTP {response.status_code}
+async def probe_many(instance_url: str, *names: str) -> dict[str, dict[str, Any]]:
+    """Probe several endpoints of one instance concurrently."""
+    results = await asyncio.gather(*(probe(instance_url, name) for name in names))
+    return dict(zip(names, results))
 
-Note: Full status requires PowerSync API access. Configure POWERSYNC_API_KEY environment variable.
-"""
 
-    except httpx.ConnectError:
-        return f"""PowerSync Instance: {instance_url}
+def _remember(instance_url: str, name: str, result: dict[str, Any]) -> None:
+    """Cache a probe result fetched outside probe() (the sampler's fresh requests)."""
+    if result["error"] or (result["status"] or 0) >= 500:
+        return
+    future = asyncio.get_running_loop().create_future()
+    future.set_result(result)
+    _probe_cache[(instance_url, name)] = (time.monotonic(), future)
 
-Status: Unable to connect
-Note: Ensure the instance URL is correct and accessible.
-"""
-    except Exception as e:
-        return f"Error getting sync status: {str(e)}"
 
+def clear_cache() -> None:
+    """Drop all cached probe responses, metric snapshots and latency histograms."""
+    _probe_cache.clear()
+    _metric_history.clear()
+    _latency.clear()
 
-async def list_active_connections(instance_url: str, limit: int) -> str:
-    """List active connections."""
-    return f"""Active Connections:
 
-Instance: {instance_url}
-Limit: {limit}
+def _ok(result: dict[str, Any]) -> bool:
+    return result["status"] is not None and 200 <= result["status"] < 300
 
-Note: This feature requires PowerSync API access with appropriate credentials.
-Configure POWERSYNC_API_KEY to access detailed connection information.
 
-Alternative: Check your PowerSync dashboard at:
-{instance_url.replace('/api', '')}/connections
-"""
+def _json(result: dict[str, Any]) -> dict[str, Any]:
+    return result["data"] if _ok(result) and isinstance(result["data"], dict) else {}
 
 
-async def get_sync_metrics(instance_url: str, time_range: str) -> str:
-    """Get sync metrics."""
-    return f"""PowerSync Metrics ({time_range}):
+def _describe_failure(result: dict[str, Any]) -> str:
+    if result["error"]:
+        return result["error"]
+    if result["status"] in (401, 403):
+        return f"HTTP {result['status']} (check POWERSYNC_API_KEY)"
+    return f"HTTP {result['status']}"
 
-Instance: {instance_url}
 
-Note: Detailed metrics are available in the PowerSync dashboard.
-Visit: {instance_url.replace('/api', '')}/metrics
+def _data_age(results: dict[str, dict[str, Any]]) -> str:
+    oldest = min(result["fetched_at"] for result in results.values())
+    return f"Data age: {time.time() - oldest:.0f}s (responses are cached for {CACHE_TTL:g}s)"
 
-For programmatic access, configure POWERSYNC_API_KEY environment variable.
-"""
 
+_METRIC_LINE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{[^}]*\})?\s+(\S+)")
 
-async def check_instance_health(instance_url: str) -> str:
-    """Check instance health."""
+
+def parse_prometheus(text: str) -> dict[str, float]:
+    """Prometheus text exposition -> {metric name: value summed over label sets}."""
+    values: dict[str, float] = {}
+    for line in text.splitlines():
+        match = _METRIC_LINE.match(line)
+        if not match:
+            continue
+        try:
+            value = float(match.group(2))
+        except ValueError:
+            continue
+        if value == value:  # skip NaN
+            values[match.group(1)] = values.get(match.group(1), 0.0) + value
+    return values
+
+
+def _metric_values(instance_url: str, result: dict[str, Any]) -> dict[str, float]:
+    """Parse a metrics probe and keep a snapshot for rates (once per fetched response)."""
+    if not _ok(result) or not isinstance(result["data"], str):
+        return {}
+    values = parse_prometheus(result["data"])
+    history = _metric_history.setdefault(instance_url, deque(maxlen=2048))
+    if not history or history[-1][0] != result["fetched_at"]:
+        history.append((result["fetched_at"], values))
+    return values
+
+
+def _active_sync_rules(diagnostics: dict[str, Any]) -> dict[str, Any]:
+    return diagnostics.get("active_sync_rules") or {}
+
+
+def _replication_streams(diagnostics: dict[str, Any]) -> list[dict[str, Any]]:
+    return _active_sync_rules(diagnostics).get("connections") or []
+
+
+def _errors(diagnostics: dict[str, Any]) -> list[dict[str, Any]]:
+    """Errors from the source connections, active sync rules and their tables."""
+    errors = []
+    for connection in diagnostics.get("connections") or []:
+        errors.extend(connection.get("errors") or [])
+    rules = _active_sync_rules(diagnostics)
+    errors.extend(rules.get("errors") or [])
+    for stream in _replication_streams(diagnostics):
+        for table in stream.get("tables") or []:
+            errors.extend(table.get("errors") or [])
+    return errors
+
+
+def _max_lag(diagnostics: dict[str, Any]) -> Optional[int]:
+    lags = [stream["replication_lag_bytes"] for stream in _replication_streams(diagnostics)
+            if stream.get("replication_lag_bytes") is not None]
+    return max(lags) if lags else None
+
+
+def _page(items: list, limit: int, offset: int, noun: str) -> tuple[list, str]:
+    """Slice one page of items and a footer saying where the next page starts."""
+    page = items[offset:offset + limit]
+    if not items:
+        return page, f"No {noun}."
+    if not page:
+        return page, f"No {noun} at offset {offset} (total: {len(items)})."
+    footer = f"Showing {noun} {offset + 1}-{offset + len(page)} of {len(items)}."
+    if offset + len(page) < len(items):
+        footer += f" Next page: offset={offset + len(page)}"
+    return page, footer
+
+
+# Latency sampler
+
+def track_instance(instance_url: str) -> None:
+    """Add an instance to the sampler (up to MAX_SAMPLED_INSTANCES) and make sure it runs."""
+    if instance_url not in _sampled_instances and len(_sampled_instances) < MAX_SAMPLED_INSTANCES:
+        _sampled_instances[instance_url] = None
+    start_sampler()
+
+
+def _latency_tracker(instance_url: str, series: str) -> LatencyTracker:
+    key = (instance_url, series)
+    if key not in _latency:
+        _latency[key] = LatencyTracker()
+    return _latency[key]
+
+
+def _timestamp(value: Any) -> Optional[float]:
+    """Epoch seconds of an ISO 8601 timestamp, None if it does not parse."""
     try:
-        response = await client.get(
-            f"{instance_url}/health",
-            headers={"Authorization": f"Bearer {POWERSYNC_API_KEY}"} if POWERSYNC_API_KEY else {},
-            timeout=5.0,
-        )
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+async def sample_instance(instance_url: str, now: Optional[float] = None) -> dict[str, Optional[float]]:
+    """
+    Probe an instance once (bypassing the cache) and record each series.
+
+    Failed probes are recorded as errors. The fresh responses replace the cached ones.
+
+    Returns:
+        {series: latency in ms, None for an error}
+    """
+    names = ["liveness", "diagnostics"] + (["write_checkpoint"] if POWERSYNC_CLIENT_TOKEN else [])
+    results = await asyncio.gather(*(_fetch(instance_url, name) for name in names))
+    now = time.time() if now is None else now
+
+    recorded: dict[str, Optional[float]] = {}
+    for name, result in zip(names, results):
+        _remember(instance_url, name, result)
+        recorded[name] = result["elapsed_ms"] if _ok(result) else None
+
+    diagnostics = _json(results[1])
+    checkpoints = [_timestamp(s["last_checkpoint_ts"]) for s in _replication_streams(diagnostics) if s.get("last_checkpoint_ts")]
+    checkpoints = [ts for ts in checkpoints if ts is not None]
+    if checkpoints:
+        recorded["checkpoint_age"] = max(0.0, now - max(checkpoints)) * 1000
+    elif not diagnostics:
+        recorded["checkpoint_age"] = None
+
+    for series, value in recorded.items():
+        _latency_tracker(instance_url, series).record(value, now)
+    return recorded
+
+
+async def run_sampler() -> None:
+    """Sample every tracked instance each SAMPLE_INTERVAL seconds until cancelled."""
+    while True:
+        started = time.monotonic()
+        try:
+            await asyncio.gather(*(sample_instance(url) for url in list(_sampled_instances)))
+        except Exception as e:
+            logger.error(f"Latency sampling failed: {e}")
+        await asyncio.sleep(max(1.0, SAMPLE_INTERVAL - (time.monotonic() - started)))
+
+
+def start_sampler() -> None:
+    """Start the background sampler if it is enabled and not running."""
+    global _sampler
+    if SAMPLE_INTERVAL <= 0 or not _sampled_instances or (_sampler and not _sampler.done()):
+        return
+    _sampler = asyncio.ensure_future(run_sampler())
+
+
+async def stop_sampler() -> None:
+    global _sampler
+    if _sampler:
+        _sampler.cancel()
+        try:
+            await _sampler
+        except asyncio.CancelledError:
+            pass
+        _sampler = None
+
+
+def _health(results: dict[str, dict[str, Any]]) -> str:
+    """unreachable, error, healthy or degraded, from the liveness, startup and diagnostics probes."""
+    if all(result["error"] == "unreachable" for result in results.values()):
+        return "unreachable"
+    if all(result["status"] is None for result in results.values()):
+        return "error"
+    fatal = [error for error in _errors(_json(results["diagnostics"])) if error.get("level") == "fatal"]
+    return "healthy" if _ok(results["liveness"]) and _ok(results["startup"]) and not fatal else "degraded"
+
+
+def _connection(result: dict[str, Any]) -> str:
+    if result["http_version"] is None:
+        return "none"
+    if result["new_connection"]:
+        return f"new {result['http_version']} (connect {result['connect_ms'] or 0:.1f} ms)"
+    return f"reused {result['http_version']}"
+
+
+def _ms(value: Optional[float]) -> str:
+    if value is None:
+        return "N/A"
+    return f"{value:,.0f}" if value >= 100 else f"{value:.1f}"
+
+
+# Tools
+
+async def get_sync_status(instance_url: str) -> str:
+    """Get current sync status."""
+    results = await probe_many(instance_url, "liveness", "diagnostics", "metrics")
+    liveness, diagnostics_result = results["liveness"], results["diagnostics"]
+
+    if liveness["error"] == "unreachable" and diagnostics_result["error"] == "unreachable":
+        return f"""PowerSync Instance: {instance_url}
+
+Status: Unable to connect
+Note: Ensure the instance URL is correct and accessible.
+"""
 
-        if response.status_code == 200:
-            return f"""PowerSync Instance Health:
+    diagnostics = _json(diagnostics_result)
+    metrics = _metric_values(instance_url, results["metrics"])
+    connections = metrics.get(SYNC_METRICS["Client connections"])
+    lag = _max_lag(diagnostics)
+    streams = _replication_streams(diagnostics)
+    rules = _active_sync_rules(diagnostics)
+
+    lines = [
+        "PowerSync Sync Status:",
+        "",
+        f"Connected: {'Yes' if _ok(liveness) else 'No (' + _describe_failure(liveness) + ')'}",
+        f"Active Connections: {int(connections) if connections is not None else 'N/A (metrics endpoint unavailable)'}",
+        f"Replication Lag: {f'{lag} bytes' if lag is not None else 'N/A'}",
+    ]
+    if diagnostics:
+        lines += [
+            f"Initial Replication: {'done' if streams and all(s.get('initial_replication_done') for s in streams) else 'in progress'}",
+            f"Last Checkpoint: {max((s.get('last_checkpoint_ts') or '' for s in streams), default='') or 'N/A'}",
+            f"Last Keepalive: {max((s.get('last_keepalive_ts') or '' for s in streams), default='') or 'N/A'}",
+            f"Sync Rules: {rules.get('tag') or rules.get('id') or 'none active'}",
+            f"Errors: {len(_errors(diagnostics))}",
+        ]
+    else:
+        lines.append(f"Diagnostics: unavailable ({_describe_failure(diagnostics_result)})")
+    age = _latency.get((instance_url, "checkpoint_age"))
+    if age:
+        summary = age.summary("1h")
+        if summary["samples"]:
+            lines.append(f"Sync Latency (checkpoint age, 1h): p50 {_ms(summary['p50'])} ms, "
+                         f"p95 {_ms(summary['p95'])} ms over {summary['samples']} samples")
+    lines += ["", f"Instance URL: {instance_url}", _data_age(results)]
+    return "\n".join(lines) + "\n"
+
+
+async def list_active_connections(instance_url: str, limit: int, offset: int = 0) -> str:
+    """List active connections."""
+    results = await probe_many(instance_url, "diagnostics", "metrics")
+    diagnostics_result = results["diagnostics"]
+    if not _ok(diagnostics_result):
+        return f"""Active Connections:
 
 Instance: {instance_url}
-Status: ✅ Healthy
-Response Time: {response.elapsed.total_seconds():.2f}s
+Diagnostics unavailable: {_describe_failure(diagnostics_result)}
 
-The PowerSync instance is reachable and responding.
+The admin API needs POWERSYNC_API_KEY set to an instance API token.
 """
-        else:
-            return f"""PowerSync Instance Health:
+
+    diagnostics = _json(diagnostics_result)
+    metrics = _metric_values(instance_url, results["metrics"])
+    rows = []
+    for connection in diagnostics.get("connections") or []:
+        rows.append(
+            f"- source {connection.get('id', '?')}: "
+            f"{'connected' if connection.get('connected') else 'DISCONNECTED'}, "
+            f"{connection.get('postgres_uri') or connection.get('uri') or 'uri hidden'}, "
+            f"{len(connection.get('errors') or [])} errors"
+        )
+    for stream in _replication_streams(diagnostics):
+        rows.append(
+            f"- replication {stream.get('slot_name') or stream.get('id', '?')}: "
+            f"lag {stream.get('replication_lag_bytes', 'N/A')} bytes, "
+            f"last LSN {stream.get('last_lsn') or 'N/A'}, "
+            f"keepalive {stream.get('last_keepalive_ts') or 'N/A'}, "
+            f"initial replication {'done' if stream.get('initial_replication_done') else 'in progress'}"
+        )
+    page, footer = _page(rows, limit, offset, "connections")
+    clients = metrics.get(SYNC_METRICS["Client connections"])
+
+    return "\n".join([
+        "Active Connections:",
+        "",
+        f"Instance: {instance_url}",
+        f"Client connections: {int(clients) if clients is not None else 'N/A (metrics endpoint unavailable)'}",
+        "(PowerSync reports a client count, not individual clients)",
+        "",
+        *page,
+        "",
+        footer,
+        _data_age(results),
+    ]) + "\n"
+
+
+async def get_sync_metrics(instance_url: str, time_range: str) -> str:
+    """Get sync metrics."""
+    results = await probe_many(instance_url, "metrics", "diagnostics")
+    metrics_result = results["metrics"]
+    if not _ok(metrics_result):
+        return f"""PowerSync Metrics ({time_range}):
 
 Instance: {instance_url}
-Status: ⚠️  Degraded
-HTTP Status: {response.status_code}
+Metrics endpoint unavailable: {_describe_failure(metrics_result)}
 
-The instance is reachable but returned an unexpected status.
+Self-hosted instances expose Prometheus metrics on PS_PROMETHEUS_PORT; point
+POWERSYNC_METRICS_URL at it. Hosted instances: {instance_url.replace('/api', '')}/metrics
 """
 
-    except httpx.ConnectError:
+    values = _metric_values(instance_url, metrics_result)
+    window = TIME_RANGES.get(time_range, TIME_RANGES["24h"])
+    history = _metric_history[instance_url]
+    now_ts, now_values = history[-1]
+    since = [snapshot for snapshot in history if snapshot[0] >= now_ts - window]
+    base_ts, base_values = since[0]
+    elapsed = now_ts - base_ts
+
+    lines = [f"PowerSync Metrics ({time_range}):", "", f"Instance: {instance_url}", ""]
+    for label, metric in SYNC_METRICS.items():
+        if metric not in values:
+            continue
+        line = f"{label}: {values[metric]:,.0f}"
+        if metric not in GAUGES and elapsed > 0 and metric in base_values and now_values[metric] >= base_values[metric]:
+            rate = (now_values[metric] - base_values[metric]) / elapsed
+            line += f" (+{now_values[metric] - base_values[metric]:,.0f}, {rate:,.2f}/s)"
+        lines.append(line)
+    if len(lines) == 4:
+        lines.append("No PowerSync metrics found in the response.")
+
+    errors = _errors(_json(results["diagnostics"]))
+    lines.append(f"Diagnostic errors: {len(errors)}")
+    lines.append("")
+    if elapsed > 0:
+        lines.append(f"Counters are totals since the service started; changes cover the last {elapsed:.0f}s "
+                     f"of the {time_range} window observed by this server.")
+    else:
+        lines.append("Counters are totals since the service started; ask again later for changes over the window.")
+    lines.append(_data_age(results))
+    return "\n".join(lines) + "\n"
+
+
+async def check_instance_health(instance_url: str) -> str:
+    """Check instance health."""
+    results = await probe_many(instance_url, "liveness", "startup", "diagnostics")
+    liveness, startup, diagnostics_result = results["liveness"], results["startup"], results["diagnostics"]
+    health = _health(results)
+
+    if health == "unreachable":
         return f"""PowerSync Instance Health:
 
 Instance: {instance_url}
@@ -280,59 +945,306 @@ Unable to connect to the instance. Check:
 2. Instance is running
 3. Network connectivity
 """
-    except Exception as e:
+    if health == "error":
         return f"""PowerSync Instance Health:
 
 Instance: {instance_url}
 Status: ❌ Error
-Error: {str(e)}
+Error: {liveness['error']}
 """
 
+    diagnostics = _json(diagnostics_result)
+    fatal = [error for error in _errors(diagnostics) if error.get("level") == "fatal"]
+    healthy = health == "healthy"
+    lag = _max_lag(diagnostics)
+
+    lines = [
+        "PowerSync Instance Health:",
+        "",
+        f"Instance: {instance_url}",
+        f"Status: {'✅ Healthy' if healthy else '⚠️  Degraded'}",
+        f"Response Time: {liveness['elapsed_ms'] / 1000:.2f}s",
+        f"Connection: {_connection(liveness)}",
+        f"Liveness: {'ok' if _ok(liveness) else _describe_failure(liveness)}",
+        f"Startup: {'ok' if _ok(startup) else _describe_failure(startup)}",
+    ]
+    if diagnostics:
+        lines.append(f"Replication Lag: {f'{lag} bytes' if lag is not None else 'N/A'}")
+        lines.append(f"Errors: {len(_errors(diagnostics))} ({len(fatal)} fatal)")
+        lines.extend(f"  - {error.get('message', error)}" for error in fatal[:5])
+    else:
+        lines.append(f"Diagnostics: {_describe_failure(diagnostics_result)}")
+    lines += ["", _data_age(results)]
+    return "\n".join(lines) + "\n"
+
+
+def _fleet_instances(spec: Any) -> list[tuple[str, str]]:
+    """(region, instance URL) pairs from a list of URLs or a map of region to URL(s)."""
+    if isinstance(spec, str):
+        spec = [spec]
+    if isinstance(spec, dict):
+        pairs = [(region, url) for region, urls in spec.items()
+                 for url in ([urls] if isinstance(urls, str) else urls)]
+    else:
+        pairs = [("", url) for url in spec]
+    seen = set()
+    return [(region, url) for region, url in pairs if url and not (url in seen or seen.add(url))]
+
+
+async def _fleet_member(region: str, instance_url: str, timeout: float, semaphore: asyncio.Semaphore) -> dict[str, Any]:
+    """Health of one instance; an instance slower than `timeout` is reported as timed out."""
+    async with semaphore:
+        started = time.perf_counter()
+        row: dict[str, Any] = {"region": region, "instance": instance_url, "lag": None, "errors": None}
+        try:
+            results = await asyncio.wait_for(
+                probe_many(instance_url, "liveness", "startup", "diagnostics"), timeout
+            )
+        except asyncio.TimeoutError:
+            row.update(health="timeout", latency_ms=None, detail=f"no answer within {timeout:g}s")
+        else:
+            diagnostics = _json(results["diagnostics"])
+            liveness = results["liveness"]
+            row.update(
+                health=_health(results),
+                latency_ms=liveness["elapsed_ms"] if liveness["status"] is not None else None,
+                lag=_max_lag(diagnostics),
+                errors=len(_errors(diagnostics)) if diagnostics else None,
+                detail="" if _ok(liveness) else _describe_failure(liveness),
+            )
+        row["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return row
+
+
+async def check_fleet_health(instances: list[tuple[str, str]], timeout: float, concurrency: int) -> str:
+    """Check the health of several instances concurrently."""
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(concurrency)
+    rows = await asyncio.gather(*(_fleet_member(region, url, timeout, semaphore) for region, url in instances))
+    elapsed = time.perf_counter() - started
+
+    icons = {"healthy": "✅", "degraded": "⚠️ ", "unreachable": "❌", "error": "❌", "timeout": "⏱️ "}
+    width = max([len("Instance")] + [len(row["instance"]) for row in rows])
+    regions = any(row["region"] for row in rows)
+    region_width = max([len("Region")] + [len(row["region"]) for row in rows]) if regions else 0
+    lines = [
+        "PowerSync Fleet Health:",
+        "",
+        (f"{'Region':<{region_width}} " if regions else "")
+        + f"{'Instance':<{width}} {'Status':<14} {'Latency ms':>10} {'Lag bytes':>10} {'Errors':>6}",
+    ]
+    for row in rows:
+        lines.append(
+            (f"{row['region']:<{region_width}} " if regions else "")
+            + f"{row['instance']:<{width}} {icons[row['health']] + ' ' + row['health']:<14} "
+            f"{_ms(row['latency_ms']):>10} {row['lag'] if row['lag'] is not None else 'N/A':>10} "
+            f"{row['errors'] if row['errors'] is not None else 'N/A':>6}"
+            + (f"  {row['detail']}" if row["detail"] else "")
+        )
+
+    counts = {}
+    for row in rows:
+        counts[row["health"]] = counts.get(row["health"], 0) + 1
+    slowest = max(rows, key=lambda row: row["elapsed_ms"])
+    lines += [
+        "",
+        "Summary: " + ", ".join(f"{count} {health}" for health, count in counts.items()),
+        f"Checked {len(rows)} instances in {elapsed:.2f}s (slowest: {slowest['instance']}, "
+        f"{slowest['elapsed_ms'] / 1000:.2f}s; {concurrency} at a time, {timeout:g}s timeout each)",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+async def get_sync_latency(instance_url: str, time_range: str) -> str:
+    """Get latency percentiles and trend from the sampler."""
+    if time_range not in TIME_RANGES:
+        time_range = "1h"
+    if not any(key[0] == instance_url for key in _latency):
+        await sample_instance(instance_url)
+
+    trackers = {series: _latency[(instance_url, series)] for series in LATENCY_SERIES if (instance_url, series) in _latency}
+    first = min(tracker.first_at for tracker in trackers.values())
+    sampling = f"every {SAMPLE_INTERVAL:g}s" if SAMPLE_INTERVAL > 0 else "on demand (sampler disabled)"
+    lines = [
+        f"PowerSync Sync Latency ({time_range}):",
+        "",
+        f"Instance: {instance_url}",
+        f"Sampling {sampling} since {datetime.fromtimestamp(first).strftime('%Y-%m-%d %H:%M:%S')}",
+        "",
+        f"{'Series':<20} {'Samples':>8} {'Errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}",
+    ]
+    trends = []
+    for series, tracker in trackers.items():
+        summary = tracker.summary(time_range)
+        lines.append(
+            f"{LATENCY_SERIES[series]:<20} {summary['samples']:>8} {summary['errors']:>7} "
+            f"{_ms(summary['p50']):>9} {_ms(summary['p95']):>9} {_ms(summary['p99']):>9} {_ms(summary['max']):>9}"
+        )
+        points = [p for p in summary["trend"] if p is not None]
+        if len(points) >= 2:
+            change = (points[-1] - points[0]) / points[0] if points[0] else 0.0
+            direction = "rising" if change > 0.2 else "falling" if change < -0.2 else "steady"
+            trends.append(f"{LATENCY_SERIES[series]}: {' → '.join(_ms(p) if p is not None else '-' for p in summary['trend'])} ms ({direction})")
+
+    lines.append("")
+    if trends:
+        lines.append(f"Trend (p95 per {_fraction(time_range, 6)}, oldest first):")
+        lines.extend(f"  {trend}" for trend in trends)
+    else:
+        lines.append("Trend: not enough samples in this range yet.")
+    lines.append("Checkpoint age is the time since the last replicated checkpoint when sampled.")
+    return "\n".join(lines) + "\n"
+
+
+def _fraction(time_range: str, parts: int) -> str:
+    seconds = TIME_RANGES[time_range] // parts
+    if seconds % 86400 == 0:
+        return f"{seconds // 86400}d"
+    if seconds % 3600 == 0:
+        return f"{seconds // 3600}h"
+    return f"{seconds // 60}min"
+
+
+_TABLE_RE = re.compile(r"\bFROM\s+([\w.\"]+)", re.IGNORECASE)
+
+
+def _query_tables(query: str) -> list[str]:
+    return sorted({name.strip('"').split(".")[-1] for name in _TABLE_RE.findall(query)})
+
+
+def _one_line(query: str) -> str:
+    return " ".join(query.split())
 
-async def get_bucket_info(instance_url: str, bucket_name: Optional[str]) -> str:
+
+async def get_bucket_info(
+    instance_url: str, bucket_name: Optional[str], limit: int = DEFAULT_PAGE_SIZE, offset: int = 0
+) -> str:
     """Get bucket information."""
-    if bucket_name:
-        return f"""PowerSync Bucket Info:
+    results = await probe_many(instance_url, "sync_rules", "diagnostics")
+    rules_result = results["sync_rules"]
+    current = _json(rules_result).get("current") or {}
+    if not current.get("content"):
+        reason = _describe_failure(rules_result) if not _ok(rules_result) else "no sync rules deployed"
+        return f"""PowerSync Buckets:
 
 Instance: {instance_url}
-Bucket: {bucket_name}
+Sync rules unavailable: {reason}
+
+Bucket configurations are in the sync rules YAML (powersync-sync-rules.yaml) and the
+PowerSync dashboard: {instance_url.replace('/api', '')}/sync-rules
+"""
+
+    buckets = parse_bucket_definitions(current["content"])
+    diagnostics = _json(results["diagnostics"])
+    replicated = {}
+    for stream in _replication_streams(diagnostics):
+        for table in stream.get("tables") or []:
+            replicated[table.get("name")] = table
+    header = [
+        f"Instance: {instance_url}",
+        f"Sync rules: version {current.get('version') or current.get('id', '?')}, slot {current.get('slot_name') or 'N/A'}",
+    ]
+    if _json(rules_result).get("next"):
+        header.append("Deploying: new sync rules are being processed")
+
+    if bucket_name:
+        bucket = buckets.get(bucket_name)
+        if bucket is None:
+            return "\n".join([
+                "PowerSync Bucket Info:", "", *header,
+                f"Bucket '{bucket_name}' is not defined. Buckets: {', '.join(buckets) or 'none'}",
+            ]) + "\n"
+        queries = [f"- parameters: {_one_line(query)}" for query in bucket["parameters"]]
+        for query in bucket["data"]:
+            tables = _query_tables(query)
+            state = ", ".join(
+                f"{table} {'✅' if table in replicated and not replicated[table].get('errors') else '⚠️'}"
+                for table in tables
+            )
+            queries.append(f"- data: {_one_line(query)}" + (f"\n  tables: {state}" if diagnostics and state else ""))
+        page, footer = _page(queries, limit, offset, "queries")
+        return "\n".join([
+            "PowerSync Bucket Info:", "", *header, f"Bucket: {bucket_name}",
+            f"Parameter queries: {len(bucket['parameters'])}, data queries: {len(bucket['data'])}",
+            "", *page, "", footer, _data_age(results),
+        ]) + "\n"
+
+    rows = [
+        f"- {name}: {len(bucket['parameters'])} parameter / {len(bucket['data'])} data queries, "
+        f"tables: {', '.join(sorted({t for q in bucket['data'] for t in _query_tables(q)})) or 'none'}"
+        for name, bucket in buckets.items()
+    ]
+    page, footer = _page(rows, limit, offset, "buckets")
+    return "\n".join([
+        "PowerSync Buckets:", "", *header, "", *page, "", footer, _data_age(results),
+    ]) + "\n"
 
-Note: Bucket configuration is available in the PowerSync dashboard.
-Visit: {instance_url.replace('/api', '')}/sync-rules
 
-For your project, buckets are configured in the sync rules YAML.
+def _run_analysis(content: str, database: str, sample_users: int) -> dict[str, Any]:
+    snapshot = open_snapshot(database)
+    try:
+        return analyze(content, snapshot, sample=sample_users)
+    finally:
+        snapshot.close()
+
+
+async def analyze_sync_rules(
+    instance_url: str, sync_rules_path: Optional[str], database: Optional[str], sample_users: int
+) -> str:
+    """Analyze deployed or local sync rules against a database snapshot."""
+    if not database:
+        return """Sync Rules Analysis:
+
+No database snapshot given. Pass database (SQLite path or postgresql:// DSN) or set
+POWERSYNC_ANALYZER_DB. Use a read replica or a restored snapshot, not the primary.
 """
+    if sync_rules_path:
+        with open(sync_rules_path, encoding="utf-8") as f:
+            content = f.read()
+        source = sync_rules_path
     else:
-        return f"""PowerSync Buckets:
+        rules_result = await probe(instance_url, "sync_rules")
+        content = (_json(rules_result).get("current") or {}).get("content")
+        if not content:
+            reason = _describe_failure(rules_result) if not _ok(rules_result) else "no sync rules deployed"
+            return f"""Sync Rules Analysis:
 
 Instance: {instance_url}
+Sync rules unavailable: {reason}
 
-Your project uses bucket-based sync rules to control which data syncs to each client.
-
-To view bucket configurations:
-1. Visit PowerSync Dashboard: {instance_url.replace('/api', '')}/sync-rules
-2. Check sync rules YAML configuration
-
-Typical buckets for MedZen:
-- global: User-specific medical data
+Pass sync_rules_path to analyze a local sync rules file.
 """
+        source = f"deployed on {instance_url}"
+
+    started = time.perf_counter()
+    report = await asyncio.to_thread(_run_analysis, content, database, sample_users)
+    return (
+        format_report(report)
+        + f"\nSync rules: {source}\nAnalysis took {time.perf_counter() - started:.1f}s\n"
+    )
 
 
 async def main():
     """Run the MCP server."""
-    async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            InitializationOptions(
-                server_name="powersync-mcp-server",
-                server_version="0.1.0",
-                capabilities=server.get_capabilities(
-                    notification_options=NotificationOptions(),
-                    experimental_capabilities={},
+    if POWERSYNC_URL:
+        track_instance(POWERSYNC_URL)
+    try:
+        async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
+            await server.run(
+                read_stream,
+                write_stream,
+                InitializationOptions(
+                    server_name="powersync-mcp-server",
+                    server_version="0.1.0",
+                    capabilities=server.get_capabilities(
+                        notification_options=NotificationOptions(),
+                        experimental_capabilities={},
+                    ),
                 ),
-            ),
-        )
+            )
+    finally:
+        await stop_sampler()
+        await pool.aclose()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+"""
+PowerSync sync rules analyzer
+
+Estimates what a set of sync rules costs before it is deployed: how many buckets each
+user gets, how many rows each bucket holds, and which data queries contribute the
+most rows per user. That is what drives PowerSync replication storage and a client's
+first sync.
+
+The bucket parameter queries are run against a snapshot of the source database for a
+sample of users. The snapshot is a SQLite file or a Postgres DSN (psycopg, imported on
+first use). The token user id is sampled from the columns the parameter queries compare
+with token_parameters.user_id() / request.user_id(). Each resulting bucket is then
+sized with COUNT(*) of every data query. Columns the queries filter on are checked
+against the snapshot's indexes, and so are columns wrapped in a cast, which no plain
+index serves.
+
+Usage:
+    python src/sync_rules_analyzer.py POWERSYNC_SYNC_RULES.yaml --db snapshot.sqlite
+    python src/sync_rules_analyzer.py powersync-sync-rules.yaml --db postgresql://... --users 200 --json
+"""
+
+import argparse
+import json
+import random
+import re
+import sqlite3
+import sys
+from typing import Any, Optional
+
+import yaml
+
+DEFAULT_SAMPLE_USERS = 100
+# Distinct token user ids read from the snapshot before sampling
+MAX_CANDIDATE_USERS = 200_000
+
+_TOKEN_RE = re.compile(r"\b(?:token_parameters\.(\w+)(?:\(\))?|request\.(user_id)\(\))", re.IGNORECASE)
+_BUCKET_RE = re.compile(r"\bbucket\.(\w+)", re.IGNORECASE)
+_CAST_RE = re.compile(r"([\w.]+)::(\w+)")
+_SUBQUERY_RE = re.compile(r"\(\s*select\b", re.IGNORECASE)
+_FROM_RE = re.compile(r"\bFROM\s+([\w.\"]+)", re.IGNORECASE)
+_REFERENCE = r"(?:bucket\.\w+|token_parameters\.\w+(?:\(\))?|request\.\w+\(\)|\(subquery\))"
+_FILTER_RE = re.compile(
+    rf"([\w.\"]+)(::\w+)?\s*(?:=|\bIN\b)\s*{_REFERENCE}|{_REFERENCE}\s*=\s*([\w.\"]+)(::\w+)?",
+    re.IGNORECASE,
+)
+
+
+def parse_bucket_definitions(content: str) -> dict[str, dict[str, list[str]]]:
+    """
+    Bucket definitions from sync rules YAML.
+
+    Returns:
+        {bucket name: {"parameters": [queries], "data": [queries]}}, in file order
+    """
+    document = yaml.safe_load(content or "") or {}
+    buckets = {}
+    for name, definition in (document.get("bucket_definitions") or {}).items():
+        definition = definition or {}
+        parameters = definition.get("parameters") or []
+        buckets[name] = {
+            "parameters": [parameters] if isinstance(parameters, str) else list(parameters),
+            "data": list(definition.get("data") or []),
+        }
+    return buckets
+
+
+def _name(identifier: str) -> str:
+    return identifier.strip('"').split(".")[-1].strip('"')
+
+
+def query_scopes(query: str) -> list[str]:
+    """Each SELECT of a query with its nested subqueries replaced by "(subquery)", outermost first."""
+    scopes: list[list[str]] = [[]]
+    open_scopes = [0]
+    stack: list[bool] = []
+    index = 0
+    while index < len(query):
+        char = query[index]
+        if char == "(" and _SUBQUERY_RE.match(query, index):
+            stack.append(True)
+            scopes.append([])
+            open_scopes.append(len(scopes) - 1)
+        elif char == ")" and stack:
+            if stack.pop():
+                open_scopes.pop()
+                scopes[open_scopes[-1]].append("(subquery)")
+            else:
+                scopes[open_scopes[-1]].append(char)
+        else:
+            if char == "(":
+                stack.append(False)
+            scopes[open_scopes[-1]].append(char)
+        index += 1
+    return ["".join(scope) for scope in scopes]
+
+
+def filter_columns(query: str) -> list[dict[str, Any]]:
+    """
+    Columns a query filters on with a bucket or token parameter, or with a subquery.
+
+    Returns:
+        [{"table", "column", "cast"}] where cast is the type the column is cast to, if any
+    """
+    filters = []
+    for scope in query_scopes(query):
+        table = _FROM_RE.search(scope)
+        where = re.split(r"\bWHERE\b", scope, maxsplit=1, flags=re.IGNORECASE)
+        if not table or len(where) < 2:
+            continue
+        for match in _FILTER_RE.finditer(where[1]):
+            column, cast = (match.group(1), match.group(2)) if match.group(1) else (match.group(3), match.group(4))
+            if column.split(".")[0].lower() in ("bucket", "token_parameters", "request"):
+                continue
+            filters.append({"table": _name(table.group(1)), "column": _name(column), "cast": cast[2:] if cast else None})
+    return filters
+
+
+def token_sources(query: str) -> list[tuple[str, str]]:
+    """(table, column) pairs a query compares with the token user id."""
+    sources = []
+    for scope in query_scopes(query):
+        table = _FROM_RE.search(scope)
+        if not table:
+            continue
+        for match in re.finditer(rf"([\w.\"]+)(?:::\w+)?\s*=\s*{_TOKEN_RE.pattern}", scope, re.IGNORECASE):
+            if (match.group(2) or match.group(3) or "").lower() == "user_id":
+                sources.append((_name(table.group(1)), _name(match.group(1))))
+    return sources
+
+
+class SqliteSnapshot:
+    """SQLite database file as the source snapshot."""
+
+    dialect = "sqlite"
+
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+    def translate(self, query: str) -> str:
+        query = _CAST_RE.sub(lambda m: f"CAST({m.group(1)} AS {m.group(2).upper()})", query)
+        query = _TOKEN_RE.sub(lambda m: f":token_{(m.group(1) or m.group(2)).lower()}", query)
+        return _BUCKET_RE.sub(lambda m: f":bucket_{m.group(1)}", query)
+
+    def query(self, sql: str, params: dict[str, Any]) -> tuple[list[str], list[tuple]]:
+        cursor = self.connection.execute(sql, params)
+        return [column[0] for column in cursor.description or []], cursor.fetchall()
+
+    def is_view(self, table: str) -> bool:
+        row = self.connection.execute("SELECT type FROM sqlite_master WHERE name = ?", (table,)).fetchone()
+        return bool(row and row[0] == "view")
+
+    def exists(self, table: str) -> bool:
+        return self.connection.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (table,)).fetchone() is not None
+
+    def indexed_columns(self, table: str) -> set[str]:
+        """Columns that lead an index, plus the primary key."""
+        columns = {row[1] for row in self.connection.execute(f'PRAGMA table_info("{table}")') if row[5] == 1}
+        for index in self.connection.execute(f'PRAGMA index_list("{table}")').fetchall():
+            info = self.connection.execute(f'PRAGMA index_info("{index[1]}")').fetchall()
+            leading = [row for row in info if row[0] == 0]
+            if leading and leading[0][2]:
+                columns.add(leading[0][2])
+        return columns
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class PostgresSnapshot:
+    """Postgres database (read-only session) as the source snapshot."""
+
+    dialect = "postgres"
+
+    def __init__(self, dsn: str):
+        try:
+            import psycopg as driver
+        except ImportError:
+            try:
+                import psycopg2 as driver
+            except ImportError:
+                raise RuntimeError("Postgres snapshots need psycopg: pip install 'psycopg[binary]'")
+        self.connection = driver.connect(dsn)
+        self.connection.autocommit = True
+        with self.connection.cursor() as cursor:
+            cursor.execute("SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY")
+            cursor.execute("SET statement_timeout = '30s'")
+
+    def translate(self, query: str) -> str:
+        query = query.replace("%", "%%")
+        query = _TOKEN_RE.sub(lambda m: f"%(token_{(m.group(1) or m.group(2)).lower()})s", query)
+        return _BUCKET_RE.sub(lambda m: f"%(bucket_{m.group(1)})s", query)
+
+    def query(self, sql: str, params: dict[str, Any]) -> tuple[list[str], list[tuple]]:
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [column[0] for column in cursor.description or []], cursor.fetchall()
+
+    def _relkind(self, table: str) -> Optional[str]:
+        _, rows = self.query(
+            "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE c.relname = %(table)s AND n.nspname = ANY(current_schemas(false))", {"table": table})
+        return rows[0][0] if rows else None
+
+    def is_view(self, table: str) -> bool:
+        return self._relkind(table) in ("v", "m")
+
+    def exists(self, table: str) -> bool:
+        return self._relkind(table) is not None
+
+    def indexed_columns(self, table: str) -> set[str]:
+        """Columns that lead an index (the primary key has one)."""
+        _, rows = self.query(
+            "SELECT a.attname FROM pg_index i "
+            "JOIN pg_class t ON t.oid = i.indrelid "
+            "JOIN pg_namespace n ON n.oid = t.relnamespace "
+            "JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = i.indkey[0] "
+            "WHERE t.relname = %(table)s AND n.nspname = ANY(current_schemas(false))", {"table": table})
+        return {row[0] for row in rows}
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def open_snapshot(database: str):
+    """SqliteSnapshot or PostgresSnapshot for a file path or postgres:// DSN."""
+    if database.startswith(("postgres://", "postgresql://")) or "host=" in database:
+        return PostgresSnapshot(database)
+    return SqliteSnapshot(database)
+
+
+def _stats(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {"mean": 0, "p95": 0, "max": 0}
+    ordered = sorted(values)
+    return {
+        "mean": round(sum(ordered) / len(ordered), 2),
+        "p95": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+        "max": ordered[-1],
+    }
+
+
+def sample_users(snapshot, buckets: dict[str, dict[str, list[str]]], sample: int, seed: int) -> tuple[list[Any], int]:
+    """Token user ids to evaluate, and how many distinct ones the snapshot has."""
+    sources = sorted({source for bucket in buckets.values() for query in bucket["parameters"] for source in token_sources(query)})
+    candidates: set = set()
+    for table, column in sources:
+        if not snapshot.exists(table):
+            continue
+        _, rows = snapshot.query(
+            f'SELECT DISTINCT "{column}" FROM "{table}" WHERE "{column}" IS NOT NULL LIMIT {MAX_CANDIDATE_USERS}', {})
+        candidates.update(row[0] for row in rows)
+    ordered = sorted(candidates, key=str)
+    return random.Random(seed).sample(ordered, min(sample, len(ordered))), len(ordered)
+
+
+def analyze(content: str, snapshot, sample: int = DEFAULT_SAMPLE_USERS, seed: int = 0,
+            users: Optional[list[Any]] = None, top: int = 10) -> dict[str, Any]:
+    """
+    Evaluate sync rules against a snapshot.
+
+    Args:
+        content: Sync rules YAML
+        snapshot: SqliteSnapshot / PostgresSnapshot (see open_snapshot)
+        sample: Token user ids to sample when `users` is not given
+        users: Explicit token user ids to evaluate
+        top: Number of heaviest data queries to report
+
+    Returns:
+        Dict with users_sampled, total_users, per_user (buckets / rows stats), buckets
+        (per definition: buckets per user, instances, rows per bucket, data queries),
+        heaviest_rules, estimated_total, unindexed and errors
+    """
+    buckets = parse_bucket_definitions(content)
+    total_users = len(users) if users is not None else 0
+    if users is None:
+        users, total_users = sample_users(snapshot, buckets, sample, seed)
+    errors: list[dict[str, str]] = []
+
+    def run(bucket: str, query: str, sql: str, params: dict[str, Any]) -> Optional[tuple[list[str], list[tuple]]]:
+        try:
+            return snapshot.query(sql, params)
+        except Exception as e:
+            if not any(error["query"] == query for error in errors):
+                errors.append({"bucket": bucket, "query": " ".join(query.split()), "error": str(e).strip()})
+            return None
+
+    # Bucket instances per user: (bucket name, frozen parameters) keys
+    user_buckets: dict[Any, set] = {user: set() for user in users}
+    for name, bucket in buckets.items():
+        if not bucket["parameters"]:
+            for user in users:
+                user_buckets[user].add((name, ()))
+            continue
+        for query in bucket["parameters"]:
+            sql = snapshot.translate(query)
+            needs_token = bool(_TOKEN_RE.search(query))
+            for user in users if needs_token else [None]:
+                params = {}
+                for match in _TOKEN_RE.finditer(query):
+                    token = (match.group(1) or match.group(2)).lower()
+                    params[f"token_{token}"] = user if token == "user_id" else None
+                result = run(name, query, sql, params)
+                if result is None:
+                    continue
+                columns, rows = result
+                instances = {(name, tuple(sorted(zip(columns, row)))) for row in rows}
+                for target in (users if not needs_token else [user]):
+                    user_buckets[target].update(instances)
+
+    # Rows per bucket instance and data query
+    instances = sorted({instance for owned in user_buckets.values() for instance in owned}, key=str)
+    rows: dict[tuple, list[Optional[int]]] = {}
+    for instance in instances:
+        name, parameters = instance
+        params = {f"bucket_{key}": value for key, value in parameters}
+        counts = []
+        for query in buckets[name]["data"]:
+            for reference in _BUCKET_RE.findall(query):
+                params.setdefault(f"bucket_{reference}", None)
+            result = run(name, query, f"SELECT COUNT(*) FROM ({snapshot.translate(query)}) AS sized", params)
+            counts.append(result[1][0][0] if result else None)
+        rows[instance] = counts
+
+    sampled = len(users) or 1
+    per_user_rows = [sum(sum(c for c in rows[i] if c) for i in owned) for owned in user_buckets.values()]
+    report_buckets: dict[str, Any] = {}
+    rules = []
+    for name, bucket in buckets.items():
+        mine = [i for i in instances if i[0] == name]
+        holders = [owned for owned in user_buckets.values() if any(i[0] == name for i in owned)]
+        per_user = [sum(1 for i in owned if i[0] == name) for owned in user_buckets.values()]
+        sizes = [sum(c for c in rows[i] if c) for i in mine]
+        data = []
+        for position, query in enumerate(bucket["data"]):
+            counts = [rows[i][position] for i in mine if rows[i][position] is not None]
+            per_user_total = sum(rows[i][position] or 0 for owned in user_buckets.values() for i in owned if i[0] == name)
+            entry = {
+                "bucket": name,
+                "query": " ".join(query.split()),
+                "rows_per_bucket": _stats(counts),
+                "rows_per_user": round(per_user_total / sampled, 2),
+            }
+            data.append(entry)
+            rules.append(entry)
+        report_buckets[name] = {
+            "kind": "global" if not bucket["parameters"] or not any(_TOKEN_RE.search(q) for q in bucket["parameters"]) else "per-user",
+            "users_with_bucket": len(holders),
+            "buckets_per_user": _stats(per_user),
+            "instances": len(mine),
+            "rows_per_bucket": _stats(sizes),
+            "data_queries": data,
+        }
+
+    # Population estimate: per-user buckets scale with users, global ones exist once
+    scale = total_users / sampled if users else 0
+    estimated_instances = sum(b["instances"] * (scale if b["kind"] == "per-user" else 1) for b in report_buckets.values())
+    estimated_rows = sum(
+        sum(sum(c for c in rows[i] if c) for i in instances if i[0] == name) * (scale if b["kind"] == "per-user" else 1)
+        for name, b in report_buckets.items()
+    )
+
+    return {
+        "users_sampled": len(users),
+        "total_users": total_users,
+        "per_user": {
+            "buckets": _stats([len(owned) for owned in user_buckets.values()]),
+            "rows": _stats(per_user_rows),
+        },
+        "buckets": report_buckets,
+        "heaviest_rules": sorted(rules, key=lambda rule: rule["rows_per_user"], reverse=True)[:top],
+        "estimated_total": {"bucket_instances": round(estimated_instances), "bucket_rows": round(estimated_rows)},
+        "unindexed": find_unindexed(buckets, snapshot),
+        "errors": errors,
+    }
+
+
+def find_unindexed(buckets: dict[str, dict[str, list[str]]], snapshot) -> list[dict[str, Any]]:
+    """Filter columns of parameter and data queries that no index on the snapshot leads with."""
+    findings = []
+    seen = set()
+    indexes: dict[str, set[str]] = {}
+    for name, bucket in buckets.items():
+        for kind in ("parameters", "data"):
+            for query in bucket[kind]:
+                for column in filter_columns(query):
+                    key = (column["table"], column["column"], column["cast"])
+                    if key in seen or not snapshot.exists(column["table"]):
+                        continue
+                    seen.add(key)
+                    if snapshot.is_view(column["table"]):
+                        reason = "view: index the column on its base table"
+                    else:
+                        if column["table"] not in indexes:
+                            indexes[column["table"]] = snapshot.indexed_columns(column["table"])
+                        if column["column"] not in indexes[column["table"]]:
+                            reason = "no index"
+                        elif column["cast"]:
+                            reason = f"cast to {column['cast']}: the index on the column is not used"
+                        else:
+                            continue
+                    findings.append({"table": column["table"], "column": column["column"], "bucket": name,
+                                     "query_kind": "parameter" if kind == "parameters" else "data", "reason": reason})
+    return findings
+
+
+def format_report(report: dict[str, Any]) -> str:
+    """Human-readable report, as the MCP tool returns it."""
+    per_user = report["per_user"]
+    lines = [
+        "PowerSync Sync Rules Analysis:",
+        "",
+        f"Users sampled: {report['users_sampled']} of {report['total_users']}",
+        f"Buckets per user: mean {per_user['buckets']['mean']}, p95 {per_user['buckets']['p95']}, max {per_user['buckets']['max']}",
+        f"Rows per user (first sync): mean {per_user['rows']['mean']:,}, p95 {per_user['rows']['p95']:,}, max {per_user['rows']['max']:,}",
+        f"Estimated total: {report['estimated_total']['bucket_instances']:,} buckets, "
+        f"{report['estimated_total']['bucket_rows']:,} bucket rows",
+        "",
+        f"{'Bucket':<24} {'Kind':<9} {'Users':>6} {'Per user':>9} {'Instances':>10} {'Rows/bucket':>12} {'Max rows':>10}",
+    ]
+    for name, bucket in report["buckets"].items():
+        lines.append(
+            f"{name:<24} {bucket['kind']:<9} {bucket['users_with_bucket']:>6} {bucket['buckets_per_user']['mean']:>9} "
+            f"{bucket['instances']:>10} {bucket['rows_per_bucket']['mean']:>12,} {bucket['rows_per_bucket']['max']:>10,}"
+        )
+    lines += ["", "Heaviest data queries (rows per user):"]
+    for rule in report["heaviest_rules"]:
+        lines.append(f"  {rule['rows_per_user']:>10,}  [{rule['bucket']}] {rule['query']}")
+    if report["unindexed"]:
+        lines += ["", "Filter columns without a usable index:"]
+        for finding in report["unindexed"]:
+            lines.append(f"  {finding['table']}.{finding['column']} ({finding['query_kind']} query of {finding['bucket']}): {finding['reason']}")
+    if report["errors"]:
+        lines += ["", "Queries that failed on the snapshot:"]
+        for error in report["errors"]:
+            lines.append(f"  [{error['bucket']}] {error['query']}: {error['error']}")
+    return "\n".join(lines) + "\n"
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Estimate buckets and rows per user for PowerSync sync rules")
+    parser.add_argument("rules", help="sync rules YAML file")
+    parser.add_argument("--db", required=True, help="SQLite snapshot path or postgresql:// DSN")
+    parser.add_argument("--users", type=int, default=DEFAULT_SAMPLE_USERS, help="token user ids to sample")
+    parser.add_argument("--user", action="append", help="evaluate this token user id (repeatable) instead of sampling")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--top", type=int, default=10, help="heaviest data queries to list")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    with open(args.rules, encoding="utf-8") as f:
+        content = f.read()
+    snapshot = open_snapshot(args.db)
+    try:
+        report = analyze(content, snapshot, sample=args.users, seed=args.seed, users=args.user, top=args.top)
+    finally:
+        snapshot.close()
+    print(json.dumps(report, indent=2, default=str) if args.json else format_report(report), end="" if not args.json else "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
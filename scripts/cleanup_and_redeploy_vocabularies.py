@@ -91,7 +91,7 @@ def main():
     """Main cleanup and redeploy function."""
 
     region = 'eu-central-1'
-    vocab_dir = Path('/Users/alainbagmi/Desktop/medzen-iwani-t1nrnu/medical-vocabularies')
+    vocab_dir = Path(__file__).resolve().parent.parent / 'medical-vocabularies'
 
     # Vocabulary configuration
     vocabularies = [
@@ -2,23 +2,74 @@
 """
 Deploy Medical Vocabularies to AWS Transcribe
 Handles vocabulary file upload with proper AWS API formatting
+
+Each vocabulary's content hash (terms and language) is kept in a tag on the remote
+vocabulary. A run lists the remote vocabularies once, reads their tags, and only
+creates missing vocabularies or updates changed or FAILED ones, submitting them
+concurrently. Lists over Transcribe's limits (vocabulary_normalizer.validate_phrases)
+are reported and not submitted; ones within 5% of the byte limit are logged as warnings. One poller then lists the vocabularies with backoff until every
+submitted one is READY or FAILED, instead of one get_vocabulary loop per vocabulary.
+
+With --tables, each list is deployed as a vocabulary table instead (Phrase, IPA,
+SoundsLike, DisplayAs from vocabulary_normalizer.py's table target), uploaded to the
+given S3 prefix and passed to Transcribe as VocabularyFileUri. DisplayAs keeps the
+source spelling, and IPA or SoundsLike come from vocabulary_g2p.py.
+
+Usage:
+    python3 scripts/deploy-medical-vocabularies.py [region] [profile] [--dry-run] [--concurrency 5]
+    python3 scripts/deploy-medical-vocabularies.py [region] [profile] --tables s3://bucket/vocabularies/
 """
 
-import os
+import argparse
+import hashlib
+import random
 import sys
-import json
 import time
-import boto3
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pathlib import Path
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from vocabulary_normalizer import PRONUNCIATIONS, normalize_file, render_table, validate_phrases, validate_table
+
+HASH_TAG = 'medzen:content-sha256'
+NAME_PREFIX = 'medzen-medical-vocab'
+RETRYABLE = ('LimitExceededException', 'ThrottlingException', 'TooManyRequestsException')
+ICONS = {'create': '🆕', 'update': '🔄', 'unchanged': '✓ ', 'busy': '⏸️ ', 'error': '❌'}
+
+# (file, vocabulary name, language code)
+VOCABULARIES = [
+    ('medzen-medical-vocab-en.txt', 'medzen-medical-vocab-en', 'en-US'),
+    ('medzen-medical-vocab-fr.txt', 'medzen-medical-vocab-fr', 'fr-FR'),
+    ('medzen-medical-vocab-sw.txt', 'medzen-medical-vocab-sw', 'sw-KE'),
+    ('medzen-medical-vocab-zu.txt', 'medzen-medical-vocab-zu', 'zu-ZA'),
+    ('medzen-medical-vocab-ha.txt', 'medzen-medical-vocab-ha', 'ha-NG'),
+    ('medzen-medical-vocab-yo-fallback-en.txt', 'medzen-medical-vocab-yo-fallback-en', 'en-US'),
+    ('medzen-medical-vocab-ig-fallback-en.txt', 'medzen-medical-vocab-ig-fallback-en', 'en-US'),
+    ('medzen-medical-vocab-pcm-fallback-en.txt', 'medzen-medical-vocab-pcm-fallback-en', 'en-US'),
+    ('medzen-medical-vocab-ln-fallback-fr.txt', 'medzen-medical-vocab-ln-fallback-fr', 'fr-FR'),
+    ('medzen-medical-vocab-kg-fallback-fr.txt', 'medzen-medical-vocab-kg-fallback-fr', 'fr-FR'),
+]
+
 
 def create_transcribe_client(region, profile=None):
-    """Create AWS Transcribe client"""
+    """Create AWS Transcribe client, and the ARN prefix of its vocabularies"""
     if profile:
         session = boto3.Session(profile_name=profile)
     else:
         session = boto3.Session()
-    return session.client('transcribe', region_name=region)
+    config = Config(retries={'mode': 'adaptive', 'max_attempts': 8})
+    account = session.client('sts', region_name=region).get_caller_identity()['Account']
+    return session.client('transcribe', region_name=region, config=config), f"arn:aws:transcribe:{region}:{account}:vocabulary/"
+
+
+def create_s3_client(region, profile=None):
+    session = boto3.Session(profile_name=profile) if profile else boto3.Session()
+    return session.client('s3', region_name=region)
+
 
 def read_vocabulary_file(filepath):
     """Read vocabulary file and parse entries"""
@@ -35,90 +86,242 @@ def read_vocabulary_file(filepath):
         print(f"❌ Error reading file {filepath}: {e}")
         return None
 
-def create_vocabulary(client, vocab_name, language_code, entries, region, log_file=None):
-    """Create vocabulary in AWS Transcribe"""
-    try:
-        # Check if vocabulary already exists
+
+def read_vocabulary_table(filepath, language_code):
+    """Table rows for a term list: the normalizer's table target with its pronunciation scheme"""
+    scheme = PRONUNCIATIONS.get(f"medical-vocabularies/{Path(filepath).name}")
+    return normalize_file(filepath, language_code, ('table',), scheme)['targets']['table']['entries']
+
+
+def content_hash(entries, language_code):
+    """SHA-256 of what Transcribe is given: the language and the terms in order"""
+    digest = hashlib.sha256(language_code.encode('utf-8'))
+    for entry in entries:
+        digest.update(b'\n' + entry.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def error_code(error):
+    return error.response.get('Error', {}).get('Code', '') if isinstance(error, ClientError) else ''
+
+
+def list_remote_vocabularies(client, name_contains=NAME_PREFIX):
+    """{name: summary} of the remote vocabularies, in as few list calls as pages"""
+    remote, token = {}, None
+    while True:
+        params = {'MaxResults': 100, 'NameContains': name_contains}
+        if token:
+            params['NextToken'] = token
+        response = client.list_vocabularies(**params)
+        for vocabulary in response.get('Vocabularies', []):
+            remote[vocabulary['VocabularyName']] = vocabulary
+        token = response.get('NextToken')
+        if not token:
+            return remote
+
+
+def remote_hash(client, arn):
+    tags = client.list_tags_for_resource(ResourceArn=arn).get('Tags', [])
+    return next((tag['Value'] for tag in tags if tag['Key'] == HASH_TAG), None)
+
+
+def plan_deployment(client, arn_prefix, vocabularies, concurrency):
+    """
+    Decide create, update or unchanged for each local vocabulary.
+
+    Returns:
+        List of dicts with name, language, entries, hash, action, reason
+    """
+    remote = list_remote_vocabularies(client)
+    existing = [vocabulary for vocabulary in vocabularies if vocabulary['name'] in remote]
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        hashes = dict(zip(
+            [vocabulary['name'] for vocabulary in existing],
+            pool.map(lambda vocabulary: remote_hash(client, arn_prefix + vocabulary['name']), existing),
+        ))
+
+    for vocabulary in vocabularies:
+        summary = remote.get(vocabulary['name'])
+        if summary is None:
+            vocabulary['action'], vocabulary['reason'] = 'create', 'new'
+        elif summary['VocabularyState'] == 'FAILED':
+            vocabulary['action'], vocabulary['reason'] = 'update', 'remote FAILED'
+        elif hashes.get(vocabulary['name']) != vocabulary['hash']:
+            vocabulary['action'] = 'update'
+            vocabulary['reason'] = 'changed' if hashes.get(vocabulary['name']) else 'no content hash tag'
+        else:
+            vocabulary['action'], vocabulary['reason'] = 'unchanged', summary['VocabularyState']
+        if vocabulary['action'] == 'update' and summary['VocabularyState'] == 'PENDING':
+            vocabulary['action'], vocabulary['reason'] = 'busy', 'remote still PENDING; run again when READY'
+    return vocabularies
+
+
+def submit(client, arn_prefix, vocabulary, attempts=6, s3=None):
+    """
+    Create or update one vocabulary and tag it with its content hash; retries throttling.
+
+    A table is uploaded to its file_uri first and passed as VocabularyFileUri.
+    """
+    tags = [{'Key': HASH_TAG, 'Value': vocabulary['hash']}]
+    if vocabulary.get('file_uri'):
+        bucket, _, key = vocabulary['file_uri'][len('s3://'):].partition('/')
+        try:
+            s3.put_object(Bucket=bucket, Key=key, Body=vocabulary['body'].encode('utf-8'),
+                          ContentType='text/tab-separated-values; charset=utf-8')
+        except ClientError as e:
+            vocabulary['state'], vocabulary['error'] = 'FAILED', f"upload failed: {e}"
+            return False
+        content = {'VocabularyFileUri': vocabulary['file_uri']}
+    else:
+        content = {'Phrases': vocabulary['entries']}
+    delay = 1.0
+    for attempt in range(attempts):
         try:
-            response = client.get_vocabulary(VocabularyName=vocab_name)
-            print(f"⚠️  Vocabulary '{vocab_name}' already exists. Skipping...")
-            if log_file:
-                log_file.write(f"⚠️  Vocabulary '{vocab_name}' already exists.\n")
+            if vocabulary['action'] == 'create':
+                client.create_vocabulary(VocabularyName=vocabulary['name'], LanguageCode=vocabulary['language'],
+                                         Tags=tags, **content)
+            else:
+                client.update_vocabulary(VocabularyName=vocabulary['name'], LanguageCode=vocabulary['language'],
+                                         **content)
+                client.tag_resource(ResourceArn=arn_prefix + vocabulary['name'], Tags=tags)
+            vocabulary['submitted_at'] = time.monotonic()
             return True
-        except client.exceptions.BadRequestException:
-            # Vocabulary doesn't exist, proceed to create
-            pass
+        except ClientError as e:
+            if error_code(e) in RETRYABLE and attempt < attempts - 1:
+                time.sleep(delay * random.uniform(0.5, 1.5))
+                delay *= 2
+                continue
+            vocabulary['state'], vocabulary['error'] = 'FAILED', str(e)
+            return False
 
-        print(f"Creating vocabulary: {vocab_name} (language: {language_code}, {len(entries)} terms)...")
 
-        response = client.create_vocabulary(
-            VocabularyName=vocab_name,
-            LanguageCode=language_code,
-            Phrases=entries
-        )
+def wait_for_vocabularies(client, vocabularies, max_wait=600, initial_delay=5.0, max_delay=30.0, log=print):
+    """
+    Poll every pending vocabulary with one list call per round until READY or FAILED.
 
-        print(f"✅ Created vocabulary: {vocab_name}")
-        if log_file:
-            log_file.write(f"✅ Created vocabulary: {vocab_name}\n")
-        return True
+    The delay starts at initial_delay and grows by half each round up to max_delay.
 
-    except Exception as e:
-        print(f"❌ Failed to create vocabulary: {vocab_name}")
-        print(f"   Error: {str(e)}")
-        if log_file:
-            log_file.write(f"❌ Failed to create vocabulary: {vocab_name} - {str(e)}\n")
-        return False
-
-def wait_for_vocabulary(client, vocab_name, max_wait=300, log_file=None):
-    """Wait for vocabulary to reach READY state"""
-    elapsed = 0
-    print(f"Waiting for vocabulary '{vocab_name}' to be ready...")
-
-    while elapsed < max_wait:
+    Returns:
+        Number of poll rounds
+    """
+    pending = {vocabulary['name']: vocabulary for vocabulary in vocabularies}
+    deadline = time.monotonic() + max_wait
+    delay, rounds = initial_delay, 0
+    while pending and time.monotonic() < deadline:
+        time.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+        rounds += 1
         try:
-            response = client.get_vocabulary(VocabularyName=vocab_name)
-            status = response['VocabularyState']
-
-            if status == 'READY':
-                print(f"✅ Vocabulary '{vocab_name}' is READY")
-                if log_file:
-                    log_file.write(f"✅ Vocabulary '{vocab_name}' is READY\n")
-                return True
-            elif status == 'FAILED':
-                print(f"❌ Vocabulary '{vocab_name}' FAILED")
-                print(f"   Reason: {response.get('FailureReason', 'Unknown')}")
-                if log_file:
-                    log_file.write(f"❌ Vocabulary '{vocab_name}' FAILED\n")
-                return False
+            remote = list_remote_vocabularies(client)
+        except ClientError as e:
+            if error_code(e) not in RETRYABLE:
+                raise
+            remote = {}
+        for name, vocabulary in list(pending.items()):
+            state = remote.get(name, {}).get('VocabularyState')
+            if state not in ('READY', 'FAILED'):
+                continue
+            vocabulary['state'] = state
+            vocabulary['ready_seconds'] = round(time.monotonic() - vocabulary['submitted_at'], 1)
+            if state == 'FAILED':
+                vocabulary['error'] = client.get_vocabulary(VocabularyName=name).get('FailureReason', 'Unknown')
+            del pending[name]
+        if pending:
+            log(f"⏳ {len(pending)} pending: {', '.join(sorted(pending))}")
+        delay = min(delay * 1.5, max_delay)
+    for vocabulary in pending.values():
+        vocabulary['state'], vocabulary['error'] = 'TIMEOUT', f"not READY after {max_wait}s"
+    return rounds
+
+
+def deploy_vocabularies(client, arn_prefix, vocab_dir, vocabularies=VOCABULARIES, concurrency=5, dry_run=False,
+                        max_wait=600, initial_delay=5.0, max_delay=30.0, log=print, tables=None, s3=None):
+    """
+    Deploy the vocabularies whose content changed and wait for them.
+
+    With tables (an s3://bucket/prefix/ URI), each list is deployed as a vocabulary
+    table uploaded there with the s3 client.
+
+    Returns:
+        Dict with the per-vocabulary results, poll rounds and total seconds
+    """
+    started = time.monotonic()
+    local = []
+    for filename, name, language_code in vocabularies:
+        path = Path(vocab_dir) / filename
+        if not path.exists():
+            log(f"⊘ Skipping {name} (file not found)")
+            continue
+        vocabulary = {'name': name, 'language': language_code}
+        warnings = []
+        if tables:
+            rows = read_vocabulary_table(path, language_code)
+            vocabulary['body'] = render_table(rows)
+            vocabulary['file_uri'] = f"{tables.rstrip('/')}/{name}.tsv"
+            entries = vocabulary['body'].splitlines()[1:]
+            problems = validate_table(rows, language=language_code, warnings=warnings)
+        else:
+            entries = read_vocabulary_file(path)
+            if entries is None:
+                local.append(dict(vocabulary, entries=[], hash=None, action='error', reason='unreadable', state='FAILED'))
+                continue
+            problems = validate_phrases(entries, warnings=warnings)
+        for warning in warnings:
+            log(f"⚠️  {name}: {warning}")
+        if problems:
+            local.append(dict(vocabulary, entries=entries, hash=None, action='error', reason='over Transcribe limits',
+                              state='FAILED', error='; '.join(problems)))
+            continue
+        local.append(dict(vocabulary, entries=entries, hash=content_hash(entries, language_code)))
+
+    readable = [vocabulary for vocabulary in local if vocabulary.get('action') != 'error']
+    plan_deployment(client, arn_prefix, readable, concurrency)
+    changes = [vocabulary for vocabulary in readable if vocabulary['action'] in ('create', 'update')]
+    for vocabulary in local:
+        log(f"{ICONS[vocabulary['action']]} {vocabulary['name']}: {vocabulary['action']} ({vocabulary['reason']}, {len(vocabulary['entries'])} terms)")
+
+    rounds = 0
+    if changes and not dry_run:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            submitted = list(pool.map(lambda vocabulary: submit(client, arn_prefix, vocabulary, s3=s3), changes))
+        waiting = [vocabulary for vocabulary, ok in zip(changes, submitted) if ok]
+        log(f"\n=== Submitted {len(waiting)} of {len(changes)} changes; waiting for READY ===\n")
+        rounds = wait_for_vocabularies(client, waiting, max_wait, initial_delay, max_delay, log)
+        for vocabulary in changes:
+            if vocabulary['state'] == 'READY':
+                log(f"✅ {vocabulary['name']} is READY ({vocabulary['ready_seconds']}s)")
             else:
-                print(f"⏳ Status: {status} (waiting...)")
-
-            time.sleep(5)
-            elapsed += 5
+                log(f"❌ {vocabulary['name']} {vocabulary['state']}: {vocabulary.get('error')}")
 
-        except Exception as e:
-            print(f"⏳ Checking status (waiting...)")
-            time.sleep(5)
-            elapsed += 5
+    return {
+        'vocabularies': [{key: value for key, value in vocabulary.items() if key not in ('entries', 'body', 'submitted_at')}
+                         for vocabulary in local],
+        'poll_rounds': rounds,
+        'seconds': round(time.monotonic() - started, 2),
+    }
 
-    print(f"⚠️  Timeout waiting for vocabulary '{vocab_name}'")
-    if log_file:
-        log_file.write(f"⚠️  Timeout waiting for vocabulary '{vocab_name}'\n")
-    return False
 
 def main():
-    region = sys.argv[1] if len(sys.argv) > 1 else 'eu-central-1'
-    profile = sys.argv[2] if len(sys.argv) > 2 else None
-
-    vocab_dir = Path('medical-vocabularies')
+    parser = argparse.ArgumentParser(description='Deploy changed medical vocabularies to AWS Transcribe')
+    parser.add_argument('region', nargs='?', default='eu-central-1')
+    parser.add_argument('profile', nargs='?', default=None)
+    parser.add_argument('--vocab-dir', default='medical-vocabularies')
+    parser.add_argument('--concurrency', type=int, default=5, help='vocabularies submitted at once')
+    parser.add_argument('--max-wait', type=int, default=600, help='seconds to wait for READY')
+    parser.add_argument('--dry-run', action='store_true', help='show what would be created or updated')
+    parser.add_argument('--tables', metavar='S3_URI',
+                        help='deploy vocabulary tables with pronunciations, uploaded under this s3:// prefix')
+    args = parser.parse_args()
+
+    vocab_dir = Path(args.vocab_dir)
     log_filename = f"vocab-deployment-{datetime.now().strftime('%Y%m%d-%H%M%S')}.log"
 
     print("=" * 50)
     print("Medical Vocabulary Deployment")
     print("=" * 50)
-    print(f"Region: {region}")
-    print(f"Profile: {profile or 'default'}")
+    print(f"Region: {args.region}")
+    print(f"Profile: {args.profile or 'default'}")
     print(f"Vocabulary Directory: {vocab_dir}")
+    print(f"Format: {'tables under ' + args.tables if args.tables else 'phrase lists'}")
     print(f"Log File: {log_filename}")
     print("=" * 50)
     print()
@@ -127,97 +330,60 @@ def main():
     if not vocab_dir.exists():
         print(f"❌ Vocabulary directory '{vocab_dir}' not found.")
         sys.exit(1)
+    if args.tables and not args.tables.startswith('s3://'):
+        print(f"❌ --tables must be an s3:// URI, got '{args.tables}'")
+        sys.exit(1)
 
     # Initialize AWS client
     try:
-        client = create_transcribe_client(region, profile)
+        client, arn_prefix = create_transcribe_client(args.region, args.profile)
+        s3 = create_s3_client(args.region, args.profile) if args.tables else None
         print("✅ Connected to AWS Transcribe\n")
     except Exception as e:
         print(f"❌ Failed to connect to AWS: {e}")
         sys.exit(1)
 
-    # Open log file
     with open(log_filename, 'w') as log_file:
         log_file.write(f"Medical Vocabulary Deployment - {datetime.now()}\n")
-        log_file.write(f"Region: {region}\n")
-        log_file.write(f"Profile: {profile or 'default'}\n\n")
-
-        # Define vocabularies to deploy
-        vocabularies = [
-            ('medical-vocabularies/medzen-medical-vocab-en.txt', 'medzen-medical-vocab-en', 'en-US'),
-            ('medical-vocabularies/medzen-medical-vocab-fr.txt', 'medzen-medical-vocab-fr', 'fr-FR'),
-            ('medical-vocabularies/medzen-medical-vocab-sw.txt', 'medzen-medical-vocab-sw', 'sw-KE'),
-            ('medical-vocabularies/medzen-medical-vocab-zu.txt', 'medzen-medical-vocab-zu', 'zu-ZA'),
-            ('medical-vocabularies/medzen-medical-vocab-ha.txt', 'medzen-medical-vocab-ha', 'ha-NG'),
-            ('medical-vocabularies/medzen-medical-vocab-yo-fallback-en.txt', 'medzen-medical-vocab-yo-fallback-en', 'en-US'),
-            ('medical-vocabularies/medzen-medical-vocab-ig-fallback-en.txt', 'medzen-medical-vocab-ig-fallback-en', 'en-US'),
-            ('medical-vocabularies/medzen-medical-vocab-pcm-fallback-en.txt', 'medzen-medical-vocab-pcm-fallback-en', 'en-US'),
-            ('medical-vocabularies/medzen-medical-vocab-ln-fallback-fr.txt', 'medzen-medical-vocab-ln-fallback-fr', 'fr-FR'),
-            ('medical-vocabularies/medzen-medical-vocab-kg-fallback-fr.txt', 'medzen-medical-vocab-kg-fallback-fr', 'fr-FR'),
-        ]
-
-        # Deploy vocabularies
-        successful = []
-        failed = []
-
-        for vocab_file, vocab_name, language_code in vocabularies:
-            if not Path(vocab_file).exists():
-                print(f"⊘ Skipping {vocab_name} (file not found)")
-                log_file.write(f"⊘ Skipped {vocab_name} (file not found)\n")
-                continue
-
-            entries = read_vocabulary_file(vocab_file)
-            if entries is None:
-                failed.append(vocab_name)
-                continue
-
-            if create_vocabulary(client, vocab_name, language_code, entries, region, log_file):
-                successful.append((vocab_name, len(entries)))
-            else:
-                failed.append(vocab_name)
+        log_file.write(f"Region: {args.region}\n")
+        log_file.write(f"Profile: {args.profile or 'default'}\n\n")
 
-        # Wait for critical vocabularies
-        print("\n=== Waiting for Critical Vocabularies to be Ready ===\n")
-        log_file.write("\nWaiting for vocabularies to be ready...\n")
+        def log(message):
+            print(message)
+            log_file.write(message + "\n")
 
-        for vocab_name, _ in successful:
-            if vocab_name in ['medzen-medical-vocab-en', 'medzen-medical-vocab-fr']:
-                wait_for_vocabulary(client, vocab_name, log_file=log_file)
+        result = deploy_vocabularies(client, arn_prefix, vocab_dir, concurrency=args.concurrency,
+                                     dry_run=args.dry_run, max_wait=args.max_wait, log=log, tables=args.tables, s3=s3)
 
         # Print summary
-        print("\n" + "=" * 50)
-        print("Deployment Summary")
-        print("=" * 50)
-        print(f"\n✅ Successfully created: {len(successful)} vocabularies")
-        for vocab_name, term_count in successful:
-            print(f"   • {vocab_name} ({term_count} terms)")
-
+        by_action = {}
+        for vocabulary in result['vocabularies']:
+            by_action.setdefault(vocabulary['action'], []).append(vocabulary)
+        failed = [vocabulary for vocabulary in result['vocabularies']
+                  if vocabulary.get('state') in ('FAILED', 'TIMEOUT')]
+        log("\n" + "=" * 50)
+        log("Deployment Summary")
+        log("=" * 50)
+        for action in ('create', 'update', 'unchanged', 'busy'):
+            if by_action.get(action):
+                log(f"{action}: {len(by_action[action])} ({', '.join(v['name'] for v in by_action[action])})")
         if failed:
-            print(f"\n❌ Failed: {len(failed)} vocabularies")
-            for vocab_name in failed:
-                print(f"   • {vocab_name}")
-
+            log(f"\n❌ Failed: {len(failed)} vocabularies")
+            for vocabulary in failed:
+                log(f"   • {vocabulary['name']}: {vocabulary.get('error')}")
+        log(f"\nTotal time: {result['seconds']}s ({result['poll_rounds']} poll rounds)")
         print(f"\nLog file: {log_filename}")
 
         print("\nNext Steps:")
         print("1. Verify all vocabularies are READY in AWS Transcribe:")
-        print(f"   aws transcribe list-vocabularies --region {region}")
+        print(f"   aws transcribe list-vocabularies --region {args.region}")
         print("\n2. Deploy the updated edge function:")
         print("   npx supabase functions deploy start-medical-transcription")
-        print("\n3. Apply the database migration:")
-        print("   npx supabase migration up")
-        print("\n4. Test medical transcription in different languages")
+        print("\n3. Test medical transcription in different languages")
         print("=" * 50)
 
-        # Log summary
-        log_file.write(f"\n✅ Successfully created: {len(successful)} vocabularies\n")
-        for vocab_name, term_count in successful:
-            log_file.write(f"   • {vocab_name} ({term_count} terms)\n")
+    sys.exit(1 if failed else 0)
 
-        if failed:
-            log_file.write(f"\n❌ Failed: {len(failed)} vocabularies\n")
-            for vocab_name in failed:
-                log_file.write(f"   • {vocab_name}\n")
 
 if __name__ == '__main__':
     main()
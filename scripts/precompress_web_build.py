@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Precompress the Flutter web build and write its content-hash manifest
+
+Walks build/web and writes Brotli (.br) and gzip (.gz) siblings for compressible
+assets in a process pool, then writes build-manifest.json with each file's SHA-256,
+size, content type, precompressed sizes and Cache-Control. local-https-server/serve.py
+reads the manifest for content-hash ETags and immutable caching of versioned URLs
+(path?v=<hash>), and the CDN upload takes Content-Type and Cache-Control from it.
+
+Rebuilds are incremental: a file whose size and mtime match the manifest is not
+re-read, and one whose hash is unchanged is not recompressed.
+
+Usage:
+    python3 scripts/precompress_web_build.py [build/web] [--workers 8] [--force]
+
+Brotli needs `pip install brotli`; without it only .gz siblings are written.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MANIFEST_NAME = 'build-manifest.json'
+MANIFEST_VERSION = 1
+WEB_DIR = Path(__file__).resolve().parent.parent / 'build' / 'web'
+
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'application/wasm',
+                      'application/manifest+json', 'image/svg+xml', 'font/ttf', 'font/otf')
+MIN_SIZE = 1024
+MAX_RATIO = 0.9  # keep a sibling only if it saves at least 10%
+
+# Loaded by URL names that do not change between builds: always revalidate
+REVALIDATE = 'no-cache'
+# Versioned URLs (path?v=<hash>) and file names carrying a hash never change
+IMMUTABLE = 'public, max-age=31536000, immutable'
+HASHED_NAME = re.compile(r'[.-][0-9a-f]{8,}\.[^/]+$')
+
+mimetypes.add_type('application/wasm', '.wasm')
+mimetypes.add_type('application/manifest+json', '.webmanifest')
+
+
+def content_type(path):
+    return mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+def compressible(path, size):
+    return size >= MIN_SIZE and content_type(path).startswith(COMPRESSIBLE_TYPES)
+
+
+def cache_control(path):
+    return IMMUTABLE if HASHED_NAME.search(path) else REVALIDATE
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compress_file(path, encodings, gzip_level, brotli_quality):
+    """Write the precompressed siblings of one file; returns {encoding: size} of those kept."""
+    data = Path(path).read_bytes()
+    kept = {}
+    for encoding in encodings:
+        if encoding == 'br':
+            compressed = brotli.compress(data, quality=brotli_quality)
+        else:
+            compressed = gzip.compress(data, gzip_level, mtime=0)
+        sibling = path + SUFFIXES[encoding]
+        if len(compressed) > len(data) * MAX_RATIO:
+            if os.path.exists(sibling):
+                os.remove(sibling)
+            continue
+        partial = f"{sibling}.{os.getpid()}.tmp"
+        with open(partial, 'wb') as f:
+            f.write(compressed)
+        os.replace(partial, sibling)
+        kept[encoding] = len(compressed)
+    return kept
+
+
+def load_manifest(web_dir):
+    try:
+        manifest = json.loads((Path(web_dir) / MANIFEST_NAME).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('version') == MANIFEST_VERSION else None
+
+
+def siblings_present(path, encodings):
+    for encoding, size in encodings.items():
+        try:
+            if os.path.getsize(path + SUFFIXES[encoding]) != size:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+def build_manifest(web_dir, workers=None, force=False, gzip_level=9, brotli_quality=11):
+    """
+    Precompress and hash every file under web_dir and write the manifest.
+
+    Returns:
+        Dict with files, hashed, compressed, reused and removed counts, the
+        original and precompressed byte totals, and seconds taken
+    """
+    started = time.perf_counter()
+    web_dir = Path(web_dir)
+    encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+    settings = {'encodings': encodings, 'gzip_level': gzip_level, 'brotli_quality': brotli_quality,
+                'min_size': MIN_SIZE, 'max_ratio': MAX_RATIO}
+    previous = None if force else load_manifest(web_dir)
+    if previous and previous.get('settings') != settings:
+        previous = None
+    old_files = previous['files'] if previous else {}
+
+    files, jobs = {}, {}
+    stats = {'files': 0, 'hashed': 0, 'compressed': 0, 'reused': 0, 'removed': 0}
+    sibling_suffixes = tuple(SUFFIXES.values())
+    for root, _, names in os.walk(web_dir):
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            relative = Path(path).relative_to(web_dir).as_posix()
+            if relative == MANIFEST_NAME or name.endswith('.tmp'):
+                continue
+            if name.endswith(sibling_suffixes):
+                base, suffix = relative.rsplit('.', 1)
+                if os.path.exists(path.rsplit('.', 1)[0]):
+                    continue
+                if base in old_files and any(SUFFIXES[e] == '.' + suffix for e in old_files[base]['encodings']):
+                    os.remove(path)  # written for a file no longer in the build
+                    stats['removed'] += 1
+                    continue
+            stat = os.stat(path)
+            old = old_files.get(relative)
+            stats['files'] += 1
+            if old and old['size'] == stat.st_size and old['mtime_ns'] == stat.st_mtime_ns:
+                digest = old['sha256']
+            else:
+                digest = file_hash(path)
+                stats['hashed'] += 1
+            entry = {
+                'sha256': digest,
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'content_type': content_type(path),
+                'cache_control': cache_control(relative),
+                'encodings': {},
+            }
+            files[relative] = entry
+            if not compressible(path, stat.st_size):
+                continue
+            if old and old['sha256'] == digest and siblings_present(path, old['encodings']):
+                entry['encodings'] = old['encodings']
+                stats['reused'] += 1
+            else:
+                jobs[relative] = path
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {relative: pool.submit(compress_file, path, encodings, gzip_level, brotli_quality)
+                       for relative, path in jobs.items()}
+            for relative, future in futures.items():
+                files[relative]['encodings'] = future.result()
+        stats['compressed'] = len(jobs)
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'generated_at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'settings': settings,
+        'files': files,
+    }
+    partial = web_dir / f"{MANIFEST_NAME}.tmp"
+    partial.write_text(json.dumps(manifest, indent=1, sort_keys=True) + '\n', encoding='utf-8')
+    os.replace(partial, web_dir / MANIFEST_NAME)
+
+    stats['bytes'] = sum(entry['size'] for entry in files.values())
+    stats['precompressed_bytes'] = {
+        encoding: sum(entry['encodings'].get(encoding, entry['size']) for entry in files.values())
+        for encoding in encodings
+    }
+    stats['seconds'] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompress the Flutter web build and write its manifest')
+    parser.add_argument('web_dir', nargs='?', default=str(WEB_DIR), help='build directory (default: build/web)')
+    parser.add_argument('--workers', type=int, default=None, help='compression processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='rehash and recompress every file')
+    parser.add_argument('--gzip-level', type=int, default=9)
+    parser.add_argument('--brotli-quality', type=int, default=11)
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.web_dir):
+        print(f"❌ Error: Web directory not found: {args.web_dir}")
+        print("   Run 'flutter build web --release' first")
+        return 1
+    if brotli is None:
+        print("⚠️  brotli not installed (pip install brotli): writing .gz siblings only")
+
+    stats = build_manifest(args.web_dir, args.workers, args.force, args.gzip_level, args.brotli_quality)
+    print(f"📦 {stats['files']} files, {stats['bytes']:,} bytes")
+    print(f"   Hashed: {stats['hashed']}  Compressed: {stats['compressed']}  "
+          f"Unchanged: {stats['reused']}  Stale siblings removed: {stats['removed']}")
+    for encoding, size in stats['precompressed_bytes'].items():
+        print(f"   {encoding}: {size:,} bytes ({size / max(stats['bytes'], 1):.0%})")
+    print(f"✅ Wrote {os.path.join(args.web_dir, MANIFEST_NAME)} in {stats['seconds']:.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
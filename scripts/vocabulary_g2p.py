@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Rule-based pronunciations for Transcribe vocabulary tables
+
+French terms get IPA (space-separated phonemes from Transcribe's fr-FR set) from
+ordered grapheme rules; acronyms are spelled out letter by letter. The rules only
+model how regular French spelling reads, which Transcribe fr-FR does by itself, so
+a French term needs IPA only when one of its words is spelled out. Terms in
+Swahili, Zulu, Hausa and the other largely phonemic African orthographies get a
+SoundsLike of hyphenated syllables, respelled with English vowels when the
+vocabulary is an English one (Pidgin, traditional medicine). A term is left
+without a pronunciation when any of its words falls outside the rules; for
+African schemes that is how English words in the same lists are told apart. The
+French rules read any Latin spelling, so English words are told apart by a lexicon
+(the foreign words passed to pronounce).
+
+Usage:
+    python3 scripts/vocabulary_g2p.py ipa-fr fièvre-jaune
+    python3 scripts/vocabulary_g2p.py respell-en wahala
+"""
+
+import re
+import sys
+
+SCHEMES = ('ipa-fr', 'syllables', 'respell-en')
+
+FRENCH_VOWELS = 'aeiouyéèêëàâîïôûùœ'
+_V = f"[{FRENCH_VOWELS}]"
+_NOT_V_OR_NASAL = f"(?![{FRENCH_VOWELS}nm])"
+
+# (grapheme pattern, phonemes), tried in order at each position of a lowercase word;
+# None copies the matched letter
+FRENCH_RULES = (
+    (r"'", ''),
+    # Endings
+    (r'(?<=^[a-zç])es$', 'e'),
+    (r'(?<=^[a-zç])e$', 'ə'),
+    (r'(?<=[ui])s$', 's'),  # virus, pubis
+    (r'(?<=.)es?$', ''),
+    (r'(?<=..)er$', 'e'),
+    (r'ez$', 'e'),
+    (r'et$', 'ɛ'),
+    (r'(?<=[aei])x$', 'k s'),
+    (r'(?<=.)(?:[stdxzp]|ds|ts|ps|ct)$', ''),
+    # Vowels
+    (r'eaux?', 'o'),
+    (r'ail(?:le)?(?=s?$)|aill', 'a j'),
+    (r'eil(?:le)?(?=s?$)|eill', 'ɛ j'),
+    (r'euil(?:le)?(?=s?$)|euill', 'œ j'),
+    (r'oeu|œu', 'œ'),
+    (r'oe|œ', 'e'),
+    (r'eu(?=[rfl])', 'œ'),
+    (r'eu', 'ø'),
+    (r'o[uù]', 'u'),
+    (rf'oin{_NOT_V_OR_NASAL}', 'w ɛ̃'),
+    (r'oi', 'w a'),
+    (rf'[ae]in{_NOT_V_OR_NASAL}', 'ɛ̃'),
+    (rf'ien{_NOT_V_OR_NASAL}', 'j ɛ̃'),
+    (rf'[iy][nm]{_NOT_V_OR_NASAL}', 'ɛ̃'),
+    (rf'[ae][nm]{_NOT_V_OR_NASAL}', 'ɑ̃'),
+    (rf'o[nm]{_NOT_V_OR_NASAL}', 'ɔ̃'),
+    (rf'u[nm]{_NOT_V_OR_NASAL}', 'œ̃'),
+    (r'ai|aî|ei|è|ê|ë', 'ɛ'),
+    (r'au', 'o'),
+    (r'é', 'e'),
+    (r'(?<=[aeuo])ille?|(?<=[aeuo])il$', 'j'),
+    (r'ill(?=[aeiou])', 'i j'),
+    (r'(?<!s)tion', 's j ɔ̃'),
+    (rf'y(?={_V})', 'j'),
+    (r'i(?=[aouéèê]|e(?!s?$))', 'j'),
+    (r'[yiîï]', 'i'),
+    (r'[uûù]', 'y'),
+    (r'[aàâ]', 'a'),
+    (r'[oô]', 'o'),
+    (rf'e(?=(?:ch|ph|th|gn|[bcdfgptv][rl]){_V})', 'ə'),
+    (r'e(?=[bcdfgjklmnpqrstvwxz]{2}|x|[crlf]$)', 'ɛ'),
+    (r'e', 'ə'),
+    # Consonants
+    (r'ch', 'ʃ'),
+    (r'ph', 'f'),
+    (r'th', 't'),
+    (r'gn', 'ɲ'),
+    (r'qu|q', 'k'),
+    (r'gu(?=[eiyéèê])', 'ɡ'),
+    (r'ge(?=[aouâô])', 'ʒ'),
+    (r'g(?=[eiyéèê])', 'ʒ'),
+    (r'gg|g', 'ɡ'),
+    (r'cc(?=[eiyéèê])', 'k s'),
+    (r'c(?=[eiyéèê])|ç', 's'),
+    (r'ck|cc|c|k', 'k'),
+    (r'x', 'k s'),
+    (r'h', ''),
+    (r'j', 'ʒ'),
+    (r'rr|r', 'ʁ'),
+    (rf'(?<={_V})s(?={_V})', 'z'),
+    (r'ss|s', 's'),
+    (r'bb|b', 'b'),
+    (r'dd|d', 'd'),
+    (r'ff|f', 'f'),
+    (r'll|l', 'l'),
+    (r'mm|m', 'm'),
+    (r'nn|n', 'n'),
+    (r'pp|p', 'p'),
+    (r'tt|t', 't'),
+    (r'[vwz]', None),
+)
+
+FRENCH_LETTERS = {
+    'a': 'a', 'b': 'b e', 'c': 's e', 'd': 'd e', 'e': 'ə', 'f': 'ɛ f', 'g': 'ʒ e', 'h': 'a ʃ', 'i': 'i',
+    'j': 'ʒ i', 'k': 'k a', 'l': 'ɛ l', 'm': 'ɛ m', 'n': 'ɛ n', 'o': 'o', 'p': 'p e', 'q': 'k y', 'r': 'ɛ ʁ',
+    's': 'ɛ s', 't': 't e', 'u': 'y', 'v': 'v e', 'w': 'd u b l ə v e', 'x': 'i k s', 'y': 'i ɡ ʁ ɛ k', 'z': 'z ɛ d',
+}
+FRENCH_PHONEMES = set('a e ɛ ə i o ɔ u y ø œ ɑ̃ ɛ̃ ɔ̃ œ̃ b d f ɡ j k l m n ɲ p ʁ s ʃ t v w z ʒ ɥ'.split())
+# Spelled out: all capitals (ADN, VHB) or capitals inside the word (AgHBs)
+ACRONYM = re.compile(r'[A-Z]{1,6}|[A-Za-z]*[a-z][A-Z][A-Za-z]*')
+
+# Open syllables of Bantu and West African orthographies: (onset) vowel, syllabic
+# nasals before a consonant (mtoto), and a final n (Hausa bugin)
+ONSETS = ("ng'|ny|ng|mb|mv|mp|nd|nj|nz|nk|nt|ch|sh|gh|kh|dh|th|hl|dl|gb|kp|ts|bh|ph|"
+          "[bcdfghjklmnpqrstvwyz]")
+SYLLABLE = re.compile(rf"(?:(?:{ONSETS})[wy]?)?(?:aa|ee|ii|oo|uu|[aeiou])|[mn](?=[bcdfghjklmnpqrstvwxz])|n$")
+ENGLISH_VOWELS = {'a': 'ah', 'e': 'eh', 'i': 'ee', 'o': 'oh', 'u': 'oo',
+                  'aa': 'aah', 'ee': 'ay', 'ii': 'ee', 'oo': 'oh', 'uu': 'oo'}
+ENGLISH_VOWEL = re.compile(r'aa|ee|ii|oo|uu|[aeiou]')
+
+COMPILED_FRENCH_RULES = tuple((re.compile(pattern), output) for pattern, output in FRENCH_RULES)
+
+
+def french_word_ipa(word):
+    """Phonemes of one French word, or None if a grapheme has no rule."""
+    if ACRONYM.fullmatch(word):
+        return ' '.join(FRENCH_LETTERS[letter] for letter in word.lower()).split()
+    word = word.lower()
+    phonemes, position = [], 0
+    while position < len(word):
+        for pattern, output in COMPILED_FRENCH_RULES:
+            match = pattern.match(word, position)
+            if match:
+                phonemes.extend((match.group()[0] if output is None else output).split())
+                position = match.end()
+                break
+        else:
+            return None
+    return phonemes
+
+
+def syllabify(word):
+    """Open syllables of a word, or None if it does not parse (foreign spelling)."""
+    word = word.lower()
+    syllables, position = [], 0
+    while position < len(word):
+        match = SYLLABLE.match(word, position)
+        if not match:
+            return None
+        syllables.append(match.group())
+        position = match.end()
+    if len(syllables) > 1 and syllables[-1] == 'n':
+        syllables[-2:] = [syllables[-2] + 'n']
+    return syllables
+
+
+def words(phrase):
+    return [word for word in re.split(r"[-\s]+", phrase) if word]
+
+
+def spelled_out(phrase):
+    """True if a word of the phrase is an acronym, read letter by letter rather than as spelt."""
+    return any(ACRONYM.fullmatch(part) for word in words(phrase) for part in word.split("'"))
+
+
+def needs_pronunciation(phrase, scheme):
+    """
+    Whether a table row is worth a pronunciation under the scheme.
+
+    Transcribe fr-FR already reads regular French spelling the way the French rules
+    do, so only rows with a spelled-out word gain from IPA; the others stay plain
+    phrases, which keeps the table well under Transcribe's size limit.
+    """
+    return scheme != 'ipa-fr' or spelled_out(phrase)
+
+
+def pronounce(phrase, scheme, foreign=frozenset()):
+    """
+    (IPA, SoundsLike) for a table Phrase under a pronunciation scheme.
+
+    At most one is set, as Transcribe requires; both are '' when any word falls
+    outside the scheme's rules or is one of the foreign words (lowercase) of
+    another language that the rules would misread.
+    """
+    if any(word.lower() in foreign for word in words(phrase)):
+        return '', ''
+    if scheme == 'ipa-fr':
+        phonemes = []
+        for word in words(phrase):
+            for part in filter(None, word.split("'")):
+                ipa = french_word_ipa(part)
+                if ipa is None:
+                    return '', ''
+                phonemes.extend(ipa)
+        return ' '.join(phonemes), ''
+    if scheme in ('syllables', 'respell-en'):
+        syllables = []
+        for word in words(phrase):
+            parsed = syllabify(word)
+            if not parsed:
+                return '', ''
+            syllables.extend(parsed)
+        if scheme == 'respell-en':
+            syllables = [ENGLISH_VOWEL.sub(lambda match: ENGLISH_VOWELS[match.group()], syllable.replace('c', 'ch'))
+                         for syllable in syllables]
+        return '', '-'.join(syllables)
+    return '', ''
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3 or sys.argv[1] not in SCHEMES:
+        print(f"Usage: python3 scripts/vocabulary_g2p.py {{{','.join(SCHEMES)}}} PHRASE...")
+        sys.exit(2)
+    for phrase in sys.argv[2:]:
+        ipa, sounds_like = pronounce(phrase, sys.argv[1])
+        print(f"{phrase}\t{ipa or sounds_like or '(no rule)'}")
@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+Normalize the medical vocabularies for each place they are used, in one pass
+
+Reads every vocabulary source (the term lists in medical-vocabularies/ and the TSV
+tables in aws-deployment/vocabularies/) once, line by line, in a process pool, and
+feeds each term through a precompiled rule set per target:
+
+    transcribe  phrases for a Transcribe custom vocabulary list (Phrases=...)
+    table       rows of a Transcribe vocabulary table (Phrase, IPA, SoundsLike, DisplayAs),
+                pronounced by vocabulary_g2p.py where a row has neither IPA nor SoundsLike
+    matcher     lowercase, accent-free keys for matching transcripts locally
+
+The rule sets are declared in RULES below, as (name, pattern, replacement) in the
+order they apply. The report counts, per target and rule, how many terms each rule
+changed, and validates the transcribe and table outputs against Transcribe's limits
+before anything is deployed.
+
+Digits are spelled out ("type-2-diabetes" -> "type-two-diabetes") rather than kept
+or deleted, and French keeps the accented letters Transcribe accepts for fr-FR.
+
+Usage:
+    python3 scripts/vocabulary_normalizer.py [--targets transcribe table matcher] [--output-dir build/vocabularies]
+    python3 scripts/vocabulary_normalizer.py --in-place      # rewrite the term lists with the transcribe rules
+    python3 scripts/vocabulary_normalizer.py --check         # validate only; exit 1 on problems
+"""
+
+import argparse
+import functools
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import vocabulary_g2p
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+OUTPUT_DIR = REPO_ROOT / 'build' / 'vocabularies'
+
+# (path relative to the repository, language code)
+SOURCES = [
+    ('medical-vocabularies/medzen-medical-vocab-en.txt', 'en-US'),
+    ('medical-vocabularies/medzen-medical-vocab-fr.txt', 'fr-FR'),
+    ('medical-vocabularies/medzen-medical-vocab-sw.txt', 'sw-KE'),
+    ('medical-vocabularies/medzen-medical-vocab-zu.txt', 'zu-ZA'),
+    ('medical-vocabularies/medzen-medical-vocab-ha.txt', 'ha-NG'),
+    ('medical-vocabularies/medzen-medical-vocab-yo-fallback-en.txt', 'en-US'),
+    ('medical-vocabularies/medzen-medical-vocab-ig-fallback-en.txt', 'en-US'),
+    ('medical-vocabularies/medzen-medical-vocab-pcm-fallback-en.txt', 'en-US'),
+    ('medical-vocabularies/medzen-medical-vocab-ln-fallback-fr.txt', 'fr-FR'),
+    ('medical-vocabularies/medzen-medical-vocab-kg-fallback-fr.txt', 'fr-FR'),
+    ('aws-deployment/vocabularies/medical-abbreviations.txt', 'en-US'),
+    ('aws-deployment/vocabularies/pidgin-medical-terms.txt', 'en-US'),
+    ('aws-deployment/vocabularies/camfranglais-medical-terms.txt', 'fr-FR'),
+    ('aws-deployment/vocabularies/african-traditional-medicine.txt', 'en-US'),
+]
+
+# Pronunciation scheme (vocabulary_g2p.SCHEMES) that fills IPA or SoundsLike in tables
+PRONUNCIATIONS = {
+    'medical-vocabularies/medzen-medical-vocab-fr.txt': 'ipa-fr',
+    'medical-vocabularies/medzen-medical-vocab-ln-fallback-fr.txt': 'ipa-fr',
+    'medical-vocabularies/medzen-medical-vocab-kg-fallback-fr.txt': 'ipa-fr',
+    'aws-deployment/vocabularies/camfranglais-medical-terms.txt': 'ipa-fr',
+    'medical-vocabularies/medzen-medical-vocab-sw.txt': 'syllables',
+    'medical-vocabularies/medzen-medical-vocab-zu.txt': 'syllables',
+    'medical-vocabularies/medzen-medical-vocab-ha.txt': 'syllables',
+    'aws-deployment/vocabularies/pidgin-medical-terms.txt': 'respell-en',
+    'aws-deployment/vocabularies/african-traditional-medicine.txt': 'respell-en',
+}
+
+# Per scheme, (its language, the language whose words its rules would misread): French
+# rules read any Latin spelling, so English-only words keep a row plain (type-deux-diabetes)
+LEXICONS = {'ipa-fr': ('fr', 'en')}
+
+TARGETS = ('transcribe', 'table', 'matcher')
+TABLE_HEADER = ('Phrase', 'IPA', 'SoundsLike', 'DisplayAs')
+
+# https://docs.aws.amazon.com/transcribe/latest/dg/custom-vocabulary.html
+TRANSCRIBE_LIMITS = {'phrases': 50000, 'phrase_chars': 256, 'bytes': 50 * 1024}
+NEAR_LIMIT = 0.95  # share of the byte limit past which a vocabulary is warned about
+INVALID_PHRASE = re.compile(r"[^\w.'-]|[\d_]")
+INVALID_SOUNDS_LIKE = re.compile(r"[^\w'-]|[\d_]")
+
+# Letters outside a-z that Transcribe accepts per language; everything else is folded
+LANGUAGE_LETTERS = {'fr': set('àâäæçéèêëîïôöœùûüÿÀÂÄÆÇÉÈÊËÎÏÔÖŒÙÛÜŸ')}
+LIGATURES = {'æ': 'ae', 'Æ': 'AE', 'œ': 'oe', 'Œ': 'OE', 'ß': 'ss', 'ø': 'o', 'Ø': 'O', 'ł': 'l', 'Ł': 'L'}
+
+NUMBER_WORDS = {
+    'en': ('zero one two three four five six seven eight nine ten eleven twelve thirteen fourteen fifteen '
+           'sixteen seventeen eighteen nineteen').split(),
+    'fr': ('zéro un deux trois quatre cinq six sept huit neuf dix onze douze treize quatorze quinze '
+           'seize dix-sept dix-huit dix-neuf').split(),
+}
+TENS = {
+    'en': {20: 'twenty', 30: 'thirty', 40: 'forty', 50: 'fifty', 60: 'sixty', 70: 'seventy', 80: 'eighty', 90: 'ninety'},
+    'fr': {20: 'vingt', 30: 'trente', 40: 'quarante', 50: 'cinquante', 60: 'soixante'},
+}
+
+
+def spell_number(number, language):
+    """Words for 0-99 in English or French; longer numbers digit by digit."""
+    language = language if language in NUMBER_WORDS else 'en'
+    units = NUMBER_WORDS[language]
+    if len(number) > 2:
+        return '-'.join(units[int(digit)] for digit in number)
+    value = int(number)
+    if value < 20:
+        return units[value]
+    if language == 'fr' and value >= 60:
+        base = 60 if value < 80 else 80
+        rest = value - base
+        head = 'soixante' if base == 60 else 'quatre-vingt'
+        if rest == 0:
+            return 'quatre-vingts' if base == 80 else head
+        joiner = '-et-' if rest in (1, 11) and base == 60 else '-'
+        return head + joiner + units[rest]
+    tens, rest = value - value % 10, value % 10
+    if rest == 0:
+        return TENS[language][tens]
+    joiner = '-et-' if language == 'fr' and rest == 1 else '-'
+    return TENS[language][tens] + joiner + units[rest]
+
+
+def fold_character(character, allowed=()):
+    if character in allowed:
+        return character
+    if character in LIGATURES:
+        return LIGATURES[character]
+    folded = ''.join(c for c in unicodedata.normalize('NFD', character) if unicodedata.category(c) != 'Mn')
+    return folded if folded.isascii() else ''
+
+
+def spell_digits(match, language):
+    return f"-{spell_number(match.group(), language[:2])}-"
+
+
+def fold_for_language(match, language):
+    return fold_character(match.group(), LANGUAGE_LETTERS.get(language[:2], ()))
+
+
+def fold_all(match, language):
+    return fold_character(match.group())
+
+
+def lowercase(match, language):
+    return match.group().lower()
+
+
+BOOST_WEIGHT = ('boost-weight', r'\s*,\s*\d*\s*$', '')  # "term, 5" from the old weighted lists
+
+PHRASE_RULES = (
+    BOOST_WEIGHT,
+    ('spell-digits', r'\d+', spell_digits),
+    ('fold-accents', r'[^\x00-\x7f]', fold_for_language),
+    ('spaces-to-hyphens', r'\s+', '-'),
+    ('invalid-characters', r"[^\w.'-]|_", ''),
+    ('repeated-hyphens', r'-{2,}', '-'),
+    ('edge-punctuation', r"^[-.']+|[-']+$", ''),
+)
+
+RULES = {
+    'transcribe': PHRASE_RULES,
+    'table': PHRASE_RULES,
+    # SoundsLike of a table row: hyphenated syllables of letters only
+    'sounds-like': (
+        ('sounds-like-digits', r'\d+', spell_digits),
+        ('sounds-like-accents', r'[^\x00-\x7f]', fold_for_language),
+        ('sounds-like-separators', r"[^\w']+|_", '-'),
+        ('sounds-like-edges', r"^[-']+|[-']+$", ''),
+    ),
+    # DisplayAs of a table row: the source spelling, tidied
+    'display': (
+        BOOST_WEIGHT,
+        ('whitespace', r'\s+', ' '),
+    ),
+    'matcher': (
+        BOOST_WEIGHT,
+        ('fold-accents', r'[^\x00-\x7f]', fold_all),
+        ('separators', r'[-_/]+', ' '),
+        ('punctuation', r"[^\w\s']", ''),
+        ('lowercase', r'[A-Z]+', lowercase),
+        ('whitespace', r'\s+', ' '),
+    ),
+}
+
+
+def compile_rules(rules):
+    """
+    Compile a rule set, with one pattern matching wherever any rule would.
+
+    A term the combined pattern does not match is left alone by every rule, so most
+    terms of an already clean list cost one search.
+    """
+    combined = re.compile('|'.join(f"(?:{pattern})" for _, pattern, _ in rules))
+    return combined, tuple((name, re.compile(pattern), replacement) for name, pattern, replacement in rules)
+
+
+COMPILED_RULES = {target: compile_rules(rules) for target, rules in RULES.items()}
+
+
+def apply_rules(compiled, term, language, impact=None):
+    """Run term through a compiled rule set; counts each rule that changed it in impact."""
+    combined, rules = compiled
+    if not combined.search(term):
+        return term.strip()
+    for name, pattern, replacement in rules:
+        if callable(replacement):
+            if not pattern.search(term):
+                continue
+            changed = pattern.sub(lambda match: replacement(match, language), term)
+        else:
+            changed = pattern.sub(replacement, term)
+        if changed != term:
+            if impact is not None:
+                impact[name] += 1
+            term = changed
+    return term.strip()
+
+
+def read_source(path):
+    """Yield (phrase, ipa, sounds_like, display_as) per term of a term list or TSV table."""
+    table = None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = unicodedata.normalize('NFC', line.rstrip('\r\n'))
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+            if table is None:
+                table = line.startswith('Phrase\t')
+                if table:
+                    continue
+            if table:
+                columns = (line.split('\t') + [''] * 4)[:4]
+                yield tuple(column.strip() for column in columns)
+            else:
+                yield line.strip(), '', '', ''
+
+
+def is_table(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip() and not line.lstrip().startswith('#'):
+                return line.startswith('Phrase\t')
+    return False
+
+
+@functools.lru_cache(maxsize=None)
+def foreign_words(scheme):
+    """Lowercase words of the scheme's foreign-language sources that its own sources never use."""
+    if scheme not in LEXICONS:
+        return frozenset()
+    lexicons = {language: set() for language in LEXICONS[scheme]}
+    for path, language in SOURCES:
+        lexicon = lexicons.get(language.split('-')[0])
+        if lexicon is None or not (REPO_ROOT / path).exists():
+            continue
+        for phrase, *_ in read_source(REPO_ROOT / path):
+            lexicon.update(word.lower() for word in vocabulary_g2p.words(phrase))
+    own, foreign = LEXICONS[scheme]
+    return frozenset(lexicons[foreign] - lexicons[own])
+
+
+def normalize_file(path, language, targets=TARGETS, pronunciation=None):
+    """
+    Normalize one source for every target in a single read.
+
+    Table rows without an IPA or SoundsLike get one from the pronunciation scheme
+    where it needs one (vocabulary_g2p.needs_pronunciation) and no word is foreign.
+
+    Returns:
+        Dict with the term count and, per target, its entries (phrases, table rows
+        or {key: display}), per-rule impact and dropped/duplicate counts
+    """
+    results = {target: {'entries': {}, 'impact': Counter(), 'dropped': 0, 'duplicates': 0} for target in targets}
+    terms = 0
+    for phrase, ipa, sounds_like, display_as in read_source(path):
+        terms += 1
+        for target in targets:
+            result = results[target]
+            normalized = apply_rules(COMPILED_RULES[target], phrase, language, result['impact'])
+            if not normalized:
+                result['dropped'] += 1
+                continue
+            if normalized in result['entries']:
+                result['duplicates'] += 1
+                continue
+            if target == 'table':
+                display = display_as or apply_rules(COMPILED_RULES['display'], phrase, language)
+                sounds_like = apply_rules(COMPILED_RULES['sounds-like'], sounds_like, language, result['impact'])
+                if (pronunciation and not ipa and not sounds_like
+                        and vocabulary_g2p.needs_pronunciation(normalized, pronunciation)):
+                    ipa, sounds_like = vocabulary_g2p.pronounce(normalized, pronunciation, foreign_words(pronunciation))
+                    if ipa or sounds_like:
+                        result['impact'][f"g2p-{pronunciation}"] += 1
+                result['entries'][normalized] = (normalized, ipa, sounds_like, '' if display == normalized else display)
+            elif target == 'matcher':
+                result['entries'][normalized] = display_as or apply_rules(COMPILED_RULES['display'], phrase, language)
+            else:
+                result['entries'][normalized] = normalized
+
+    for target, result in results.items():
+        entries = result['entries']
+        if target == 'matcher':
+            result['entries'] = dict(sorted(entries.items()))
+        else:
+            result['entries'] = [entries[key] for key in sorted(entries)]
+        result['impact'] = dict(result['impact'])
+    return {'path': str(path), 'language': language, 'terms': terms, 'targets': results}
+
+
+def render_phrases(phrases):
+    return ''.join(phrase + '\n' for phrase in phrases)
+
+
+def render_table(rows):
+    return ''.join('\t'.join(row) + '\n' for row in [TABLE_HEADER, *rows])
+
+
+def phrase_problems(phrases, limits):
+    problems = []
+    if len(phrases) > limits['phrases']:
+        problems.append(f"{len(phrases)} phrases (limit {limits['phrases']})")
+    too_long = [phrase for phrase in phrases if len(phrase) > limits['phrase_chars']]
+    if too_long:
+        problems.append(f"{len(too_long)} phrases over {limits['phrase_chars']} characters: {too_long[0][:40]}...")
+    invalid = [phrase for phrase in phrases if INVALID_PHRASE.search(phrase)]
+    if invalid:
+        problems.append(f"{len(invalid)} phrases with invalid characters: {', '.join(invalid[:3])}")
+    return problems
+
+
+def size_problems(size, limits, warnings):
+    if size > limits['bytes']:
+        return [f"{size} bytes (limit {limits['bytes']})"]
+    if warnings is not None and size > limits['bytes'] * NEAR_LIMIT:
+        warnings.append(f"{size} bytes is within {1 - NEAR_LIMIT:.0%} of the {limits['bytes']} byte limit")
+    return []
+
+
+def validate_phrases(phrases, limits=TRANSCRIBE_LIMITS, warnings=None):
+    """
+    Problems that would make Transcribe reject a custom vocabulary list; empty if none.
+
+    A list close to the byte limit is accepted but noted in warnings, when given.
+    """
+    problems = phrase_problems(phrases, limits)
+    problems.extend(size_problems(len(render_phrases(phrases).encode('utf-8')), limits, warnings))
+    return problems
+
+
+def validate_table(rows, limits=TRANSCRIBE_LIMITS, language='', warnings=None):
+    """
+    Problems that would make Transcribe reject a vocabulary table; empty if none.
+
+    A table close to the byte limit is accepted but noted in warnings, when given.
+    """
+    problems = phrase_problems([row[0] for row in rows], limits)
+    problems.extend(size_problems(len(render_table(rows).encode('utf-8')), limits, warnings))
+    both = [row[0] for row in rows if row[1] and row[2]]
+    if both:
+        problems.append(f"{len(both)} rows with both IPA and SoundsLike: {', '.join(both[:3])}")
+    invalid = [row[2] for row in rows if row[2] and INVALID_SOUNDS_LIKE.search(row[2])]
+    if invalid:
+        problems.append(f"{len(invalid)} SoundsLike values with invalid characters: {', '.join(invalid[:3])}")
+    if language.startswith('fr'):
+        unknown = sorted({phoneme for row in rows for phoneme in row[1].split()} - vocabulary_g2p.FRENCH_PHONEMES)
+        if unknown:
+            problems.append(f"IPA symbols outside the fr-FR set: {' '.join(unknown[:5])}")
+    return problems
+
+
+def write_outputs(result, output_dir, in_place):
+    """Write one source's outputs; returns the paths written."""
+    stem = Path(result['path']).stem
+    written = []
+    for target, outcome in result['targets'].items():
+        if target == 'transcribe':
+            if in_place:
+                if is_table(result['path']):
+                    continue  # tables are rewritten by the table target, never flattened
+                path = Path(result['path'])
+            else:
+                path = Path(output_dir) / 'transcribe' / f"{stem}.txt"
+            content = render_phrases(outcome['entries'])
+        elif target == 'table':
+            path = Path(output_dir) / 'table' / f"{stem}.tsv"
+            content = render_table(outcome['entries'])
+        else:
+            path = Path(output_dir) / 'matcher' / f"{stem}.json"
+            content = json.dumps(outcome['entries'], ensure_ascii=False, indent=1) + '\n'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists() and path.read_text(encoding='utf-8') == content:
+            continue
+        partial = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        partial.write_text(content, encoding='utf-8')
+        os.replace(partial, path)
+        written.append(str(path))
+    return written
+
+
+def normalize_vocabularies(sources=SOURCES, targets=TARGETS, output_dir=OUTPUT_DIR, in_place=False,
+                           workers=None, write=True, root=REPO_ROOT):
+    """
+    Normalize every source for every target, validate, and write the outputs.
+
+    Returns:
+        Dict with per-file results (term and entry counts, problems, warnings), per-target
+        rule impact totals, the files written and seconds taken
+    """
+    started = time.perf_counter()
+    jobs = [(Path(root) / path, language, PRONUNCIATIONS.get(path)) for path, language in sources
+            if (Path(root) / path).exists()]
+    missing = [path for path, _ in sources if not (Path(root) / path).exists()]
+    if workers == 1:
+        results = [normalize_file(path, language, targets, pronunciation) for path, language, pronunciation in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(normalize_file, path, language, targets, pronunciation)
+                       for path, language, pronunciation in jobs]
+            results = [future.result() for future in futures]
+
+    report = {'files': [], 'impact': {target: Counter() for target in targets}, 'written': [], 'missing': missing}
+    for result in results:
+        summary = {'path': os.path.relpath(result['path'], root), 'language': result['language'],
+                   'terms': result['terms'], 'targets': {}}
+        for target, outcome in result['targets'].items():
+            report['impact'][target].update(outcome['impact'])
+            entry = {'entries': len(outcome['entries']), 'dropped': outcome['dropped'], 'duplicates': outcome['duplicates']}
+            if target == 'transcribe':
+                entry['warnings'] = []
+                entry['problems'] = validate_phrases(outcome['entries'], warnings=entry['warnings'])
+            elif target == 'table':
+                entry['warnings'] = []
+                entry['problems'] = validate_table(outcome['entries'], language=result['language'],
+                                                   warnings=entry['warnings'])
+            summary['targets'][target] = entry
+        report['files'].append(summary)
+        if write:
+            report['written'].extend(write_outputs(result, output_dir, in_place))
+    report['impact'] = {target: dict(impact.most_common()) for target, impact in report['impact'].items()}
+    report['problems'] = sum(len(entry.get('problems', [])) for summary in report['files']
+                             for entry in summary['targets'].values())
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Normalize the medical vocabularies for Transcribe and local matching')
+    parser.add_argument('--targets', nargs='+', choices=TARGETS, default=list(TARGETS))
+    parser.add_argument('--output-dir', default=str(OUTPUT_DIR), help='where outputs go (default: build/vocabularies)')
+    parser.add_argument('--in-place', action='store_true', help='rewrite the term lists with the transcribe rules')
+    parser.add_argument('--check', action='store_true', help='validate only: write nothing, exit 1 on problems')
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: CPU count)')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    report = normalize_vocabularies(targets=args.targets, output_dir=args.output_dir, in_place=args.in_place,
+                                    workers=args.workers, write=not args.check)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        return 1 if report['problems'] else 0
+
+    print("🧹 Normalizing medical vocabularies\n")
+    for path in report['missing']:
+        print(f"⊘ File not found: {path}")
+    for summary in report['files']:
+        counts = ', '.join(f"{target} {entry['entries']}" for target, entry in summary['targets'].items())
+        print(f"{'❌' if any(e.get('problems') for e in summary['targets'].values()) else '✅'} "
+              f"{summary['path']} ({summary['language']}): {summary['terms']} terms → {counts}")
+        for target, entry in summary['targets'].items():
+            for problem in entry.get('problems', []):
+                print(f"   {target}: {problem}")
+            for warning in entry.get('warnings', []):
+                print(f"   ⚠️  {target}: {warning}")
+    print("\n📊 Terms changed per rule:")
+    for target, impact in report['impact'].items():
+        rules = ', '.join(f"{name} {count}" for name, count in impact.items()) or 'none'
+        print(f"   {target}: {rules}")
+    if not args.check:
+        print(f"\n✏️  {len(report['written'])} files written")
+    if report['problems']:
+        print(f"\n❌ {report['problems']} problems would make Transcribe reject a vocabulary")
+        return 1
+    print(f"\n✅ Done in {report['seconds']:.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -465,6 +465,8 @@ serve(async (req) => {
       JSON.stringify({
         draft_id: draft.id,
         appointment_id: session.appointment_id,
+        // Count of live_caption_segments rows used for the draft (not the
+        // video_call_sessions.transcript_segments column, which is no longer written)
         transcript_segments: segments?.length || 0,
         chat_messages: messages?.length || 0,
       }),
@@ -0,0 +1,17 @@
+-- Track Bedrock prompt cache usage alongside input/output tokens
+-- generate-soap-from-transcript marks the static system prompt for prompt caching;
+-- cached tokens are reported separately from input_tokens by Bedrock
+
+ALTER TABLE IF EXISTS bedrock_token_usage
+ADD COLUMN IF NOT EXISTS cache_read_input_tokens INTEGER DEFAULT 0,
+ADD COLUMN IF NOT EXISTS cache_creation_input_tokens INTEGER DEFAULT 0,
+ADD COLUMN IF NOT EXISTS prompt_version TEXT;
+
+COMMENT ON COLUMN bedrock_token_usage.cache_read_input_tokens IS
+'Input tokens served from the Bedrock prompt cache (billed at the reduced cache-read rate)';
+
+COMMENT ON COLUMN bedrock_token_usage.cache_creation_input_tokens IS
+'Input tokens written to the Bedrock prompt cache on this call';
+
+COMMENT ON COLUMN bedrock_token_usage.prompt_version IS
+'Content hash of the system prompt revision used for generation';
@@ -0,0 +1,13 @@
+-- Keep transcript segments out of video_call_sessions
+-- The transcription router and callback write segments to S3 as gzip NDJSON chunks with a
+-- manifest (medzen_runtime.transcript_store); the session row keeps the pointer and a summary
+
+ALTER TABLE IF EXISTS video_call_sessions
+ADD COLUMN IF NOT EXISTS transcript_manifest_uri TEXT,
+ADD COLUMN IF NOT EXISTS transcript_summary JSONB;
+
+COMMENT ON COLUMN video_call_sessions.transcript_manifest_uri IS
+'S3 URI of the transcript segment manifest (chunk index for time-range and speaker reads)';
+
+COMMENT ON COLUMN video_call_sessions.transcript_summary IS
+'Segment store summary: duration, segment_count, speakers, chunks, stored_bytes';
@@ -0,0 +1,17 @@
+-- Report audio preprocessing per session
+-- With MEDZEN_AUDIO_PREPROCESS enabled the transcription router transcribes a trimmed mono 16 kHz
+-- derivative of the recording (medzen_runtime.audio); segment times still refer to the recording
+
+ALTER TABLE IF EXISTS video_call_sessions
+ADD COLUMN IF NOT EXISTS audio_preprocessed_uri TEXT,
+ADD COLUMN IF NOT EXISTS audio_original_seconds NUMERIC,
+ADD COLUMN IF NOT EXISTS audio_seconds_saved NUMERIC;
+
+COMMENT ON COLUMN video_call_sessions.audio_preprocessed_uri IS
+'S3 URI of the trimmed audio sent for transcription (FLAC for AWS Transcribe, Opus for Whisper)';
+
+COMMENT ON COLUMN video_call_sessions.audio_original_seconds IS
+'Duration of the original recording in seconds';
+
+COMMENT ON COLUMN video_call_sessions.audio_seconds_saved IS
+'Seconds of leading/trailing silence and long pauses removed before transcription';